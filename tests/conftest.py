@@ -0,0 +1,178 @@
+"""测试公共设施：把 tools/ 加入导入路径，并提供手动时钟与录像回放客户端"""
+
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import pytest
+
+TOOLS_DIR = Path(__file__).resolve().parents[1] / "tools"
+if str(TOOLS_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOLS_DIR))
+
+import auto_copilot_pipeline as acp  # noqa: E402
+
+
+class ManualClock(acp.Clock):
+    """手动时钟：sleep 只推进时间，不真正等待"""
+
+    def __init__(self, start: float = 1_000_000.0) -> None:
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self.now += seconds
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def call(args: List[str], output: str = "", rc: Optional[int] = 0, stderr: str = "", duration: float = 0.0) -> dict:
+    """录像中的一条请求：args 为 gh 之后的参数"""
+    return {"t": 0, "d": duration, "a": list(args), "rc": rc, "o": output, "e": stderr}
+
+
+def write_cassette(path: Path, entries: Iterable[dict], repo: str = "o/r") -> Path:
+    with path.open("w", encoding="utf-8") as fh:
+        fh.write(json.dumps({"cassette": 1, "repo": repo}) + "\n")
+        for entry in entries:
+            fh.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return path
+
+
+@pytest.fixture
+def clock() -> ManualClock:
+    return ManualClock()
+
+
+@pytest.fixture
+def replay(tmp_path, clock):
+    """replay(entries) -> 使用该录像的 GitHubClient（o/r）"""
+
+    def build(entries: Iterable[dict]) -> acp.GitHubClient:
+        transport = acp.ReplayTransport(write_cassette(tmp_path / "gh.jsonl", entries), clock)
+        return acp.GitHubClient("o", "r", transport=transport, clock=clock)
+
+    return build
+
+
+def make_item(todo_id: str, title: str = "任务", meta: Iterable[str] = (), stage: int = 4,
+              file_path: Optional[Path] = None) -> acp.WorkItem:
+    """单个 TODO 组成的工作项"""
+    path = file_path or Path(acp.ROOT / "todo" / f"Stage-{stage:02d}_Test.todos.md")
+    todo = acp.TodoItem(todo_id, stage, title, list(meta), path)
+    return acp.WorkItem(todo_id, stage, title, path, [todo])
+
+
+def file_call(path: str, ref: str, text: Optional[str]) -> dict:
+    """GitHubClient.get_file_text 的录像条目；text 为 None 表示文件不存在"""
+    args = ["api", f"/repos/o/r/contents/{acp.quote(path)}?ref={acp.quote(ref, safe='')}", "-H", acp.RAW_ACCEPT_HEADER]
+    if text is None:
+        return call(args, rc=1, stderr="gh: Not Found (HTTP 404)")
+    return call(args, text)
+
+
+def pipeline_args(*argv: str):
+    """按命令行解析的 Pipeline 参数"""
+    return acp.build_arg_parser().parse_args(list(argv))
+
+
+class FakeGitHub:
+    """按时间线脚本演进的 GitHub 假对象，只实现监控 Issue 用到的方法
+
+    at(时间, 动作) 登记的动作在时钟走到该时间后的下一次调用前生效。
+    """
+
+    repo_ref = "o/r"
+    thread_calls = 0
+    memo_hits = coalesced = 0
+
+    def __init__(self, clock: ManualClock) -> None:
+        self.clock = clock
+        self.issues: dict = {}
+        self.links: dict = {}  # Issue 编号 -> 时间线上引用的 PR 编号（按出现顺序）
+        self.pulls: dict = {}
+        self.finished: set = set()
+        self.assigned_at: List[float] = []
+        self.comments: List[tuple] = []
+        self._script: List[tuple] = []
+
+    def at(self, when: float, action) -> None:
+        self._script.append((when, action))
+        self._script.sort(key=lambda entry: entry[0])
+
+    def _tick(self) -> None:
+        while self._script and self._script[0][0] <= self.clock.time():
+            self._script.pop(0)[1]()
+
+    def open_issue(self, number: int, title: str = "") -> None:
+        self.issues[number] = {"number": number, "title": title, "state": "open",
+                               "assignees": [{"login": "Copilot"}], "body": ""}
+
+    def open_pr(self, issue: int, number: int, finished: bool = False) -> None:
+        self.links.setdefault(issue, []).append(number)
+        self.pulls[number] = {"number": number, "state": "open", "merged_at": None,
+                              "updatedAt": str(self.clock.time()), "files": []}
+        if finished:
+            self.finished.add(number)
+
+    def get_issue(self, number: int) -> dict:
+        self._tick()
+        return dict(self.issues[number])
+
+    def get_issue_body(self, number: int) -> str:
+        return self.issues[number]["body"]
+
+    def edit_issue_body(self, number: int, body: str) -> None:
+        self.issues[number]["body"] = body
+
+    def latest_pr_from_timeline(self, number: int) -> Optional[int]:
+        self._tick()
+        links = self.links.get(number)
+        return links[-1] if links else None
+
+    def get_pull(self, number: int) -> dict:
+        self._tick()
+        return dict(self.pulls[number])
+
+    def api_request(self, method: str, endpoint: str, **_: object):
+        number = int(endpoint.rstrip("/").split("/")[-2])
+        return [{"event": "copilot_work_finished"}] if number in self.finished else []
+
+    def comment_issue(self, number: int, body: str) -> None:
+        self.comments.append((number, body))
+
+    def close_pr(self, number: int, delete_branch: bool = False) -> None:
+        self.pulls[number]["state"] = "closed"
+
+    def close_issue(self, number: int, comment: Optional[str] = None) -> None:
+        self.issues[number].update(state="closed", stateReason="NOT_PLANNED")
+        if comment:
+            self.comments.append((number, comment))
+
+    def list_closed_issues(self, limit: int = 1000) -> List[dict]:
+        self._tick()
+        return [{"title": issue["title"], "stateReason": issue.get("stateReason")}
+                for issue in self.issues.values() if issue["state"] == "closed"][:limit]
+
+    def mark_pr_ready(self, number: int) -> None:
+        pass
+
+    def merge_pull(self, number: int) -> None:
+        self.pulls[number].update(state="closed", merged_at=str(self.clock.time()))
+        for issue, links in self.links.items():
+            if number in links:
+                self.issues[issue].update(state="closed", stateReason="COMPLETED")
+
+    def remove_assignees(self, number: int, assignees) -> None:
+        self.issues[number]["assignees"] = []
+
+    def add_assignees(self, number: int, assignees) -> None:
+        self.issues[number]["assignees"] = [{"login": "Copilot"}]
+        self.assigned_at.append(self.clock.time())
@@ -0,0 +1,119 @@
+import subprocess
+import sys
+
+import pytest
+
+import auto_copilot_pipeline as acp
+from conftest import call, write_cassette
+
+
+class StubTransport(acp.GhTransport):
+    """按顺序返回预设结果的内层传输；结果为异常时抛出"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+
+    def run(self, cmd, timeout):
+        self.calls.append(cmd)
+        result = self.results.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        return subprocess.CompletedProcess(cmd, 0, stdout=result, stderr="")
+
+
+@pytest.mark.parametrize("name", ["gh.jsonl", "gh.jsonl.gz"])
+def test_record_then_replay_round_trip(tmp_path, clock, name):
+    path = tmp_path / name
+    inner = StubTransport([
+        "first",
+        subprocess.CalledProcessError(1, ["gh"], output="", stderr="boom"),
+        subprocess.TimeoutExpired(["gh"], 5),
+        "second",
+    ])
+    recorder = acp.RecordingTransport(inner, path, "o/r", clock)
+    assert recorder.run(["gh", "issue", "list"], 5).stdout == "first"
+    with pytest.raises(subprocess.CalledProcessError):
+        recorder.run(["gh", "pr", "view", "1"], 5)
+    with pytest.raises(subprocess.TimeoutExpired):
+        recorder.run(["gh", "pr", "view", "2"], 5)
+    recorder.run(["gh", "issue", "list"], 5)
+    recorder.close()
+
+    replay = acp.ReplayTransport(path, clock)
+    assert replay.header["repo"] == "o/r"
+    assert replay.run(["gh", "issue", "list"], 5).stdout == "first"
+    assert replay.run(["gh", "issue", "list"], 5).stdout == "second"
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        replay.run(["gh", "pr", "view", "1"], 5)
+    assert error.value.stderr == "boom"
+    with pytest.raises(subprocess.TimeoutExpired):
+        replay.run(["gh", "pr", "view", "2"], 5)
+    assert replay.exhausted
+    # 录制的调用用完后重复最后一次响应
+    assert replay.run(["gh", "issue", "list"], 5).stdout == "second"
+
+
+def test_replay_miss_raises(tmp_path, clock):
+    replay = acp.ReplayTransport(write_cassette(tmp_path / "gh.jsonl", [call(["issue", "list"], "[]")]), clock)
+    with pytest.raises(acp.CassetteMissError):
+        replay.run(["gh", "issue", "view", "1"], 5)
+
+
+def test_replay_reproduces_recorded_latency(tmp_path, clock):
+    replay = acp.ReplayTransport(write_cassette(tmp_path / "gh.jsonl", [call(["issue", "list"], "[]", duration=2.5)]), clock)
+    started = clock.time()
+    replay.run(["gh", "issue", "list"], 5)
+    assert clock.time() - started == pytest.approx(2.5)
+
+
+def test_client_over_replay(replay):
+    github = replay([
+        call(["issue", "create", "--repo", "o/r", "--title", "[T-1] 标题", "--body", "正文"],
+             "https://github.com/o/r/issues/7"),
+        call(["pr", "merge", "3", "--repo", "o/r", "--squash", "--delete-branch"],
+             rc=1, stderr="connection reset"),
+        call(["pr", "merge", "3", "--repo", "o/r", "--squash", "--delete-branch"]),
+    ])
+    assert github.create_issue("[T-1] 标题", "正文") == 7
+    # 网络错误按退避重试，回放中第二次调用成功
+    assert github.merge_pull(3) == {"merged": True}
+
+
+CLOSED_ISSUES = ["issue", "list", "--repo", "o/r", "--state", "closed", "--limit", "1000", "--json", "title,stateReason"]
+
+
+def replay_main(tmp_path, monkeypatch, entries, *argv):
+    (tmp_path / "todo").mkdir(exist_ok=True)
+    cassette = write_cassette(tmp_path / "gh.jsonl", entries)
+    monkeypatch.setattr(sys, "argv", ["auto_copilot_pipeline.py", "--replay-cassette", str(cassette),
+                                      "--replay-speed", "1000000", "--root", str(tmp_path), "--no-history", *argv])
+    return acp.main()
+
+
+def test_replay_main_stops_when_cassette_is_exhausted(tmp_path, monkeypatch):
+    assert replay_main(tmp_path, monkeypatch, [call(CLOSED_ISSUES, "[]")]) == 0
+
+
+def test_replay_main_fails_when_idle_before_cassette_is_exhausted(tmp_path, monkeypatch):
+    entries = [call(CLOSED_ISSUES, "[]"), call(["issue", "view", "1", "--repo", "o/r"], "{}")]
+    assert replay_main(tmp_path, monkeypatch, entries) == 1
+
+
+def test_replay_main_fails_on_swallowed_miss(tmp_path, monkeypatch):
+    # 查询已完成任务失败会被吞掉，但未录制的请求仍使回放失败
+    assert replay_main(tmp_path, monkeypatch, [call(["issue", "view", "1", "--repo", "o/r"], "{}")]) == 1
+
+
+def test_replay_main_does_not_retry_a_miss(tmp_path, monkeypatch):
+    scans = []
+
+    def scan(self, completed_ids):
+        scans.append(1)
+        if len(scans) > 1:
+            raise KeyboardInterrupt  # 出错后重试了同一轮
+        raise acp.CassetteMissError("录像中没有该请求")
+
+    monkeypatch.setattr(acp.Pipeline, "scan", scan)
+    assert replay_main(tmp_path, monkeypatch, [call(CLOSED_ISSUES, "[]")]) == 1
+    assert len(scans) == 1
@@ -0,0 +1,40 @@
+from chapter_store import ChapterStore
+
+VOLUME = "archives/Stage-04_Mass-Production/Volume-01"
+# 混合 1 / 3 / 4 字节字符，使章末窗口的起点落在多字节字符中间
+BODY = "".join(f"林风第{i}次回头，看见🌙和a。\n" for i in range(60))
+
+
+def build_store(tmp_path):
+    directory = tmp_path / VOLUME
+    directory.mkdir(parents=True)
+    (directory / "Ch-001-002_Draft.md").write_text("## 第1章\n\n草稿。\n\n## 第2章\n\n草稿。\n", encoding="utf-8")
+    (directory / "Ch-001-002_Polished.md").write_text(
+        f"## 第1章\n\n{BODY}\n## 第2章\n\n短章。{' ' * 50}" + "\n" * 3000, encoding="utf-8")
+    store = ChapterStore(tmp_path)
+    assert store.refresh() == 2
+    return store
+
+
+def test_tail_reads_newest_version_across_byte_boundaries(tmp_path):
+    store = build_store(tmp_path)
+    expected = BODY.rstrip()
+    for chars in (1, 7, 50, 199, 200, 333, len(expected)):
+        assert store.tail(1, 1, chars) == expected[-chars:].lstrip()
+    assert "草稿" not in store.chapter(1, 1)
+
+
+def test_tail_window_grows_past_trailing_whitespace(tmp_path):
+    store = build_store(tmp_path)
+    # 尾部空白远超初始窗口：窗口倍增直到读到正文
+    assert store.tail(1, 2, 3) == "短章。"
+    assert store.tail(1, 2, 200) == "## 第2章\n\n短章。"
+    assert store.tail(1, 3) is None
+
+
+def test_refresh_reindexes_only_changed_files(tmp_path):
+    store = build_store(tmp_path)
+    assert store.refresh() == 0
+    reloaded = ChapterStore(tmp_path)
+    assert reloaded.refresh() == 0
+    assert reloaded.tail(1, 1, 20) == BODY.rstrip()[-20:]
@@ -0,0 +1,94 @@
+import random
+
+from char_diff import diff_file, diff_text, myers_diff, split_chapters, tail_cut
+
+BODY = "".join(f"林风在第{i}个路口停下，回头看了一眼。" for i in range(40))
+
+
+def chapter(number, body):
+    return f"## 第{number}章 夜行\n\n{body}\n\n"
+
+
+def apply(old, new, spans):
+    """按改动块把 old 改写成 new，验证改动块覆盖了全部差异"""
+    pieces, cursor = [], 0
+    for a0, a1, b0, b1 in spans:
+        pieces.append(old[cursor:a0])
+        pieces.append(new[b0:b1])
+        cursor = a1
+    pieces.append(old[cursor:])
+    return "".join(pieces)
+
+
+def test_myers_diff_reconstructs_random_edits():
+    rng = random.Random(7)
+    for _ in range(200):
+        a = [rng.randrange(4) for _ in range(rng.randrange(30))]
+        b = [rng.randrange(4) for _ in range(rng.randrange(30))]
+        pieces, cursor = [], 0
+        for a0, a1, b0, b1 in myers_diff(a, b):
+            pieces.extend(a[cursor:a0])
+            pieces.extend(b[b0:b1])
+            cursor = a1
+        pieces.extend(a[cursor:])
+        assert pieces == b
+
+
+def test_diff_text_refines_to_characters():
+    old, new = "林风推门而入。屋里很暗。", "林风推窗而入。屋里很暗。"
+    assert diff_text(old, new) == [(3, 4, 3, 4)]
+    assert apply(old, new, diff_text(old, new)) == new
+
+
+def test_diff_file_skips_unchanged_chapters():
+    old = chapter(1, BODY) + chapter(2, BODY)
+    new = chapter(1, BODY) + chapter(2, BODY.replace("回头", "转身", 1))
+    report = diff_file(old, new)
+    assert report.unchanged == 1
+    assert [c.number for c in report.chapters] == [2]
+    assert report.chapters[0].outside_ending == 1
+
+
+def test_edit_inside_window_is_ending_only():
+    new_body = BODY[:-4] + "走远了。"
+    report = diff_file(chapter(1, BODY), chapter(1, new_body), window=50)
+    assert report.ending_only
+    assert report.chapters[0].first_offset <= 4
+
+
+def test_long_tail_truncation_is_ending_only():
+    cut = len(BODY) - 300
+    report = diff_file(chapter(1, BODY), chapter(1, BODY[:cut]), window=50)
+    assert report.ending_only
+    assert report.chapters[0].truncated == 300
+    assert report.chapters[0].first_offset == 0
+
+
+def test_truncation_anchors_window_at_cut_point():
+    cut = len(BODY) - 300
+    near = BODY[:cut - 10] + "他" + BODY[cut - 9:cut]
+    far = BODY[:100] + "他" + BODY[101:cut]
+    assert diff_file(chapter(1, BODY), chapter(1, near), window=50).ending_only
+    report = diff_file(chapter(1, BODY), chapter(1, far), window=50)
+    assert not report.ending_only
+    assert report.chapters[0].first_offset == cut - 100
+
+
+def test_truncation_may_add_a_short_new_ending():
+    cut = len(BODY) - 300
+    report = diff_file(chapter(1, BODY), chapter(1, BODY[:cut] + "远处传来一声枪响。"), window=50)
+    assert report.ending_only
+    assert report.chapters[0].truncated > 0
+    long_ending = BODY[:cut] + "远处传来一声枪响。" * 10
+    assert not diff_file(chapter(1, BODY), chapter(1, long_ending), window=50).ending_only
+
+
+def test_middle_deletion_is_not_a_truncation():
+    old = BODY
+    new = BODY[:100] + BODY[400:]
+    assert tail_cut(diff_text(old, new), len(old), len(new), 50) is None
+    assert not diff_file(chapter(1, old), chapter(1, new), window=50).ending_only
+
+
+def test_split_chapters_without_heading():
+    assert [(c.number, c.start) for c in split_chapters("正文。\n")] == [(None, 0)]
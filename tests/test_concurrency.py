@@ -0,0 +1,55 @@
+import auto_copilot_pipeline as acp
+
+
+def test_window_grows_only_when_saturated(clock):
+    control = acp.ConcurrencyController(2, 4, clock=clock)
+    assert control.limit == 2
+    control.completed(saturated=False)
+    assert control.window == 2
+    control.completed(saturated=True)
+    control.completed(saturated=True)
+    assert control.limit == 2  # 窗口 2 → 2.5 → 2.9
+    control.completed(saturated=True)
+    assert control.limit == 3
+    for _ in range(20):
+        control.completed(saturated=True)
+    assert control.limit == 4  # 不超过上限
+
+
+def test_congestion_halves_once_per_cooldown(clock):
+    control = acp.ConcurrencyController(1, 16, clock=clock)
+    assert control.set_limit(12) == 12
+    control.congestion("合并冲突")
+    control.congestion("合并冲突")
+    assert control.limit == 6 and control.decreases == 1
+    clock.advance(acp.AIMD_COOLDOWN)
+    control.congestion("合并冲突")
+    assert control.limit == 3 and control.last_reason == "合并冲突"
+    assert control.set_limit(100) == 16 and control.set_limit(0) == 1
+
+
+def test_wait_pr_and_reset_rate_signal_congestion(clock):
+    control = acp.ConcurrencyController(1, 16, clock=clock)
+    control.set_limit(8)
+    for seconds in (600, 650, 700, 620, 610):
+        control.wait_pr(seconds)
+    control.wait_pr(800)  # 未达到基线的 2 倍
+    assert control.limit == 8
+    control.wait_pr(1500)
+    assert control.limit == 4
+
+    clock.advance(acp.AIMD_COOLDOWN)
+    for resets in (0, 0, 1, 1):
+        control.attempt_ended(resets)
+    assert control.limit == 4  # 样本不足半个窗口
+    control.attempt_ended(1)
+    assert control.limit == 2 and control.snapshot()["reset_rate"] is None
+
+
+def test_low_api_headroom_lowers_limit(clock):
+    budget = acp.RateBudget(per_hour=3600, clock=clock)
+    control = acp.ConcurrencyController(1, 8, budget=budget, clock=clock)
+    control.set_limit(8)
+    assert control.poll() == 8
+    budget.pause(60)
+    assert control.poll() == 4 and control.last_reason == "API 限流暂停"
@@ -0,0 +1,55 @@
+import json
+
+import auto_copilot_pipeline as acp
+from conftest import make_item, pipeline_args
+
+
+def letter(item_id, failed_at, repo="o/r"):
+    return acp.DeadLetter(item_id, 4, "任务", "失败", 3, failed_at, repo)
+
+
+def test_queue_lists_by_failure_time_and_replays(tmp_path):
+    queue = acp.DeadLetterQueue(tmp_path / "dead_letters.json")
+    assert queue.entries() == [] and queue.replay() == []
+    queue.add(letter("S04-T-002", 20))
+    queue.add(letter("S04-T-001", 10))
+    assert [entry.item for entry in queue.entries()] == ["S04-T-001", "S04-T-002"]
+    assert [entry.item for entry in queue.replay(["S04-T-002", "S04-T-009"])] == ["S04-T-002"]
+    assert queue.ids() == {"S04-T-001"}
+
+
+def test_delayed_retries_come_back_in_due_order(tmp_path):
+    pipeline = acp.Pipeline(None, pipeline_args("--offline", "--no-history"), root=tmp_path)
+    first, second, third = (make_item(f"S04-T-00{n}") for n in (1, 2, 3))
+    lane = acp.Lane(pipeline, [third])
+    lane.defer(second, 200)
+    lane.defer(first, 100)
+    assert not lane.idle and lane.release_due(50) == 0
+    assert lane.release_due(200) == 2
+    assert [item.id_full for item in lane.pending] == ["S04-T-001", "S04-T-002", "S04-T-003"]
+    lane.pending.clear()
+    lane.defer(first, 100)
+    lane.defer(second, 200)
+    assert lane.prioritize("S04-T-002")
+    assert [item.id_full for item in lane.pending] == ["S04-T-002"]
+    assert lane.release_due(100) == 1 and lane.delayed == []
+
+
+def test_cli_uses_the_selected_repo_roots(tmp_path, capsys):
+    for name in ("a", "b"):
+        acp.DeadLetterQueue(tmp_path / name / ".pipeline" / acp.DEAD_LETTER_NAME).add(
+            letter(f"S04-{name.upper()}-001", 10, f"o/{name}"))
+    config = tmp_path / "daemon.json"
+    config.write_text(json.dumps({"repos": [{"repo": "o/a", "root": "a"}, {"repo": "o/b", "root": "b"}]}),
+                      encoding="utf-8")
+
+    queues = acp.dead_letter_queues(pipeline_args("--dead-letters", "--daemon-config", str(config)))
+    assert list(queues) == ["o/a", "o/b"]
+    assert acp.dead_letter_command(queues, None) == 0
+    assert "S04-A-001" in capsys.readouterr().out
+
+    queues = acp.dead_letter_queues(pipeline_args("--root", str(tmp_path / "b"), "--replay-dead-letters"))
+    assert acp.dead_letter_command(queues, []) == 0
+    assert "已重放 S04-B-001" in capsys.readouterr().out
+    assert acp.DeadLetterQueue(tmp_path / "b" / ".pipeline" / acp.DEAD_LETTER_NAME).entries() == []
+    assert len(acp.DeadLetterQueue(tmp_path / "a" / ".pipeline" / acp.DEAD_LETTER_NAME).entries()) == 1
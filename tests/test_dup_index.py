@@ -0,0 +1,47 @@
+from dup_index import DUPLICATE_THRESHOLD, MIN_PARAGRAPH_CHARS, DuplicateIndex, signature
+
+VOLUME = "archives/Stage-04_Mass-Production/Volume-01"
+PARAGRAPH = "林风推门而入，屋里的烛火被夜风吹得摇摇欲坠，他握紧腰间的长剑，目光扫过角落里那张积满灰尘的旧桌子，心中暗暗戒备。"
+NEAR = PARAGRAPH.replace("旧桌子", "旧椅子")
+
+
+def build_index(tmp_path, files):
+    for rel, text in files.items():
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    index = DuplicateIndex(tmp_path)
+    index.refresh()
+    return index
+
+
+def test_near_duplicate_from_another_chapter_is_reported(tmp_path):
+    index = build_index(tmp_path, {f"{VOLUME}/Ch-001-003_Draft.md": f"## 第1章\n\n{PARAGRAPH}\n"})
+    hits = index.check(f"{VOLUME}/Ch-004-006_Draft.md", f"## 第4章\n\n他停了下来。\n\n{NEAR}\n")
+    assert len(hits) == 1
+    hit = hits[0]
+    assert (hit.line, hit.other_path, hit.other_line) == (5, f"{VOLUME}/Ch-001-003_Draft.md", 3)
+    assert DUPLICATE_THRESHOLD <= hit.similarity < 1.0
+
+
+def test_paragraphs_already_in_base_are_not_checked(tmp_path):
+    index = build_index(tmp_path, {f"{VOLUME}/Ch-001-003_Draft.md": f"## 第1章\n\n{PARAGRAPH}\n"})
+    rel = f"{VOLUME}/Ch-004-006_Draft.md"
+    text = f"## 第4章\n\n{NEAR}\n"
+    assert index.check(rel, text, base_text=text) == []
+
+
+def test_versions_of_the_same_chapter_are_not_compared(tmp_path):
+    index = build_index(tmp_path, {f"{VOLUME}/Ch-001-003_Draft.md": f"## 第1章\n\n{PARAGRAPH}\n"})
+    assert index.check(f"{VOLUME}/Ch-001-003_Polished.md", f"## 第1章\n\n{NEAR}\n") == []
+    # 同一章号、不同卷仍然比较
+    other_volume = "archives/Stage-04_Mass-Production/Volume-02/Ch-001-003_Draft.md"
+    assert len(index.check(other_volume, f"## 第1章\n\n{NEAR}\n")) == 1
+
+
+def test_short_paragraphs_are_ignored(tmp_path):
+    short = PARAGRAPH[:MIN_PARAGRAPH_CHARS - 5]
+    assert signature(short) is None
+    index = build_index(tmp_path, {f"{VOLUME}/Ch-001-003_Draft.md": f"## 第1章\n\n{short}\n"})
+    assert index.summary()["paragraphs"] == 0
+    assert index.check(f"{VOLUME}/Ch-004-006_Draft.md", f"## 第4章\n\n{short}\n\n{short}\n") == []
@@ -0,0 +1,51 @@
+import subprocess
+import sys
+
+import pytest
+
+import auto_copilot_pipeline as acp
+from conftest import pipeline_args
+
+OUTPUT = "archives/Stage-01_Test/out.md"
+WRITER = (
+    "import pathlib, sys; p = pathlib.Path(sys.argv[1]); p.parent.mkdir(parents=True, exist_ok=True); "
+    "p.write_text(sys.argv[2], encoding='utf-8'); pathlib.Path('other.md').write_text('x', encoding='utf-8')"
+)
+
+
+def git(root, *args):
+    return subprocess.run(["git", *args], cwd=root, check=True, capture_output=True, text=True).stdout
+
+
+@pytest.fixture
+def repo(tmp_path):
+    todo = tmp_path / "todo" / "Stage-01_Test.todos.md"
+    todo.parent.mkdir()
+    todo.write_text(f"### - [ ] [S01-T-001] 任务\n**产出要求**:\n- 写入 `{OUTPUT}`\n", encoding="utf-8")
+    (tmp_path / ".gitignore").write_text("/.pipeline/\n", encoding="utf-8")
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.name", "t")
+    git(tmp_path, "config", "user.email", "t@t")
+    git(tmp_path, "add", "todo", ".gitignore")
+    git(tmp_path, "commit", "-q", "-m", "todo")
+    return tmp_path
+
+
+def test_executor_requires_execute():
+    with pytest.raises(TypeError):
+        acp.Executor()
+
+
+def test_local_executor_commits_only_declared_outputs(repo):
+    pipeline = acp.Pipeline(None, pipeline_args("--offline", "--no-history"), root=repo, todo_root=repo / "todo")
+    _, todos = acp.parse_stage_structure(repo / "todo" / "Stage-01_Test.todos.md")
+    item = acp.WorkItem(todos[0].id_full, 1, todos[0].title, todos[0].file_path, todos)
+    executor = acp.LocalExecutor("gen", f'{sys.executable} -c "{WRITER}" {OUTPUT} \'{{"id": "{{id}}"}}\'')
+
+    executor.execute(pipeline, item)
+
+    committed = git(repo, "show", "--name-only", "--format=%s", "HEAD").split()
+    assert committed[0] == "[S01-T-001]"
+    assert sorted(committed[2:]) == [OUTPUT, "todo/Stage-01_Test.todos.md"]
+    assert (repo / OUTPUT).read_text(encoding="utf-8") == '{"id": "S01-T-001"}'
+    assert git(repo, "status", "--porcelain").strip() == "?? other.md"
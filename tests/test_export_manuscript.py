@@ -0,0 +1,62 @@
+import json
+import sys
+import zipfile
+
+import pytest
+
+import export_manuscript as em
+
+VOLUME_DIR = "archives/Stage-04_Mass-Production/Volume-01"
+
+
+def write_volume(root):
+    directory = root / VOLUME_DIR
+    directory.mkdir(parents=True)
+    (directory / "Ch-003-004_Polished.md").write_text(
+        "# 文件说明\n\n## 第三章 夜雨\n\n林风推门而入。\n\n## 第4章 天明\n\n---\n\n天亮了。\n", encoding="utf-8")
+    (directory / "Ch-001-002_Polished.md").write_text(
+        "## 第1章 开端\n\n他醒了。\n\n## 第2章 出发\n\n> 他走了。\n", encoding="utf-8")
+    (directory / "Ch-001-002_Draft.md").write_text("## 第1章 草稿\n\n不应导出。\n", encoding="utf-8")
+
+
+def export(monkeypatch, capsys, root, *argv):
+    monkeypatch.setattr(sys, "argv", ["export_manuscript.py", "--root", str(root), "--title", "测试书",
+                                      "--workers", "1", "--json", *argv])
+    assert em.main() == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_export_writer_is_abstract():
+    with pytest.raises(TypeError):
+        em.ExportWriter()
+
+
+def test_export_volume_and_skip_unchanged(tmp_path, monkeypatch, capsys):
+    write_volume(tmp_path)
+    report = export(monkeypatch, capsys, tmp_path)
+    assert [result["chapters"] for result in report["exported"]] == [4]
+    output = tmp_path / "exports"
+
+    with zipfile.ZipFile(output / "epub" / "Volume-01.epub") as epub:
+        first = epub.infolist()[0]
+        assert first.filename == "mimetype" and first.compress_type == zipfile.ZIP_STORED
+        assert epub.read("mimetype") == b"application/epub+zip"
+        nav = epub.read("OEBPS/nav.xhtml").decode("utf-8")
+    titles = ["第1章 开端", "第2章 出发", "第三章 夜雨", "第4章 天明"]
+    assert [nav.index(title) for title in titles] == sorted(nav.index(title) for title in titles)
+
+    text = (output / "txt" / "Volume-01.txt").read_text(encoding="utf-8")
+    assert [text.index(title) for title in titles] == sorted(text.index(title) for title in titles)
+    assert "文件说明" not in text and "草稿" not in text and "---" not in text
+    assert "　　他走了。\n" in text
+    with zipfile.ZipFile(output / "upload" / "Volume-01_0001-0004.zip") as bundle:
+        assert [name[:4] for name in bundle.namelist()] == ["0001", "0002", "0003", "0004"]
+
+    manifest = json.loads((output / em.MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert set(manifest["volumes"]["1"]) == {"txt", "epub", "upload"}
+    report = export(monkeypatch, capsys, tmp_path)
+    assert report["exported"] == [] and report["skipped"] == [1]
+
+    (tmp_path / VOLUME_DIR / "Ch-001-002_Polished.md").write_text("## 第1章 开端\n\n他又醒了。\n", encoding="utf-8")
+    report = export(monkeypatch, capsys, tmp_path, "--formats", "txt")
+    assert [result["volume"] for result in report["exported"]] == [1]
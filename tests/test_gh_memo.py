@@ -0,0 +1,58 @@
+import json
+
+import auto_copilot_pipeline as acp
+from conftest import call
+
+
+def issue_view(number, state="open"):
+    return call(["issue", "view", str(number), "--repo", "o/r", "--json", "number,state,assignees"],
+                json.dumps({"number": number, "state": state}))
+
+
+OPEN_ISSUES = call(["api", "/repos/o/r/issues?state=open&per_page=100", "--paginate"], "[]")
+
+
+def client(replay):
+    return replay([
+        issue_view(5), issue_view(5, "closed"), issue_view(6), OPEN_ISSUES,
+        call(["issue", "comment", "5", "--repo", "o/r", "--body", "hi"]),
+        call(["api", "/repos/o/r/issues/comments/9", "--method", "PATCH", "-f", "body=x"]),
+    ])
+
+
+def test_gh_resource():
+    assert acp.gh_resource(["issue", "view", "5", "--repo", "o/r"]) == 5
+    assert acp.gh_resource(["api", "/repos/o/r/issues/12/timeline"]) == 12
+    assert acp.gh_resource(["api", "/repos/o/r/pulls/7?per_page=100"]) == 7
+    assert acp.gh_resource(["api", "/repos/o/r/issues/comments/9", "--method", "PATCH"]) is None
+    assert acp.gh_resource(["issue", "list", "--repo", "o/r"]) is None
+
+
+def test_memo_lasts_one_tick(replay):
+    github = client(replay)
+    github.begin_tick()
+    assert github.get_issue(5)["state"] == "open"
+    assert github.get_issue(5)["state"] == "open"
+    assert github.memo_hits == 1 and github.thread_calls == 1
+    github.begin_tick()
+    assert github.get_issue(5)["state"] == "closed"
+    assert github.thread_calls == 2
+
+
+def test_write_invalidates_only_its_issue_and_lists(replay):
+    github = client(replay)
+    github.get_issue(5)
+    github.get_issue(6)
+    github.list_open_issues()
+    github.comment_issue(5, "hi")
+    calls = github.thread_calls
+    assert github.get_issue(6)["number"] == 6  # 其他 Issue 的读结果仍可复用
+    assert github.thread_calls == calls
+    assert github.get_issue(5)["state"] == "closed"
+    github.list_open_issues()
+    assert github.thread_calls == calls + 2
+
+    github.update_comment(9, "x")  # 无法确定所属 Issue：全部失效
+    calls = github.thread_calls
+    github.get_issue(6)
+    assert github.thread_calls == calls + 1
@@ -0,0 +1,76 @@
+import json
+import threading
+
+import auto_copilot_pipeline as acp
+from conftest import FakeGitHub, call, make_item, pipeline_args
+
+
+def test_race_grants_merge_to_first_claimant_until_released():
+    race = acp.HedgeRace()
+    assert not race.beaten(5) and not race.beaten(9)
+    assert race.claim(9)
+    assert not race.claim(5) and race.beaten(5) and not race.beaten(9)
+    race.release(5)  # 非持有者释放无效
+    assert race.winner == 9
+    race.release(9)
+    assert race.claim(5) and race.beaten(9)
+
+
+def test_beaten_attempt_closes_itself_as_not_planned(tmp_path, clock):
+    github = FakeGitHub(clock)
+    github.open_issue(5, "[S04-T-001] 任务")
+    github.open_issue(9, "[S04-T-001] 任务（对冲）")
+    github.open_pr(5, 7)
+    github.open_pr(9, 10)
+    race = acp.HedgeRace()
+    pipeline = acp.Pipeline(github, pipeline_args("--no-history", "--no-validate"), root=tmp_path)
+
+    assert race.claim(5)
+    pipeline._monitor_issue(make_item("S04-T-001"), 9, race, hedge=True)
+    assert github.issues[9]["state"] == "closed" and github.pulls[10]["state"] == "closed"
+    github.merge_pull(7)
+
+    assert acp.completed_ids_from_issues(github.issues.values()) == {"S04-T-001"}
+    assert acp.completed_ids_from_issues([github.issues[9]]) == set()
+
+
+def test_not_planned_issues_do_not_count_as_completed(tmp_path, replay):
+    issues = [
+        {"title": "[S04-T-001] 任务（对冲）", "stateReason": "NOT_PLANNED"},
+        {"title": "[S04-T-002] 任务", "stateReason": "COMPLETED"},
+        {"title": "[S04-T-003] 任务", "stateReason": ""},
+    ]
+    github = replay([call(["issue", "list", "--repo", "o/r", "--state", "closed", "--limit", "1000",
+                           "--json", "title,stateReason"], json.dumps(issues, ensure_ascii=False))])
+    pipeline = acp.Pipeline(github, pipeline_args("--no-history"), root=tmp_path)
+    assert pipeline.get_recent_completed_todos() == {"S04-T-002", "S04-T-003"}
+
+
+def test_lane_snapshot_copies_hedge_progress_under_lock(tmp_path, clock):
+    pipeline = acp.Pipeline(FakeGitHub(clock), pipeline_args("--no-history"), root=tmp_path)
+    item = make_item("S04-T-001")
+    lane = acp.Lane(pipeline, [])
+    lane.in_flight[item.id_full] = item
+
+    def hedge_track(**fields):
+        pipeline._local.hedge = True
+        try:
+            pipeline._track(item, **fields)
+        finally:
+            pipeline._local.hedge = False
+
+    pipeline._track(item, issue=5, phase="working")
+    worker = threading.Thread(target=hedge_track, kwargs={"issue": 9, "phase": "waiting_pr"})
+    with pipeline._lock:
+        # 对冲线程写入 progress 时须等待同一把锁
+        worker.start()
+        worker.join(0.05)
+        assert worker.is_alive()
+    worker.join()
+
+    entry = lane.snapshot()["in_flight"][0]
+    assert entry["issue"] == 5 and entry["hedge"] == {"issue": 9, "phase": "waiting_pr"}
+    hedge_track(phase="working", pr=10)
+    # 快照是深拷贝：对冲线程之后的写入不会改动已交给控制接口序列化的数据
+    assert entry["hedge"] == {"issue": 9, "phase": "waiting_pr"}
+    json.dumps(lane.snapshot())
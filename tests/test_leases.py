@@ -0,0 +1,38 @@
+import pytest
+
+import auto_copilot_pipeline as acp
+
+
+def stores(tmp_path, clock, ttl=60):
+    path = tmp_path / "leases.json"
+    return acp.FileLeaseStore(path, "a", ttl, clock), acp.FileLeaseStore(path, "b", ttl, clock)
+
+
+def test_lease_store_is_abstract():
+    with pytest.raises(TypeError):
+        acp.LeaseStore("a", 60, acp.Clock())
+
+
+def test_expired_lease_is_taken_over(tmp_path, clock):
+    a, b = stores(tmp_path, clock)
+    assert a.acquire("S04-T-001")
+    assert not b.acquire("S04-T-001")
+    clock.advance(30)
+    assert a.heartbeat() == set()
+    clock.advance(45)  # 续约后尚未过期
+    assert not b.acquire("S04-T-001")
+    clock.advance(20)
+    assert b.acquire("S04-T-001")
+    assert a.heartbeat() == {"S04-T-001"}
+    assert a.held == set() and b.held == {"S04-T-001"}
+
+
+def test_released_lease_is_free_unless_done(tmp_path, clock):
+    a, b = stores(tmp_path, clock)
+    assert a.acquire("S04-T-001") and a.acquire("S04-T-002")
+    a.release("S04-T-001")
+    a.release("S04-T-002", done=True)
+    assert b.acquire("S04-T-001")
+    assert not b.acquire("S04-T-002")  # 已完成的保留到自然过期
+    clock.advance(61)
+    assert b.acquire("S04-T-002")
@@ -0,0 +1,99 @@
+import auto_copilot_pipeline as acp
+from conftest import make_item, pipeline_args
+from md_index import MarkdownIndex, parse_markdown
+
+GUIDE = """# Stage-04 批量生产
+
+前言。
+
+## 1. 工作流程
+
+```markdown
+## 验收标准（示例代码，不是标题）
+| 不是 | 表格 |
+|------|------|
+```
+
+| 步骤 | 负责人 |
+|:----:|--------|
+| 起草 | 写手 |
+| 审校 | 编辑 |
+正文紧接表格。
+
+### 1.1 细节
+
+细节内容。
+
+## 2. 验收标准
+
+- [ ] 字数达标
+- [ ] 去AI味
+
+### 2.1 抽检
+
+抽检 10%。
+
+## 3. 附录
+
+附录。
+"""
+RELEASE = "archives/Stage-04_Mass-Production/Volume-01/Ch-001-003_Release.md"
+
+
+def build_index(tmp_path):
+    (tmp_path / "Stages").mkdir()
+    (tmp_path / "Stages" / "Stage-04_Mass-Production.md").write_text(GUIDE, encoding="utf-8")
+    index = MarkdownIndex(tmp_path)
+    assert index.refresh() == 1
+    return index, "Stages/Stage-04_Mass-Production.md"
+
+
+def test_headings_inside_code_fences_are_ignored():
+    tree = parse_markdown(GUIDE.encode("utf-8"))
+    assert [(s.level, s.title) for s in tree.sections] == [
+        (1, "Stage-04 批量生产"), (2, "1. 工作流程"), (3, "1.1 细节"),
+        (2, "2. 验收标准"), (3, "2.1 抽检"), (2, "3. 附录"),
+    ]
+    assert [s.parent for s in tree.sections] == [None, 0, 1, 0, 3, 0]
+
+
+def test_section_byte_ranges(tmp_path):
+    index, rel = build_index(tmp_path)
+    data = GUIDE.encode("utf-8")
+    tree = index.tree(rel)
+    criteria = tree.sections[3]
+    assert data[criteria.start:criteria.body].decode("utf-8") == "## 2. 验收标准\n"
+    assert data[criteria.end:].decode("utf-8").startswith("## 3. 附录")
+    # 小节全文包含子小节，截止于下一个同级标题；多字节标题不影响字节偏移
+    assert index.section(rel, "验收标准") == "- [ ] 字数达标\n- [ ] 去AI味\n\n### 2.1 抽检\n\n抽检 10%。"
+    assert index.section(rel, "验收标准", "抽检") == "抽检 10%。"
+    assert index.section(rel, "附录", "抽检") is None
+    assert index.section(rel, "附录", include_heading=True) == "## 3. 附录\n\n附录。"
+
+
+def test_table_detection(tmp_path):
+    index, rel = build_index(tmp_path)
+    tree = index.tree(rel)
+    assert [(t.section, t.header, t.rows) for t in tree.tables] == [(1, ["步骤", "负责人"], 2)]
+    assert index.tables(rel) == [[["步骤", "负责人"], ["起草", "写手"], ["审校", "编辑"]]]
+    assert index.tables(rel, "验收标准") == []
+
+
+def test_refresh_reparses_only_changed_files(tmp_path):
+    index, rel = build_index(tmp_path)
+    assert index.refresh() == 0
+    release = tmp_path / RELEASE
+    release.parent.mkdir(parents=True)
+    release.write_text("## 第1章\n\n正文。\n", encoding="utf-8")
+    assert index.refresh() == 1
+    reloaded = MarkdownIndex(tmp_path)
+    assert reloaded.refresh() == 0
+    assert reloaded.section(rel, "验收标准", "抽检") == "抽检 10%。"
+
+
+def test_stage_criteria_embeds_the_acceptance_section(tmp_path):
+    build_index(tmp_path)
+    pipeline = acp.Pipeline(None, pipeline_args("--offline", "--no-history"), root=tmp_path)
+    criteria = pipeline._stage_criteria(make_item("S04-T-001", stage=4))
+    assert criteria.startswith("## ✅ 阶段验收标准（摘自 `Stages/Stage-04_Mass-Production.md`）")
+    assert "- [ ] 字数达标" in criteria and "抽检 10%。" in criteria and "附录" not in criteria
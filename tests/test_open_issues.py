@@ -0,0 +1,61 @@
+import json
+
+import auto_copilot_pipeline as acp
+from conftest import call, make_item, pipeline_args
+
+LIST_ARGS = ["api", "/repos/o/r/issues?state=open&per_page=100", "--paginate"]
+
+
+def issue(number, title, *assignees):
+    return {"number": number, "title": title, "assignees": [{"login": login} for login in assignees]}
+
+
+def pages(*pages):
+    return "".join(json.dumps(page) for page in pages)
+
+
+def assign_call(number):
+    return call(["issue", "edit", str(number), "--repo", "o/r", "--add-assignee", acp.COPILOT_ASSIGNEES[0]])
+
+
+def search_call(todo_id, issues):
+    return call(["issue", "list", "--repo", "o/r", "--state", "open", "--search", f"[{todo_id}]",
+                 "--json", "number,title"], json.dumps(issues))
+
+
+def test_list_open_issues_decodes_every_page(replay):
+    output = pages(
+        [issue(1, "[S04-T-001] 任务", "Copilot"), {"number": 2, "title": "PR", "pull_request": {}}],
+        [issue(3, "[S04-T-003] 任务")],
+        [],
+    )
+    github = replay([call(LIST_ARGS, output)])
+    assert [entry["number"] for entry in github.list_open_issues()] == [1, 3]
+
+
+def test_ensure_issue_reuses_listed_issues(tmp_path, replay):
+    github = replay([
+        call(LIST_ARGS, pages([issue(7, "[S04-T-001] 任务", "Copilot")], [issue(9, "[S04-T-002] 任务", "someone")])),
+        assign_call(9),
+    ])
+    pipeline = acp.Pipeline(github, pipeline_args("--no-history"), root=tmp_path)
+    pipeline.refresh_open_issues()
+    # 已分配给 Copilot 的直接复用，不再查询；未分配的重新分配
+    assert pipeline._ensure_issue(make_item("S04-T-001")) == 7
+    assert pipeline._ensure_issue(make_item("S04-T-002")) == 9
+    assert pipeline._open_issues["S04-T-002"]["assignees"] == {"someone", acp.COPILOT_USERNAME}
+    assert github.transport.exhausted
+
+
+def test_ensure_issue_searches_before_creating_unlisted_item(tmp_path, replay):
+    github = replay([
+        call(LIST_ARGS, pages([])),
+        # 本轮开始后由他人新开的 Issue
+        search_call("S04-T-005", [{"number": 12, "title": "[S04-T-005] 任务"}]),
+        call(["issue", "view", "12", "--repo", "o/r", "--json", "number,state,assignees"],
+             json.dumps({"number": 12, "state": "open", "assignees": [{"login": "Copilot"}]})),
+    ])
+    pipeline = acp.Pipeline(github, pipeline_args("--no-history"), root=tmp_path)
+    pipeline.refresh_open_issues()
+    assert pipeline._ensure_issue(make_item("S04-T-005")) == 12
+    assert github.transport.exhausted
@@ -0,0 +1,25 @@
+import auto_copilot_pipeline as acp
+from conftest import make_item, pipeline_args
+from corpus_stats import CorpusStats
+
+
+def test_dry_run_pipeline_does_not_touch_state(tmp_path):
+    (tmp_path / "archives").mkdir()
+    (tmp_path / "archives" / "a.md").write_text("正文", encoding="utf-8")
+    todo = tmp_path / "todo" / "Stage-04_Test.todos.md"
+    todo.parent.mkdir()
+    todo.write_text("### - [ ] [S04-T-001] 任务\n", encoding="utf-8")
+    pipeline = acp.Pipeline(None, pipeline_args("--dry-run"), root=tmp_path, todo_root=todo.parent)
+    assert pipeline.run([make_item("S04-T-001", file_path=todo)]) == []
+    assert pipeline._loaded == {}
+    assert pipeline.history is None
+    assert not (tmp_path / ".pipeline").exists()
+
+
+def test_indexes_load_once_on_first_use(tmp_path):
+    pipeline = acp.Pipeline(None, pipeline_args("--offline", "--no-dup-check"), root=tmp_path)
+    assert pipeline.duplicates is None
+    corpus = pipeline.corpus
+    assert isinstance(corpus, CorpusStats) and pipeline.corpus is corpus
+    assert pipeline.dead_letters.entries() == []
+    assert set(pipeline._loaded) == {"corpus", "dead_letters"}
@@ -0,0 +1,52 @@
+import os
+
+import auto_copilot_pipeline as acp
+from conftest import FakeGitHub, pipeline_args
+
+PLAN = "### - [ ] [S04-T-001] 任务\n### - [ ] [S04-T-002] 任务\n"
+
+
+def make_lane(tmp_path, github):
+    todo = tmp_path / "todo" / "Stage-04_Test.todos.md"
+    todo.parent.mkdir()
+    todo.write_text(PLAN, encoding="utf-8")
+    pipeline = acp.Pipeline(github, pipeline_args("--no-history"), root=tmp_path, todo_root=todo.parent)
+    return todo, pipeline, acp.Lane(pipeline, pipeline.scan(set()), completed_ids=set())
+
+
+def test_completed_ids_are_requeried_at_most_once_per_poll_interval(tmp_path, clock):
+    todo, pipeline, lane = make_lane(tmp_path, FakeGitHub(clock))
+    queries = []
+    pipeline.get_recent_completed_todos = lambda: queries.append(1) or set()
+
+    now = clock.time()
+    for _ in range(3):
+        now += acp.PLAN_RECHECK_INTERVAL
+        assert lane.refresh_plan(now) is None
+    assert queries == []
+
+    now += pipeline.args.poll_interval
+    assert lane.refresh_plan(now) is None
+    now += acp.PLAN_RECHECK_INTERVAL
+    assert lane.refresh_plan(now) is None
+    assert len(queries) == 1
+
+    todo.write_text(PLAN + "### - [ ] [S04-T-003] 任务\n", encoding="utf-8")
+    os.utime(todo, ns=(0, 1))
+    now += acp.PLAN_RECHECK_INTERVAL
+    assert [item.id_full for item in lane.refresh_plan(now)] == ["S04-T-001", "S04-T-002", "S04-T-003"]
+    assert len(queries) == 2
+
+
+def test_issue_completed_elsewhere_drops_pending_item(tmp_path, clock):
+    github = FakeGitHub(clock)
+    github.open_issue(11, "[S04-T-001] 任务")
+    _, pipeline, lane = make_lane(tmp_path, github)
+    # 另一台主机或人工在本进程之外合并了 S04-T-001 的 PR
+    github.at(clock.time() + 1, lambda: github.issues[11].update(state="closed", stateReason="COMPLETED"))
+
+    clock.advance(pipeline.args.poll_interval)
+    items = lane.refresh_plan(clock.time())
+    assert [item.id_full for item in items] == ["S04-T-002"]
+    lane.merge_plan(items)
+    assert [item.id_full for item in lane.pending] == ["S04-T-002"]
@@ -0,0 +1,64 @@
+import auto_copilot_pipeline as acp
+from conftest import file_call
+from prose_lint import ENDING_WINDOW, OPENING_WINDOW, LintRule, PhraseAutomaton, ProseLinter
+
+CHAPTER = "archives/Stage-04_Mass-Production/Volume-01/Ch-001-003_Draft.md"
+TODO_FILE = "todo/Stage-04_Test.todos.md"
+FILLER = "林风推门而入，屋里很暗。"
+
+
+def phrases(report):
+    return [(hit.line, hit.phrase) for hit in report.hits if hit.severity == "error"]
+
+
+def test_automaton_reports_overlapping_matches():
+    automaton = PhraseAutomaton(["he", "she", "his", "hers"])
+    found = sorted((start, automaton.patterns[index]) for start, index in automaton.finditer("ushershis"))
+    assert found == [(1, "she"), (2, "he"), (2, "hers"), (6, "his")]
+
+
+def test_scoped_rules_apply_to_every_chapter():
+    padding = FILLER * (max(OPENING_WINDOW, ENDING_WINDOW) // len(FILLER) + 1)
+    text = (f"## 第1章\n\n第二天，{padding}他沉沉睡去。\n\n"
+            f"## 第2章\n\n{padding}第二天，{padding}沉沉睡去之后，{padding}\n\n"
+            f"## 第3章\n\n时间来到深夜。{padding}他陷入沉思。\n")
+    hits = phrases(ProseLinter().lint_text(text))
+    # 第2章的“第二天”不在章首、“沉沉睡去”不在章末；标题里的“第”字不参与匹配
+    assert hits == [(3, "第二天"), (3, "沉沉睡去"), (11, "时间来到"), (11, "陷入沉思")]
+
+
+def test_gap_rule_stays_inside_one_sentence():
+    linter = ProseLinter([LintRule("那是…的开始")])
+    assert phrases(linter.lint_text("那是一切噩梦的开始。")) == [(1, "那是…的开始")]
+    assert phrases(linter.lint_text("那是他。这是新的开始。")) == []
+    assert phrases(linter.lint_text("那是他\n新的开始")) == []
+
+
+def test_added_errors_ignore_hits_already_in_base():
+    linter = ProseLinter()
+    assert linter.added_errors("然而他走了。然而她来了。", "然而他走了。") == {"然而": 1}
+    assert not linter.added_errors("然而他走了。", "然而他走了。然而她来了。")
+
+
+def check_lint(replay, head, base):
+    github = replay([
+        file_call(CHAPTER, "h", head),
+        file_call(CHAPTER, "main", base),
+        file_call(TODO_FILE, "h", "### - [x] [S04-T-001] 任务\n"),
+    ])
+    spec = acp.DeliverableSpec(TODO_FILE, ["S04-T-001"], [CHAPTER])
+    pull = {"files": [{"path": CHAPTER}, {"path": TODO_FILE}], "headRefName": "h", "baseRefName": "main"}
+    report = acp.validate_pull(github, spec, pull, linter=ProseLinter())
+    return report, next(check for check in report.checks if check[0] == "去AI味")
+
+
+def test_validate_pull_fails_on_added_lint_error(replay):
+    report, lint = check_lint(replay, f"然而{FILLER}显然{FILLER}", f"然而{FILLER}")
+    assert lint[1] is False and "显然×1" in lint[2]
+    assert not report.passed()
+
+
+def test_validate_pull_ignores_base_only_lint_errors(replay):
+    report, lint = check_lint(replay, f"然而{FILLER}{FILLER}", f"然而{FILLER}")
+    assert lint[1] is True
+    assert report.passed(), report.to_markdown()
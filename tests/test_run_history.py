@@ -0,0 +1,73 @@
+import json
+import sqlite3
+import sys
+import time
+
+import run_history as rh
+
+DAY_ONE = time.mktime((2026, 3, 1, 12, 0, 0, 0, 0, -1))
+DAY_TWO = time.mktime((2026, 3, 2, 12, 0, 0, 0, 0, -1))
+
+
+def record(item, stage, finished, outcome="success", resets=0, api_calls=10, work=None):
+    return rh.RunRecord("o/r", item, stage, "写手", "draft", "copilot", outcome,
+                        None if outcome == "success" else "超时", finished - 600, finished,
+                        resets=resets, api_calls=api_calls, wait_pr=60.0, work=work, total=600.0, elapsed=600.0)
+
+
+def write_history(path):
+    history = rh.RunHistory(path)
+    history.append(record("S04-T-001", 4, DAY_ONE, work=100.0))
+    history.append(record("S04-T-002", 4, DAY_ONE + 60, resets=2, api_calls=20, work=200.0))
+    history.append(record("S04-T-003", 4, DAY_TWO, work=300.0))
+    history.append(record("S04-T-004", 4, DAY_TWO + 60, outcome="failed", api_calls=30))
+    history.append(record("S05-T-001", 5, DAY_TWO, work=50.0))
+    history.close()
+
+
+def run_cli(monkeypatch, capsys, path, *argv):
+    monkeypatch.setattr(sys, "argv", ["run_history.py", "--history", str(path), "--json", *argv])
+    assert rh.main() == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_schema_and_day_column(tmp_path):
+    path = tmp_path / rh.HISTORY_NAME
+    write_history(path)
+    with sqlite3.connect(str(path)) as db:
+        columns = [row[1] for row in db.execute("PRAGMA table_info(runs)")]
+        days = [row[0] for row in db.execute("SELECT day FROM runs ORDER BY finished, item")]
+    assert columns[:2] == ["repo", "item"] and "day" in columns and set(rh.PHASES) <= set(columns)
+    assert days == ["2026-03-01", "2026-03-01", "2026-03-02", "2026-03-02", "2026-03-02"]
+    assert rh.RunHistory(path).count() == 5
+
+
+def test_report_by_stage(tmp_path, monkeypatch, capsys):
+    path = tmp_path / rh.HISTORY_NAME
+    write_history(path)
+    stage4, stage5 = run_cli(monkeypatch, capsys, path, "--by", "stage")
+    assert stage4 == {
+        "stage": 4, "items": 4, "succeeded": 3, "failed": 1,
+        "per_day": 1.5,  # 3 个成功分布在 2 个自然日
+        "reset_rate": 0.25, "resets_per_item": 0.5, "api_calls_per_item": 17.5,
+        "wait_pr": {"p50": 60.0, "p95": 60.0, "p99": 60.0},
+        "work": {"p50": 200.0, "p95": 300.0, "p99": 300.0},  # 失败记录没有 work，不计入分位数
+        "total": {"p50": 600.0, "p95": 600.0, "p99": 600.0},
+        "elapsed": {"p50": 600.0, "p95": 600.0, "p99": 600.0},
+    }
+    assert (stage5["stage"], stage5["items"], stage5["per_day"]) == (5, 1, 1.0)
+
+
+def test_daily_throughput(tmp_path, monkeypatch, capsys):
+    path = tmp_path / rh.HISTORY_NAME
+    write_history(path)
+    assert run_cli(monkeypatch, capsys, path, "--daily") == [
+        {"date": "2026-03-01", "succeeded": 2, "failed": 0, "api_calls": 30},
+        {"date": "2026-03-02", "succeeded": 2, "failed": 1, "api_calls": 50},
+    ]
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert [rh.percentile(values, pct) for pct in rh.PERCENTILES] == [50, 95, 99]
+    assert rh.percentile([], 50) is None
@@ -0,0 +1,67 @@
+import auto_copilot_pipeline as acp
+from conftest import FakeGitHub, make_item, pipeline_args
+
+
+def test_task_classes_run_from_fine_to_coarse():
+    chapter = make_item("S06-V01-R1-C01", stage=6, meta=["**责任专家**: PS (Lead) + VE"])
+    assert acp.task_classes(chapter) == ["S06-V01-R1", "S06-R1", "expert:PS", "stage:06"]
+    assert acp.task_classes(make_item("S03-CA-001", stage=3, meta=["**责任专家**: CA"])) == [
+        "S03-CA", "expert:CA", "stage:03"]
+
+
+def test_timeout_model_falls_back_to_coarser_class(tmp_path):
+    model = acp.TimeoutModel(tmp_path / "timeouts.json")
+    classes = ["S06-V01-R1", "S06-R1", "stage:06"]
+    assert model.timeout(classes, "work") == (acp.PR_TIMEOUT, "默认")
+    for seconds in (3000, 3200, 3400, 3600, 4000):
+        model.record(["S06-R1", "stage:06"], "work", seconds)
+    assert model.timeout(classes, "work") == (4000 * acp.TIMEOUT_MULTIPLIER, "S06-R1")
+    assert acp.TimeoutModel(tmp_path / "timeouts.json").samples == model.samples
+
+
+def _monitor(tmp_path, github, item, *argv):
+    pipeline = acp.Pipeline(github, pipeline_args("--no-history", "--no-dup-check", "--no-lint", *argv),
+                            root=tmp_path, todo_root=tmp_path / "todo")
+    pipeline._monitor_issue(item, 5)
+    return pipeline.timeouts.samples[acp.task_classes(item)[0]]
+
+
+def test_wait_pr_is_timed_from_reassignment_and_old_pr_is_ignored(tmp_path, clock):
+    github = FakeGitHub(clock)
+    github.open_issue(5)
+    start = clock.time()
+    github.at(start + 600, lambda: github.open_pr(5, 7))
+    github.at(start + 900, lambda: github.pulls[7].update(state="closed"))
+    github.at(start + 2400, lambda: github.open_pr(5, 8))
+    github.at(start + 3000, lambda: github.finished.add(8))
+
+    samples = _monitor(tmp_path, github, make_item("S04-T-001"), "--no-validate")
+
+    assert len(github.assigned_at) == 1  # 时间线上残留的 PR #7 不会再次触发重置
+    reassigned = github.assigned_at[0] - start
+    first, second = samples["wait_pr"]
+    assert first == 600
+    assert 2400 - reassigned <= second < 2400 - reassigned + acp.DEFAULT_POLL_INTERVAL
+    assert len(samples["work"]) == 1
+
+
+def test_work_is_learned_only_from_accepted_pulls(tmp_path, clock, monkeypatch):
+    todo = tmp_path / "todo" / "Stage-04_Test.todos.md"
+    todo.parent.mkdir()
+    todo.write_text("### - [ ] [S04-T-001] 任务\n", encoding="utf-8")
+    reports = iter([acp.ValidationReport([("产出文件", False, "缺少 a.md")]),
+                    acp.ValidationReport([("产出文件", True, "a.md")])])
+    monkeypatch.setattr(acp, "validate_pull", lambda *args, **kwargs: next(reports))
+
+    github = FakeGitHub(clock)
+    github.open_issue(5)
+    start = clock.time()
+    github.at(start + 600, lambda: github.open_pr(5, 7, finished=True))
+    github.at(start + 1800, lambda: github.open_pr(5, 8))
+    github.at(start + 4800, lambda: github.finished.add(8))
+
+    samples = _monitor(tmp_path, github, make_item("S04-T-001", file_path=todo))
+
+    assert len(samples["wait_pr"]) == 2
+    assert samples["work"] == [3000]
+    assert github.pulls[7]["state"] == "closed" and github.pulls[8]["merged_at"]
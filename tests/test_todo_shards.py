@@ -0,0 +1,75 @@
+from todo_shards import shard_path, sync_shards
+
+MASTER = """# Stage 06
+
+### - [ ] [S06-V01-R1-C01] 第001-010章
+**操作步骤**:
+- [ ] 通读
+- [ ] 修改
+
+---
+
+### - [ ] [S06-V01-R1-C02] 第011-020章
+- [ ] 通读
+"""
+
+
+def setup(tmp_path, text=MASTER):
+    todo_root = tmp_path / "todo"
+    todo_root.mkdir()
+    master = todo_root / "Stage-06_Test.todos.md"
+    master.write_bytes(text.encode("utf-8"))
+    return todo_root, master
+
+
+def test_shards_mirror_master_blocks(tmp_path):
+    todo_root, master = setup(tmp_path)
+    report = sync_shards(todo_root)
+    first = shard_path(todo_root, master, "S06-V01-R1-C01")
+    assert sorted(report.written) == sorted([first, shard_path(todo_root, master, "S06-V01-R1-C02")])
+    body = first.read_text(encoding="utf-8").split("\n")
+    assert body[0].startswith("<!--") and "todo/Stage-06_Test.todos.md" in body[0]
+    assert body[2:] == ["### - [ ] [S06-V01-R1-C01] 第001-010章", "**操作步骤**:", "- [ ] 通读", "- [ ] 修改", ""]
+    assert not sync_shards(todo_root).changed
+
+
+def test_shard_ticks_are_written_back_and_never_removed(tmp_path):
+    todo_root, master = setup(tmp_path)
+    sync_shards(todo_root)
+    first = shard_path(todo_root, master, "S06-V01-R1-C01")
+    first.write_text(first.read_text(encoding="utf-8").replace("- [ ] 通读", "- [x] 通读"), encoding="utf-8")
+    report = sync_shards(todo_root)
+    assert report.reconciled == {master.name: []}  # 只勾选了操作步骤
+    assert "- [x] 通读\n- [ ] 修改" in master.read_text(encoding="utf-8")
+
+    second = shard_path(todo_root, master, "S06-V01-R1-C02")
+    second.write_text(second.read_text(encoding="utf-8").replace("[ ] [S06", "[x] [S06"), encoding="utf-8")
+    assert sync_shards(todo_root).reconciled == {master.name: ["S06-V01-R1-C02"]}
+    assert "### - [x] [S06-V01-R1-C02]" in master.read_text(encoding="utf-8")
+
+    # 分片中取消勾选不会回写，反而被主文件覆盖
+    first.write_text(first.read_text(encoding="utf-8").replace("- [x] 通读", "- [ ] 通读"), encoding="utf-8")
+    report = sync_shards(todo_root)
+    assert report.reconciled == {} and report.written == [first]
+    assert "- [x] 通读" in first.read_text(encoding="utf-8")
+
+
+def test_regenerated_master_keeps_only_todo_line_ticks(tmp_path):
+    todo_root, master = setup(tmp_path)
+    sync_shards(todo_root)
+    first = shard_path(todo_root, master, "S06-V01-R1-C01")
+    first.write_text(first.read_text(encoding="utf-8").replace("[ ]", "[x]"), encoding="utf-8")
+    master.write_text(MASTER.replace("- [ ] 修改\n", "- [ ] 修改\n- [ ] 复核\n"), encoding="utf-8")
+    sync_shards(todo_root)
+    text = master.read_text(encoding="utf-8")
+    assert "### - [x] [S06-V01-R1-C01]" in text and "- [ ] 通读\n- [ ] 修改\n- [ ] 复核" in text
+
+
+def test_removed_todos_drop_their_shards_and_crlf_is_kept(tmp_path):
+    todo_root, master = setup(tmp_path, MASTER.replace("\n", "\r\n"))
+    sync_shards(todo_root)
+    second = shard_path(todo_root, master, "S06-V01-R1-C02")
+    assert b"\r\n" in second.read_bytes()
+    master.write_bytes(MASTER.split("---")[0].replace("\n", "\r\n").encode("utf-8"))
+    assert sync_shards(todo_root).removed == [second]
+    assert not second.exists()
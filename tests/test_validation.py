@@ -0,0 +1,151 @@
+import auto_copilot_pipeline as acp
+from conftest import FakeGitHub, call, file_call, make_item, pipeline_args
+from dup_index import DuplicateIndex
+from prose_lint import ProseLinter
+
+CHAPTER = "archives/Stage-04_Mass-Production/Volume-01/Ch-001-003_Draft.md"
+TODO_FILE = "todo/Stage-04_Test.todos.md"
+META = [
+    "**产出要求**:",
+    f"- 正文写入 `{CHAPTER}`，本次不少于 10 字",
+    "**验收标准**:",
+    "- [ ] 全卷总字数至少 20 字",
+]
+
+
+def pull(*paths):
+    return {"files": [{"path": p} for p in paths], "headRefName": "h", "baseRefName": "main"}
+
+
+def spec():
+    return acp.parse_deliverable_spec(make_item("S04-T-001", meta=META))
+
+
+def test_parse_deliverable_spec():
+    parsed = spec()
+    assert parsed.outputs == [CHAPTER]
+    assert parsed.min_chars == 10
+    assert parsed.min_total_chars == 20
+    assert parsed.todo_ids == ["S04-T-001"]
+    assert parsed.todo_file == TODO_FILE
+
+
+def test_validate_pull_passes(replay):
+    github = replay([
+        file_call(CHAPTER, "h", "林风推门而入。" * 5),
+        file_call(CHAPTER, "main", "林风。"),
+        file_call(TODO_FILE, "h", "### - [x] [S04-T-001] 任务\n"),
+    ])
+    report = acp.validate_pull(github, spec(), pull(CHAPTER, TODO_FILE))
+    assert report.passed(), report.to_markdown()
+    assert [name for name, _, _ in report.checks] == ["产出文件", "字数", "总字数", "TODO 勾选"]
+
+
+def test_validate_pull_reports_each_failure(replay):
+    github = replay([file_call(TODO_FILE, "h", "### - [ ] [S04-T-001] 任务\n")])
+    report = acp.validate_pull(github, spec(), pull("archives/other.md", TODO_FILE))
+    results = {name: ok for name, ok, _ in report.checks}
+    assert results == {"产出文件": False, "TODO 勾选": False}
+    assert report.score == 0
+
+
+def test_validate_pull_counts_only_added_words(replay):
+    github = replay([
+        file_call(CHAPTER, "h", "林风推门而入。" * 4),
+        file_call(CHAPTER, "main", "林风推门而入。" * 3),
+        file_call(TODO_FILE, "h", "### - [x] [S04-T-001] 任务\n"),
+    ])
+    report = acp.validate_pull(github, spec(), pull(CHAPTER, TODO_FILE))
+    words = next(check for check in report.checks if check[0] == "字数")
+    assert words[1] is False and "新增 6 字" in words[2]
+
+
+def test_validate_pull_flags_only_new_lint_errors(replay):
+    github = replay([
+        file_call(CHAPTER, "h", "然而林风推门而入。然而他停下。"),
+        file_call(CHAPTER, "main", "然而林风推门而入。"),
+        file_call(TODO_FILE, "h", "### - [x] [S04-T-001] 任务\n"),
+    ])
+    plain = acp.DeliverableSpec(TODO_FILE, ["S04-T-001"], [CHAPTER])
+    report = acp.validate_pull(github, plain, pull(CHAPTER, TODO_FILE), linter=ProseLinter())
+    lint = next(check for check in report.checks if check[0] == "去AI味")
+    assert lint[1] is False and "然而×1" in lint[2]
+
+
+def test_validate_pull_without_branch_is_not_scored(replay):
+    report = acp.validate_pull(replay([]), spec(), {"files": [{"path": CHAPTER}, {"path": TODO_FILE}]})
+    assert ("字数", None, "PR 缺少分支信息，跳过") in report.checks
+    assert ("TODO 勾选", None, "PR 缺少分支信息，跳过") in report.checks
+    assert report.passed()
+
+
+def test_validate_pull_missing_file_counts_as_empty(replay):
+    github = replay([
+        file_call(CHAPTER, "h", None),
+        file_call(CHAPTER, "main", None),
+        file_call(TODO_FILE, "h", "### - [x] [S04-T-001] 任务\n"),
+    ])
+    report = acp.validate_pull(github, spec(), pull(CHAPTER, TODO_FILE))
+    assert {name: ok for name, ok, _ in report.checks}["字数"] is False
+
+
+PARAGRAPH = "林风推门而入，屋里的烛火被夜风吹得摇摇欲坠，他握紧腰间的长剑，目光扫过角落里那张积满灰尘的旧桌子，心中暗暗戒备。"
+
+
+def duplicate_report(tmp_path, replay, head_call):
+    archive = tmp_path / "archives" / "Stage-04_Mass-Production" / "Volume-01" / "Ch-000_Old.md"
+    archive.parent.mkdir(parents=True)
+    archive.write_text(f"# 第0章\n\n{PARAGRAPH}\n", encoding="utf-8")
+    index = DuplicateIndex(tmp_path)
+    index.refresh()
+    github = replay([head_call, file_call(CHAPTER, "main", None)])
+    spec = acp.DeliverableSpec(TODO_FILE, ["S04-T-001"], [CHAPTER])
+    return acp.validate_pull(github, spec, pull(CHAPTER), duplicates=index)
+
+
+def test_duplicates_are_flagged_without_scoring(tmp_path, replay, clock):
+    report = duplicate_report(tmp_path, replay, file_call(CHAPTER, "h", f"# 第1章\n\n{PARAGRAPH}\n"))
+    assert ("重复段落", None) in [(name, ok) for name, ok, _ in report.checks]
+    assert [name for name, _ in report.flags] == ["重复段落"]
+
+    github = FakeGitHub(clock)
+    pipeline = acp.Pipeline(None, pipeline_args("--offline", "--no-history"), root=tmp_path)
+    pipeline._flag_duplicates(github, 7, report)
+    assert [number for number, _ in github.comments] == [7]
+
+
+def test_failed_duplicate_check_is_not_flagged(tmp_path, replay, clock):
+    failing = call(file_call(CHAPTER, "h", "")["a"], rc=1, stderr="gh: unknown error (HTTP 500)")
+    report = duplicate_report(tmp_path, replay, failing)
+    assert ("重复段落", None) in [(name, ok) for name, ok, _ in report.checks]
+    assert report.flags == []
+
+    github = FakeGitHub(clock)
+    pipeline = acp.Pipeline(None, pipeline_args("--offline", "--no-history"), root=tmp_path)
+    pipeline._flag_duplicates(github, 7, report)
+    assert github.comments == []
+
+
+ENDING_BODY = "".join(f"林风在第{i}个路口停下，回头看了一眼。" for i in range(60))
+
+
+def ending_check(replay, new_body):
+    github = replay([
+        file_call(CHAPTER, "main", f"## 第1章\n\n{ENDING_BODY}\n"),
+        file_call(CHAPTER, "h", f"## 第1章\n\n{new_body}\n"),
+    ])
+    spec = acp.DeliverableSpec(TODO_FILE, ["S04-T-001"], [CHAPTER], ending_only=True)
+    report = acp.validate_pull(github, spec, pull(CHAPTER))
+    return next(check for check in report.checks if check[0] == "章末范围")
+
+
+def test_ending_scope_allows_long_tail_truncation(replay):
+    cut = len(ENDING_BODY) - 600
+    check = ending_check(replay, ENDING_BODY[:cut - 50] + "他" + ENDING_BODY[cut - 49:cut])
+    assert check[1] is True, check[2]
+
+
+def test_ending_scope_rejects_edits_before_the_cut(replay):
+    cut = len(ENDING_BODY) - 600
+    check = ending_check(replay, ENDING_BODY[:100] + "他" + ENDING_BODY[101:cut])
+    assert check[1] is False and "距截断点" in check[2]
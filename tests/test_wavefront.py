@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import auto_copilot_pipeline as acp
+from conftest import make_item
+
+PATH = Path("todo/Stage-06_Test.todos.md")
+
+
+def batch(number, *todo_ids):
+    todos = [acp.TodoItem(todo_id, 6, "任务", [], PATH) for todo_id in todo_ids]
+    return acp.WorkItem(f"S06-BATCH-{number:02d}", 6, "批次", PATH, todos, number, 9)
+
+
+def test_cells_depend_on_previous_round_of_same_chunk():
+    items = [make_item(todo_id, stage=6) for todo_id in (
+        "S06-V01-R1-C01", "S06-V01-R1-C02", "S06-V01-R2-C01", "S06-V02-R2-C01",
+        "S06-V01-Summary-R1", "S06-Global-Final")]
+    deps = acp.wavefront_dependencies(items)
+    assert deps["S06-V01-R2-C01"] == {"S06-V01-R1-C01"}
+    assert "S06-V02-R2-C01" not in deps  # 前置不在待处理列表中，视为已完成
+    assert deps["S06-V01-Summary-R1"] == {"S06-V01-R1-C01", "S06-V01-R1-C02"}
+    assert deps["S06-Global-Final"] == {
+        "S06-V01-R1-C01", "S06-V01-R1-C02", "S06-V01-R2-C01", "S06-V02-R2-C01", "S06-V01-Summary-R1"}
+
+
+def test_batch_depends_on_union_of_its_todos_prerequisites():
+    items = [
+        batch(1, "S06-V01-R1-C01", "S06-V01-R1-C02"),
+        batch(2, "S06-V02-R1-C01", "S06-V01-R2-C01"),
+        batch(3, "S06-V01-R2-C02", "S06-V01-R3-C02"),
+        batch(4, "S06-V01-Summary-R2"),
+    ]
+    deps = acp.wavefront_dependencies(items)
+    assert "S06-BATCH-01" not in deps
+    assert deps["S06-BATCH-02"] == {"S06-BATCH-01"}
+    assert deps["S06-BATCH-03"] == {"S06-BATCH-01"}  # R3-C02 依赖的 R2-C02 在同一批内
+    assert deps["S06-BATCH-04"] == {"S06-BATCH-02", "S06-BATCH-03"}
+    assert acp.held_by(items, {"S06-BATCH-01"}) == {f"S06-BATCH-0{n}" for n in range(1, 5)}
+    assert acp.held_by(items, {"S06-BATCH-02"}) == {"S06-BATCH-02", "S06-BATCH-04"}
@@ -25,18 +25,41 @@
 from __future__ import annotations
 
 import argparse
+import copy
+import fnmatch
+import gzip
+import heapq
 import json
 import logging
+import os
+import random
 import re
+import shlex
 import shutil
 import signal
+import socket
+import socketserver
 import subprocess
 import sys
+import threading
 import time
-from dataclasses import dataclass
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Iterable, List, Optional
-from urllib.parse import urlparse
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+from urllib.parse import quote, urlparse
+
+from chapter_store import ChapterStore
+from char_diff import ENDING_WINDOW, diff_file
+from corpus_stats import CorpusStats, classify, count_chinese_chars
+from dup_index import DuplicateIndex
+from md_index import MarkdownIndex
+from prose_lint import ProseLinter
+from run_history import HISTORY_NAME, RunHistory, RunRecord
+from todo_shards import shard_dir, shard_path, sync_shards
 
 # ==================== 项目配置 ====================
 
@@ -107,9 +130,19 @@ DEFAULT_MAX_WAIT = 36000  # 单个 Issue 最大等待时间：10小时
 DEFAULT_BATCH_SIZE = 1  # 每个 Issue 包含的 TODO 数量（原子执行）
 DEFAULT_TASK_MAX_RETRIES = 3  # 任务失败重试次数
 DEFAULT_TASK_RETRY_WAIT = 300  # 任务重试等待时间：5分钟
+TASK_RETRY_JITTER = 0.5  # 重试等待在退避时长的 [1-J, 1] 倍间随机取值，避免同时失败的任务同时重试
 DEFAULT_MAX_PR_RESETS = 3  # 单个 Issue 内最大 PR 重置次数
 PR_TIMEOUT = 10800  # PR 处理超时：3小时
 PR_WAIT_TIMEOUT = 1800  # 等待 PR 创建超时：30分钟
+TIMEOUT_MIN_SAMPLES = 5  # 任务类别至少积累这么多样本才使用学习到的超时
+TIMEOUT_PERCENTILE = 0.95  # 学习超时取历史耗时的 P95
+TIMEOUT_MULTIPLIER = 1.5  # 在 P95 基础上留出的余量
+TIMEOUT_MAX_SAMPLES = 50  # 每个类别 / 阶段保留的最近样本数
+PR_WAIT_TIMEOUT_FLOOR = 600  # 学习到的等待 PR 超时下限：10分钟
+PR_TIMEOUT_FLOOR = 1800  # 学习到的 PR 处理超时下限：30分钟
+PR_TIMEOUT_CEILING = 21600  # PR 处理硬上限：6小时，即使 PR 仍有更新也会重置
+PR_STALL_TIMEOUT = 1800  # 超过学习超时后，PR 连续这么久没有更新才判定卡死
+DEFAULT_MAX_HEDGES = 2  # 同时在途的对冲尝试上限（所有仓库共享）
 RESET_WAIT_TIME = 30  # 重置后的等待时间（秒）
 HEARTBEAT_INTERVAL = 300  # 长时间等待时的心跳日志间隔（秒）
 GH_TIMEOUT = 180  # GitHub CLI 命令超时（秒），从 120 增加到 180
@@ -118,11 +151,47 @@ NETWORK_ERROR_BASE_WAIT = 10  # 网络错误基础等待时间（秒）
 NETWORK_ERROR_MAX_WAIT = 120  # 网络错误最大等待时间（秒）
 PR_READY_WAIT = 2  # PR 标记 Ready 后等待时间（秒）
 MAIN_ERROR_WAIT = 30  # 主循环错误重试等待（秒）
+DEFAULT_RATE_PER_HOUR = 4500  # 共享 API 预算：每小时请求数（GitHub core 上限 5000，留余量）
+DEFAULT_SEARCH_PER_MINUTE = 25  # 共享 API 预算：每分钟 search 请求数（上限 30）
+DEFAULT_GH_PARALLEL = 4  # 同时运行的 gh 进程上限
+GH_MEMO_TTL = 10  # 只读 gh 请求结果的复用时长上限（秒）；缓存按调度轮次清空，此值只兜底调度循环被阻塞的情况
+GH_MEMO_MAX_ENTRIES = 512  # 复用缓存的条目上限，超出时先清理过期条目
+# 只读的 gh 子命令；gh api 另按 --method 与字段参数判断（带 -f / -F 时 gh 默认使用 POST）
+GH_READ_COMMANDS = {("issue", "view"), ("issue", "list"), ("pr", "view"), ("pr", "list"), ("pr", "checks"), ("pr", "diff")}
+GH_API_WRITE_FLAGS = {"-f", "-F", "--field", "--raw-field", "--input"}
+# gh api 路径中的单个 Issue / PR，如 /repos/o/r/issues/12/timeline、/repos/o/r/pulls/12/files
+GH_API_NUMBER_PATTERN = re.compile(r"/repos/[^/]+/[^/]+/(?:issues|pulls)/(\d+)(?:[/?]|$)")
+DEFAULT_MAX_CONCURRENCY = 1  # 同时在途的工作项数量（1 = 顺序执行）
+PLAN_RECHECK_INTERVAL = 5  # 调度中每隔这么久检查一次 TODO 文件是否变化（秒），变化后在下一次派发前重新扫描
+DEFAULT_MIN_CONCURRENCY = 1  # --auto-concurrency 时在途上限的下限（上限为 --max-concurrency）
+AIMD_INCREASE = 1.0  # 加性增：满载完成一整个窗口（当前上限个工作项）后上限加 1
+AIMD_DECREASE = 0.5  # 乘性减：出现拥塞信号时上限乘以该系数
+AIMD_COOLDOWN = 900  # 两次降低之间的最短间隔（秒），同一波拥塞只降一次
+AIMD_WAIT_PR_SAMPLES = 20  # 等待 PR 耗时基线取最近这么多个样本的最小值
+AIMD_WAIT_PR_FACTOR = 2.0  # 等待 PR 耗时超过基线的这么多倍，视为 Copilot 侧排队
+AIMD_WAIT_PR_MIN_DELAY = 300  # 且超出基线至少这么多秒，避免短耗时的抖动触发降低
+AIMD_RESET_WINDOW = 10  # 重置率按最近这么多次尝试计算
+AIMD_RESET_RATE = 0.3  # 近期尝试中发生重置的比例超过该值时降低并发
+AIMD_HEADROOM_FLOOR = 0.2  # API 预算令牌低于桶容量的该比例（或处于限流暂停）时降低并发
+MERGE_CONFLICT_MARKERS = ("conflict", "not mergeable", "cannot be cleanly")  # 合并失败中表示冲突的错误信息
+DEFAULT_LEASE_TTL = 1800  # 多主机租约有效期（秒），每 1/3 有效期续约一次
+DEFAULT_LOCAL_WORKERS = 4  # 本地执行后端同时运行的命令进程数
+LOCAL_COMMAND_TIMEOUT = 3600  # 本地执行后端单条命令超时（秒）
+STATE_DIR = ROOT / ".pipeline"  # 本地运行状态目录（不纳入版本库）
+DEFAULT_CONTROL_SOCKET = STATE_DIR / "control.sock"
+DEAD_LETTER_NAME = "dead_letters.json"  # 重试耗尽的工作项（死信队列），位于 .pipeline/ 下
+CONTROL_TIMEOUT = 10  # 控制指令客户端超时（秒）
 TIMELINE_ACCEPT_HEADER = "Accept: application/vnd.github.mockingbird-preview+json"
+RAW_ACCEPT_HEADER = "Accept: application/vnd.github.raw"
+LEASE_ISSUE_TITLE = "[pipeline-leases] 多主机工作项租约"
+LEASE_COMMENT_MARKER = "<!-- pipeline-lease -->"
+MAX_STYLE_NOTES = 20  # Issue 中最多列出的文风异常章节数
+PREVIOUS_TAIL_CHARS = 300  # Issue 中嵌入的上一章结尾字数
+STAGE_CRITERIA_MAX_CHARS = 2000  # Issue 中嵌入的 Stage 验收标准的最大字符数
 
 CORE_DOCUMENTS = {
-    ROOT / "Project-Bible.md": "# Project Bible\n\n> 本文件由 auto_copilot_pipeline.py 自动创建，用于维护世界观、角色与伏笔总账。\n\n",
-    ROOT / "Risk-Ledger.md": "# Risk Ledger\n\n> 本文件由 auto_copilot_pipeline.py 自动创建，用于记录风险、决策与后续动作。\n\n"
+    "Project-Bible.md": "# Project Bible\n\n> 本文件由 auto_copilot_pipeline.py 自动创建，用于维护世界观、角色与伏笔总账。\n\n",
+    "Risk-Ledger.md": "# Risk Ledger\n\n> 本文件由 auto_copilot_pipeline.py 自动创建，用于记录风险、决策与后续动作。\n\n"
 }
 
 # ==================== 正则表达式 ====================
@@ -133,6 +202,12 @@ STAGE_FILE_PATTERN = re.compile(r"^Stage-(\d+)_(.+)\.todos\.md$")
 TODO_LINE_PATTERN = re.compile(
     r"^###\s+-\s*\[(?P<status>[ xX])\]\s+\[(?P<todo_id>[^\]]+?)\]\s+(?P<title>.+)$"
 )
+ISSUE_ID_PATTERN = re.compile(r"\[([^\]]+?)\]")
+
+# 任务标题中的章节范围，如 Stage-06 的 “· 第001-010章”
+CHAPTER_RANGE_PATTERN = re.compile(r"第(\d+)-(\d+)章")
+# 任务 ID 中的卷号，如 S06-V01-R1-C01
+VOLUME_ID_PATTERN = re.compile(r"-V(\d+)")
 
 # ==================== 日志配置 ====================
 
@@ -144,9 +219,10 @@ logging.basicConfig(
 logger = logging.getLogger("copilot-pipeline")
 
 
-def ensure_core_documents() -> None:
+def ensure_core_documents(root: Path = ROOT) -> None:
     created: List[str] = []
-    for path, placeholder in CORE_DOCUMENTS.items():
+    for name, placeholder in CORE_DOCUMENTS.items():
+        path = root / name
         if not path.exists():
             path.parent.mkdir(parents=True, exist_ok=True)
             path.write_text(placeholder, encoding="utf-8")
@@ -277,24 +353,408 @@ def extract_stage_number_from_filename(path: Path) -> int:
 def stage_file_sort_key(path: Path) -> tuple[int, str]:
     return extract_stage_number_from_filename(path), path.name
 
+# ==================== 时钟 ====================
+
+class Clock:
+    """实时时钟：Pipeline 与 GitHubClient 的所有计时和等待都经由此对象"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class ScaledClock(Clock):
+    """加速时钟：回放录像时按 speed 倍速流逝，轮询与退避等待同比缩短"""
+
+    def __init__(self, speed: float) -> None:
+        if speed <= 0:
+            raise ValueError(f"回放倍速必须大于 0: {speed}")
+        self.speed = speed
+        self._origin = time.time()
+
+    def time(self) -> float:
+        return self._origin + (time.time() - self._origin) * self.speed
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+# ==================== GitHub 传输层（录制 / 回放） ====================
+
+class CassetteMissError(RuntimeError):
+    """回放时遇到录像中不存在的请求"""
+
+
+class GhTransport:
+    """gh CLI 进程调用层，GitHubClient 的每个请求都经由 run() 发出
+
+    失败语义与 subprocess.run(check=True) 一致：抛出 CalledProcessError / TimeoutExpired，
+    由 GitHubClient._run_gh 统一处理重试。
+    """
+
+    def run(self, cmd: List[str], timeout: float) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            cmd, capture_output=True, text=True, check=True,
+            encoding="utf-8", timeout=timeout
+        )
+
+    def close(self) -> None:
+        pass
+
+
+def _open_cassette(path: Path, mode: str):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return path.open(mode, encoding="utf-8")
+
+
+class RecordingTransport(GhTransport):
+    """录制层：透传请求并把请求、响应与耗时逐条追加到录像文件
+
+    录像为 JSON Lines（.gz 结尾时 gzip 压缩）。首行是文件头，之后每行一个请求：
+    t=相对开始的秒数, d=耗时, a=gh 参数, rc=退出码（超时为 null）, o=stdout, e=stderr。
+    每条写入后立即 flush，进程崩溃时已发生的流量仍可回放。
+    """
+
+    def __init__(self, inner: GhTransport, path: Path, repo_ref: str, clock: Optional[Clock] = None) -> None:
+        self.inner = inner
+        self.path = path
+        self.clock = clock or Clock()
+        self._lock = threading.Lock()
+        self._start = self.clock.time()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = _open_cassette(path, "w")
+        self._write({
+            "cassette": 1,
+            "repo": repo_ref,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        })
+        logger.info(f"📼 录制 gh 流量到 {path}")
+
+    def _write(self, entry: dict) -> None:
+        with self._lock:
+            self._fh.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._fh.flush()
+
+    def run(self, cmd: List[str], timeout: float) -> subprocess.CompletedProcess:
+        started = self.clock.time()
+        entry: Dict[str, Any] = {"t": round(started - self._start, 3), "a": cmd[1:]}
+        try:
+            result = self.inner.run(cmd, timeout)
+            entry.update(rc=result.returncode, o=result.stdout, e=result.stderr or "")
+            return result
+        except subprocess.CalledProcessError as exc:
+            entry.update(rc=exc.returncode, o=exc.stdout or "", e=exc.stderr or "")
+            raise
+        except subprocess.TimeoutExpired:
+            entry.update(rc=None, o="", e="")
+            raise
+        finally:
+            entry["d"] = round(self.clock.time() - started, 3)
+            self._write(entry)
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
+class ReplayTransport(GhTransport):
+    """回放层：按录像确定性地返回响应，不访问网络
+
+    同一组 gh 参数的响应按录制顺序依次返回；录制的调用用完后重复最后一次响应，
+    以兼容回放时轮询次数与录制时略有差异的情况。响应延迟按录制耗时经 clock 复现，
+    配合 ScaledClock 即可加速回放。
+    """
+
+    def __init__(self, path: Path, clock: Optional[Clock] = None) -> None:
+        self.path = path
+        self.clock = clock or Clock()
+        self.header: dict = {}
+        self._lock = threading.Lock()
+        self._queues: Dict[str, Deque[dict]] = defaultdict(deque)
+        self._last: Dict[str, dict] = {}
+        # 录像中不存在的请求；调用方吞掉 CassetteMissError 时，回放入口仍可据此判定失败
+        self.misses: List[str] = []
+        count = 0
+        with _open_cassette(path, "r") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if "cassette" in entry:
+                    self.header = entry
+                    continue
+                self._queues[self._key(entry["a"])].append(entry)
+                count += 1
+        logger.info(f"📼 从 {path} 载入 {count} 条录制请求 ({len(self._queues)} 种)")
+
+    @property
+    def exhausted(self) -> bool:
+        """录制的请求是否已全部回放"""
+        with self._lock:
+            return not any(self._queues.values())
+
+    @staticmethod
+    def _key(args: List[str]) -> str:
+        return json.dumps(args, ensure_ascii=False, separators=(",", ":"))
+
+    def run(self, cmd: List[str], timeout: float) -> subprocess.CompletedProcess:
+        key = self._key(cmd[1:])
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue:
+                entry = queue.popleft()
+                self._last[key] = entry
+            elif key in self._last:
+                entry = self._last[key]
+            else:
+                message = f"录像中没有该请求: gh {' '.join(cmd[1:4])}..."
+                self.misses.append(message)
+                raise CassetteMissError(message)
+
+        self.clock.sleep(entry.get("d", 0))
+        if entry.get("rc") is None:
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        if entry["rc"] != 0:
+            raise subprocess.CalledProcessError(entry["rc"], cmd, output=entry.get("o", ""), stderr=entry.get("e", ""))
+        return subprocess.CompletedProcess(cmd, 0, stdout=entry.get("o", ""), stderr=entry.get("e", ""))
+
+
+def replay_diverged(transport: ReplayTransport) -> bool:
+    """回放中出现过录像里没有的请求时记录错误并返回 True"""
+    if not transport.misses:
+        return False
+    logger.error(f"✗ 回放与录像不一致（{len(transport.misses)} 个未录制的请求），首个: {transport.misses[0]}")
+    return True
+
+# ==================== API 预算 ====================
+
+class RateBudget:
+    """多个 GitHubClient 共享的 API 预算
+
+    - 令牌桶：core 请求按小时配额匀速放行，search 请求另有每分钟配额
+    - 并发上限：同时运行的 gh 进程数（gh CLI 没有连接池，以进程槽位代替）
+    - 限流暂停：任一客户端触发 rate limit 后，所有客户端一起暂停
+    """
+
+    def __init__(self, per_hour: float = DEFAULT_RATE_PER_HOUR,
+                 search_per_minute: float = DEFAULT_SEARCH_PER_MINUTE,
+                 max_parallel: int = DEFAULT_GH_PARALLEL,
+                 clock: Optional[Clock] = None) -> None:
+        self.clock = clock or Clock()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, max_parallel))
+        now = self.clock.time()
+        # 桶：[速率(个/秒), 容量, 当前令牌, 上次补充时间]
+        self._buckets: Dict[str, List[float]] = {
+            "core": [per_hour / 3600.0, max(1.0, per_hour / 60.0), max(1.0, per_hour / 60.0), now],
+            "search": [search_per_minute / 60.0, max(1.0, search_per_minute / 6.0), max(1.0, search_per_minute / 6.0), now],
+        }
+        self._paused_until = 0.0
+
+    def _take(self, kind: str) -> float:
+        """尝试取一个令牌，返回还需等待的秒数（0 表示已取到）"""
+        with self._lock:
+            now = self.clock.time()
+            if now < self._paused_until:
+                return self._paused_until - now
+            bucket = self._buckets[kind]
+            rate, capacity, tokens, last = bucket
+            tokens = min(capacity, tokens + (now - last) * rate)
+            bucket[3] = now
+            if tokens >= 1.0:
+                bucket[2] = tokens - 1.0
+                return 0.0
+            bucket[2] = tokens
+            return (1.0 - tokens) / rate if rate > 0 else RETRY_SLEEP_SHORT
+
+    def acquire(self, search: bool = False) -> None:
+        """阻塞直到预算允许再发起一个请求"""
+        for kind in (("core", "search") if search else ("core",)):
+            while True:
+                wait = self._take(kind)
+                if wait <= 0:
+                    break
+                self.clock.sleep(min(wait, RETRY_SLEEP_SHORT))
+
+    def pause(self, seconds: float) -> None:
+        """触发限流后全局暂停，所有共享该预算的客户端都会等待"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self.clock.time() + seconds)
+
+    def headroom(self) -> float:
+        """core 桶剩余令牌占容量的比例；限流暂停期间为 0"""
+        with self._lock:
+            now = self.clock.time()
+            if now < self._paused_until:
+                return 0.0
+            rate, capacity, tokens, last = self._buckets["core"]
+            return min(capacity, tokens + (now - last) * rate) / capacity
+
+    @contextmanager
+    def slot(self):
+        """占用一个 gh 进程槽位"""
+        self._slots.acquire()
+        try:
+            yield
+        finally:
+            self._slots.release()
+
 # ==================== GitHub 客户端 ====================
 
+def is_read_request(args: List[str]) -> bool:
+    """gh 参数是否为只读请求（可合并 / 复用）；无法确定时按写请求处理"""
+    if not args:
+        return False
+    if args[0] == "api":
+        for flag in ("--method", "-X"):
+            if flag in args:
+                index = args.index(flag) + 1
+                return index < len(args) and args[index].upper() == "GET"
+        return not any(arg in GH_API_WRITE_FLAGS for arg in args)
+    return tuple(args[:2]) in GH_READ_COMMANDS
+
+
+def gh_resource(args: List[str]) -> Optional[int]:
+    """gh 请求针对的单个 Issue / PR 编号；列表、搜索、文件内容等不属于单个 Issue 的请求返回 None"""
+    if len(args) > 2 and args[0] in ("issue", "pr") and args[2].isdigit():
+        return int(args[2])
+    if len(args) > 1 and args[0] == "api":
+        match = GH_API_NUMBER_PATTERN.search(args[1])
+        if match:
+            return int(match.group(1))
+    return None
+
+
+class _Flight:
+    """一次在途的只读请求；相同参数的后来者等待它的结果而不重复发起"""
+
+    def __init__(self, generation: tuple) -> None:
+        self.generation = generation
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> str:
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result or ""
+
+
 class GitHubClient:
-    def __init__(self, owner: str, repo: str) -> None:
+    def __init__(self, owner: str, repo: str, transport: Optional[GhTransport] = None,
+                 clock: Optional[Clock] = None, budget: Optional[RateBudget] = None) -> None:
         self.owner = owner
         self.repo = repo
         self.repo_ref = f"{owner}/{repo}"
-        if not shutil.which("gh"):
+        self.clock = clock or Clock()
+        # 多仓库守护进程中各客户端共享同一份预算
+        self.budget = budget or RateBudget(clock=self.clock)
+        # 回放模式不需要真实的 gh CLI
+        if transport is None and not shutil.which("gh"):
             raise RuntimeError("未找到 gh CLI")
+        self.transport = transport or GhTransport()
+        self._calls = threading.local()
+        # 只读请求的单飞合并与复用：相同参数的在途请求只发一次，结果在同一调度轮次内复用
+        # （调度器每轮开始时调用 begin_tick 清空，memo_ttl 为复用时长上限）。
+        # 写请求只失效同一 Issue / PR 的读结果以及列表类读结果，无法确定对象的写请求清空全部；
+        # 被失效的键之后的读请求也不再加入写之前发起的在途请求
+        self.memo_ttl: float = GH_MEMO_TTL
+        self.memo_hits = 0
+        self.coalesced = 0
+        self._memo: Dict[tuple, tuple[float, str]] = {}
+        self._inflight: Dict[tuple, _Flight] = {}
+        self._generation = 0
+        self._epochs: Dict[Optional[int], int] = defaultdict(int)  # Issue / PR 编号（None 为列表类）-> 失效次数
+        self._memo_lock = threading.Lock()
+
+    @property
+    def thread_calls(self) -> int:
+        """当前线程累计发起的 gh 调用次数（含重试），用于统计单个工作项的 API 用量"""
+        return getattr(self._calls, "count", 0)
+
+    def begin_tick(self) -> None:
+        """调度器每轮开始时调用：清空复用缓存，上一轮发起的在途读请求结果不再进入缓存"""
+        with self._memo_lock:
+            self._generation += 1
+            self._memo.clear()
+
+    def invalidate(self, number: Optional[int] = None) -> None:
+        """失效复用缓存（写请求前后自动调用）：number 为空时清空全部，否则只失效该 Issue / PR 与列表类的读结果"""
+        with self._memo_lock:
+            if number is None:
+                self._generation += 1
+                self._memo.clear()
+                self._inflight.clear()
+                return
+            stale = (number, None)
+            for resource in stale:
+                self._epochs[resource] += 1
+            for key in [key for key in self._memo if gh_resource(list(key)) in stale]:
+                del self._memo[key]
+            for key in [key for key in self._inflight if gh_resource(list(key)) in stale]:
+                del self._inflight[key]
 
     def _run_gh(self, args: List[str], retries: int = 3) -> str:
+        if not is_read_request(args):
+            number = gh_resource(args)
+            self.invalidate(number)
+            try:
+                return self._call_gh(args, retries)
+            finally:
+                # 写请求期间发起的读请求可能读到旧状态，结果不进入缓存
+                self.invalidate(number)
+
+        key = tuple(args)
+        resource = gh_resource(args)
+        with self._memo_lock:
+            cached = self._memo.get(key)
+            if cached is not None and self.clock.time() - cached[0] <= self.memo_ttl:
+                self.memo_hits += 1
+                return cached[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._inflight[key] = _Flight((self._generation, self._epochs[resource]))
+            else:
+                self.coalesced += 1
+        if not leader:
+            return flight.wait()
+
+        try:
+            flight.result = self._call_gh(args, retries)
+            return flight.result
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._memo_lock:
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                if (flight.error is None and flight.generation == (self._generation, self._epochs[resource])
+                        and self.memo_ttl > 0):
+                    if len(self._memo) >= GH_MEMO_MAX_ENTRIES:
+                        now = self.clock.time()
+                        self._memo = {k: v for k, v in self._memo.items() if now - v[0] <= self.memo_ttl}
+                        if len(self._memo) >= GH_MEMO_MAX_ENTRIES:
+                            self._memo.clear()
+                    self._memo[key] = (self.clock.time(), flight.result or "")
+            flight.done.set()
+
+    def _call_gh(self, args: List[str], retries: int = 3) -> str:
         cmd = ["gh"] + args
+        is_search = "--search" in args
         for attempt in range(1, retries + 1):
             try:
-                result = subprocess.run(
-                    cmd, capture_output=True, text=True, check=True,
-                    encoding="utf-8", timeout=GH_TIMEOUT
-                )
+                self.budget.acquire(search=is_search)
+                self._calls.count = self.thread_calls + 1
+                with self.budget.slot():
+                    result = self.transport.run(cmd, GH_TIMEOUT)
                 return result.stdout.strip()
             except subprocess.TimeoutExpired:
                 if attempt == retries:
@@ -302,7 +762,7 @@ class GitHubClient:
                     raise RuntimeError(f"gh 命令超时: {' '.join(args)}")
                 wait_time = min(2 ** attempt * NETWORK_ERROR_BASE_WAIT, NETWORK_ERROR_MAX_WAIT)
                 logger.warning(f"gh 命令超时，{wait_time}秒后重试 ({attempt}/{retries}): {' '.join(args[:3])}...")
-                time.sleep(wait_time)
+                self.clock.sleep(wait_time)
             except subprocess.CalledProcessError as exc:
                 stderr = exc.stderr.strip() if exc.stderr else "无错误信息"
 
@@ -327,16 +787,17 @@ class GitHubClient:
                 if "rate limit" in stderr.lower() or "abuse" in stderr.lower():
                     wait_time = min(300 * attempt, 1800)  # 最多等待 30 分钟
                     logger.warning(f"GitHub API 限流警告，暂停 {wait_time}秒 ({wait_time/60:.1f}min) 后重试 ({attempt}/{retries})")
-                    time.sleep(wait_time)
+                    # 暂停共享预算，同一账号下的其他仓库也一并等待
+                    self.budget.pause(wait_time)
                 # 网络错误使用指数退避
                 elif is_network_error:
                     wait_time = min(2 ** attempt * NETWORK_ERROR_BASE_WAIT, NETWORK_ERROR_MAX_WAIT)
                     logger.warning(f"网络错误，{wait_time}秒后重试 ({attempt}/{retries}): {stderr[:100]}")
-                    time.sleep(wait_time)
+                    self.clock.sleep(wait_time)
                 else:
                     wait_time = min(2 ** attempt, 30)
                     logger.warning(f"gh 命令失败，{wait_time}秒后重试 ({attempt}/{retries}): {stderr[:100]}")
-                    time.sleep(wait_time)
+                    self.clock.sleep(wait_time)
 
         raise RuntimeError(f"gh 命令失败：未知错误 (重试 {retries} 次后仍失败)")
 
@@ -421,6 +882,35 @@ class GitHubClient:
     def comment_issue(self, issue_number: int, body: str) -> None:
         self._run_gh(["issue", "comment", str(issue_number), "--repo", self.repo_ref, "--body", body])
 
+    def list_comments(self, issue_number: int) -> List[dict]:
+        """分页列出 Issue 的全部评论（id、body、user）"""
+        output = self._run_gh(["api", f"/repos/{self.repo_ref}/issues/{issue_number}/comments?per_page=100", "--paginate"])
+        return [comment for comment in _decode_pages(output) if isinstance(comment, dict)]
+
+    def create_comment(self, issue_number: int, body: str) -> int:
+        """发表评论并返回评论 id（comment_issue 不返回 id）"""
+        output = self._run_gh([
+            "api", f"/repos/{self.repo_ref}/issues/{issue_number}/comments",
+            "--method", "POST", "-f", f"body={body}",
+        ])
+        try:
+            return int(json.loads(output)["id"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise RuntimeError(f"解析评论 id 失败，输出: {output[:200]}") from e
+
+    def update_comment(self, comment_id: int, body: str) -> None:
+        self._run_gh([
+            "api", f"/repos/{self.repo_ref}/issues/comments/{comment_id}",
+            "--method", "PATCH", "-f", f"body={body}",
+        ])
+
+    def close_issue(self, issue_number: int, comment: Optional[str] = None) -> None:
+        """以 not planned 关闭 Issue，可附带说明评论"""
+        args = ["issue", "close", str(issue_number), "--repo", self.repo_ref, "--reason", "not planned"]
+        if comment:
+            args.extend(["--comment", comment])
+        self._run_gh(args)
+
     def get_issue(self, issue_number: int) -> dict:
         """获取 Issue 信息，包含状态和分配者"""
         output = self._run_gh([
@@ -435,7 +925,7 @@ class GitHubClient:
     def get_pull(self, pr_number: int) -> dict:
         output = self._run_gh([
             "pr", "view", str(pr_number), "--repo", self.repo_ref,
-            "--json", "number,state,mergedAt,isDraft,updatedAt,files"
+            "--json", "number,state,mergedAt,isDraft,updatedAt,files,headRefName,baseRefName"
         ])
         try:
             data = json.loads(output) if output else {}
@@ -449,6 +939,28 @@ class GitHubClient:
             data["draft"] = data.pop("isDraft")
         return data
 
+    def get_file_text(self, path: str, ref: str) -> Optional[str]:
+        """读取指定分支上的单个文件（raw），文件不存在时返回 None"""
+        api_path = f"/repos/{self.repo_ref}/contents/{quote(path)}?ref={quote(ref, safe='')}"
+        try:
+            return self._run_gh(["api", api_path, "-H", RAW_ACCEPT_HEADER], retries=2)
+        except RuntimeError as e:
+            if "not found" in str(e).lower() or "404" in str(e):
+                return None
+            raise
+
+    def get_issue_body(self, issue_number: int) -> str:
+        output = self._run_gh([
+            "issue", "view", str(issue_number), "--repo", self.repo_ref, "--json", "body"
+        ])
+        try:
+            return (json.loads(output) if output else {}).get("body") or ""
+        except json.JSONDecodeError as e:
+            raise RuntimeError(f"解析 Issue 数据失败: {e}") from e
+
+    def edit_issue_body(self, issue_number: int, body: str) -> None:
+        self._run_gh(["issue", "edit", str(issue_number), "--repo", self.repo_ref, "--body", body])
+
     def merge_pull(self, pr_number: int) -> dict:
         self._run_gh(["pr", "merge", str(pr_number), "--repo", self.repo_ref, "--squash", "--delete-branch"])
         return {"merged": True}
@@ -466,11 +978,11 @@ class GitHubClient:
         self._run_gh(args)
 
     def list_closed_issues(self, limit: int = 1000) -> List[dict]:
-        """查询已关闭的 Issues"""
+        """查询已关闭的 Issues（标题与关闭原因）"""
         output = self._run_gh([
             "issue", "list", "--repo", self.repo_ref,
             "--state", "closed",
-            "--limit", str(limit), "--json", "title"
+            "--limit", str(limit), "--json", "title,stateReason"
         ])
         try:
             issues = json.loads(output) if output else []
@@ -478,6 +990,11 @@ class GitHubClient:
         except json.JSONDecodeError:
             return []
 
+    def list_open_issues(self) -> List[dict]:
+        """分页列出全部开放 Issue（不含 PR）：一次 gh 调用，每页 100 个"""
+        output = self._run_gh(["api", f"/repos/{self.repo_ref}/issues?state=open&per_page=100", "--paginate"])
+        return [issue for issue in _decode_pages(output) if isinstance(issue, dict) and "pull_request" not in issue]
+
     def find_issue_by_todo(self, todo_id: str) -> Optional[int]:
         """尝试根据标题中的 TODO ID 查找已有的开放 Issue"""
         if not todo_id or not todo_id.strip():
@@ -544,6 +1061,24 @@ class GitHubClient:
             else:
                 logger.warning(f"标记 PR #{pr_number} 为 Ready 失败: {e}")
 
+def _decode_pages(output: str) -> List[Any]:
+    """解码 gh api --paginate 的输出：每一页的 JSON 数组依次拼接，逐个解码后合并"""
+    decoder = json.JSONDecoder()
+    entries: List[Any] = []
+    pos = 0
+    try:
+        while True:
+            while pos < len(output) and output[pos].isspace():
+                pos += 1
+            if pos >= len(output):
+                break
+            page, pos = decoder.raw_decode(output, pos)
+            if isinstance(page, list):
+                entries.extend(page)
+    except json.JSONDecodeError as e:
+        raise RuntimeError(f"解析分页结果失败: {e}") from e
+    return entries
+
 # ==================== PR 监控 ====================
 
 def check_copilot_signal(github: GitHubClient, pr_number: int) -> bool:
@@ -635,6 +1170,42 @@ def parse_stage_structure(path: Path) -> tuple[int, List[TodoItem]]:
     logger.info(f"解析完成: {len(todos)} 个待办任务")
     return stage_num, todos
 
+def mark_todos_done(path: Path, todo_ids: Iterable[str]) -> int:
+    """在 TODO 文件中勾选指定任务，返回实际勾选的数量"""
+    pending = set(todo_ids)
+    lines = path.read_text(encoding="utf-8").splitlines(keepends=True)
+    marked = 0
+    for i, line in enumerate(lines):
+        match = TODO_LINE_PATTERN.match(line.rstrip("\r\n"))
+        if match and match.group("status") == " " and match.group("todo_id").strip() in pending:
+            lines[i] = line[:match.start("status")] + "x" + line[match.end("status"):]
+            marked += 1
+    if marked:
+        path.write_text("".join(lines), encoding="utf-8")
+    return marked
+
+def completed_ids_from_issues(issues: Iterable[Any]) -> set[str]:
+    """从 Issue 标题中提取工作项 ID（标题中第一个方括号内的内容）
+
+    只统计以 completed 关闭的 Issue：失败的对冲尝试、竞速落后的尝试都以 not planned 关闭，
+    不代表任务完成。stateReason 缺失或为空（旧数据）时按已完成处理。
+    """
+    completed = set()
+    for issue in issues:
+        if not isinstance(issue, dict):
+            continue
+        if (issue.get("stateReason") or "COMPLETED") != "COMPLETED":
+            continue
+        title = issue.get("title", "")
+        if not title:
+            continue
+        match = ISSUE_ID_PATTERN.search(title)
+        if match:
+            todo_id = match.group(1).strip()
+            if todo_id:
+                completed.add(todo_id)
+    return completed
+
 def iter_work_items(todo_root: Path, batch_size: int, completed_ids: set[str]) -> List[WorkItem]:
     """获取当前需要处理的工作项
 
@@ -678,258 +1249,1699 @@ def iter_work_items(todo_root: Path, batch_size: int, completed_ids: set[str]) -
                 title = f"{path.stem} 批次 {i}/{len(batches)}"
                 stage_items.append(WorkItem(wid, stage_num, title, path, batch, i, len(batches)))
 
+        # 逐项跳过只记 debug 日志：计划规模增长后逐条输出会拖慢启动，改为按 Stage 汇总
         filtered_items: List[WorkItem] = []
         for item in stage_items:
             if item.id_full in completed_ids:
-                logger.info(f"⏭ 跳过已完成任务/批次 (GitHub): {item.id_full}")
+                logger.debug(f"⏭ 跳过已完成任务/批次 (GitHub): {item.id_full}")
                 continue
 
             if item.is_batch:
                 all_sub_completed = all(todo.id_full in completed_ids for todo in item.todos)
                 if all_sub_completed:
-                    logger.info(f"⏭ 跳过已完成批次 (子任务全清): {item.id_full}")
+                    logger.debug(f"⏭ 跳过已完成批次 (子任务全清): {item.id_full}")
                     continue
 
             filtered_items.append(item)
 
+        skipped = len(stage_items) - len(filtered_items)
+        if skipped:
+            logger.info(f"⏭ Stage {stage_num:02d} 跳过 {skipped} 个已完成任务/批次 (GitHub)")
+
         if filtered_items:
             logger.info(f"锁定 Stage {stage_num:02d}，待处理 {len(filtered_items)} 个任务")
             return filtered_items
 
     return []
 
-# ==================== Pipeline ====================
+# ==================== 交付物预检 ====================
+
+# TODO 元信息中描述产出 / 验收的小节标题
+OUTPUT_SECTIONS = ("产出要求", "输出", "输出路径", "产出", "交付物")
+ACCEPTANCE_SECTIONS = ("验收标准", "验收")
+# 验收小节内的子标题（如 **基础质量检查**:）仍属于验收，遇到这些输入/流程类小节才退出
+PROCESS_SECTIONS = ("责任专家", "任务描述", "前置检查", "参考文件清单", "执行流程", "操作步骤", "适用章节", "说明")
+# 小节标题形如 **产出要求**: 或 **验收标准**（说明）:，同一行可能并列多个标题，以最后一个为准
+META_SECTION_PATTERN = re.compile(r"\*\*(?P<name>[^*]+?)\*\*\s*(?:[（(][^）)]*[）)])?\s*[:：]")
+ARCHIVE_PATH_PATTERN = re.compile(r"archives/[^\s`'\"，。；、）)]+?\.md")
+# 字数下限：不少于/至少/≥ N字、N字以上；验收小节中的 A-B字 区间取 A。“每章/每个”等单位级要求不计入
+WORD_TARGET_PATTERNS = (
+    re.compile(r"(?<!每)(?:不少于|至少|不低于|≥|>=)\s*(?P<num>\d[\d,]*(?:\.\d+)?)\s*(?P<wan>万)?\s*字"),
+    re.compile(r"(?<![每\d,])(?P<num>\d[\d,]*(?:\.\d+)?)\s*(?P<wan>万)?\s*字以上"),
+)
+WORD_RANGE_PATTERN = re.compile(r"(?<![每\d,])(?P<num>\d[\d,]*)\s*[-~～至]\s*\d[\d,]*\s*(?P<wan>万)?\s*字")
+# 含这些词的字数要求针对产出文件的总字数，其余针对本次新增字数
+TOTAL_WORD_HINTS = ("总字数", "全文", "全卷")
+VALIDATION_MARKER = "<!-- pipeline-validation -->"
+DUPLICATE_REPORT_LIMIT = 5  # 预检报告中最多列出的重复段落数
+# 标题含该词的任务（Stage-06 章末截断）只允许改动各章章末
+ENDING_ONLY_HINT = "章末截断"
+SCOPE_REPORT_LIMIT = 5  # 预检报告中最多列出的越界章节数
 
-class Pipeline:
-    def __init__(self, github: Optional[GitHubClient], args: argparse.Namespace) -> None:
-        self.github = github
-        self.args = args
 
-    def _require_github(self) -> GitHubClient:
-        if not self.github:
-            raise RuntimeError("GitHub 客户端不可用，无法执行在线操作。请移除 --dry-run 或正确配置 gh CLI。")
-        return self.github
+@dataclass
+class DeliverableSpec:
+    todo_file: str
+    todo_ids: List[str]
+    outputs: List[str]
+    min_chars: Optional[int] = None  # 本次新增字数下限
+    min_total_chars: Optional[int] = None  # 产出文件总字数下限
+    todo_shards: Dict[str, str] = field(default_factory=dict)  # TODO ID -> 分片文件（--todo-shards）
+    ending_only: bool = False  # 只允许改动章末（章末截断任务）
+    chapter_range: Optional[tuple[int, int]] = None  # 任务标题中的章节范围（如 第001-010章）
+
+
+def parse_deliverable_spec(item: WorkItem, root: Path = ROOT,
+                           shards: Optional[Dict[str, str]] = None) -> DeliverableSpec:
+    """从 TODO 的 **产出要求** / **验收标准** 等小节提取交付物规则；shards 为 Issue 指向的分片文件"""
+    try:
+        todo_file = item.file_path.relative_to(root).as_posix()
+    except ValueError:
+        todo_file = item.file_path.as_posix()
+
+    outputs: List[str] = []
+    targets: List[int] = []
+    total_targets: List[int] = []
+    ranges: List[tuple[int, int]] = []
+    for todo in item.todos:
+        chapters = CHAPTER_RANGE_PATTERN.search(todo.title)
+        if chapters:
+            ranges.append((int(chapters.group(1)), int(chapters.group(2))))
+        section = ""
+        in_fence = False
+        for line in todo.meta_lines:
+            stripped = line.strip()
+            # 代码块是输出格式示例，不参与解析
+            if stripped.startswith("```"):
+                in_fence = not in_fence
+                continue
+            if in_fence:
+                continue
+            # 文件中最后一个 TODO 的元信息可能包含其后的阶段级清单，遇到标题或分隔线即停止
+            if stripped.startswith("#") or stripped == "---":
+                break
+            if stripped.startswith("**"):
+                headers = META_SECTION_PATTERN.findall(stripped)
+                if headers:
+                    name = re.split(r"[（(]", headers[-1])[0].strip()
+                    if name in OUTPUT_SECTIONS:
+                        section = name
+                    elif "验收" in name:
+                        section = "验收"
+                    elif name in PROCESS_SECTIONS or section not in ACCEPTANCE_SECTIONS:
+                        section = ""
+            if section in OUTPUT_SECTIONS:
+                for path in ARCHIVE_PATH_PATTERN.findall(line):
+                    if path not in outputs:
+                        outputs.append(path)
+            if section in OUTPUT_SECTIONS or section in ACCEPTANCE_SECTIONS:
+                patterns = WORD_TARGET_PATTERNS
+                if section in ACCEPTANCE_SECTIONS:
+                    patterns = patterns + (WORD_RANGE_PATTERN,)
+                bucket = total_targets if any(hint in line for hint in TOTAL_WORD_HINTS) else targets
+                for pattern in patterns:
+                    for match in pattern.finditer(line):
+                        value = float(match.group("num").replace(",", ""))
+                        if match.group("wan"):
+                            value *= 10000
+                        bucket.append(int(value))
+
+    return DeliverableSpec(
+        todo_file=todo_file,
+        todo_ids=[todo.id_full for todo in item.todos],
+        outputs=outputs,
+        min_chars=max(targets) if targets else None,
+        min_total_chars=max(total_targets) if total_targets else None,
+        todo_shards=dict(shards or {}),
+        ending_only=any(ENDING_ONLY_HINT in todo.title for todo in item.todos),
+        chapter_range=(min(r[0] for r in ranges), max(r[1] for r in ranges)) if ranges else None,
+    )
 
-    def get_recent_completed_todos(self, limit: int = 1000) -> set[str]:
-        """获取最近已完成的 TODO ID 集合，用于自动跳过
 
-        注意：此方法依赖 GitHub API，如果需要更快的启动速度，
-        可以考虑将进度缓存到本地文件（如 .pipeline_progress.json）
-        """
-        if not self.github:
-            logger.debug("跳过远程进度扫描：当前为 dry-run 或 GitHub 未配置")
-            return set()
+@dataclass
+class ValidationReport:
+    # (检查项, 结果, 说明)；结果为 None 表示不计入得分：无法检查（如文件拉取失败）或仅作提示
+    checks: List[tuple[str, Optional[bool], str]]
+    # 需要在 PR 中提示的发现（如疑似重复段落），与“无法检查”区分开
+    flags: List[tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def scored(self) -> List[tuple[str, Optional[bool], str]]:
+        return [check for check in self.checks if check[1] is not None]
+
+    @property
+    def score(self) -> float:
+        scored = self.scored
+        return sum(1 for check in scored if check[1]) / len(scored) if scored else 1.0
+
+    def passed(self, min_score: float = 1.0) -> bool:
+        return self.score >= min_score
+
+    def to_markdown(self) -> str:
+        scored = self.scored
+        lines = [f"得分：{sum(1 for c in scored if c[1])}/{len(scored)}", ""]
+        for name, ok, detail in self.checks:
+            icon = "⚠️" if ok is None else ("✅" if ok else "❌")
+            lines.append(f"- {icon} **{name}**：{detail}")
+        return "\n".join(lines)
 
-        github = self._require_github()
 
+def _match_output(pattern: str, changed: Iterable[str]) -> List[str]:
+    # 产出路径中的占位符（{Filename}、*）按通配符处理
+    glob = re.sub(r"\{[^}]*\}", "*", pattern)
+    return [path for path in changed if fnmatch.fnmatchcase(path, glob)]
+
+
+def validate_pull(github: GitHubClient, spec: DeliverableSpec, pr: dict,
+                  linter: Optional[ProseLinter] = None,
+                  duplicates: Optional[DuplicateIndex] = None) -> ValidationReport:
+    """用 PR 的文件列表做预检，只拉取判定所需的文件内容
+
+    检查项：产出文件是否在 PR 中、产出字数是否达到 TODO 中的字数下限、TODO 是否已勾选，
+    以及（提供 linter 时）正文文件是否新增了禁用词 / 禁用句式。
+    提供 duplicates 时检查新增段落是否与已有归档近似重复；重复只作提示（不计分、不阻塞合并）。
+    章末截断任务另外按章比较 base / head，要求改动都在章末窗口内、且不超出任务标题中的章节范围。
+    """
+    checks: List[tuple[str, Optional[bool], str]] = []
+    flags: List[tuple[str, str]] = []
+    changed = [f.get("path", "") for f in pr.get("files") or [] if isinstance(f, dict)]
+    head = pr.get("headRefName")
+    base = pr.get("baseRefName")
+    blobs: Dict[tuple[str, str], str] = {}
+
+    def fetch(path: str, ref: Optional[str]) -> str:
+        if not ref:
+            return ""
+        if (path, ref) not in blobs:
+            blobs[(path, ref)] = github.get_file_text(path, ref) or ""
+        return blobs[(path, ref)]
+
+    # 1. 产出文件
+    produced: List[str] = []
+    if spec.outputs:
+        for output in spec.outputs:
+            hits = _match_output(output, changed)
+            produced.extend(hits)
+            checks.append(("产出文件", bool(hits), f"`{output}`" + ("" if hits else " 未出现在 PR 中")))
+    else:
+        produced = [path for path in changed if path.startswith("archives/") and path.endswith(".md")]
+        checks.append(("产出归档", bool(produced), f"PR 修改了 {len(produced)} 个 archives/ 文件"))
+
+    # 2. 字数下限：新增字数 = head 版本字数 - base 版本字数；总字数只看 head 版本
+    if (spec.min_chars or spec.min_total_chars) and produced:
+        if not head:
+            checks.append(("字数", None, "PR 缺少分支信息，跳过"))
+        else:
+            try:
+                added = total = 0
+                for path in dict.fromkeys(produced):
+                    new_count = count_chinese_chars(fetch(path, head))
+                    total += new_count
+                    if spec.min_chars:
+                        added += max(0, new_count - count_chinese_chars(fetch(path, base)))
+                if spec.min_chars:
+                    checks.append(("字数", added >= spec.min_chars, f"新增 {added} 字 / 要求 ≥{spec.min_chars} 字"))
+                if spec.min_total_chars:
+                    checks.append(("总字数", total >= spec.min_total_chars, f"{total} 字 / 要求 ≥{spec.min_total_chars} 字"))
+            except Exception as e:
+                checks.append(("字数", None, f"拉取文件失败，跳过: {e}"))
+
+    # 3. 去AI味：只统计本次新增的禁用词 / 禁用句式，历史遗留问题不阻塞合并
+    manuscripts = [path for path in dict.fromkeys(changed) if path.startswith("archives/") and classify(path).get("kind")]
+    if linter and manuscripts:
+        if not head:
+            checks.append(("去AI味", None, "PR 缺少分支信息，跳过"))
+        else:
+            try:
+                added_hits: Counter = Counter()
+                for path in manuscripts:
+                    added_hits += linter.added_errors(fetch(path, head), fetch(path, base))
+                detail = "未新增禁用词" if not added_hits else "新增禁用词/句式: " + "、".join(
+                    f"{phrase}×{count}" for phrase, count in added_hits.most_common()
+                )
+                checks.append(("去AI味", not added_hits, detail))
+            except Exception as e:
+                checks.append(("去AI味", None, f"拉取文件失败，跳过: {e}"))
+
+    # 4. 近似重复段落：与已有归档或本次提交内的其他段落对比
+    if duplicates and manuscripts and head:
         try:
-            # 查询所有已关闭的 Issues
-            issues = github.list_closed_issues(limit)
-            if not issues:
-                logger.debug("未从 GitHub 获取到已关闭的 Issue")
-                return set()
+            hits = []
+            for path in manuscripts:
+                hits.extend(duplicates.check(path, fetch(path, head), fetch(path, base)))
+            if not hits:
+                checks.append(("重复段落", True, "未发现与已有归档近似重复的段落"))
+            else:
+                shown = "；".join(hit.describe() for hit in hits[:DUPLICATE_REPORT_LIMIT])
+                more = f" 等 {len(hits)} 处" if len(hits) > DUPLICATE_REPORT_LIMIT else ""
+                checks.append(("重复段落", None, f"疑似重复{more}：{shown}"))
+                flags.append(("重复段落", f"疑似重复{more}：{shown}"))
+        except Exception as e:
+            checks.append(("重复段落", None, f"拉取文件失败，跳过: {e}"))
 
-            completed = set()
-            for issue in issues:
-                if not isinstance(issue, dict):
-                    continue
-                title = issue.get("title", "")
-                if not title:
+    # 5. 改动范围：章末截断只允许改章末（整段删掉的结尾不限长度，窗口从截断点起算）；新建的文件（工作副本）不受限制
+    if spec.ending_only and manuscripts and head:
+        try:
+            problems: List[str] = []
+            summaries: List[str] = []
+            for path in manuscripts:
+                old_text = fetch(path, base)
+                if not old_text:
                     continue
-                match = re.search(r"\[([^\]]+?)\]", title)
-                if match:
-                    todo_id = match.group(1).strip()
-                    if todo_id:
-                        completed.add(todo_id)
-
-            if completed:
-                logger.info(f"从 GitHub 获取到 {len(completed)} 个最近完成的任务记录")
+                report = diff_file(old_text, fetch(path, head))
+                summaries.append(f"`{path}` {report.summary()}")
+                for chapter in report.chapters:
+                    if chapter.status != "modified":
+                        problems.append(f"{chapter.label}{'新增' if chapter.status == 'added' else '删除'}整章")
+                    elif chapter.outside_ending:
+                        anchor = "截断点" if chapter.truncated else "章末"
+                        problems.append(f"{chapter.label}改动距{anchor} {chapter.first_offset} 字")
+                    elif spec.chapter_range and chapter.number is not None and not (
+                            spec.chapter_range[0] <= chapter.number <= spec.chapter_range[1]):
+                        problems.append(f"{chapter.label}不在本组 第{spec.chapter_range[0]}-{spec.chapter_range[1]}章 内")
+            if not summaries:
+                checks.append(("章末范围", None, "未修改已有正文文件，跳过"))
+            elif problems:
+                shown = "；".join(problems[:SCOPE_REPORT_LIMIT])
+                more = f" 等 {len(problems)} 处" if len(problems) > SCOPE_REPORT_LIMIT else ""
+                checks.append(("章末范围", False, f"改动越界{more}：{shown}"))
             else:
-                logger.debug("未从 GitHub 获取到已完成的任务记录")
-            return completed
-        except json.JSONDecodeError as e:
-            logger.warning(f"解析 Issue 列表失败: {e}")
-            return set()
+                checks.append(("章末范围", True, f"改动均在章末 {ENDING_WINDOW} 字内；" + "；".join(summaries)))
         except Exception as e:
-            logger.warning(f"获取已完成任务失败: {e}")
-            return set()
+            checks.append(("章末范围", None, f"拉取文件失败，跳过: {e}"))
+
+    # 6. TODO 勾选：使用分片时勾选分片或主文件均可
+    todo_files = list(dict.fromkeys([*spec.todo_shards.values(), spec.todo_file]))
+    if not any(path in changed for path in todo_files):
+        checks.append(("TODO 勾选", False, f"PR 未修改 `{'` / `'.join(todo_files)}`"))
+    elif not head:
+        checks.append(("TODO 勾选", None, "PR 缺少分支信息，跳过"))
+    else:
+        try:
+            unchecked = []
+            for todo_id in spec.todo_ids:
+                ticked = re.compile(rf"^###\s+-\s*\[[xX]\]\s+\[{re.escape(todo_id)}\]", re.MULTILINE)
+                files = [path for path in (spec.todo_shards.get(todo_id), spec.todo_file) if path and path in changed]
+                if not any(ticked.search(fetch(path, head)) for path in files):
+                    unchecked.append(todo_id)
+            detail = "已勾选" if not unchecked else f"未勾选: {', '.join(unchecked)}"
+            checks.append(("TODO 勾选", not unchecked, detail))
+        except Exception as e:
+            checks.append(("TODO 勾选", None, f"拉取文件失败，跳过: {e}"))
 
-    def run(self, items: Iterable[WorkItem]) -> None:
-        items_list = items if isinstance(items, list) else list(items)
-        total = len(items_list)
-        logger.info(f"\n{'='*80}")
-        logger.info(f"工作队列统计")
-        logger.info(f"{'='*80}")
-        logger.info(f"待处理工作项总数: {total}")
-        if total == 0:
-            logger.info("✓ 所有 TODO 已完成，无需进一步操作。")
-            return
+    return ValidationReport(checks, flags)
 
-        # 按 Stage 分组统计
-        stage_counts = {}
-        for item in items_list:
-            stage_counts[item.stage_number] = stage_counts.get(item.stage_number, 0) + 1
-        for stage, count in sorted(stage_counts.items()):
-            logger.info(f"  Stage {stage:02d}: {count} 个任务")
-        logger.info(f"{'='*80}\n")
+# ==================== 自适应超时 ====================
 
-        max_task_retries = max(1, self.args.task_max_retries)
-        base_retry_wait = max(1, self.args.task_retry_wait)
+EXPERT_PATTERN = re.compile(r"\*\*责任专家\*\*\s*[:：]\s*([A-Z]{2,})")
+# 任务 ID 末尾的序号段（001、C01）不区分任务类别
+ID_SEQUENCE_SEGMENT = re.compile(r"\d+|C\d+")
+ID_VOLUME_SEGMENT = re.compile(r"V\d+")
 
-        failed_items = []  # 记录失败的任务
 
-        for i, item in enumerate(items_list, 1):
-            logger.info(f"\n{'='*80}")
-            logger.info(f"📋 进度: {i}/{total} ({i*100//total}%)")
-            logger.info(f"🔖 工作项: {item.id_full}")
-            logger.info(f"📝 标题: {item.title}")
-            if item.is_batch:
-                logger.info(f"📦 批次: {item.batch_index}/{item.batch_total} (包含 {len(item.todos)} 个子任务)")
-            logger.info(f"{'='*80}")
+def task_classes(item: WorkItem) -> List[str]:
+    """任务类别，由细到粗：ID 前缀 → 去掉卷号的前缀 → 责任专家 → Stage
 
-            # 任务级重试机制
-            for attempt in range(1, max_task_retries + 1):
-                try:
-                    issue_num = self._ensure_issue(item)
-                    if not self.args.dry_run:
-                        self._wait_and_merge(item, issue_num)
-                    logger.info(f"\n✓ [{i}/{total}] {item.id_full} 完成\n")
-                    break  # 成功则跳出重试循环
-                except Exception as e:
-                    logger.error(f"\n✗ [{i}/{total}] {item.id_full} 失败 (尝试 {attempt}/{max_task_retries}): {e}")
-                    if attempt < max_task_retries:
-                        wait_time = base_retry_wait * (2 ** (attempt - 1))  # 指数退避: base, 2*base, 4*base, ...
-                        logger.warning(f"等待 {wait_time} 秒后重试...")
-                        time.sleep(wait_time)
-                    else:
-                        # 重试耗尽，记录失败但继续处理后续任务
-                        logger.error(f"✗✗✗ [{i}/{total}] {item.id_full} 最终失败，跳过并继续后续任务")
-                        logger.exception("详细错误信息：")
-                        failed_items.append((item.id_full, str(e)))
-                        break
+    例：S06-V01-R1-C01 → [S06-V01-R1, S06-R1, stage:06]；S03-CA-001 → [S03-CA, expert:CA, stage:03]
+    """
+    todo = item.todos[0] if item.todos else None
+    parts = (todo.id_full if todo else item.id_full).split("-")
+    while len(parts) > 1 and ID_SEQUENCE_SEGMENT.fullmatch(parts[-1]):
+        parts.pop()
+    classes = ["-".join(parts)]
+    general = [part for part in parts if not ID_VOLUME_SEGMENT.fullmatch(part)]
+    while len(general) > 1:
+        prefix = "-".join(general)
+        if prefix not in classes:
+            classes.append(prefix)
+        general.pop()
+    expert = EXPERT_PATTERN.search("".join(todo.meta_lines)) if todo else None
+    if expert:
+        classes.append(f"expert:{expert.group(1)}")
+    classes.append(f"stage:{item.stage_code}")
+    return classes
+
+
+def task_type(item: WorkItem) -> str:
+    """运行历史中的任务类型：去掉序号与卷号的 ID 前缀，如 S06-V01-R1-C01 → S06-R1、S03-CA-001 → S03-CA"""
+    todo = item.todos[0] if item.todos else None
+    parts = (todo.id_full if todo else item.id_full).split("-")
+    while len(parts) > 1 and ID_SEQUENCE_SEGMENT.fullmatch(parts[-1]):
+        parts.pop()
+    return "-".join(part for part in parts if not ID_VOLUME_SEGMENT.fullmatch(part))
+
+
+class TimeoutModel:
+    """按任务类别学习各阶段耗时，超时取 P95 × 余量并限制在上下限内
+
+    阶段 wait_pr：分配 Copilot（或重置后重新分配）到新 PR 出现；阶段 work：PR 出现到
+    copilot_work_finished，且只记录通过预检、被接受的 PR。只记录成功完成的阶段耗时；样本不足的类别依次回退到更粗的类别，最后回退到固定常量。
+    """
 
-        # 所有任务处理完后，报告失败的任务
-        if failed_items:
-            logger.error(f"\n{'='*80}")
-            logger.error(f"⚠️  有 {len(failed_items)} 个任务最终失败：")
-            for task_id, error in failed_items:
-                logger.error(f"  - {task_id}: {error}")
-            logger.error(f"{'='*80}\n")
-            logger.error("请手动处理失败的任务，然后重新运行脚本")
+    DEFAULTS = {"wait_pr": PR_WAIT_TIMEOUT, "work": PR_TIMEOUT}
+    BOUNDS = {"wait_pr": (PR_WAIT_TIMEOUT_FLOOR, PR_WAIT_TIMEOUT * 2), "work": (PR_TIMEOUT_FLOOR, PR_TIMEOUT_CEILING)}
 
-    def _ensure_issue(self, item: WorkItem) -> int:
-        if self.args.dry_run:
-            logger.info(f"[DRY RUN] 创建 Issue: {item.title}")
-            return 0
+    def __init__(self, path: Path, enabled: bool = True) -> None:
+        self.path = path
+        self.enabled = enabled
+        self.samples: Dict[str, Dict[str, List[float]]] = {}
+        self._lock = threading.Lock()
+        try:
+            self.samples = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取超时统计失败，将重新学习: {e}")
+
+    def record(self, classes: List[str], phase: str, seconds: float) -> None:
+        with self._lock:
+            for name in classes:
+                series = self.samples.setdefault(name, {}).setdefault(phase, [])
+                series.append(round(seconds, 1))
+                del series[:-TIMEOUT_MAX_SAMPLES]
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_name(self.path.name + ".tmp")
+                tmp.write_text(json.dumps(self.samples, ensure_ascii=False), encoding="utf-8")
+                tmp.replace(self.path)
+            except OSError as e:
+                logger.warning(f"保存超时统计失败: {e}")
+
+    def estimate(self, classes: List[str], phase: str) -> Optional[tuple[float, str]]:
+        """返回最细的有足够样本的类别的 P95 耗时 (秒数, 类别)，没有则返回 None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            for name in classes:
+                series = sorted(self.samples.get(name, {}).get(phase, []))
+                if len(series) >= TIMEOUT_MIN_SAMPLES:
+                    return series[min(len(series) - 1, int(TIMEOUT_PERCENTILE * len(series)))], name
+        return None
 
-        github = self._require_github()
-        existing = github.find_issue_by_todo(item.id_full)
+    def timeout(self, classes: List[str], phase: str) -> tuple[float, str]:
+        """返回 (超时秒数, 依据)；依据为类别名或 "默认" """
+        learned = self.estimate(classes, phase)
+        if learned:
+            estimate, name = learned
+            floor, ceiling = self.BOUNDS[phase]
+            return min(ceiling, max(floor, estimate * TIMEOUT_MULTIPLIER)), name
+        return float(self.DEFAULTS[phase]), "默认"
 
-        # 尝试复用已有的 open Issue
-        if existing:
-            logger.info(f"检测到线上已有 Issue #{existing}")
-            try:
-                issue_data = github.get_issue(existing)
-                state = issue_data.get('state')
-                logger.debug(f"Issue #{existing} 状态: {state}")
+# ==================== 对冲执行 ====================
 
-                if state == "open":
-                    # Issue 是 open 状态，确保 Copilot 已分配
-                    assignees = {
-                        (assignee.get("login") or "").lower()
-                        for assignee in issue_data.get("assignees", []) if assignee
-                    }
-                    if COPILOT_USERNAME not in assignees:
-                        github.add_assignees(existing, COPILOT_ASSIGNEES)
-                        logger.info(f"✓ 已将 Issue #{existing} 重新分配给 Copilot")
-                    else:
-                        logger.debug(f"Issue #{existing} 已分配给 Copilot，直接复用")
-                    return existing
-                else:
-                    # Issue 已关闭或未知状态，创建新的
-                    logger.warning(f"Issue #{existing} 状态为 {state}，将创建新 Issue")
-            except Exception as e:
-                logger.warning(f"获取 Issue #{existing} 详情失败: {e}，将创建新 Issue")
+class HedgeRace:
+    """同一工作项的主尝试与对冲尝试之间的竞速状态
 
-        # 构建 Issue Body
-        body = self._build_body(item)
-        # 构建完整的 Issue Body（包含所有任务详情和执行指令）
-        full_body = self._build_full_issue_body(item, body)
+    两个尝试各自监控自己的 Issue；谁先拿到合并权（claim）谁合并，另一方在下一次轮询时
+    发现自己落后，关闭自己的 PR 与 Issue 后退出。合并失败时释放合并权，让对方继续竞争。
+    """
 
-        issue_num = github.create_issue(f"[{item.id_full}] {item.title}", full_body)
-        logger.info(f"创建 Issue #{issue_num}")
+    def __init__(self) -> None:
+        self.winner: Optional[int] = None  # 取得合并权的 Issue 编号
+        self.hedge_issue: Optional[int] = None
+        self.hedge_error: Optional[str] = None
+        self.hedge_done = threading.Event()
+        self._lock = threading.Lock()
 
-        # 关键：通过 Assignment 触发 Copilot（而不是评论）
-        logger.info(f"分配 Issue #{issue_num} 给 Copilot 以触发自动执行...")
-        try:
-            github.add_assignees(issue_num, COPILOT_ASSIGNEES)
-            logger.info(f"✓ 成功分配给 Copilot")
-        except Exception as e:
-            # 分配失败是严重错误，必须抛出异常
-            logger.error(f"✗ 分配 Issue #{issue_num} 给 Copilot 失败: {e}")
-            logger.error("分配失败意味着 Copilot 不会被触发，将抛出异常以触发重试")
-            raise RuntimeError(f"无法分配 Issue #{issue_num} 给 Copilot，请检查权限配置: {e}") from e
+    def claim(self, issue_num: int) -> bool:
+        with self._lock:
+            if self.winner is None:
+                self.winner = issue_num
+            return self.winner == issue_num
 
-        return issue_num
+    def release(self, issue_num: int) -> None:
+        with self._lock:
+            if self.winner == issue_num:
+                self.winner = None
 
-    def _build_body(self, item: WorkItem) -> str:
-        """构建任务详情部分（TODO 列表）"""
-        lines = [
-            "### 📋 任务详情",
-            ""
-        ]
-        for todo in item.todos:
-            lines.append(f"#### {todo.id_full} {todo.title}")
-            lines.extend(todo.meta_lines)
-            lines.append("")
-        return "\n".join(lines)
+    def beaten(self, issue_num: int) -> bool:
+        with self._lock:
+            return self.winner is not None and self.winner != issue_num
 
-    def _build_full_issue_body(self, item: WorkItem, task_details: str) -> str:
-        """构建完整的 Issue Body，包含执行指令和任务详情"""
-        try:
-            relative_path = item.file_path.relative_to(ROOT).as_posix()
-        except ValueError:
-            # 如果路径不在 ROOT 下，使用绝对路径
-            relative_path = item.file_path.as_posix()
+# ==================== 执行后端 ====================
 
-        reference_files = f"""- `.github/copilot-instructions.md`
-- `{relative_path}`
-- `Stages/Stage-{item.stage_code}_*.md`
-- `Project-Bible.md` (如不存在将自动创建)
-- `Risk-Ledger.md` (如不存在将自动创建)"""
+# 本地命令模板中的占位符；其余花括号（如命令里的字面量 {}）原样保留
+LOCAL_PLACEHOLDER_PATTERN = re.compile(r"\{(id|stage|file|title)\}")
 
-        instruction_body = ISSUE_BODY_TEMPLATE.format(
-            task_overview=f"- **文件**: `{relative_path}`\n- **任务ID**: `{item.id_full}`\n- **TODO数量**: {len(item.todos)}",
-            stage_file=relative_path,
+
+class Executor(ABC):
+    """执行后端：把一个工作项变成主分支上的交付物（含勾选 TODO）
+
+    execute() 正常返回即视为完成，失败时抛出异常，由 Pipeline.process_item 统一重试。
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def execute(self, pipeline: Pipeline, item: WorkItem) -> None:
+        ...
+
+
+class CopilotExecutor(Executor):
+    """默认后端：创建 Issue 并分配 Copilot，等待其 PR 合并"""
+
+    name = "copilot"
+
+    def execute(self, pipeline: Pipeline, item: WorkItem) -> None:
+        issue_num = pipeline._ensure_issue(item)
+        if not pipeline.args.dry_run:
+            pipeline._wait_and_merge(item, issue_num)
+
+
+class LocalExecutor(Executor):
+    """本地后端：为每个工作项启动一个命令进程，完成后在本地勾选 TODO 并提交
+
+    命令模板按 shell 规则切分后逐段替换 {id}、{stage}、{file}、{title} 占位符；
+    完整的 Issue 指令经 stdin 传入，工作项信息同时以 PIPELINE_* 环境变量提供。
+    命令在仓库根目录运行，退出码非 0 视为失败。workers 限制同时运行的命令进程数。
+    提交时只暂存 TODO 声明的产出文件、TODO 文件及其分片，并行命令的其他改动不会被带入。
+    提交只留在本地分支，不会自动推送。
+    """
+
+    name = "local"
+
+    def __init__(self, name: str, command: str, workers: int = DEFAULT_LOCAL_WORKERS,
+                 timeout: float = LOCAL_COMMAND_TIMEOUT, commit: bool = True) -> None:
+        self.name = name
+        self.argv = shlex.split(command)
+        if not self.argv:
+            raise ValueError(f"执行后端 {name} 的命令为空")
+        self.timeout = timeout
+        self.commit = commit
+        self._slots = threading.BoundedSemaphore(max(1, workers))
+        self._git_lock = threading.Lock()
+
+    def execute(self, pipeline: Pipeline, item: WorkItem) -> None:
+        try:
+            relative_path = item.file_path.relative_to(pipeline.root).as_posix()
+        except ValueError:
+            relative_path = item.file_path.as_posix()
+        fields = {"id": item.id_full, "stage": item.stage_code, "file": relative_path, "title": item.title}
+        argv = [LOCAL_PLACEHOLDER_PATTERN.sub(lambda m: fields[m.group(1)], part) for part in self.argv]
+        if pipeline.args.dry_run:
+            logger.info(f"[DRY RUN] 本地执行 ({self.name}): {shlex.join(argv)}")
+            return
+
+        env = dict(os.environ)
+        env.update({
+            "PIPELINE_ITEM_ID": item.id_full,
+            "PIPELINE_TODO_IDS": ",".join(todo.id_full for todo in item.todos),
+            "PIPELINE_STAGE": item.stage_code,
+            "PIPELINE_TODO_FILE": relative_path,
+        })
+        instructions = pipeline._build_full_issue_body(item, pipeline._build_body(item))
+
+        with self._slots:
+            started = pipeline.clock.time()
+            pipeline._track(item, phase="local", executor=self.name, started=started)
+            logger.info(f"▶ 本地执行 ({self.name}): {shlex.join(argv)}")
+            try:
+                result = subprocess.run(
+                    argv, cwd=pipeline.root, env=env, input=instructions,
+                    capture_output=True, text=True, encoding="utf-8", timeout=self.timeout,
+                )
+            except subprocess.TimeoutExpired as e:
+                raise RuntimeError(f"本地命令超时 ({self.timeout:.0f}s): {shlex.join(argv)}") from e
+            except OSError as e:
+                raise RuntimeError(f"无法启动本地命令 {argv[0]}: {e}") from e
+        if result.stdout.strip():
+            logger.debug(f"本地命令输出:\n{result.stdout.strip()[-2000:]}")
+        if result.returncode != 0:
+            raise RuntimeError(f"本地命令退出码 {result.returncode}: {result.stderr.strip()[-500:]}")
+        logger.info(f"✓ 本地命令完成 ({pipeline.clock.time() - started:.1f}s)")
+
+        with self._git_lock:
+            pipeline._track(item, phase="committing")
+            marked = mark_todos_done(item.file_path, [todo.id_full for todo in item.todos])
+            if marked < len(item.todos):
+                logger.warning(f"{item.file_path.name} 中只勾选了 {marked}/{len(item.todos)} 个 TODO")
+            if pipeline.args.todo_shards:
+                pipeline.sync_todo_shards([item.file_path])
+            if self.commit:
+                paths = self._commit_paths(pipeline, item)
+                if paths:
+                    self._git(pipeline.root, "add", "-A", "--", *paths)
+                    self._git(pipeline.root, "commit", "-q", "-m", f"[{item.id_full}] {item.title}", "--", *paths)
+                    logger.info(f"✓ 已提交 [{item.id_full}]: {len(paths)} 个文件")
+                else:
+                    logger.warning(f"[{item.id_full}] 没有可提交的改动")
+
+        try:
+            pipeline.corpus.refresh()
+            for line in pipeline.corpus.progress_lines():
+                logger.info(f"📊 {line}")
+        except Exception as e:
+            logger.warning(f"更新字数统计失败: {e}")
+
+    def _commit_paths(self, pipeline: Pipeline, item: WorkItem) -> List[str]:
+        """本工作项应提交的改动：TODO 声明的产出、TODO 文件与其分片目录（相对仓库根目录）"""
+        spec = parse_deliverable_spec(item, pipeline.root)
+        changed = self._git(pipeline.root, "ls-files", "-z", "--modified", "--deleted", "--others",
+                            "--exclude-standard").split("\0")
+        owned_dir = None
+        if pipeline.args.todo_shards:
+            try:
+                owned_dir = shard_dir(pipeline.todo_root, item.file_path).relative_to(pipeline.root).as_posix() + "/"
+            except ValueError:
+                pass
+        paths = []
+        for path in dict.fromkeys(filter(None, changed)):
+            if (path == spec.todo_file or (owned_dir and path.startswith(owned_dir))
+                    or any(_match_output(pattern, [path]) for pattern in spec.outputs)):
+                paths.append(path)
+        if not spec.outputs:
+            logger.warning(f"[{item.id_full}] 的 TODO 未声明产出文件，只提交 TODO 勾选")
+        return paths
+
+    @staticmethod
+    def _git(root: Path, *args: str) -> str:
+        result = subprocess.run(["git", *args], cwd=root, capture_output=True, text=True, encoding="utf-8")
+        if result.returncode != 0:
+            raise RuntimeError(f"git {args[0]} 失败: {(result.stderr or result.stdout).strip()}")
+        return result.stdout
+
+
+@dataclass
+class ExecutorRoute:
+    """路由规则：ID 通配（匹配工作项或其任一 TODO 的 ID）与 Stage 同时给出时须同时满足"""
+    executor: str
+    pattern: Optional[str] = None
+    stage: Optional[int] = None
+
+    def matches(self, item: WorkItem) -> bool:
+        if self.stage is not None and item.stage_number != self.stage:
+            return False
+        if self.pattern is not None:
+            ids = [item.id_full] + [todo.id_full for todo in item.todos]
+            return any(fnmatch.fnmatchcase(todo_id, self.pattern) for todo_id in ids)
+        return True
+
+
+class ExecutorRouter:
+    """按路由规则为工作项选择执行后端，第一条匹配的规则生效，否则使用默认后端"""
+
+    def __init__(self, executors: Optional[Dict[str, Executor]] = None,
+                 routes: Optional[List[ExecutorRoute]] = None, default: str = CopilotExecutor.name) -> None:
+        self.executors: Dict[str, Executor] = {CopilotExecutor.name: CopilotExecutor()}
+        self.executors.update(executors or {})
+        self.routes = routes or []
+        for name in [default] + [route.executor for route in self.routes]:
+            if name not in self.executors:
+                raise ValueError(f"未定义的执行后端: {name}")
+        self.default = self.executors[default]
+
+    def route(self, item: WorkItem) -> Executor:
+        for route in self.routes:
+            if route.matches(item):
+                return self.executors[route.executor]
+        return self.default
+
+    @classmethod
+    def from_file(cls, path: Optional[Path]) -> ExecutorRouter:
+        """读取执行后端配置（JSON）；path 为空时所有工作项都走 Copilot
+
+        {
+          "default": "copilot",
+          "executors": {"gen": {"type": "local", "command": "python tools/gen.py {id}", "workers": 4}},
+          "routes": [{"match": "S03-CA-*", "executor": "gen"}, {"stage": 1, "executor": "gen"}]
+        }
+        """
+        if path is None:
+            return cls()
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            raise ValueError(f"读取执行后端配置失败 {path}: {e}") from e
+
+        executors: Dict[str, Executor] = {}
+        for name, spec in (data.get("executors") or {}).items():
+            kind = spec.get("type", "local")
+            if kind == CopilotExecutor.name:
+                executors[name] = CopilotExecutor()
+            elif kind == LocalExecutor.name:
+                if not spec.get("command"):
+                    raise ValueError(f"执行后端 {name} 缺少 command")
+                executors[name] = LocalExecutor(
+                    name, spec["command"],
+                    workers=int(spec.get("workers", DEFAULT_LOCAL_WORKERS)),
+                    timeout=float(spec.get("timeout", LOCAL_COMMAND_TIMEOUT)),
+                    commit=bool(spec.get("commit", True)),
+                )
+            else:
+                raise ValueError(f"执行后端 {name} 的类型未知: {kind}")
+
+        routes = []
+        for entry in data.get("routes") or []:
+            if not entry.get("executor") or ("match" not in entry and "stage" not in entry):
+                raise ValueError(f"路由规则需要 executor 以及 match 或 stage: {entry}")
+            stage = entry.get("stage")
+            routes.append(ExecutorRoute(entry["executor"], entry.get("match"), int(stage) if stage is not None else None))
+        return cls(executors, routes, data.get("default", CopilotExecutor.name))
+
+# ==================== 多主机租约 ====================
+
+# process_item 的返回值：工作项由其他主机认领，本机跳过（不计为失败）
+CLAIMED_ELSEWHERE = "由其他主机认领"
+
+class LeaseLost(RuntimeError):
+    """工作项的租约已过期并被其他主机接管"""
+
+
+class LeaseStore(ABC):
+    """工作项租约：多台主机运行 Pipeline 时，同一工作项同时只由一台主机处理
+
+    acquire 成功后由 Pipeline 每 1/3 有效期调用一次 heartbeat 续约；主机退出或宕机后租约过期，
+    其他主机可以接管（复用已有的 Issue 继续监控）。过期判断依赖各主机的时钟大致同步。
+    """
+
+    def __init__(self, owner: str, ttl: float, clock: Clock) -> None:
+        self.owner = owner
+        self.ttl = ttl
+        self.clock = clock
+        self._held: set[str] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def held(self) -> set[str]:
+        with self._lock:
+            return set(self._held)
+
+    @abstractmethod
+    def acquire(self, key: str) -> bool:
+        """认领租约；键已由其他主机持有且未过期时返回 False"""
+
+    @abstractmethod
+    def heartbeat(self) -> set[str]:
+        """续约本机持有的全部租约，返回已被其他主机接管的键"""
+
+    @abstractmethod
+    def release(self, key: str, done: bool = False) -> None:
+        """释放租约；done=True 时保留记录直到自然过期，避免其他主机在看到 TODO 勾选前重复处理"""
+
+
+class FileLeaseStore(LeaseStore):
+    """本地文件租约：JSON 文件 + flock，适用于共享文件系统上的多主机或单机测试"""
+
+    def __init__(self, path: Path, owner: str, ttl: float, clock: Clock) -> None:
+        super().__init__(owner, ttl, clock)
+        self.path = path
+
+    @contextmanager
+    def _leases(self):
+        import fcntl  # 仅类 Unix 系统可用，按需导入
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    leases = json.loads(self.path.read_text(encoding="utf-8"))
+                except (FileNotFoundError, ValueError):
+                    leases = {}
+                yield leases
+                tmp = self.path.with_name(self.path.name + ".tmp")
+                tmp.write_text(json.dumps(leases, ensure_ascii=False, indent=2), encoding="utf-8")
+                tmp.replace(self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def acquire(self, key: str) -> bool:
+        now = self.clock.time()
+        with self._lock, self._leases() as leases:
+            lease = leases.get(key)
+            if lease and lease["owner"] != self.owner and lease["expires"] > now:
+                return False
+            leases[key] = {"owner": self.owner, "expires": now + self.ttl}
+            self._held.add(key)
+            return True
+
+    def heartbeat(self) -> set[str]:
+        now = self.clock.time()
+        lost = set()
+        with self._lock, self._leases() as leases:
+            for key in self._held:
+                lease = leases.get(key)
+                if lease and lease["owner"] != self.owner and lease["expires"] > now:
+                    lost.add(key)
+                else:
+                    leases[key] = {"owner": self.owner, "expires": now + self.ttl}
+            self._held -= lost
+        return lost
+
+    def release(self, key: str, done: bool = False) -> None:
+        now = self.clock.time()
+        with self._lock, self._leases() as leases:
+            for other in [k for k, lease in leases.items() if lease["expires"] <= now]:
+                del leases[other]
+            if not done and leases.get(key, {}).get("owner") == self.owner:
+                del leases[key]
+            self._held.discard(key)
+
+
+class GitHubLeaseStore(LeaseStore):
+    """GitHub 租约：仓库中一个协调 Issue，每台主机维护其中一条评论，记录自己持有的租约
+
+    评论内容为 {键: [认领时间, 过期时间]}。认领时先写入自己的评论再读回全部评论，同一个键
+    存在多个未过期租约时，认领时间最早者（相同则主机名较小者）胜出，失败方撤回；每次续约也按
+    同一规则复核，因此即便两台主机同时认领，最迟在下一次续约时也会只剩一方。
+    """
+
+    def __init__(self, github: GitHubClient, owner: str, ttl: float, clock: Clock) -> None:
+        super().__init__(owner, ttl, clock)
+        self.github = github
+        self._issue: Optional[int] = None
+        self._comment: Optional[int] = None
+        self._mine: Dict[str, List[float]] = {}
+
+    def _coordination_issue(self) -> int:
+        if self._issue is None:
+            issues = [
+                issue["number"] for issue in self.github.list_open_issues()
+                if (issue.get("title") or "").startswith(LEASE_ISSUE_TITLE)
+            ]
+            if not issues:
+                self.github.create_issue(LEASE_ISSUE_TITLE, "Pipeline 多主机租约协调 Issue，请勿关闭或编辑评论。")
+                # 两台主机可能同时创建，重新列出后统一取编号最小的一个
+                issues = [
+                    issue["number"] for issue in self.github.list_open_issues()
+                    if (issue.get("title") or "").startswith(LEASE_ISSUE_TITLE)
+                ]
+            self._issue = min(issues)
+        return self._issue
+
+    def _snapshot(self) -> Dict[str, Dict[str, List[float]]]:
+        """读取全部主机的租约：{主机: {键: [认领时间, 过期时间]}}"""
+        hosts: Dict[str, Dict[str, List[float]]] = {}
+        for comment in self.github.list_comments(self._coordination_issue()):
+            body = comment.get("body") or ""
+            if not body.startswith(LEASE_COMMENT_MARKER):
+                continue
+            try:
+                data = json.loads(body[len(LEASE_COMMENT_MARKER):])
+            except ValueError:
+                continue
+            if data.get("owner") == self.owner:
+                self._comment = comment.get("id")
+            hosts[data.get("owner", "")] = data.get("leases") or {}
+        return hosts
+
+    def _publish(self) -> None:
+        now = self.clock.time()
+        self._mine = {key: lease for key, lease in self._mine.items() if key in self._held or lease[1] > now}
+        body = LEASE_COMMENT_MARKER + json.dumps({"owner": self.owner, "leases": self._mine}, ensure_ascii=False)
+        if self._comment is None:
+            self._comment = self.github.create_comment(self._coordination_issue(), body)
+        else:
+            self.github.update_comment(self._comment, body)
+
+    def _winner(self, hosts: Dict[str, Dict[str, List[float]]], key: str, now: float) -> Optional[str]:
+        claims = [(lease[0], owner) for owner, leases in hosts.items()
+                  for lease_key, lease in leases.items() if lease_key == key and lease[1] > now]
+        return min(claims)[1] if claims else None
+
+    def acquire(self, key: str) -> bool:
+        with self._lock:
+            now = self.clock.time()
+            hosts = self._snapshot()
+            hosts.pop(self.owner, None)
+            if self._winner(hosts, key, now) is not None:
+                return False
+            self._mine[key] = [now, now + self.ttl]
+            self._publish()
+            if self._winner(self._snapshot(), key, now) != self.owner:
+                del self._mine[key]
+                self._publish()
+                return False
+            self._held.add(key)
+            return True
+
+    def heartbeat(self) -> set[str]:
+        with self._lock:
+            if not self._held:
+                return set()
+            now = self.clock.time()
+            hosts = self._snapshot()
+            lost = {key for key in self._held if self._winner(hosts, key, now) not in (None, self.owner)}
+            for key in self._held - lost:
+                self._mine[key] = [self._mine.get(key, [now])[0], now + self.ttl]
+            for key in lost:
+                self._mine.pop(key, None)
+            self._held -= lost
+            self._publish()
+            return lost
+
+    def release(self, key: str, done: bool = False) -> None:
+        with self._lock:
+            self._held.discard(key)
+            if done:
+                return  # 不再续约，记录留在评论中直到过期
+            if self._mine.pop(key, None) is not None:
+                self._publish()
+
+
+def open_lease_store(args: argparse.Namespace, github: Optional[GitHubClient], root: Path,
+                     clock: Clock) -> Optional[LeaseStore]:
+    """按 --lease-store 创建租约存储；未启用、dry-run 或离线时返回 None"""
+    if args.lease_store == "none" or args.dry_run or args.offline:
+        return None
+    owner = args.host_id or f"{socket.gethostname()}:{os.getpid()}"
+    if args.lease_store == "github":
+        if github is None:
+            raise ValueError("GitHub 租约需要可用的 GitHub 客户端")
+        return GitHubLeaseStore(github, owner, args.lease_ttl, clock)
+    return FileLeaseStore(args.lease_file or root / ".pipeline" / "leases.json", owner, args.lease_ttl, clock)
+
+# ==================== 死信队列 ====================
+
+@dataclass
+class DeadLetter:
+    item: str
+    stage: int
+    title: str
+    error: str
+    attempts: int
+    failed_at: float
+    repo: str
+
+
+class DeadLetterQueue:
+    """重试耗尽的工作项
+
+    持久化到 .pipeline/dead_letters.json（flock 保护，命令行与运行中的 Pipeline 可同时读写）。
+    队列中的工作项及其（传递）后续任务在之后的扫描中暂缓执行，重放（移出队列）后由下一轮扫描重新派发。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _letters(self, write: bool = False):
+        import fcntl  # 仅类 Unix 系统可用，按需导入
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.path.with_name(self.path.name + ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    letters = json.loads(self.path.read_text(encoding="utf-8"))
+                except FileNotFoundError:
+                    letters = {}
+                except ValueError as e:
+                    logger.warning(f"死信队列文件损坏，按空队列处理: {e}")
+                    letters = {}
+                yield letters
+                if write:
+                    tmp = self.path.with_name(self.path.name + ".tmp")
+                    tmp.write_text(json.dumps(letters, ensure_ascii=False, indent=2), encoding="utf-8")
+                    tmp.replace(self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, letter: DeadLetter) -> None:
+        with self._letters(write=True) as letters:
+            letters[letter.item] = asdict(letter)
+
+    def entries(self) -> List[DeadLetter]:
+        if not self.path.exists():
+            return []
+        with self._letters() as letters:
+            return sorted((DeadLetter(**entry) for entry in letters.values()), key=lambda letter: letter.failed_at)
+
+    def ids(self) -> set[str]:
+        return {letter.item for letter in self.entries()}
+
+    def replay(self, item_ids: Optional[Iterable[str]] = None) -> List[DeadLetter]:
+        """移出指定工作项（None 为全部），返回被移出的条目"""
+        if not self.path.exists():
+            return []
+        with self._letters(write=True) as letters:
+            keys = list(letters) if item_ids is None else [key for key in item_ids if key in letters]
+            return [DeadLetter(**letters.pop(key)) for key in keys]
+
+# ==================== Pipeline ====================
+
+class Pipeline:
+    def __init__(self, github: Optional[GitHubClient], args: argparse.Namespace,
+                 root: Path = ROOT, todo_root: Optional[Path] = None, name: Optional[str] = None,
+                 hedge_slots: Optional[threading.Semaphore] = None,
+                 concurrency: Optional[ConcurrencyController] = None) -> None:
+        self.github = github
+        self.args = args
+        self.root = root
+        self.todo_root = todo_root or root / "todo"
+        self.name = name or (github.repo_ref if github else root.name)
+        self.clock = github.clock if github else Clock()
+        if github is not None:
+            # 只读请求的复用不超过半个轮询间隔：同一轮询内的重复读取被合并，下一轮总能看到新状态
+            github.memo_ttl = min(GH_MEMO_TTL, args.poll_interval / 2)
+        # 字数统计、章节索引、Markdown 索引、重复段落索引、运行历史与死信队列在首次使用时才加载
+        # （见同名属性），dry-run 与只读命令不会读取整个 archives/ 或写入 .pipeline/
+        self._loaded: Dict[str, Any] = {}
+        self._lazy_lock = threading.Lock()
+        # 按任务类别学习的超时（--fixed-timeouts 时始终使用固定常量）
+        self.timeouts = TimeoutModel(root / ".pipeline" / "timeouts.json", enabled=not args.fixed_timeouts)
+        # 合并前的去AI味检查，规则可通过 --lint-rules 自定义
+        self.linter = None if args.no_lint else ProseLinter.from_file(args.lint_rules)
+        # 按 ID / Stage 选择执行后端（默认全部走 Copilot）
+        self.executors = ExecutorRouter.from_file(args.executors)
+        # 多主机租约（--lease-store），以及被其他主机接管、需要放弃的工作项
+        self.leases = open_lease_store(args, github, root, self.clock)
+        self._lost_leases: set[str] = set()
+        self._lease_keeper: Optional[threading.Thread] = None
+        # 对冲执行的名额（守护进程中由所有仓库共享），未启用 --hedge 时为 None
+        if args.hedge:
+            self.hedge_slots = hedge_slots or threading.BoundedSemaphore(max(1, args.max_hedges))
+        else:
+            self.hedge_slots = None
+        # AIMD 并发自适应（--auto-concurrency，守护进程中由所有仓库共享），未启用时为 None
+        self.concurrency = concurrency
+        if concurrency is None and args.auto_concurrency:
+            self.concurrency = ConcurrencyController(args.min_concurrency, args.max_concurrency,
+                                                     budget=github.budget if github else None, clock=self.clock)
+        # 工作项的累计统计（重试、重置、对冲、API 调用与阶段耗时），写入历史后清除
+        self._run_stats: Dict[str, Dict[str, Any]] = {}
+        # 在途工作项的监控状态（供守护进程 status 查询），以及待执行的强制重置请求；progress 的读写均需持有 _lock
+        self.progress: Dict[str, Dict[str, Any]] = {}
+        self._reset_requests: set[str] = set()
+        # 开放 Issue 映射：TODO ID -> {"number", "assignees"}；每轮调度前批量刷新，为 None 时逐项搜索
+        self._open_issues: Optional[Dict[str, dict]] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # ---------- 按需加载的索引与记录 ----------
+
+    def _lazy(self, name: str, factory: Callable[[], Any]) -> Any:
+        """首次访问时创建对象；factory 返回 None（未启用或打开失败）时同样只尝试一次"""
+        with self._lazy_lock:
+            if name not in self._loaded:
+                self._loaded[name] = factory()
+            return self._loaded[name]
+
+    @property
+    def corpus(self) -> CorpusStats:
+        """archives/ 增量字数统计，合并后只重算 PR 改动的文件"""
+        return self._lazy("corpus", lambda: CorpusStats(self.root, clock=self.clock.time))
+
+    @property
+    def chapters(self) -> ChapterStore:
+        """正文章节索引，用于在 Issue 中嵌入上一章结尾"""
+        return self._lazy("chapters", lambda: ChapterStore(self.root))
+
+    @property
+    def documents(self) -> MarkdownIndex:
+        """Stages / 总账 / 归档的 Markdown 标题树，用于按小节取 Issue 上下文"""
+        return self._lazy("documents", lambda: MarkdownIndex(self.root))
+
+    @property
+    def duplicates(self) -> Optional[DuplicateIndex]:
+        """近似重复段落索引：合并前检查新增段落，合并后增量更新；--no-dup-check 时为 None"""
+        if self.args.no_dup_check:
+            return None
+        return self._lazy("duplicates", lambda: DuplicateIndex(self.root, clock=self.clock.time))
+
+    @property
+    def history(self) -> Optional[RunHistory]:
+        """运行历史：每个完成 / 最终失败的工作项追加一条记录（tools/run_history.py 汇总）"""
+        if self.args.no_history or self.args.dry_run:
+            return None
+        return self._lazy("history", self._open_history)
+
+    def _open_history(self) -> Optional[RunHistory]:
+        try:
+            return RunHistory(self.args.history or self.root / ".pipeline" / HISTORY_NAME)
+        except Exception as e:
+            logger.warning(f"打开运行历史失败，本次不记录: {e}")
+            return None
+
+    @property
+    def dead_letters(self) -> DeadLetterQueue:
+        """重试耗尽的工作项，后续扫描时暂缓执行，直到通过 --replay-dead-letters / ctl replay 重放"""
+        return self._lazy("dead_letters", lambda: DeadLetterQueue(self.root / ".pipeline" / DEAD_LETTER_NAME))
+
+    def request_reset(self, item_id: str) -> None:
+        """请求强制重置在途工作项，由其监控循环在下一次轮询时执行"""
+        with self._lock:
+            self._reset_requests.add(item_id)
+
+    def _take_reset_request(self, item_id: str) -> bool:
+        with self._lock:
+            if item_id in self._reset_requests:
+                self._reset_requests.discard(item_id)
+                return True
+            return False
+
+    def refresh_open_issues(self) -> None:
+        """列出全部开放 Issue，建立 TODO ID -> Issue 映射，已在映射中的工作项不再单独搜索"""
+        if not self.github:
+            return
+        try:
+            issues = self.github.list_open_issues()
+        except Exception as e:
+            logger.warning(f"列出开放 Issue 失败，本轮将逐项搜索: {e}")
+            with self._lock:
+                self._open_issues = None
+            return
+        mapping: Dict[str, dict] = {}
+        # 同一 TODO 有多个开放 Issue（如对冲尝试）时取编号最小的一个
+        for issue in sorted(issues, key=lambda issue: issue.get("number") or 0):
+            match = ISSUE_ID_PATTERN.search(issue.get("title") or "")
+            if not match or not isinstance(issue.get("number"), int):
+                continue
+            assignees = {(assignee.get("login") or "").lower() for assignee in issue.get("assignees") or [] if assignee}
+            mapping.setdefault(match.group(1).strip(), {"number": issue["number"], "assignees": assignees})
+        with self._lock:
+            self._open_issues = mapping
+        logger.info(f"开放 Issue: {len(issues)} 个，其中 {len(mapping)} 个对应 TODO")
+
+    def _remember_issue(self, todo_id: str, issue_num: int, assignees: Iterable[str]) -> None:
+        with self._lock:
+            if self._open_issues is not None:
+                self._open_issues[todo_id] = {"number": issue_num, "assignees": set(assignees)}
+
+    def _forget_issue(self, todo_id: str, issue_num: Optional[int] = None) -> None:
+        """Issue 已关闭：从开放 Issue 映射中移除（issue_num 为空时不校验编号）"""
+        with self._lock:
+            if self._open_issues is None:
+                return
+            entry = self._open_issues.get(todo_id)
+            if entry and (issue_num is None or entry["number"] == issue_num):
+                del self._open_issues[todo_id]
+
+    def _lease_key(self, item: WorkItem) -> str:
+        return f"{self.name}/{item.id_full}"
+
+    def _start_lease_keeper(self) -> None:
+        """后台线程每 1/3 有效期续约一次；被接管的工作项由其监控循环在下一次轮询时放弃"""
+        with self._lock:
+            if self._lease_keeper is not None:
+                return
+            self._lease_keeper = threading.Thread(target=self._keep_leases, name="lease-keeper", daemon=True)
+        self._lease_keeper.start()
+
+    def _keep_leases(self) -> None:
+        prefix = f"{self.name}/"
+        while True:
+            self.clock.sleep(max(1.0, self.leases.ttl / 3))
+            try:
+                lost = self.leases.heartbeat()
+            except Exception as e:
+                logger.warning(f"租约续约失败（下次重试）: {e}")
+                continue
+            if lost:
+                logger.warning(f"租约已被其他主机接管: {', '.join(sorted(lost))}")
+                with self._lock:
+                    self._lost_leases.update(key[len(prefix):] for key in lost if key.startswith(prefix))
+
+    def _check_lease(self, item: WorkItem) -> None:
+        with self._lock:
+            if item.id_full in self._lost_leases:
+                raise LeaseLost(f"{item.id_full} 的租约已被其他主机接管")
+
+    def _stats(self, item: WorkItem) -> Dict[str, Any]:
+        """工作项的累计统计（跨越各次尝试），调用方需持有 self._lock"""
+        return self._run_stats.setdefault(
+            item.id_full,
+            {"started": self.clock.time(), "attempts": 0, "resets": 0, "hedged": False, "api_calls": 0, "phases": {}},
+        )
+
+    def _record_phase(self, item: WorkItem, classes: List[str], phase: str, seconds: float) -> None:
+        """记录阶段耗时：供超时模型学习，同时累计到工作项的运行历史"""
+        self.timeouts.record(classes, phase, seconds)
+        hedge = getattr(self._local, "hedge", False)
+        with self._lock:
+            phases = self._stats(item)["phases"]
+            if phase == "total":
+                phases[phase] = seconds  # 取最终合并的那次尝试
+            elif not hedge:
+                phases[phase] = phases.get(phase, 0.0) + seconds
+        if phase == "wait_pr" and not hedge and self.concurrency is not None:
+            self.concurrency.wait_pr(seconds)
+
+    def _end_attempt(self, item: WorkItem) -> None:
+        """一次尝试结束：清除监控状态，把本次的重置次数计入统计"""
+        with self._lock:
+            entry = self.progress.pop(item.id_full, None) or {}
+            self._stats(item)["resets"] += entry.get("resets") or 0
+        if self.concurrency is not None:
+            self.concurrency.attempt_ended(entry.get("resets") or 0)
+
+    def _record_history(self, item: WorkItem, executor: Executor, error: Optional[str]) -> None:
+        with self._lock:
+            stats = self._run_stats.pop(item.id_full, None) or {}
+        history = self.history
+        if history is None:
+            return
+        classes = task_classes(item)
+        expert = next((name[len("expert:"):] for name in classes if name.startswith("expert:")), None)
+        phases = stats.get("phases", {})
+        finished = self.clock.time()
+        started = stats.get("started", finished)
+        try:
+            history.append(RunRecord(
+                repo=self.name,
+                item=item.id_full,
+                stage=item.stage_number,
+                expert=expert,
+                task_type=task_type(item),
+                executor=executor.name,
+                outcome="success" if error is None else "failed",
+                error=error,
+                started=started,
+                finished=finished,
+                attempts=stats.get("attempts", 1),
+                resets=stats.get("resets", 0),
+                hedged=stats.get("hedged", False),
+                api_calls=stats.get("api_calls", 0),
+                wait_pr=phases.get("wait_pr"),
+                work=phases.get("work"),
+                total=phases.get("total"),
+                elapsed=finished - started,
+            ))
+        except Exception as e:
+            logger.warning(f"写入运行历史失败: {e}")
+
+    def _track(self, item: WorkItem, **fields: Any) -> None:
+        # 对冲线程的状态挂在主尝试条目的 hedge 字段下
+        hedge = getattr(self._local, "hedge", False)
+        with self._lock:
+            entry = self.progress.setdefault(item.id_full, {})
+            if hedge:
+                entry = entry.setdefault("hedge", {})
+            entry.update(fields)
+
+    def progress_of(self, item_id: str) -> Dict[str, Any]:
+        """工作项监控状态的深拷贝：嵌套的 hedge 字段仍在被对冲线程修改，不能共享给其他线程序列化"""
+        with self._lock:
+            return copy.deepcopy(self.progress.get(item_id, {}))
+
+    def _require_github(self) -> GitHubClient:
+        if not self.github:
+            raise RuntimeError("GitHub 客户端不可用，无法执行在线操作。请移除 --dry-run 或正确配置 gh CLI。")
+        return self.github
+
+    def get_recent_completed_todos(self, limit: int = 1000) -> set[str]:
+        """获取最近已完成的 TODO ID 集合，用于自动跳过
+
+        注意：此方法依赖 GitHub API，如果需要更快的启动速度，
+        可以考虑将进度缓存到本地文件（如 .pipeline_progress.json）
+        """
+        if not self.github:
+            logger.debug("跳过远程进度扫描：当前为 dry-run 或 GitHub 未配置")
+            return set()
+
+        github = self._require_github()
+
+        try:
+            # 查询所有已关闭的 Issues
+            issues = github.list_closed_issues(limit)
+            if not issues:
+                logger.debug("未从 GitHub 获取到已关闭的 Issue")
+                return set()
+
+            completed = completed_ids_from_issues(issues)
+            if completed:
+                logger.info(f"从 GitHub 获取到 {len(completed)} 个最近完成的任务记录")
+            else:
+                logger.debug("未从 GitHub 获取到已完成的任务记录")
+            return completed
+        except json.JSONDecodeError as e:
+            logger.warning(f"解析 Issue 列表失败: {e}")
+            return set()
+        except Exception as e:
+            logger.warning(f"获取已完成任务失败: {e}")
+            return set()
+
+    def run(self, items: Iterable[WorkItem], completed_ids: Optional[set[str]] = None) -> List[tuple[str, str]]:
+        """处理一轮工作项，返回最终失败的 (工作项 ID, 错误信息) 列表
+
+        completed_ids 为扫描时使用的已完成集合；本轮执行中 TODO 计划变化时据此重新扫描。
+        """
+        items_list = items if isinstance(items, list) else list(items)
+        total = len(items_list)
+        logger.info(f"\n{'='*80}")
+        logger.info("工作队列统计")
+        logger.info(f"{'='*80}")
+        logger.info(f"待处理工作项总数: {total}")
+        if total == 0:
+            logger.info("✓ 所有 TODO 已完成，无需进一步操作。")
+            return []
+
+        # 按 Stage 分组统计
+        stage_counts = {}
+        for item in items_list:
+            stage_counts[item.stage_number] = stage_counts.get(item.stage_number, 0) + 1
+        for stage, count in sorted(stage_counts.items()):
+            logger.info(f"  Stage {stage:02d}: {count} 个任务")
+        # dry-run 只预览队列：不扫描 archives/，也不刷新 .pipeline/ 下的缓存
+        if not self.args.dry_run:
+            try:
+                self.corpus.refresh()
+                for line in self.corpus.report_lines():
+                    logger.info(line)
+            except Exception as e:
+                logger.warning(f"统计 archives/ 字数失败: {e}")
+            if self.duplicates is not None:
+                try:
+                    self.duplicates.refresh()
+                except Exception as e:
+                    logger.warning(f"更新重复段落索引失败: {e}")
+        logger.info(f"{'='*80}\n")
+
+        self.refresh_open_issues()
+        lane = Lane(self, items_list, completed_ids=completed_ids)
+        Scheduler([lane], max_in_flight=self.args.max_concurrency, clock=self.clock,
+                  controller=self.concurrency).run()
+        if lane.claimed_elsewhere:
+            logger.info(f"⏭ {len(lane.claimed_elsewhere)} 个任务由其他主机处理或等待其前置任务")
+            if len(lane.claimed_elsewhere) == total:
+                # 本轮全部由其他主机处理，等待一个轮询间隔，避免空转反复认领
+                self.clock.sleep(self.args.poll_interval)
+
+        if lane.failed:
+            buried = len(lane.failed) - len(lane.blocked)
+            logger.error(f"⚠️  本轮 {buried} 个任务重试耗尽，已移入死信队列"
+                         + (f"；{len(lane.blocked)} 个后续任务因前置失败未执行" if lane.blocked else ""))
+            logger.error("使用 --dead-letters 查看，处理后用 --replay-dead-letters 重新执行")
+        return lane.failed
+
+    def process_item(self, item: WorkItem, label: str, attempt: int = 1, final: bool = True) -> Optional[str]:
+        """执行工作项的一次尝试
+
+        失败后的重试由调度器安排：失败项进入延迟重试队列，等待期间继续派发其他工作项。
+
+        Args:
+            item: 工作项
+            label: 日志中的进度标签，如 "3/12"
+            attempt: 本次尝试的序号（从 1 开始）
+            final: 是否为最后一次尝试；最后一次失败或成功时写入运行历史
+
+        Returns:
+            成功返回 None；失败返回本次的错误信息
+        """
+        max_task_retries = max(attempt, self.args.task_max_retries)
+        logger.info(f"\n{'='*80}")
+        logger.info(f"📋 进度: {label}")
+        logger.info(f"🔖 工作项: {item.id_full}")
+        logger.info(f"📝 标题: {item.title}")
+        if item.is_batch:
+            logger.info(f"📦 批次: {item.batch_index}/{item.batch_total} (包含 {len(item.todos)} 个子任务)")
+        if attempt > 1:
+            logger.info(f"🔁 重试: 第 {attempt}/{max_task_retries} 次尝试")
+        logger.info(f"{'='*80}")
+
+        executor = self.executors.route(item)
+        if executor.name != CopilotExecutor.name:
+            logger.info(f"⚙ 执行后端: {executor.name}")
+
+        if self.leases is not None:
+            if not self.leases.acquire(self._lease_key(item)):
+                logger.info(f"⏭ {item.id_full} 已由其他主机认领，跳过")
+                with self._lock:
+                    self._run_stats.pop(item.id_full, None)
+                return CLAIMED_ELSEWHERE
+            self._start_lease_keeper()
+        error: Optional[str] = CLAIMED_ELSEWHERE
+        calls = self.github.thread_calls if self.github else 0
+        try:
+            error = self._attempt_item(item, label, executor, attempt, max_task_retries, final)
+            with self._lock:
+                self._stats(item)["api_calls"] += (self.github.thread_calls if self.github else 0) - calls
+            if error is None or (final and error != CLAIMED_ELSEWHERE):
+                self._record_history(item, executor, error)
+            return error
+        finally:
+            if error is None or final or error == CLAIMED_ELSEWHERE:
+                with self._lock:
+                    self._run_stats.pop(item.id_full, None)
+            if self.leases is not None:
+                with self._lock:
+                    self._lost_leases.discard(item.id_full)
+                try:
+                    self.leases.release(self._lease_key(item), done=error is None)
+                except Exception as e:
+                    logger.warning(f"释放 {item.id_full} 的租约失败（将自然过期）: {e}")
+
+    def _attempt_item(self, item: WorkItem, label: str, executor: Executor,
+                      attempt: int, max_task_retries: int, final: bool) -> Optional[str]:
+        with self._lock:
+            self._stats(item)["attempts"] = attempt
+        try:
+            executor.execute(self, item)
+            self._forget_issue(item.id_full)
+            logger.info(f"\n✓ [{label}] {item.id_full} 完成\n")
+            self._end_attempt(item)
+            return None
+        except LeaseLost as e:
+            self._end_attempt(item)
+            logger.warning(f"⏭ {e}，停止本机处理")
+            return CLAIMED_ELSEWHERE
+        except Exception as e:
+            self._end_attempt(item)
+            logger.error(f"\n✗ [{label}] {item.id_full} 失败 (尝试 {attempt}/{max_task_retries}): {e}")
+            if final:
+                # 重试耗尽：移入死信队列，继续处理后续任务
+                logger.error(f"✗✗✗ [{label}] {item.id_full} 最终失败，移入死信队列并继续后续任务")
+                logger.exception("详细错误信息：")
+                self.bury(item, str(e), attempt)
+            return str(e)
+
+    def retry_delay(self, attempt: int) -> float:
+        """第 attempt 次尝试失败后的重试等待：指数退避 base, 2*base, 4*base, ...，再乘以随机抖动"""
+        delay = max(1, self.args.task_retry_wait) * (2 ** (attempt - 1))
+        return delay * random.uniform(1 - TASK_RETRY_JITTER, 1.0)
+
+    def bury(self, item: WorkItem, error: str, attempts: int) -> None:
+        """把重试耗尽的工作项写入死信队列"""
+        try:
+            self.dead_letters.add(DeadLetter(
+                item=item.id_full, stage=item.stage_number, title=item.title, error=error,
+                attempts=attempts, failed_at=self.clock.time(), repo=self.name,
+            ))
+        except Exception as e:
+            logger.warning(f"写入死信队列失败: {e}")
+
+    def scan(self, completed_ids: set[str]) -> List[WorkItem]:
+        """扫描 TODO 得到本轮工作项：先同步分片（--todo-shards），再去掉死信队列中的工作项"""
+        if self.args.todo_shards and not self.args.dry_run:
+            self.sync_todo_shards()
+        items = iter_work_items(self.todo_root, self.args.issue_batch_size, completed_ids)
+        return self.hold_dead_letters(items)
+
+    def sync_todo_shards(self, masters: Optional[Iterable[Path]] = None) -> None:
+        """把分片中的勾选回写到主文件，并按主文件更新分片"""
+        try:
+            report = sync_shards(self.todo_root, masters)
+        except OSError as e:
+            logger.warning(f"同步 TODO 分片失败: {e}")
+            return
+        for name, ids in report.reconciled.items():
+            logger.info(f"☑ {name}: 从分片回写勾选" + (f" {', '.join(ids)}" if ids else "（操作步骤）"))
+        if report.written or report.removed:
+            logger.info(f"TODO 分片: 更新 {len(report.written)} 个，删除 {len(report.removed)} 个"
+                        f"（需提交并推送后 Copilot 才能读到）")
+
+    def todo_shard_files(self, item: WorkItem) -> Dict[str, str]:
+        """工作项各 TODO 的分片文件（相对仓库根目录）；未启用 --todo-shards 或分片缺失时为空"""
+        if not self.args.todo_shards:
+            return {}
+        shards = {}
+        for todo in item.todos:
+            path = shard_path(self.todo_root, todo.file_path, todo.id_full)
+            if not path.exists():
+                return {}
+            try:
+                shards[todo.id_full] = path.relative_to(self.root).as_posix()
+            except ValueError:
+                shards[todo.id_full] = path.as_posix()
+        return shards
+
+    def hold_dead_letters(self, items: List[WorkItem]) -> List[WorkItem]:
+        """去掉死信队列中的工作项及（传递）依赖它们的网格任务"""
+        try:
+            dead = self.dead_letters.ids()
+        except Exception as e:
+            logger.warning(f"读取死信队列失败，本轮不做过滤: {e}")
+            return items
+        if not dead:
+            return items
+        held = held_by(items, dead)
+        if held:
+            logger.warning(f"☠ 死信队列中的 {len(held)} 个任务（含后续任务）本轮暂缓，"
+                           f"使用 --dead-letters 查看，--replay-dead-letters 重新执行")
+        return [item for item in items if item.id_full not in held]
+
+    def _ensure_issue(self, item: WorkItem) -> int:
+        if self.args.dry_run:
+            logger.info(f"[DRY RUN] 创建 Issue: {item.title}")
+            return 0
+
+        github = self._require_github()
+        with self._lock:
+            known = self._open_issues.get(item.id_full) if self._open_issues is not None else None
+        existing = known["number"] if known else None
+        if not known:
+            # 映射是本轮开始时的快照：轮中由他人（人工 / 其他主机）新开的 Issue 不在其中，创建前再搜索一次
+            existing = github.find_issue_by_todo(item.id_full)
+
+        # 尝试复用已有的 open Issue
+        if existing:
+            logger.info(f"检测到线上已有 Issue #{existing}")
+            try:
+                if known:
+                    # 来自本轮的开放 Issue 列表，无需再单独查询
+                    state, assignees = "open", known["assignees"]
+                else:
+                    issue_data = github.get_issue(existing)
+                    state = issue_data.get('state')
+                    assignees = {
+                        (assignee.get("login") or "").lower()
+                        for assignee in issue_data.get("assignees", []) if assignee
+                    }
+                logger.debug(f"Issue #{existing} 状态: {state}")
+
+                if state == "open":
+                    # Issue 是 open 状态，确保 Copilot 已分配
+                    if COPILOT_USERNAME not in assignees:
+                        github.add_assignees(existing, COPILOT_ASSIGNEES)
+                        logger.info(f"✓ 已将 Issue #{existing} 重新分配给 Copilot")
+                        self._remember_issue(item.id_full, existing, assignees | {COPILOT_USERNAME})
+                    else:
+                        logger.debug(f"Issue #{existing} 已分配给 Copilot，直接复用")
+                    return existing
+                else:
+                    # Issue 已关闭或未知状态，创建新的
+                    logger.warning(f"Issue #{existing} 状态为 {state}，将创建新 Issue")
+            except Exception as e:
+                logger.warning(f"获取 Issue #{existing} 详情失败: {e}，将创建新 Issue")
+
+        # 构建 Issue Body
+        body = self._build_body(item)
+        # 构建完整的 Issue Body（包含所有任务详情和执行指令）
+        full_body = self._build_full_issue_body(item, body)
+
+        issue_num = github.create_issue(f"[{item.id_full}] {item.title}", full_body)
+        logger.info(f"创建 Issue #{issue_num}")
+
+        # 关键：通过 Assignment 触发 Copilot（而不是评论）
+        logger.info(f"分配 Issue #{issue_num} 给 Copilot 以触发自动执行...")
+        try:
+            github.add_assignees(issue_num, COPILOT_ASSIGNEES)
+            logger.info("✓ 成功分配给 Copilot")
+            self._remember_issue(item.id_full, issue_num, {COPILOT_USERNAME})
+        except Exception as e:
+            # 分配失败是严重错误，必须抛出异常
+            logger.error(f"✗ 分配 Issue #{issue_num} 给 Copilot 失败: {e}")
+            logger.error("分配失败意味着 Copilot 不会被触发，将抛出异常以触发重试")
+            raise RuntimeError(f"无法分配 Issue #{issue_num} 给 Copilot，请检查权限配置: {e}") from e
+
+        return issue_num
+
+    def _build_body(self, item: WorkItem) -> str:
+        """构建任务详情部分（TODO 列表）"""
+        lines = [
+            "### 📋 任务详情",
+            ""
+        ]
+        for todo in item.todos:
+            lines.append(f"#### {todo.id_full} {todo.title}")
+            lines.extend(todo.meta_lines)
+            lines.append("")
+        return "\n".join(lines)
+
+    def _build_full_issue_body(self, item: WorkItem, task_details: str) -> str:
+        """构建完整的 Issue Body，包含执行指令和任务详情"""
+        try:
+            relative_path = item.file_path.relative_to(self.root).as_posix()
+        except ValueError:
+            # 如果路径不在仓库根目录下，使用绝对路径
+            relative_path = item.file_path.as_posix()
+
+        # 启用分片时指向每个 TODO 的分片文件，不必读入整份主文件
+        shards = self.todo_shard_files(item)
+        todo_file = "`、`".join(shards.values()) if shards else relative_path
+        overview = f"- **文件**: `{todo_file}`"
+        if shards:
+            overview += f"\n- **主文件**: `{relative_path}`（无需读取；分片中的勾选由流水线同步回主文件）"
+
+        reference_files = f"""- `.github/copilot-instructions.md`
+- `{todo_file}`
+- `Stages/Stage-{item.stage_code}_*.md`
+- `Project-Bible.md` (如不存在将自动创建)
+- `Risk-Ledger.md` (如不存在将自动创建)"""
+
+        instruction_body = ISSUE_BODY_TEMPLATE.format(
+            task_overview=f"{overview}\n- **任务ID**: `{item.id_full}`\n- **TODO数量**: {len(item.todos)}",
+            stage_file=todo_file,
             stage_code=item.stage_code,
             plural="s" if item.is_batch else "",
             reference_files=reference_files
         )
 
-        return f"{instruction_body}\n\n---\n\n{task_details}"
+        sections = [instruction_body, self._stage_criteria(item), self._previous_tail(item),
+                    self._style_notes(item), task_details]
+        return "\n\n---\n\n".join(section for section in sections if section)
+
+    @staticmethod
+    def _chapter_targets(item: WorkItem) -> List[tuple[int, Optional[tuple[int, int]]]]:
+        """工作项涉及的 (卷号, 章节范围)；标题中没有范围时章节范围为 None"""
+        targets = []
+        for todo in item.todos:
+            volume = VOLUME_ID_PATTERN.search(todo.id_full)
+            if volume:
+                chapters = CHAPTER_RANGE_PATTERN.search(todo.title)
+                span = (int(chapters.group(1)), int(chapters.group(2))) if chapters else None
+                targets.append((int(volume.group(1)), span))
+        return targets
+
+    def _stage_criteria(self, item: WorkItem) -> str:
+        """附上 Stage 指南中的验收标准小节，交付前可逐条自查"""
+        guides = sorted((self.root / "Stages").glob(f"Stage-{item.stage_code}_*.md"))
+        if not guides:
+            return ""
+        rel = guides[0].relative_to(self.root).as_posix()
+        try:
+            criteria = self.documents.section(rel, "验收标准")
+            self.documents.save()
+        except OSError as e:
+            logger.warning(f"读取 {rel} 的验收标准失败: {e}")
+            return ""
+        if not criteria:
+            return ""
+        if len(criteria) > STAGE_CRITERIA_MAX_CHARS:
+            criteria = criteria[:STAGE_CRITERIA_MAX_CHARS].rstrip() + f"\n\n……（完整内容见 `{rel}`）"
+        return f"## ✅ 阶段验收标准（摘自 `{rel}`）\n\n{criteria}"
+
+    def _previous_tail(self, item: WorkItem) -> str:
+        """按章节范围工作的任务附上范围前一章的结尾，便于章首接戏"""
+        starts = sorted((volume, span[0]) for volume, span in self._chapter_targets(item) if span)
+        if not starts:
+            return ""
+        try:
+            self.chapters.refresh()
+        except OSError as e:
+            logger.warning(f"刷新章节索引失败: {e}")
+            return ""
+        volume, first = starts[0]
+        # 取本阶段之前（含本阶段）最新的正文
+        for stage in range(item.stage_number, 3, -1):
+            previous = self.chapters.previous(volume, first, stage=stage)
+            if previous is None:
+                continue
+            tail = self.chapters.tail(*previous, chars=PREVIOUS_TAIL_CHARS, stage=stage)
+            if tail:
+                quoted = "\n".join(f"> {line}" if line else ">" for line in tail.splitlines())
+                return (
+                    f"## 📖 上一章结尾（卷{previous[0]} 第{previous[1]:03d}章，Stage {stage:02d} 最后 {PREVIOUS_TAIL_CHARS} 字）\n\n"
+                    f"本组第一章的开头必须无缝衔接以下内容，不能“归零开局”：\n\n{quoted}"
+                )
+        return ""
+
+    def _style_notes(self, item: WorkItem) -> str:
+        """Stage-05/06 任务附上 tools/style_metrics.py 标记的异常章节，便于定向修改"""
+        if item.stage_number not in (5, 6):
+            return ""
+        try:
+            data = json.loads((self.root / ".pipeline" / "style-flags.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return ""
+
+        targets = self._chapter_targets(item)
+        flagged = [
+            entry for entry in data.get("chapters", [])
+            if entry.get("stage", 0) < item.stage_number and any(
+                entry.get("volume") == volume and (span is None or span[0] <= entry.get("chapter", 0) <= span[1])
+                for volume, span in targets
+            )
+        ]
+        if not flagged:
+            return ""
+        # 只取任务之前最新一个阶段的正文
+        latest = max(entry["stage"] for entry in flagged)
+        flagged = [entry for entry in flagged if entry["stage"] == latest]
+        lines = [
+            "## 📐 文风指标预警（请优先处理）",
+            "",
+            f"`tools/style_metrics.py` 对 Stage {latest:02d} 正文的统计显示，以下章节明显偏离全书分布：",
+            "",
+        ]
+        for entry in flagged[:MAX_STYLE_NOTES]:
+            lines.append(f"- 卷{entry['volume']} 第{entry['chapter']:03d}章（`{entry['path']}`）：{'；'.join(entry['reasons'])}")
+        if len(flagged) > MAX_STYLE_NOTES:
+            lines.append(f"- ……另有 {len(flagged) - MAX_STYLE_NOTES} 章，见 `.pipeline/style-flags.json`")
+        return "\n".join(lines)
 
     def _wait_and_merge(self, item: WorkItem, issue_num: int) -> None:
         if self.args.dry_run:
             return
 
+        race = HedgeRace() if self.hedge_slots else None
+        try:
+            self._monitor_issue(item, issue_num, race)
+        except Exception as e:
+            if race is None or race.hedge_issue is None:
+                raise
+            # 主尝试失败，但对冲尝试仍可能成功
+            logger.warning(f"Issue #{issue_num} 失败，等待对冲 Issue #{race.hedge_issue} 的结果: {e}")
+            race.hedge_done.wait()
+            if race.hedge_error is not None:
+                raise
+            self._close_attempt(self._require_github(), issue_num, None, race.hedge_issue)
+            logger.info(f"✓ 对冲 Issue #{race.hedge_issue} 已完成 {item.id_full}")
+            return
+        if race is not None and race.hedge_issue is not None:
+            # 等对冲线程收尾（落后时自行关闭，领先时完成合并），工作项的结果与统计才完整
+            race.hedge_done.wait()
+            if race.beaten(issue_num) and race.hedge_error is not None:
+                raise RuntimeError(f"对冲 Issue #{race.hedge_issue} 合并失败: {race.hedge_error}")
+
+    def _monitor_issue(self, item: WorkItem, issue_num: int,
+                       race: Optional[HedgeRace] = None, hedge: bool = False) -> None:
+        """监控单个 Issue 直到其 PR 合并；race 不为空时与另一尝试竞速，hedge 表示本身是对冲尝试"""
         github = self._require_github()
         reset_count = 0
 
-        issue_start_time = time.time()
+        issue_start_time = self.clock.time()
         wait_start_time = issue_start_time
+        assigned_at = issue_start_time  # 最近一次分配 Copilot 的时间，wait_pr 样本从这里计时
+        retired_prs: set[int] = set()  # 本次监控已放弃的 PR，重置后时间线上仍可能排在最后
         pr_create_time = None
         current_pr = None
         last_heartbeat = issue_start_time
 
-        logger.info(f"开始监控 Issue #{issue_num}，PR 超时 {PR_TIMEOUT/3600:.1f}h，最大重置 {DEFAULT_MAX_PR_RESETS} 次")
+        classes = task_classes(item)
+        wait_timeout, wait_basis = self.timeouts.timeout(classes, "wait_pr")
+        pr_timeout, pr_basis = self.timeouts.timeout(classes, "work")
+        last_update: Optional[str] = None  # PR 的 updatedAt，变化即视为仍在推进
+        last_activity = issue_start_time
+        # 主尝试超过该类任务 P95 总耗时后开启对冲
+        learned_total = self.timeouts.estimate(classes, "total") if race and not hedge else None
+        hedge_after = learned_total[0] if learned_total else None
+
+        logger.info(
+            f"开始监控 Issue #{issue_num}，等待 PR 超时 {wait_timeout/60:.0f}min ({wait_basis})，"
+            f"PR 超时 {pr_timeout/3600:.1f}h ({pr_basis})，最大重置 {DEFAULT_MAX_PR_RESETS} 次"
+        )
+        self._track(item, issue=issue_num, pr=None, phase="waiting_pr", resets=0, started=issue_start_time)
 
         while True:
-            elapsed_total = time.time() - issue_start_time
+            elapsed_total = self.clock.time() - issue_start_time
 
             # 检查总超时：防止 Issue 卡死无限等待
             if elapsed_total >= self.args.issue_max_wait:
                 raise RuntimeError(f"Issue #{issue_num} 总超时 ({self.args.issue_max_wait/3600:.1f}h)")
 
+            self._check_lease(item)
+
+            if race is not None:
+                # 另一尝试已先行合并：关闭本尝试后退出
+                if race.beaten(issue_num):
+                    self._close_attempt(github, issue_num, current_pr, race.winner)
+                    return
+                if hedge_after is not None and race.hedge_issue is None and elapsed_total > hedge_after:
+                    if self._start_hedge(item, issue_num, race):
+                        hedge_after = None
+
             # 检查 Issue 是否已关闭
             try:
                 issue_data = github.get_issue(issue_num)
@@ -937,12 +2949,32 @@ class Pipeline:
                 if issue_state == "closed":
                     # 警告：Issue 被关闭但可能 PR 未合并，记录日志
                     logger.info(f"✓ Issue #{issue_num} 已关闭")
+                    self._forget_issue(item.id_full, issue_num)
                     if not current_pr:
                         logger.warning(f"警告：Issue #{issue_num} 已关闭但未检测到关联的 PR")
                     return
             except Exception as e:
                 logger.warning(f"获取 Issue 状态失败 (将重试): {e}")
-                time.sleep(RETRY_SLEEP_SHORT)
+                self.clock.sleep(RETRY_SLEEP_SHORT)
+                continue
+
+            # 守护进程控制指令：强制重置（不计入自动重置次数）
+            if self._take_reset_request(item.id_full):
+                logger.warning(f"🎛 收到强制重置指令，重置 Issue #{issue_num}")
+                if current_pr:
+                    try:
+                        github.comment_issue(current_pr, f"🎛 **人工强制重置**\n\n已关闭此 PR 并重新触发 Issue #{issue_num}。")
+                        github.close_pr(current_pr, delete_branch=True)
+                    except Exception as e:
+                        logger.warning(f"关闭 PR #{current_pr} 失败（继续执行重置）: {e}")
+                if current_pr:
+                    retired_prs.add(current_pr)
+                assigned_at = self._reset_issue(github, issue_num) or assigned_at
+                current_pr = None
+                pr_create_time = None
+                wait_start_time = self.clock.time()
+                self._track(item, pr=None, phase="waiting_pr")
+                self.clock.sleep(RESET_WAIT_TIME)
                 continue
 
             # 获取最新 PR
@@ -950,31 +2982,39 @@ class Pipeline:
                 pr_num = github.latest_pr_from_timeline(issue_num)
             except Exception as e:
                 logger.warning(f"获取 PR 失败: {e}")
-                time.sleep(RETRY_SLEEP_SHORT)
+                self.clock.sleep(RETRY_SLEEP_SHORT)
                 continue
 
+            if pr_num in retired_prs:
+                pr_num = None
+
             # 修复：如果长时间没有 PR 创建，触发重置
             if not pr_num:
-                elapsed_since_start = time.time() - wait_start_time
-                if elapsed_since_start > PR_WAIT_TIMEOUT:
+                elapsed_since_start = self.clock.time() - wait_start_time
+                if elapsed_since_start > wait_timeout:
                     if reset_count >= DEFAULT_MAX_PR_RESETS:
                         raise RuntimeError(
-                            f"等待 PR 创建超时 ({PR_WAIT_TIMEOUT/60:.1f}min)，"
+                            f"等待 PR 创建超时 ({wait_timeout/60:.1f}min)，"
                             f"且重置次数已达上限 ({DEFAULT_MAX_PR_RESETS})，Issue #{issue_num} 需要人工介入"
                         )
 
                     logger.warning(f"等待 PR 创建超时 ({elapsed_since_start/60:.1f}min)，触发重置 (第 {reset_count + 1}/{DEFAULT_MAX_PR_RESETS} 次)")
-                    self._reset_issue(github, issue_num)
+                    assigned_at = self._reset_issue(github, issue_num) or assigned_at
                     reset_count += 1
-                    wait_start_time = time.time()  # 仅重置 PR 等待计时器
-                    time.sleep(RESET_WAIT_TIME)
+                    self._track(item, resets=reset_count, pr=None, phase="waiting_pr")
+                    wait_start_time = self.clock.time()  # 仅重置 PR 等待计时器
+                    self.clock.sleep(RESET_WAIT_TIME)
                     continue
 
             if pr_num:
                 # 检测到新 PR
                 if current_pr != pr_num:
                     current_pr = pr_num
-                    pr_create_time = time.time()
+                    pr_create_time = self.clock.time()
+                    last_update = None
+                    last_activity = pr_create_time
+                    self._record_phase(item, classes, "wait_pr", pr_create_time - assigned_at)
+                    self._track(item, pr=pr_num, phase="working", pr_since=pr_create_time)
                     # 注意：不重置 wait_start_time，它专门用于等待 PR 创建超时
                     logger.info(f"检测到 PR #{pr_num}")
 
@@ -983,12 +3023,20 @@ class Pipeline:
                     pr = github.get_pull(pr_num)
                 except Exception as e:
                     logger.warning(f"获取 PR 状态失败: {e}")
-                    time.sleep(RETRY_SLEEP_SHORT)
+                    self.clock.sleep(RETRY_SLEEP_SHORT)
                     continue
 
+                if pr.get("updatedAt") != last_update:
+                    last_update = pr.get("updatedAt")
+                    last_activity = self.clock.time()
+
                 # 如果已合并，完成
                 if pr.get("merged_at"):
                     logger.info(f"✓ PR #{pr_num} 已合并")
+                    if race is not None:
+                        race.claim(issue_num)
+                    self._record_phase(item, classes, "total", self.clock.time() - issue_start_time)
+                    self._record_merge(github, pr)
                     return
 
                 # 如果 PR 被外部关闭（未合并），重置
@@ -999,17 +3047,54 @@ class Pipeline:
 
                     # 注意：reset_count 从 0 开始，所以这是第 (reset_count + 1) 次重置
                     logger.warning(f"重置流程 (第 {reset_count + 1}/{DEFAULT_MAX_PR_RESETS} 次)")
-                    self._reset_issue(github, issue_num)
+                    retired_prs.add(pr_num)
+                    assigned_at = self._reset_issue(github, issue_num) or assigned_at
                     reset_count += 1
+                    self._track(item, resets=reset_count, pr=None, phase="waiting_pr")
                     current_pr = None
                     pr_create_time = None
-                    wait_start_time = time.time()  # 关键修复：重置等待计时器
-                    time.sleep(RESET_WAIT_TIME)
+                    wait_start_time = self.clock.time()  # 关键修复：重置等待计时器
+                    self.clock.sleep(RESET_WAIT_TIME)
                     continue
 
                 # 条件1：检测到完成信号，立即标记为 ready 并合并 PR
                 if check_copilot_signal(github, pr_num):
-                    logger.info(f"✓ 检测到 copilot_work_finished 信号")
+                    logger.info("✓ 检测到 copilot_work_finished 信号")
+                    finished_at = self.clock.time()
+
+                    # 合并前预检交付物，不合格则带着问题清单定向重置
+                    if not self.args.no_validate:
+                        self._track(item, phase="validating")
+                        report = validate_pull(github, parse_deliverable_spec(item, self.root, self.todo_shard_files(item)), pr,
+                                               self.linter, self.duplicates)
+                        if not report.passed(self.args.validation_min_score):
+                            logger.warning(f"✗ PR #{pr_num} 交付物预检未通过 (得分 {report.score:.0%})")
+                            for name, ok, detail in report.checks:
+                                if ok is False:
+                                    logger.warning(f"  - {name}: {detail}")
+                            if reset_count >= DEFAULT_MAX_PR_RESETS:
+                                raise RuntimeError(f"交付物预检未通过且重置次数已达上限 ({DEFAULT_MAX_PR_RESETS})，Issue #{issue_num} 需要人工介入")
+                            logger.warning(f"定向重置流程 (第 {reset_count + 1}/{DEFAULT_MAX_PR_RESETS} 次)")
+                            retired_prs.add(pr_num)
+                            assigned_at = self._reject_pull(github, issue_num, pr_num, report, reset_count) or assigned_at
+                            reset_count += 1
+                            self._track(item, resets=reset_count, pr=None, phase="waiting_pr")
+                            current_pr = None
+                            pr_create_time = None
+                            wait_start_time = self.clock.time()
+                            self.clock.sleep(RESET_WAIT_TIME)
+                            continue
+                        logger.info(f"✓ 交付物预检通过 (得分 {report.score:.0%})")
+                        self._flag_duplicates(github, pr_num, report)
+
+                    # 只从被接受的 PR 学习 work 耗时，被驳回的交付不代表正常完成
+                    if pr_create_time:
+                        self._record_phase(item, classes, "work", finished_at - pr_create_time)
+
+                    if race is not None and not race.claim(issue_num):
+                        self._close_attempt(github, issue_num, current_pr, race.winner)
+                        return
+                    self._track(item, phase="merging")
 
                     # 关键修复：无论当前状态如何，都尝试标记为 ready
                     # 因为 Copilot 完成后 PR 可能处于 "ready for review" 状态
@@ -1018,7 +3103,7 @@ class Pipeline:
                     try:
                         github.mark_pr_ready(pr_num)
                         logger.info(f"✓ 已将 PR #{pr_num} 标记为 Ready")
-                        time.sleep(PR_READY_WAIT)
+                        self.clock.sleep(PR_READY_WAIT)
                     except Exception as e:
                         # 如果 PR 已经是 ready 状态，命令可能会失败，这是正常的
                         logger.debug(f"标记 Ready 时出现异常（可能 PR 已是 Ready 状态）: {e}")
@@ -1026,6 +3111,8 @@ class Pipeline:
                     try:
                         github.merge_pull(pr_num)
                         logger.info(f"✓ PR #{pr_num} 合并成功")
+                        self._record_phase(item, classes, "total", self.clock.time() - issue_start_time)
+                        self._record_merge(github, pr)
                         return
                     except Exception as e:
                         # 再次确认是否已合并
@@ -1033,12 +3120,18 @@ class Pipeline:
                             pr_status = github.get_pull(pr_num)
                             if pr_status.get("merged_at"):
                                 logger.info(f"✓ PR #{pr_num} 已合并")
+                                self._record_phase(item, classes, "total", self.clock.time() - issue_start_time)
+                                self._record_merge(github, pr)
                                 return
                         except Exception:
                             pass
+                        if race is not None:
+                            race.release(issue_num)
 
                         # 合并失败，检查是否可以重置
                         logger.error(f"合并 PR #{pr_num} 失败: {e}")
+                        if self.concurrency is not None and any(marker in str(e).lower() for marker in MERGE_CONFLICT_MARKERS):
+                            self.concurrency.congestion(f"PR #{pr_num} 合并冲突")
                         if reset_count >= DEFAULT_MAX_PR_RESETS:
                             raise RuntimeError(f"合并失败且重置次数已达上限 ({DEFAULT_MAX_PR_RESETS})，Issue #{issue_num} 需要人工介入: {e}") from e
 
@@ -1056,30 +3149,41 @@ class Pipeline:
                             github.close_pr(pr_num, delete_branch=True)
                         except Exception:
                             pass  # 关闭失败也继续
-                        self._reset_issue(github, issue_num)
+                        retired_prs.add(pr_num)
+                        assigned_at = self._reset_issue(github, issue_num) or assigned_at
                         reset_count += 1
+                        self._track(item, resets=reset_count, pr=None, phase="waiting_pr")
                         current_pr = None
                         pr_create_time = None
-                        wait_start_time = time.time()
-                        time.sleep(RESET_WAIT_TIME)
+                        wait_start_time = self.clock.time()
+                        self.clock.sleep(RESET_WAIT_TIME)
                         continue
 
                 # 条件2：PR 超时，重置流程
+                # 超过学习超时后，只有 PR 连续 PR_STALL_TIMEOUT 没有更新才重置；到达硬上限则无条件重置
                 if pr_create_time:
-                    elapsed = time.time() - pr_create_time
-                    if elapsed > PR_TIMEOUT:
+                    now = self.clock.time()
+                    elapsed = now - pr_create_time
+                    stalled = now - last_activity
+                    if elapsed > pr_timeout and stalled <= PR_STALL_TIMEOUT and elapsed <= PR_TIMEOUT_CEILING:
+                        if now - last_heartbeat >= HEARTBEAT_INTERVAL:
+                            logger.info(f"PR #{pr_num} 已超过 {pr_timeout/3600:.1f}h，但 {stalled/60:.0f}min 前仍有更新，继续等待")
+                    elif elapsed > pr_timeout:
                         if reset_count >= DEFAULT_MAX_PR_RESETS:
                             logger.error(f"PR #{pr_num} 超时 ({elapsed/3600:.1f}h)，已达最大重置次数")
                             raise RuntimeError(f"PR 超时且重置次数已达上限 ({DEFAULT_MAX_PR_RESETS})，Issue #{issue_num} 需要人工介入")
 
-                        logger.warning(f"PR #{pr_num} 超时 ({elapsed/3600:.1f}h / {PR_TIMEOUT/3600:.1f}h)，准备重置流程 (第 {reset_count + 1}/{DEFAULT_MAX_PR_RESETS} 次)")
+                        logger.warning(
+                            f"PR #{pr_num} 超时 ({elapsed/3600:.1f}h / {pr_timeout/3600:.1f}h，{stalled/60:.0f}min 无更新)，"
+                            f"准备重置流程 (第 {reset_count + 1}/{DEFAULT_MAX_PR_RESETS} 次)"
+                        )
 
                         # 关闭超时 PR（注意：关闭 PR 不会关闭 Issue，Issue 仍然保持 open）
                         try:
                             # 先添加评论说明超时原因，方便后期审计
                             timeout_comment = f"""🕒 **PR 超时自动关闭**
 
-Copilot 处理时间超过 {PR_TIMEOUT/3600:.1f} 小时，自动关闭此 PR。
+Copilot 处理时间超过 {pr_timeout/3600:.1f} 小时且 {stalled/60:.0f} 分钟没有更新，自动关闭此 PR。
 已触发 Issue #{issue_num} 的重置流程，Copilot 将重新处理任务。
 
 重置次数：{reset_count + 1}/{DEFAULT_MAX_PR_RESETS}
@@ -1090,44 +3194,173 @@ Copilot 处理时间超过 {PR_TIMEOUT/3600:.1f} 小时，自动关闭此 PR。
                         except Exception as e:
                             logger.warning(f"关闭 PR 失败（继续执行重置）: {e}")
 
-                        self._reset_issue(github, issue_num)
+                        retired_prs.add(pr_num)
+                        assigned_at = self._reset_issue(github, issue_num) or assigned_at
                         reset_count += 1
+                        self._track(item, resets=reset_count, pr=None, phase="waiting_pr")
                         current_pr = None
                         pr_create_time = None
-                        wait_start_time = time.time()
+                        wait_start_time = self.clock.time()
                         logger.info(f"已触发重置，等待 {RESET_WAIT_TIME} 秒后继续监控")
-                        time.sleep(RESET_WAIT_TIME)
+                        self.clock.sleep(RESET_WAIT_TIME)
                         continue
 
             # 心跳日志
-            current_time = time.time()
+            current_time = self.clock.time()
             if current_time - last_heartbeat >= HEARTBEAT_INTERVAL:
                 elapsed_mins = (current_time - issue_start_time) / 60
                 reset_suffix = f" [重置:{reset_count}/{DEFAULT_MAX_PR_RESETS}]" if reset_count > 0 else ""
 
                 if pr_num and pr_create_time:
                     pr_elapsed = (current_time - pr_create_time) / 60
-                    pr_remaining = (PR_TIMEOUT - (current_time - pr_create_time)) / 60
+                    pr_remaining = (pr_timeout - (current_time - pr_create_time)) / 60
                     indicator = "⏰" if pr_remaining < 30 else "⏳"
-                    status = f"等待信号 (PR #{pr_num}, {pr_elapsed:.0f}/{PR_TIMEOUT/60:.0f}min, 剩余{pr_remaining:.0f}min){reset_suffix} {indicator}"
+                    status = f"等待信号 (PR #{pr_num}, {pr_elapsed:.0f}/{pr_timeout/60:.0f}min, 剩余{pr_remaining:.0f}min){reset_suffix} {indicator}"
                 else:
                     wait_elapsed = (current_time - wait_start_time) / 60
-                    wait_remaining = (PR_WAIT_TIMEOUT - (current_time - wait_start_time)) / 60
-                    status = f"等待 PR ({wait_elapsed:.0f}/{PR_WAIT_TIMEOUT/60:.0f}min, 剩余{wait_remaining:.0f}min){reset_suffix}"
+                    wait_remaining = (wait_timeout - (current_time - wait_start_time)) / 60
+                    status = f"等待 PR ({wait_elapsed:.0f}/{wait_timeout/60:.0f}min, 剩余{wait_remaining:.0f}min){reset_suffix}"
 
                 logger.info(f"💓 [{elapsed_mins:.0f}min] {status}")
                 last_heartbeat = current_time
 
-            time.sleep(self.args.poll_interval)
+            self.clock.sleep(self.args.poll_interval)
+
+    def _start_hedge(self, item: WorkItem, issue_num: int, race: HedgeRace) -> bool:
+        """占用一个对冲名额并在后台线程开启对冲尝试；名额用尽时返回 False，下次轮询再试"""
+        if not self.hedge_slots.acquire(blocking=False):
+            return False
+        race.hedge_issue = 0  # 占位，防止重复开启
+        logger.info(f"🪁 Issue #{issue_num} 已超过同类任务 P95 耗时，为 {item.id_full} 开启对冲尝试")
+        threading.Thread(
+            target=self._run_hedge, args=(item, issue_num, race),
+            name=f"hedge-{item.id_full}", daemon=True,
+        ).start()
+        return True
+
+    def _run_hedge(self, item: WorkItem, primary_issue: int, race: HedgeRace) -> None:
+        """对冲尝试：为同一工作项新建 Issue 并分配 Copilot，与主尝试竞速合并"""
+        self._local.hedge = True
+        github = self._require_github()
+        hedge_issue = None
+        calls = github.thread_calls
+        with self._lock:
+            self._stats(item)["hedged"] = True
+        try:
+            body = self._build_full_issue_body(item, self._build_body(item))
+            note = (f"> 🪁 本 Issue 是 #{primary_issue} 的对冲执行：两者同时处理同一任务，"
+                    f"先合并者生效，另一方会被自动关闭。\n\n")
+            hedge_issue = github.create_issue(f"[{item.id_full}] {item.title}（对冲）", note + body)
+            race.hedge_issue = hedge_issue
+            github.add_assignees(hedge_issue, COPILOT_ASSIGNEES)
+            logger.info(f"🪁 已创建对冲 Issue #{hedge_issue} 并分配给 Copilot")
+            self._monitor_issue(item, hedge_issue, race, hedge=True)
+        except Exception as e:
+            race.hedge_error = str(e)
+            logger.warning(f"对冲尝试 {item.id_full} 失败: {e}")
+            if hedge_issue and not race.beaten(hedge_issue):
+                try:
+                    github.close_issue(hedge_issue, f"对冲尝试失败，任务由 #{primary_issue} 继续处理：{str(e)[:200]}")
+                except Exception as close_error:
+                    logger.warning(f"关闭对冲 Issue #{hedge_issue} 失败: {close_error}")
+        finally:
+            if race.hedge_issue == 0:
+                race.hedge_issue = None
+            with self._lock:
+                entry = self.progress.get(item.id_full)
+                if entry is not None:
+                    entry.pop("hedge", None)
+                    if not entry:
+                        self.progress.pop(item.id_full, None)
+                self._stats(item)["api_calls"] += github.thread_calls - calls
+            self._local.hedge = False
+            self.hedge_slots.release()
+            race.hedge_done.set()
+
+    def _close_attempt(self, github: GitHubClient, issue_num: int, pr_num: Optional[int], winner: Optional[int]) -> None:
+        """另一尝试已合并：关闭本尝试的 PR 与 Issue，并取消 Copilot 分配"""
+        logger.info(f"🏁 Issue #{winner} 已先行合并，关闭落后的 Issue #{issue_num}")
+        message = f"🏁 同一任务已由 #{winner} 完成，关闭此尝试。"
+        try:
+            # 落后方可能还没轮询到自己的 PR，从时间线补查，避免遗留开放的 PR
+            pr_num = pr_num or github.latest_pr_from_timeline(issue_num)
+            if pr_num:
+                github.comment_issue(pr_num, message)
+                github.close_pr(pr_num, delete_branch=True)
+            github.remove_assignees(issue_num, COPILOT_ASSIGNEES)
+            github.close_issue(issue_num, message)
+        except Exception as e:
+            logger.warning(f"关闭落后的 Issue #{issue_num} 失败: {e}")
+
+    def _record_merge(self, github: GitHubClient, pr: dict) -> None:
+        """合并后只拉取 PR 改动的归档文件重算字数，并输出正文进度与 ETA"""
+        changed = [f.get("path", "") for f in pr.get("files") or [] if isinstance(f, dict)]
+        changed = [path for path in changed if path.startswith("archives/") and path.endswith(".md")]
+        if not changed:
+            return
+        ref = pr.get("baseRefName") or "main"
+        try:
+            contents = {path: github.get_file_text(path, ref) for path in changed}
+            self.corpus.update(contents)
+            for line in self.corpus.progress_lines():
+                logger.info(f"📊 {line}")
+            if self.duplicates is not None:
+                self.duplicates.update(contents)
+        except Exception as e:
+            logger.warning(f"更新字数统计失败: {e}")
+
+    def _flag_duplicates(self, github: GitHubClient, pr_num: int, report: ValidationReport) -> None:
+        """预检发现疑似重复段落时在 PR 中留言提示，不阻塞合并；拉取失败等无法检查的情况不留言"""
+        flagged = [detail for name, detail in report.flags if name == "重复段落"]
+        if not flagged:
+            return
+        logger.warning(f"⚠ PR #{pr_num} {flagged[0]}")
+        try:
+            github.comment_issue(pr_num, f"⚠️ **重复段落**：{flagged[0]}")
+        except Exception as e:
+            logger.warning(f"在 PR #{pr_num} 留言失败: {e}")
+
+    def _reject_pull(self, github: GitHubClient, issue_num: int, pr_num: int,
+                     report: ValidationReport, reset_count: int) -> Optional[float]:
+        """关闭预检未通过的 PR，把问题清单写入 Issue 描述后重置，返回重新分配 Copilot 的时间
 
-    def _reset_issue(self, github: GitHubClient, issue_num: int) -> None:
-        """重置 Issue：通过 unassign + assign 触发 Copilot 重新处理"""
+        Copilot 只读取 Issue 的初始描述，因此问题清单写进描述末尾（替换上一次的清单），
+        而不是以评论形式追加。
+        """
+        details = report.to_markdown()
+        try:
+            github.comment_issue(pr_num, f"""⛔ **交付物预检未通过**
+
+{details}
+
+已关闭此 PR 并触发 Issue #{issue_num} 的定向重置。
+重置次数：{reset_count + 1}/{DEFAULT_MAX_PR_RESETS}
+""")
+            github.close_pr(pr_num, delete_branch=True)
+        except Exception as e:
+            logger.warning(f"关闭 PR #{pr_num} 失败（继续执行重置）: {e}")
+
+        try:
+            body = github.get_issue_body(issue_num)
+            body = body.split(VALIDATION_MARKER)[0].rstrip()
+            feedback = (
+                f"\n\n{VALIDATION_MARKER}\n---\n\n## ⛔ 上次交付未通过预检（请逐项修正）\n\n"
+                f"PR #{pr_num} 已被关闭。\n\n{details}\n"
+            )
+            github.edit_issue_body(issue_num, body + feedback)
+        except Exception as e:
+            logger.warning(f"更新 Issue #{issue_num} 预检反馈失败（继续执行重置）: {e}")
+
+        return self._reset_issue(github, issue_num)
+
+    def _reset_issue(self, github: GitHubClient, issue_num: int) -> Optional[float]:
+        """重置 Issue：通过 unassign + assign 触发 Copilot 重新处理，返回重新分配的时间（Issue 已关闭时为 None）"""
         try:
             # 检查 Issue 状态，如果已关闭则不重置
             issue_data = github.get_issue(issue_num)
             if issue_data.get("state") == "closed":
                 logger.warning(f"Issue #{issue_num} 已关闭，跳过重置")
-                return
+                return None
 
             # 获取当前分配的用户列表
             assignees = {
@@ -1138,22 +3371,1071 @@ Copilot 处理时间超过 {PR_TIMEOUT/3600:.1f} 小时，自动关闭此 PR。
             # 关键修复：先 unassign Copilot（如果已分配），再重新 assign
             # 这是触发 Copilot 重新处理的正确方式
             if COPILOT_USERNAME in assignees:
-                logger.info(f"检测到 Copilot 已分配，先取消分配以触发重新处理")
+                logger.info("检测到 Copilot 已分配，先取消分配以触发重新处理")
                 github.remove_assignees(issue_num, COPILOT_ASSIGNEES)
-                time.sleep(2)  # 给 GitHub 一点时间处理 unassign
+                self.clock.sleep(2)  # 给 GitHub 一点时间处理 unassign
 
             # 重新分配 Copilot
             logger.info(f"重新分配 Issue #{issue_num} 给 Copilot")
             github.add_assignees(issue_num, COPILOT_ASSIGNEES)
             logger.info(f"✓ 已触发 Copilot 重新处理 Issue #{issue_num}")
+            return self.clock.time()
 
         except Exception as e:
             logger.error(f"重置 Issue 失败: {e}")
             raise
 
+# ==================== 调度器 ====================
+
+# Stage-06 锁链优化的任务网格：章节组 S06-V01-R1-C01、卷复盘 S06-V01-Summary-R1、全局收尾 S06-Global-*
+GRID_CELL_PATTERN = re.compile(r"^S(\d+)-V(\d+)-R(\d+)-C(\d+)$")
+GRID_SUMMARY_PATTERN = re.compile(r"^S(\d+)-V(\d+)-Summary-R(\d+)$")
+GRID_GLOBAL_PATTERN = re.compile(r"^S(\d+)-Global-")
+
+
+def wavefront_dependencies(items: Iterable[WorkItem]) -> Dict[str, set[str]]:
+    """网格任务的前置依赖，只包含同一批待处理的任务（已完成的前置不再阻塞）
+
+    - 章节组第 R 轮依赖同卷同组的第 R-1 轮，不同卷、不同组之间互不依赖
+    - 卷的第 R 轮复盘依赖该卷第 R 轮的全部章节组
+    - 全局收尾任务依赖本阶段其余全部网格任务
+
+    依赖按 TODO 计算：批处理工作项（--issue-batch-size > 1，ID 为 S06-BATCH-NN）依赖其各 TODO 前置
+    所在工作项的并集，前置落在同一批内的不计。
+    """
+    items = list(items)
+    owners: Dict[str, str] = {}  # TODO ID -> 所在工作项 ID
+    cells: Dict[tuple, str] = {}
+    rounds: Dict[tuple, set[str]] = defaultdict(set)
+    grid: Dict[int, set[str]] = defaultdict(set)
+    for item in items:
+        for todo_id in [todo.id_full for todo in item.todos] or [item.id_full]:
+            owners[todo_id] = item.id_full
+            match = GRID_CELL_PATTERN.match(todo_id)
+            if match:
+                stage, volume, round_no, chunk = map(int, match.groups())
+                cells[(stage, volume, round_no, chunk)] = todo_id
+                rounds[(stage, volume, round_no)].add(todo_id)
+                grid[stage].add(todo_id)
+                continue
+            match = GRID_SUMMARY_PATTERN.match(todo_id)
+            if match:
+                grid[int(match.group(1))].add(todo_id)
+
+    deps: Dict[str, set[str]] = {}
+    for item in items:
+        required: set[str] = set()
+        for todo_id in [todo.id_full for todo in item.todos] or [item.id_full]:
+            cell = GRID_CELL_PATTERN.match(todo_id)
+            summary = GRID_SUMMARY_PATTERN.match(todo_id)
+            final = GRID_GLOBAL_PATTERN.match(todo_id)
+            if cell:
+                stage, volume, round_no, chunk = map(int, cell.groups())
+                previous = cells.get((stage, volume, round_no - 1, chunk))
+                prerequisites = {previous} if previous else set()
+            elif summary:
+                prerequisites = rounds.get(tuple(map(int, summary.groups())), set())
+            elif final:
+                prerequisites = grid.get(int(final.group(1)), set())
+            else:
+                continue
+            required.update(owners[prerequisite] for prerequisite in prerequisites)
+        required.discard(item.id_full)
+        if required:
+            deps[item.id_full] = required
+    return deps
+
+
+def held_by(items: Iterable[WorkItem], blocked_ids: set[str]) -> set[str]:
+    """blocked_ids 中的待处理工作项，以及（传递）依赖它们的网格任务"""
+    items = list(items)
+    deps = wavefront_dependencies(items)
+    held = {item.id_full for item in items if item.id_full in blocked_ids}
+    changed = bool(held)
+    while changed:
+        changed = False
+        for item_id, required in deps.items():
+            if item_id not in held and not required.isdisjoint(held):
+                held.add(item_id)
+                changed = True
+    return held
+
+
+class ConcurrencyController:
+    """AIMD 并发自适应：在 [floor, ceiling] 之间调整调度器的在途上限
+
+    - 加性增：每个在满载（在途数已达上限）时成功完成的工作项让窗口增加 AIMD_INCREASE / 窗口，
+      即每满载完成一整个窗口上限加 1；未满载时上限不是瓶颈，不增加
+    - 乘性减：出现拥塞信号时窗口乘以 AIMD_DECREASE，冷却期（AIMD_COOLDOWN）内只降一次
+
+    拥塞信号：
+    1. 等待 PR 耗时明显高于近期最小值（Copilot 侧排队）
+    2. 近期尝试的重置率过高
+    3. API 预算余量不足或处于限流暂停
+    4. 合并冲突（并行 PR 改动了同一批文件）
+
+    信号来自各工作线程，内部加锁；守护进程中所有仓库共享同一个控制器。
+    """
+
+    def __init__(self, floor: int, ceiling: int, budget: Optional[RateBudget] = None,
+                 clock: Optional[Clock] = None) -> None:
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.budget = budget
+        self.clock = clock or Clock()
+        self.window = float(self.floor)  # 从下限起步，逐步探测
+        self.increases = 0
+        self.decreases = 0
+        self.last_reason: Optional[str] = None
+        self._last_decrease: Optional[float] = None
+        self._wait_pr: Deque[float] = deque(maxlen=AIMD_WAIT_PR_SAMPLES)
+        self._resets: Deque[bool] = deque(maxlen=AIMD_RESET_WINDOW)
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        return int(self.window)
+
+    def _set(self, window: float) -> int:
+        """调用方需持有 self._lock，返回调整前的上限"""
+        old = self.limit
+        self.window = min(float(self.ceiling), max(float(self.floor), window))
+        return old
+
+    def _decrease(self, reason: str) -> None:
+        """调用方需持有 self._lock"""
+        now = self.clock.time()
+        if self.window <= self.floor or (self._last_decrease is not None and now - self._last_decrease < AIMD_COOLDOWN):
+            return
+        self._last_decrease = now
+        self.last_reason = reason
+        old = self._set(self.window * AIMD_DECREASE)
+        self.decreases += 1
+        logger.warning(f"⚙ 并发上限 {old} → {self.limit}：{reason}")
+
+    def set_limit(self, value: int) -> int:
+        """控制指令手动设置上限（仍限制在 [floor, ceiling] 内），之后从该值继续自适应"""
+        with self._lock:
+            self._set(float(value))
+            return self.limit
+
+    def congestion(self, reason: str) -> None:
+        with self._lock:
+            self._decrease(reason)
+
+    def completed(self, saturated: bool) -> None:
+        """工作项成功完成；saturated 表示完成时在途数已达上限"""
+        if not saturated:
+            return
+        with self._lock:
+            old = self._set(self.window + AIMD_INCREASE / self.window)
+            self.increases += 1
+            if self.limit != old:
+                logger.info(f"⚙ 并发上限 {old} → {self.limit}：满载完成一轮且无拥塞信号")
+
+    def attempt_ended(self, resets: int) -> None:
+        """一次尝试结束，计入近期重置率"""
+        with self._lock:
+            self._resets.append(resets > 0)
+            if len(self._resets) < AIMD_RESET_WINDOW // 2:
+                return
+            rate = sum(self._resets) / len(self._resets)
+            if rate > AIMD_RESET_RATE:
+                self._resets.clear()
+                self._decrease(f"近期重置率 {rate:.0%}")
+
+    def wait_pr(self, seconds: float) -> None:
+        """等待 PR 耗时：与近期最小值比较，显著变长说明 Copilot 侧在排队"""
+        with self._lock:
+            baseline = min(self._wait_pr) if len(self._wait_pr) >= TIMEOUT_MIN_SAMPLES else None
+            self._wait_pr.append(seconds)
+            if (baseline is not None and seconds > baseline * AIMD_WAIT_PR_FACTOR
+                    and seconds - baseline > AIMD_WAIT_PR_MIN_DELAY):
+                self._decrease(f"等待 PR {seconds/60:.0f}min，近期最短 {baseline/60:.0f}min")
+
+    def poll(self) -> int:
+        """调度循环每轮调用：检查 API 预算余量，返回当前上限"""
+        if self.budget is not None:
+            headroom = self.budget.headroom()
+            if headroom < AIMD_HEADROOM_FLOOR:
+                with self._lock:
+                    self._decrease("API 限流暂停" if headroom == 0 else f"API 预算余量 {headroom:.0%}")
+        return self.limit
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "window": round(self.window, 2),
+                "floor": self.floor,
+                "ceiling": self.ceiling,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "last_decrease_reason": self.last_reason,
+                "wait_pr_baseline": min(self._wait_pr) if self._wait_pr else None,
+                "reset_rate": round(sum(self._resets) / len(self._resets), 3) if self._resets else None,
+            }
+
+
+def plan_signature(todo_root: Path) -> tuple:
+    """TODO 主文件的 (文件名, 大小, mtime) 签名，只 stat 不读取内容"""
+    entries = []
+    try:
+        with os.scandir(todo_root) as it:
+            for entry in it:
+                if entry.name.startswith("Stage-") and entry.name.endswith(".todos.md") and entry.is_file():
+                    st = entry.stat()
+                    entries.append((entry.name, st.st_size, st.st_mtime_ns))
+    except FileNotFoundError:
+        pass
+    return tuple(sorted(entries))
+
+
+class Lane:
+    """调度通道：一个仓库（Pipeline）的待处理队列、优先级与并发配额
+
+    待处理队列是 TODO 计划的惰性视图：每次派发前，若 TODO 文件发生变化或已完成集合到了刷新时间，
+    重新扫描并按计划顺序重排（新增 / 取消勾选的任务立即加入，已勾选 / 删除的移出，内容修改的换成新版本）；
+    在途、等待重试与本轮已结束的工作项不受影响。
+    """
+
+    def __init__(self, pipeline: Pipeline, items: Optional[List[WorkItem]] = None,
+                 priority: float = 1.0, max_in_flight: Optional[int] = None,
+                 completed_ids: Optional[set[str]] = None) -> None:
+        self.pipeline = pipeline
+        self.name = pipeline.name
+        self.priority = max(0.01, priority)
+        self.max_in_flight = max_in_flight
+        self.pending: Deque[WorkItem] = deque(items or [])
+        # 网格任务按波前释放：前置未完成的工作项留在队列中，不占用在途名额
+        self.deps = wavefront_dependencies(self.pending)
+        self.in_flight: Dict[str, WorkItem] = {}
+        # 延迟重试队列：(到期时间, 序号, 工作项) 小根堆；等待期间不占在途名额，调度器照常派发其他工作项
+        self.delayed: List[tuple[float, int, WorkItem]] = []
+        self._delay_seq = 0
+        self.attempts: Dict[str, int] = {}  # 工作项已开始的尝试次数
+        self.labels: Dict[str, str] = {}  # 工作项首次派发时的进度标签，重试沿用
+        self.total = len(self.pending)
+        self.dispatched = 0
+        self.succeeded = 0
+        self.failed: List[tuple[str, str]] = []
+        self.blocked: List[str] = []  # 因前置任务最终失败而未执行的工作项（也计入 failed）
+        self.claimed_elsewhere: List[str] = []  # 由其他主机认领而跳过的工作项（含因此暂缓的后续任务）
+        self.settled: set[str] = set()  # 本轮已结束（完成 / 最终失败 / 被认领 / 被跳过）的工作项，重新扫描时不再加入
+        self.pinned: set[str] = set()  # 通过控制指令提前的工作项，重新扫描时保持在队首
+        self.pass_value = 0.0  # stride scheduling 的虚拟时间
+        self.next_refill = 0.0
+        self.rounds = 0
+        # 计划刷新：已完成集合（GitHub 已关闭的 Issue）与 TODO 文件签名
+        now = pipeline.clock.time()
+        self.completed_ids: set[str] = set(completed_ids or ())
+        self.signature = plan_signature(pipeline.todo_root)
+        self.next_plan_check = now + PLAN_RECHECK_INTERVAL
+        self.next_completed_check = now + pipeline.args.poll_interval
+
+    @property
+    def idle(self) -> bool:
+        return not self.pending and not self.in_flight and not self.delayed
+
+    def defer(self, item: WorkItem, due: float) -> None:
+        """失败的工作项在 due 时刻之后重新进入待处理队列"""
+        self._delay_seq += 1
+        heapq.heappush(self.delayed, (due, self._delay_seq, item))
+
+    def release_due(self, now: float) -> int:
+        """把到期的重试项移回待处理队列队首（按到期顺序），返回移回的数量"""
+        due: List[WorkItem] = []
+        while self.delayed and self.delayed[0][0] <= now:
+            due.append(heapq.heappop(self.delayed)[2])
+        self.pending.extendleft(reversed(due))
+        return len(due)
+
+    def has_capacity(self) -> bool:
+        if not self.pending:
+            return False
+        return self.max_in_flight is None or len(self.in_flight) < self.max_in_flight
+
+    def ready_items(self) -> Iterable[WorkItem]:
+        """按队列顺序产出前置已全部完成的工作项"""
+        if not self.deps:
+            yield from self.pending
+            return
+        outstanding = {item.id_full for item in self.pending}
+        outstanding.update(self.in_flight)
+        outstanding.update(item.id_full for _, _, item in self.delayed)
+        for item in self.pending:
+            required = self.deps.get(item.id_full)
+            if not required or required.isdisjoint(outstanding):
+                yield item
+
+    def drop_dependents(self, failed_id: str) -> List[str]:
+        """前置任务最终失败或由其他主机认领：把（传递）依赖它的待处理工作项移出队列"""
+        blocked = {failed_id}
+        dropped: List[str] = []
+        changed = True
+        while changed:
+            changed = False
+            for item in list(self.pending):
+                if not self.deps.get(item.id_full, set()).isdisjoint(blocked):
+                    self.pending.remove(item)
+                    blocked.add(item.id_full)
+                    dropped.append(item.id_full)
+                    changed = True
+        self.settled.update(dropped)
+        return dropped
+
+    def prioritize(self, item_id: str) -> bool:
+        """把待处理队列中的指定工作项移到队首；等待重试的工作项立即重试"""
+        for item in self.pending:
+            if item.id_full == item_id:
+                self.pending.remove(item)
+                self.pending.appendleft(item)
+                self.pinned.add(item_id)
+                return True
+        for entry in self.delayed:
+            if entry[2].id_full == item_id:
+                self.delayed.remove(entry)
+                heapq.heapify(self.delayed)
+                self.pending.appendleft(entry[2])
+                self.pinned.add(item_id)
+                return True
+        return False
+
+    def refresh_plan(self, now: float) -> Optional[List[WorkItem]]:
+        """在调度锁外调用：TODO 文件变化或有新完成的任务时重新扫描，返回最新计划；无变化时返回 None"""
+        if now < self.next_plan_check:
+            return None
+        self.next_plan_check = now + PLAN_RECHECK_INTERVAL
+        pipeline = self.pipeline
+        changed = False
+        signature = plan_signature(pipeline.todo_root)
+        if signature != self.signature:
+            self.signature = signature
+            changed = True
+        if (pipeline.github is not None and not pipeline.args.from_beginning
+                and (changed or now >= self.next_completed_check)):
+            # 在其他主机或人工完成的任务：派发前发现，避免重复创建 Issue；
+            # 计划变化时立即查询，否则每个轮询间隔最多查询一次
+            self.next_completed_check = now + pipeline.args.poll_interval
+            completed = pipeline.get_recent_completed_todos()
+            if not completed <= self.completed_ids:
+                self.completed_ids |= completed
+                changed = True
+        if not changed:
+            return None
+        items = pipeline.scan(self.completed_ids)
+        # 分片同步可能回写主文件，以扫描后的签名为准
+        self.signature = plan_signature(pipeline.todo_root)
+        return items
+
+    def merge_plan(self, items: List[WorkItem]) -> None:
+        """用最新计划替换待处理队列；需持有调度锁"""
+        delayed = [item for _, _, item in self.delayed]
+        busy = set(self.in_flight) | {item.id_full for item in delayed} | self.settled
+        fresh = {item.id_full: item for item in items if item.id_full not in busy}
+        before = [item.id_full for item in self.pending]
+        # 提前的与到期重试的工作项保持在队首，其余按计划顺序
+        front = [fresh.pop(item_id) for item_id in before
+                 if (item_id in self.pinned or item_id in self.attempts) and item_id in fresh]
+        self.pending = deque(front + list(fresh.values()))
+        after = {item.id_full for item in self.pending}
+        added = [item_id for item_id in after if item_id not in set(before)]
+        removed = [item_id for item_id in before if item_id not in after]
+        for item_id in removed:
+            self.attempts.pop(item_id, None)
+            self.labels.pop(item_id, None)
+            self.pinned.discard(item_id)
+        self.deps = wavefront_dependencies([*self.pending, *self.in_flight.values(), *delayed])
+        self.total += len(added) - len(removed)
+        if added or removed:
+            logger.info(f"[{self.name}] TODO 计划变化：新增 {len(added)} 个、移出 {len(removed)} 个待处理任务"
+                        + (f"（新增 {', '.join(added[:5])}{' 等' if len(added) > 5 else ''}）" if added else ""))
+
+    def snapshot(self) -> dict:
+        in_flight = []
+        for item_id, item in self.in_flight.items():
+            entry = {"id": item_id, "stage": item.stage_number, "title": item.title}
+            entry.update(self.pipeline.progress_of(item_id))
+            in_flight.append(entry)
+        return {
+            "priority": self.priority,
+            "max_in_flight": self.max_in_flight,
+            "round": self.rounds,
+            "pending": [item.id_full for item in self.pending],
+            "ready": sum(1 for _ in self.ready_items()),
+            "retrying": [
+                {"id": item.id_full, "attempts": self.attempts.get(item.id_full, 0),
+                 "due_in": round(max(0.0, due - self.pipeline.clock.time()))}
+                for due, _, item in sorted(self.delayed)
+            ],
+            "in_flight": in_flight,
+            "dispatched": self.dispatched,
+            "total": self.total,
+            "succeeded": self.succeeded,
+            "failed": [{"id": task_id, "error": error} for task_id, error in self.failed],
+            "claimed_elsewhere": len(self.claimed_elsewhere),
+            # 被单飞合并 / 短时复用省掉的 gh 调用
+            "gh_saved": ({"memo_hits": self.pipeline.github.memo_hits, "coalesced": self.pipeline.github.coalesced}
+                         if self.pipeline.github is not None else None),
+        }
+
+    def refill(self) -> int:
+        """重新扫描 TODO，开始新一轮；只在通道空闲时调用"""
+        pipeline = self.pipeline
+        completed_ids: set[str] = set()
+        if not pipeline.args.from_beginning:
+            completed_ids = pipeline.get_recent_completed_todos()
+        items = pipeline.scan(completed_ids)
+        self.pending.extend(items)
+        self.deps = wavefront_dependencies(self.pending)
+        self.total = len(items)
+        self.dispatched = 0
+        self.attempts.clear()
+        self.labels.clear()
+        self.settled.clear()
+        self.pinned.clear()
+        now = pipeline.clock.time()
+        self.completed_ids = completed_ids
+        self.signature = plan_signature(pipeline.todo_root)
+        self.next_plan_check = now + PLAN_RECHECK_INTERVAL
+        self.next_completed_check = now + pipeline.args.poll_interval
+        if items:
+            self.rounds += 1
+            pipeline.refresh_open_issues()
+        return len(items)
+
+
+class Scheduler:
+    """公平调度器：多条通道共享同一个在途上限
+
+    通道之间按优先级加权轮转（stride scheduling）：每派发一个工作项，通道的虚拟时间前进
+    1/priority，总是从虚拟时间最小且未达并发上限的通道取下一项。每个在途工作项在独立的
+    守护线程中执行 Pipeline.process_item，中断信号不会被等待中的线程阻塞。
+    传入 controller 时在途上限由 AIMD 控制器按吞吐与拥塞信号自动调整。
+    """
+
+    def __init__(self, lanes: Iterable[Lane], max_in_flight: int = DEFAULT_MAX_CONCURRENCY,
+                 clock: Optional[Clock] = None, controller: Optional[ConcurrencyController] = None) -> None:
+        self.lanes = list(lanes)
+        self.controller = controller
+        self.max_in_flight = controller.limit if controller is not None else max(1, max_in_flight)
+        self.clock = clock or Clock()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._virtual_time = 0.0
+        self.started_at = self.clock.time()
+        self.poll_interval: float = DEFAULT_POLL_INTERVAL
+        # 暂停目标：(类型, 仓库或 "*", 值)，类型为 repo / stage / item
+        self.paused: set[tuple[str, str, str]] = set()
+        self.draining = False
+        if len(self.lanes) > 1 or self.max_in_flight > 1 or (controller is not None and controller.ceiling > 1):
+            _enable_thread_log_context()
+
+    def _is_paused(self, lane: Lane, item: WorkItem) -> bool:
+        if not self.paused:
+            return False
+        for repo in (lane.name, "*"):
+            if (("repo", repo, "") in self.paused
+                    or ("stage", repo, str(item.stage_number)) in self.paused
+                    or ("item", repo, item.id_full) in self.paused):
+                return True
+        return False
+
+    def _next_runnable(self, lane: Lane) -> Optional[WorkItem]:
+        if not lane.has_capacity():
+            return None
+        for item in lane.ready_items():
+            if not self._is_paused(lane, item):
+                return item
+        return None
+
+    def _pick_lane(self) -> Optional[tuple[Lane, WorkItem]]:
+        if self.draining:
+            return None
+        best: Optional[tuple[Lane, WorkItem]] = None
+        for lane in self.lanes:
+            item = self._next_runnable(lane)
+            if item is None:
+                continue
+            if best is None or (lane.pass_value, -lane.priority) < (best[0].pass_value, -best[0].priority):
+                best = (lane, item)
+        return best
+
+    def _dispatch(self, lane: Lane, item: WorkItem) -> None:
+        lane.pending.remove(item)
+        lane.pinned.discard(item.id_full)
+        # 空闲后重新加入的通道从当前虚拟时间起步，不能靠积攒的份额独占调度
+        lane.pass_value = max(lane.pass_value, self._virtual_time)
+        self._virtual_time = lane.pass_value
+        lane.pass_value += 1.0 / lane.priority
+        lane.in_flight[item.id_full] = item
+        self._in_flight += 1
+
+        attempt = lane.attempts.get(item.id_full, 0) + 1
+        lane.attempts[item.id_full] = attempt
+        label = lane.labels.get(item.id_full)
+        if label is None:
+            lane.dispatched += 1
+            label = f"{lane.dispatched}/{lane.total} ({lane.dispatched * 100 // max(1, lane.total)}%)"
+            if len(self.lanes) > 1:
+                label = f"{lane.name} {label}"
+            lane.labels[item.id_full] = label
+        # 最大重试次数可在线修改，按派发时的取值判断是否为最后一次尝试
+        final = attempt >= max(1, lane.pipeline.args.task_max_retries)
+        thread = threading.Thread(
+            target=self._work, args=(lane, item, label, attempt, final),
+            name=f"{lane.name}:{item.id_full}" if len(self.lanes) > 1 else item.id_full,
+            daemon=True,
+        )
+        thread.start()
+
+    def _work(self, lane: Lane, item: WorkItem, label: str, attempt: int = 1, final: bool = True) -> None:
+        error: Optional[str] = None
+        try:
+            error = lane.pipeline.process_item(item, label, attempt, final)
+        except Exception as e:  # process_item 自身会兜底，这里只防御意外
+            logger.error(f"工作项 {item.id_full} 执行异常: {e}", exc_info=True)
+            error = str(e)
+            if final:
+                lane.pipeline.bury(item, error, attempt)
+        finally:
+            with self._cond:
+                saturated = self._in_flight >= self.max_in_flight
+                lane.in_flight.pop(item.id_full, None)
+                self._in_flight -= 1
+                if self.controller is not None and error is None:
+                    self.controller.completed(saturated)
+                    self.max_in_flight = self.controller.limit
+                if error is not None and error != CLAIMED_ELSEWHERE and not final:
+                    # 进入延迟重试队列：依赖它的任务继续等待，其余工作项照常派发
+                    delay = lane.pipeline.retry_delay(attempt)
+                    lane.defer(item, self.clock.time() + delay)
+                    logger.warning(f"{item.id_full} 将在 {delay:.0f} 秒后重试，等待期间继续派发其他任务")
+                else:
+                    lane.attempts.pop(item.id_full, None)
+                    lane.labels.pop(item.id_full, None)
+                    lane.settled.add(item.id_full)
+                if error is None:
+                    lane.succeeded += 1
+                elif error == CLAIMED_ELSEWHERE:
+                    # 后续轮次由本机还是其他主机处理，等前置完成后的下一轮扫描再决定
+                    lane.claimed_elsewhere.append(item.id_full)
+                    lane.claimed_elsewhere.extend(lane.drop_dependents(item.id_full))
+                elif final:
+                    lane.failed.append((item.id_full, error))
+                    dropped = lane.drop_dependents(item.id_full)
+                    lane.blocked.extend(dropped)
+                    lane.failed.extend((dropped_id, f"前置任务 {item.id_full} 失败，未执行") for dropped_id in dropped)
+                    if dropped:
+                        logger.warning(f"{item.id_full} 失败，跳过依赖它的 {len(dropped)} 个任务: {', '.join(dropped[:10])}")
+                self._cond.notify_all()
+
+    def _refill_idle_lanes(self, poll_interval: float) -> None:
+        now = self.clock.time()
+        with self._cond:
+            if self.draining:
+                return
+            due = [lane for lane in self.lanes if lane.idle and now >= lane.next_refill]
+        # 空闲通道没有在途线程，可以在锁外做网络扫描
+        for lane in due:
+            try:
+                count = lane.refill()
+            except Exception as e:
+                logger.error(f"[{lane.name}] 扫描 TODO 失败: {e}", exc_info=True)
+                count = 0
+            if count:
+                logger.info(f"[{lane.name}] 第 {lane.rounds} 轮：待处理 {count} 个任务")
+            else:
+                logger.debug(f"[{lane.name}] 暂无待办任务，{poll_interval} 秒后重新扫描")
+            lane.next_refill = self.clock.time() + poll_interval
+
+    def _refresh_plans(self) -> None:
+        """派发前让忙碌通道按最新 TODO 计划重排待处理队列；扫描在锁外进行，合并在锁内"""
+        now = self.clock.time()
+        for lane in self.lanes:
+            if self.draining or lane.idle:
+                continue  # 空闲通道由 _refill_idle_lanes 开始新一轮
+            try:
+                items = lane.refresh_plan(now)
+            except Exception as e:
+                logger.warning(f"[{lane.name}] 重新扫描 TODO 失败（沿用当前队列）: {e}")
+                continue
+            if items is not None:
+                with self._cond:
+                    lane.merge_plan(items)
+
+    def run(self, forever: bool = False, poll_interval: float = DEFAULT_POLL_INTERVAL) -> None:
+        """派发直到所有通道清空；forever=True 时持续运行，空闲通道按轮询间隔重新扫描
+
+        轮询间隔保存在 self.poll_interval，可通过控制指令在线调整。
+        进入排空（drain）状态后不再派发新工作项，在途项全部结束即返回。
+        """
+        self.poll_interval = poll_interval
+        while True:
+            # 只读 gh 请求的复用以调度轮次为界
+            for lane in self.lanes:
+                if lane.pipeline.github is not None:
+                    lane.pipeline.github.begin_tick()
+            if forever:
+                self._refill_idle_lanes(self.poll_interval)
+            self._refresh_plans()
+            with self._cond:
+                if self.controller is not None:
+                    self.max_in_flight = self.controller.poll()
+                now = self.clock.time()
+                for lane in self.lanes:
+                    lane.release_due(now)
+                while self._in_flight < self.max_in_flight:
+                    picked = self._pick_lane()
+                    if picked is None:
+                        break
+                    self._dispatch(*picked)
+                if self._in_flight == 0:
+                    if self.draining:
+                        retrying = sum(len(lane.delayed) for lane in self.lanes)
+                        if retrying:
+                            logger.info(f"排空：放弃 {retrying} 个等待重试的工作项，下次扫描时重新派发")
+                        return
+                    if not forever and self._pick_lane() is None and not any(lane.delayed for lane in self.lanes):
+                        return
+                self._cond.wait(timeout=1.0)
+
+    # ---------- 控制指令 ----------
+
+    def _find_lane(self, repo: Optional[str]) -> Lane:
+        if repo is None:
+            if len(self.lanes) == 1:
+                return self.lanes[0]
+            raise ValueError("存在多个仓库，请指定 repo=owner/name")
+        for lane in self.lanes:
+            if lane.name == repo:
+                return lane
+        raise ValueError(f"未知仓库: {repo}")
+
+    def _pause_target(self, params: dict) -> tuple[str, str, str]:
+        repo = params.get("repo") or "*"
+        if repo != "*":
+            self._find_lane(repo)
+        if params.get("item"):
+            return ("item", repo, params["item"])
+        if params.get("stage"):
+            return ("stage", repo, str(int(params["stage"])))
+        if repo != "*":
+            return ("repo", repo, "")
+        raise ValueError("请指定 stage=N、item=ID 或 repo=owner/name")
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "uptime": round(self.clock.time() - self.started_at, 1),
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "concurrency": self.controller.snapshot() if self.controller is not None else None,
+                "poll_interval": self.poll_interval,
+                "draining": self.draining,
+                "paused": [
+                    {"type": kind, "repo": repo, "value": value}
+                    for kind, repo, value in sorted(self.paused)
+                ],
+                "repos": {lane.name: lane.snapshot() for lane in self.lanes},
+            }
+
+    def control(self, request: dict, args: argparse.Namespace) -> Any:
+        """执行一条控制指令，返回可 JSON 序列化的结果；参数错误抛出 ValueError"""
+        cmd = request.get("cmd")
+        params = {key: value for key, value in request.items() if key != "cmd"}
+
+        if cmd == "status":
+            return self.status()
+
+        if cmd in ("pause", "resume"):
+            target = self._pause_target(params)
+            with self._cond:
+                if cmd == "pause":
+                    self.paused.add(target)
+                else:
+                    self.paused.discard(target)
+                self._cond.notify_all()
+            logger.info(f"🎛 控制指令: {cmd} {target[0]}={target[2] or target[1]}")
+            return {"paused": len(self.paused)}
+
+        if cmd == "prioritize":
+            item_id = params.get("item")
+            if not item_id:
+                raise ValueError("请指定 item=ID")
+            with self._cond:
+                for lane in self.lanes:
+                    if lane.prioritize(item_id):
+                        logger.info(f"🎛 控制指令: 提前处理 {item_id}")
+                        return {"moved": item_id, "repo": lane.name}
+            raise ValueError(f"待处理队列中没有 {item_id}")
+
+        if cmd == "reset":
+            item_id = params.get("item")
+            if not item_id:
+                raise ValueError("请指定 item=ID")
+            with self._cond:
+                for lane in self.lanes:
+                    if item_id in lane.in_flight:
+                        lane.pipeline.request_reset(item_id)
+                        logger.info(f"🎛 控制指令: 强制重置 {item_id}")
+                        return {"reset": item_id, "repo": lane.name}
+            raise ValueError(f"{item_id} 不在执行中")
+
+        if cmd == "dead-letters":
+            lanes = [self._find_lane(params["repo"])] if params.get("repo") else self.lanes
+            return {lane.name: [asdict(letter) for letter in lane.pipeline.dead_letters.entries()] for lane in lanes}
+
+        if cmd == "replay":
+            item_id = params.get("item")
+            if not item_id:
+                raise ValueError("请指定 item=ID 或 item=all")
+            lanes = [self._find_lane(params["repo"])] if params.get("repo") else self.lanes
+            replayed: Dict[str, List[str]] = {}
+            for lane in lanes:
+                letters = lane.pipeline.dead_letters.replay(None if item_id == "all" else [item_id])
+                if letters:
+                    replayed[lane.name] = [letter.item for letter in letters]
+                    with self._cond:
+                        # 空闲通道立即重新扫描；忙碌通道在本轮结束后的扫描中派发
+                        lane.next_refill = 0.0
+                        self._cond.notify_all()
+            if not replayed:
+                raise ValueError(f"死信队列中没有 {item_id}")
+            logger.info(f"🎛 控制指令: 重放死信 {replayed}")
+            return {"replayed": replayed}
+
+        if cmd == "drain":
+            with self._cond:
+                self.draining = True
+                self._cond.notify_all()
+                remaining = self._in_flight
+            logger.info(f"🎛 控制指令: 排空，等待 {remaining} 个在途工作项结束后退出")
+            return {"draining": True, "in_flight": remaining}
+
+        if cmd == "config":
+            return self._apply_config(params, args)
+
+        raise ValueError(f"未知指令: {cmd}")
+
+    def _apply_config(self, params: dict, args: argparse.Namespace) -> dict:
+        repo = params.pop("repo", None)
+        applied: Dict[str, Any] = {}
+        with self._cond:
+            for key, value in params.items():
+                if repo is not None or key == "priority":
+                    lane = self._find_lane(repo)
+                    if key == "priority":
+                        lane.priority = max(0.01, float(value))
+                    elif key == "max_in_flight":
+                        lane.max_in_flight = int(value) or None
+                    else:
+                        raise ValueError(f"仓库级配置只支持 priority / max_in_flight: {key}")
+                    applied[f"{lane.name}.{key}"] = value
+                elif key == "max_in_flight":
+                    if self.controller is not None:
+                        # 自适应模式下作为新的起点，之后继续按信号调整
+                        self.max_in_flight = self.controller.set_limit(int(value))
+                    else:
+                        self.max_in_flight = max(1, int(value))
+                    applied[key] = self.max_in_flight
+                elif key == "poll_interval":
+                    interval = max(1, int(value))
+                    self.poll_interval = interval
+                    args.poll_interval = interval
+                    for lane in self.lanes:
+                        if lane.pipeline.github is not None:
+                            lane.pipeline.github.memo_ttl = min(GH_MEMO_TTL, interval / 2)
+                    applied[key] = interval
+                elif key in LIVE_CONFIG_KEYS:
+                    setattr(args, key, LIVE_CONFIG_KEYS[key](value))
+                    applied[key] = getattr(args, key)
+                else:
+                    raise ValueError(f"不支持在线修改的配置项: {key}")
+            self._cond.notify_all()
+        logger.info(f"🎛 控制指令: 配置更新 {applied}")
+        return applied
+
+
+# 可通过控制指令在线修改的运行参数及其类型
+LIVE_CONFIG_KEYS = {
+    "issue_max_wait": int,
+    "task_max_retries": int,
+    "task_retry_wait": int,
+}
+
+
+def _enable_thread_log_context() -> None:
+    """并发执行时在日志中带上线程名（仓库:工作项），便于区分交错的输出"""
+    formatter = logging.Formatter(
+        "%(asctime)s [%(levelname)s] [%(threadName)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(formatter)
+
+# ==================== 控制套接字 ====================
+
+class ControlServer:
+    """守护进程的 Unix 套接字控制接口
+
+    协议：每个连接发送一行 JSON 请求（{"cmd": "status", ...}），返回一行 JSON 响应
+    （{"ok": true, "result": ...} 或 {"ok": false, "error": "..."}）。
+    所有查询只读取调度器的内存状态，不访问 GitHub。
+    """
+
+    def __init__(self, path: Path, scheduler: Scheduler, args: argparse.Namespace) -> None:
+        self.path = path
+        self.scheduler = scheduler
+        self.args = args
+        self._server: Optional[socketserver.UnixStreamServer] = None
+
+    def start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            # 上次异常退出遗留的套接字文件
+            self.path.unlink()
+        control = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                line = self.rfile.readline(65536)
+                try:
+                    request = json.loads(line.decode("utf-8"))
+                    if not isinstance(request, dict):
+                        raise ValueError("请求必须是 JSON 对象")
+                    response = {"ok": True, "result": control.scheduler.control(request, control.args)}
+                except (ValueError, TypeError) as e:
+                    response = {"ok": False, "error": str(e)}
+                except Exception as e:
+                    logger.error(f"处理控制指令失败: {e}", exc_info=True)
+                    response = {"ok": False, "error": f"内部错误: {e}"}
+                self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+
+        server = socketserver.ThreadingUnixStreamServer(str(self.path), Handler)
+        server.daemon_threads = True
+        self.path.chmod(0o600)
+        thread = threading.Thread(target=server.serve_forever, name="control", daemon=True)
+        thread.start()
+        self._server = server
+        logger.info(f"🎛 控制套接字: {self.path}")
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def control_client(path: Path, words: List[str]) -> int:
+    """控制指令客户端：`CMD key=value ...` 转为 JSON 请求发送给守护进程"""
+    request: Dict[str, Any] = {"cmd": words[0]}
+    for word in words[1:]:
+        if "=" not in word:
+            logger.error(f"参数格式应为 key=value: {word}")
+            return 1
+        key, value = word.split("=", 1)
+        request[key] = value
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CONTROL_TIMEOUT)
+            sock.connect(str(path))
+            sock.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+    except OSError as e:
+        logger.error(f"无法连接守护进程 {path}: {e}")
+        return 1
+
+    try:
+        response = json.loads(line.decode("utf-8"))
+    except json.JSONDecodeError:
+        logger.error("守护进程返回了无效响应")
+        return 1
+    if not response.get("ok"):
+        logger.error(f"指令失败: {response.get('error')}")
+        return 1
+    print(json.dumps(response.get("result"), ensure_ascii=False, indent=2))
+    return 0
+
+def dead_letter_queues(args: argparse.Namespace) -> Dict[str, DeadLetterQueue]:
+    """--dead-letters / --replay-dead-letters 作用的死信队列：仓库名 -> 队列
+
+    --daemon-config 时为配置中的各仓库（--repo 可选出其中一个），否则为 --root 指定的仓库。
+    """
+    if args.daemon_config:
+        configs, _ = load_daemon_config(args.daemon_config)
+        if args.repo:
+            configs = [config for config in configs if config.name == args.repo]
+            if not configs:
+                raise ValueError(f"多仓库配置中没有仓库: {args.repo}")
+        return {config.name: DeadLetterQueue(config.root / ".pipeline" / DEAD_LETTER_NAME) for config in configs}
+    root = (args.root or ROOT).resolve()
+    return {args.repo or root.name: DeadLetterQueue(root / ".pipeline" / DEAD_LETTER_NAME)}
+
+
+def dead_letter_command(queues: Dict[str, DeadLetterQueue], replay: Optional[List[str]]) -> int:
+    """--dead-letters / --replay-dead-letters：查看或重放所选仓库的死信队列"""
+    if replay is None:
+        total = 0
+        for name, queue in queues.items():
+            letters = queue.entries()
+            if len(queues) > 1:
+                print(f"[{name}]" + ("" if letters else " 死信队列为空"))
+            for letter in letters:
+                failed_at = datetime.fromtimestamp(letter.failed_at).strftime("%Y-%m-%d %H:%M")
+                print(f"{letter.item}  Stage {letter.stage:02d}  {failed_at}  尝试 {letter.attempts} 次  {letter.title}")
+                print(f"    {letter.error}")
+            total += len(letters)
+        print(f"共 {total} 个工作项" if total else "死信队列为空")
+        return 0
+    letters = [letter for queue in queues.values() for letter in queue.replay(replay or None)]
+    missing = sorted(set(replay) - {letter.item for letter in letters})
+    for letter in letters:
+        print(f"已重放 {letter.item}" + (f" ({letter.repo})" if len(queues) > 1 else ""))
+    if missing:
+        logger.error(f"死信队列中没有: {', '.join(missing)}")
+        return 1
+    if letters:
+        print("下一轮扫描时重新执行（守护进程可用 --ctl replay item=ID 立即生效）")
+    return 0
+
+# ==================== 多仓库守护进程 ====================
+
+@dataclass
+class RepoConfig:
+    owner: str
+    repo: str
+    root: Path
+    todo_root: Path
+    priority: float = 1.0
+    max_in_flight: Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.owner}/{self.repo}"
+
+
+def load_daemon_config(path: Path) -> tuple[List[RepoConfig], dict]:
+    """读取多仓库配置（JSON）
+
+    格式::
+
+        {
+          "max_in_flight": 4,
+          "rate_limit_per_hour": 4500,
+          "repos": [
+            {"repo": "owner/story1", "root": "/srv/story1", "priority": 2, "max_in_flight": 2},
+            {"repo": "owner/story2", "root": "/srv/story2", "todo_root": "/srv/story2/todo"}
+          ]
+        }
+
+    Returns:
+        (仓库配置列表, 全局设置)
+    """
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"读取多仓库配置失败 {path}: {e}") from e
+
+    entries = data.get("repos") if isinstance(data, dict) else None
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"多仓库配置缺少 repos 列表: {path}")
+
+    configs: List[RepoConfig] = []
+    seen: set[str] = set()
+    for entry in entries:
+        repo_ref = entry.get("repo", "") if isinstance(entry, dict) else ""
+        if "/" not in repo_ref:
+            raise ValueError(f"仓库格式错误，应为 owner/repo: {entry}")
+        if repo_ref in seen:
+            raise ValueError(f"仓库重复配置: {repo_ref}")
+        seen.add(repo_ref)
+        if not entry.get("root"):
+            raise ValueError(f"仓库 {repo_ref} 缺少 root 路径")
+        owner, repo = repo_ref.split("/", 1)
+        # 相对路径以配置文件所在目录为基准
+        root = (path.parent / entry["root"]).resolve()
+        todo_root = (path.parent / entry["todo_root"]).resolve() if entry.get("todo_root") else root / "todo"
+        cap = entry.get("max_in_flight")
+        configs.append(RepoConfig(
+            owner, repo, root, todo_root,
+            priority=float(entry.get("priority", 1.0)),
+            max_in_flight=int(cap) if cap else None,
+        ))
+
+    settings = {key: value for key, value in data.items() if key != "repos"}
+    return configs, settings
+
+
+def run_daemon(args: argparse.Namespace, clock: Clock, transport: Optional[GhTransport],
+               configs: List[RepoConfig], settings: dict) -> int:
+    """守护进程：所有仓库共享一份 API 预算与一个公平调度器，并通过控制套接字接受指令"""
+    max_in_flight = int(settings.get("max_in_flight", args.max_concurrency))
+    budget = RateBudget(
+        per_hour=float(settings.get("rate_limit_per_hour", DEFAULT_RATE_PER_HOUR)),
+        search_per_minute=float(settings.get("search_per_minute", DEFAULT_SEARCH_PER_MINUTE)),
+        max_parallel=int(settings.get("gh_parallel", DEFAULT_GH_PARALLEL)),
+        clock=clock,
+    )
+
+    logger.info("="*80)
+    logger.info("Auto Copilot Pipeline - 守护进程")
+    logger.info("="*80)
+    controller: Optional[ConcurrencyController] = None
+    if args.auto_concurrency:
+        # 所有仓库共享同一个控制器：拥塞信号（API 预算、Copilot 排队）本来就是账号级的
+        controller = ConcurrencyController(min(args.min_concurrency, max_in_flight), max_in_flight,
+                                           budget=budget, clock=clock)
+        logger.info(f"全局在途上限: 自适应 {controller.floor}~{controller.ceiling}")
+    else:
+        logger.info(f"全局在途上限: {max_in_flight}")
+    hedge_slots = None
+    if args.hedge:
+        max_hedges = int(settings.get("max_hedges", args.max_hedges))
+        hedge_slots = threading.BoundedSemaphore(max(1, max_hedges))
+        logger.info(f"对冲执行: 启用，在途上限 {max_hedges}")
+    lanes: List[Lane] = []
+    for cfg in configs:
+        cap = f"{cfg.max_in_flight}" if cfg.max_in_flight else "不限"
+        logger.info(f"  {cfg.name}: root={cfg.root} 优先级={cfg.priority:g} 并发上限={cap}")
+        if not cfg.todo_root.is_dir():
+            logger.warning(f"  {cfg.name}: TODO 目录不存在 {cfg.todo_root}")
+        github: Optional[GitHubClient] = None
+        if not args.dry_run:
+            github = GitHubClient(cfg.owner, cfg.repo, transport=transport, clock=clock, budget=budget)
+        ensure_core_documents(cfg.root)
+        pipeline = Pipeline(github, args, root=cfg.root, todo_root=cfg.todo_root, name=cfg.name,
+                            hedge_slots=hedge_slots, concurrency=controller)
+        lanes.append(Lane(pipeline, priority=cfg.priority, max_in_flight=cfg.max_in_flight))
+    logger.info("="*80)
+
+    scheduler = Scheduler(lanes, max_in_flight=max_in_flight, clock=clock, controller=controller)
+    if args.dry_run:
+        # Dry-run 只预览每个仓库的首轮任务
+        for lane in lanes:
+            lane.refill()
+        scheduler.run()
+        logger.info("Dry-run 模式：首轮任务预览完成，自动退出。")
+        return 0
+
+    server = ControlServer(args.control_socket, scheduler, args)
+    server.start()
+    try:
+        scheduler.run(forever=True, poll_interval=args.poll_interval)
+    finally:
+        server.stop()
+    logger.info("✓ 守护进程已排空并退出")
+    return 0
+
     # ==================== 入口 ====================
 
-def main() -> int:
+def build_arg_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Auto Copilot Pipeline - 自动续传版本")
     parser.add_argument("--poll-interval", type=int, default=DEFAULT_POLL_INTERVAL,
                         help="轮询间隔（秒）")
@@ -1164,15 +4446,94 @@ def main() -> int:
     parser.add_argument("--task-max-retries", type=int, default=DEFAULT_TASK_MAX_RETRIES,
                         help="单个工作项失败后的最大重试次数")
     parser.add_argument("--task-retry-wait", type=int, default=DEFAULT_TASK_RETRY_WAIT,
-                        help="首次重试前的等待时间（秒），之后按重试序号递增")
+                        help="首次重试前的等待时间（秒），之后指数递增并随机抖动；等待期间继续派发其他任务")
     parser.add_argument("--dry-run", action="store_true",
                         help="预览模式，不创建实际 Issue")
+    parser.add_argument("--offline", action="store_true",
+                        help="离线运行：不连接 GitHub，所有工作项须由 --executors 路由到本地执行后端")
+    parser.add_argument("--executors", type=Path, default=None,
+                        help="执行后端与路由配置（JSON，格式见 ExecutorRouter.from_file），默认全部走 Copilot")
     parser.add_argument("--from-beginning", action="store_true",
                         help="强制从头开始，忽略 GitHub Issues 中的进度")
     parser.add_argument("--repo", type=str,
                         help="手动指定仓库 (格式: owner/repo)，覆盖自动检测")
+    parser.add_argument("--root", type=Path, default=None, metavar="PATH",
+                        help="仓库工作目录（默认: 本脚本所在仓库），TODO 位于其下的 todo/")
+    parser.add_argument("--no-validate", action="store_true",
+                        help="跳过合并前的交付物预检")
+    parser.add_argument("--validation-min-score", type=float, default=1.0,
+                        help="交付物预检最低得分（0-1，默认 1.0 即全部检查项通过）")
+    parser.add_argument("--fixed-timeouts", action="store_true",
+                        help="使用固定的 PR 超时常量，不按任务类别学习超时")
+    parser.add_argument("--hedge", action="store_true",
+                        help="工作项超过同类任务 P95 总耗时后，另开一个 Issue 并行执行，先合并者生效")
+    parser.add_argument("--max-hedges", type=int, default=DEFAULT_MAX_HEDGES,
+                        help=f"同时在途的对冲尝试上限 (默认: {DEFAULT_MAX_HEDGES})")
+    parser.add_argument("--lease-store", choices=["none", "file", "github"], default="none",
+                        help="多主机协作的工作项租约存储：file 为本地 / 共享文件，github 为仓库中的协调 Issue (默认: none)")
+    parser.add_argument("--lease-file", type=Path, default=None,
+                        help="--lease-store file 的租约文件 (默认: .pipeline/leases.json)")
+    parser.add_argument("--lease-ttl", type=int, default=DEFAULT_LEASE_TTL,
+                        help=f"租约有效期（秒），主机失联超过该时间后其工作项可被接管 (默认: {DEFAULT_LEASE_TTL})")
+    parser.add_argument("--host-id", default=None,
+                        help="本主机在租约中的标识 (默认: 主机名:进程号)")
+    parser.add_argument("--no-lint", action="store_true",
+                        help="合并前预检不检查去AI味禁用词")
+    parser.add_argument("--lint-rules", type=Path, default=None,
+                        help="去AI味规则文件（JSON，格式见 tools/prose_lint.py）")
+    parser.add_argument("--history", type=Path, default=None,
+                        help="运行历史数据库，汇总见 tools/run_history.py (默认: .pipeline/history.sqlite3)")
+    parser.add_argument("--no-history", action="store_true",
+                        help="不记录运行历史")
+    parser.add_argument("--no-dup-check", action="store_true",
+                        help="合并前预检不检查与已有归档近似重复的段落")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="同时在途的工作项数量（默认 1，即顺序执行）；--auto-concurrency 时为自适应的上限")
+    parser.add_argument("--auto-concurrency", action="store_true",
+                        help="按吞吐与拥塞信号（等待 PR 耗时、重置率、API 预算余量、合并冲突）"
+                             "在 --min-concurrency 与 --max-concurrency 之间自动调整并发（AIMD）")
+    parser.add_argument("--min-concurrency", type=int, default=DEFAULT_MIN_CONCURRENCY,
+                        help=f"--auto-concurrency 的并发下限（默认 {DEFAULT_MIN_CONCURRENCY}）")
+    parser.add_argument("--daemon", action="store_true",
+                        help="守护进程模式：常驻调度并通过控制套接字接受指令")
+    parser.add_argument("--daemon-config", type=Path, metavar="PATH",
+                        help="多仓库守护进程配置（JSON），一个进程共享预算调度多个仓库（隐含 --daemon）")
+    parser.add_argument("--control-socket", type=Path, default=DEFAULT_CONTROL_SOCKET, metavar="PATH",
+                        help=f"守护进程控制套接字路径（默认 {DEFAULT_CONTROL_SOCKET.relative_to(ROOT)}）")
+    parser.add_argument("--ctl", nargs="+", metavar="CMD",
+                        help="向运行中的守护进程发送指令，如: status | pause stage=6 | resume item=S06-V01-R1-C01 | "
+                             "prioritize item=ID | reset item=ID | dead-letters | replay item=ID|all | drain | "
+                             "config poll_interval=30")
+    parser.add_argument("--todo-shards", action="store_true",
+                        help="为每个 TODO 维护 todo/shards/ 下的分片文件并让 Issue 指向分片；"
+                             "扫描前把分片中的勾选同步回主文件（分片需提交推送，见 tools/todo_shards.py）")
+    parser.add_argument("--dead-letters", action="store_true",
+                        help="列出死信队列（重试耗尽的工作项）后退出；与 --daemon-config 同用时列出各仓库的队列"
+                             "（可用 --repo 只看其中一个）")
+    parser.add_argument("--replay-dead-letters", nargs="*", metavar="ID", default=None,
+                        help="把指定工作项（不指定则全部）移出死信队列后退出，下一轮扫描时重新执行")
+    parser.add_argument("--record-cassette", type=Path, metavar="PATH",
+                        help="录制所有 gh 请求与响应（含耗时）到录像文件，.gz 结尾时压缩")
+    parser.add_argument("--replay-cassette", type=Path, metavar="PATH",
+                        help="从录像文件回放 gh 流量，离线复现线上问题")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="回放倍速，等待与轮询按该倍数加速（默认 1.0）")
+    return parser
+
+def main() -> int:
+    parser = build_arg_parser()
     args = parser.parse_args()
 
+    if args.ctl:
+        return control_client(args.control_socket, args.ctl)
+    if args.dead_letters or args.replay_dead_letters is not None:
+        try:
+            queues = dead_letter_queues(args)
+        except ValueError as e:
+            logger.error(str(e))
+            return 1
+        return dead_letter_command(queues, args.replay_dead_letters)
+
     # 验证参数合理性
     if args.poll_interval < 1:
         logger.error("轮询间隔必须至少为 1 秒")
@@ -1186,22 +4547,86 @@ def main() -> int:
     if args.task_max_retries < 1:
         logger.error("任务最大重试次数必须至少为 1")
         return 1
+    if args.max_concurrency < 1:
+        logger.error("并发数必须至少为 1")
+        return 1
+    if args.auto_concurrency and not 1 <= args.min_concurrency <= args.max_concurrency:
+        logger.error("--min-concurrency 必须在 1 与 --max-concurrency 之间")
+        return 1
+    if args.lease_ttl < 30:
+        logger.error("租约有效期至少为 30 秒")
+        return 1
+    if args.max_hedges < 1:
+        logger.error("对冲上限必须至少为 1")
+        return 1
+    if args.record_cassette and args.replay_cassette:
+        logger.error("--record-cassette 与 --replay-cassette 不能同时使用")
+        return 1
+    if args.replay_speed <= 0:
+        logger.error("回放倍速必须大于 0")
+        return 1
+    if args.root and args.daemon_config:
+        logger.error("--root 不能与 --daemon-config 同时使用（各仓库的目录在配置中指定）")
+        return 1
+    if args.offline and (args.daemon or args.daemon_config or args.replay_cassette or args.record_cassette):
+        logger.error("--offline 不能与守护进程或录像 / 回放同时使用")
+        return 1
 
-    if args.repo:
-        if "/" not in args.repo:
-            logger.error("仓库格式错误，应为 owner/repo")
+    clock: Clock = Clock()
+    transport: Optional[GhTransport] = None
+    if args.replay_cassette:
+        clock = ScaledClock(args.replay_speed)
+        try:
+            transport = ReplayTransport(args.replay_cassette, clock)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取录像失败 {args.replay_cassette}: {e}")
+            return 1
+        # 未显式指定仓库时沿用录像中的仓库，避免依赖本地 git remote
+        if not args.repo and transport.header.get("repo"):
+            args.repo = transport.header["repo"]
+
+    # --root 指向其他仓库的工作目录；默认为本脚本所在仓库
+    root = args.root.resolve() if args.root else ROOT
+    todo_root = root / "todo" if args.root else TODO_ROOT
+    daemon_configs: Optional[List[RepoConfig]] = None
+    daemon_settings: dict = {}
+    if args.daemon_config:
+        try:
+            daemon_configs, daemon_settings = load_daemon_config(args.daemon_config)
+        except ValueError as e:
+            logger.error(str(e))
             return 1
-        owner, repo = args.repo.split("/", 1)
     else:
+        if args.repo:
+            if "/" not in args.repo:
+                logger.error("仓库格式错误，应为 owner/repo")
+                return 1
+            owner, repo = args.repo.split("/", 1)
+        else:
+            try:
+                owner, repo = resolve_repo()
+            except RuntimeError as e:
+                if args.dry_run or args.offline:
+                    logger.warning(f"DRY RUN 模式且无法检测仓库: {e}")
+                    logger.warning("将使用模拟仓库 dummy/repo 继续运行")
+                    owner, repo = "dummy", "repo"
+                else:
+                    raise
+        if args.daemon:
+            daemon_configs = [RepoConfig(owner, repo, root, todo_root)]
+
+    if daemon_configs is not None:
+        if args.record_cassette:
+            repo_ref = "daemon" if args.daemon_config else daemon_configs[0].name
+            transport = RecordingTransport(GhTransport(), args.record_cassette, repo_ref, clock)
         try:
-            owner, repo = resolve_repo()
-        except RuntimeError as e:
-            if args.dry_run:
-                logger.warning(f"DRY RUN 模式且无法检测仓库: {e}")
-                logger.warning("将使用模拟仓库 dummy/repo 继续运行")
-                owner, repo = "dummy", "repo"
-            else:
-                raise
+            return run_daemon(args, clock, transport, daemon_configs, daemon_settings)
+        except KeyboardInterrupt:
+            logger.warning("\n⚠ 用户中断执行")
+            return 130
+        finally:
+            if transport:
+                transport.close()
 
     logger.info("="*80)
     logger.info("Auto Copilot Pipeline - 配置")
@@ -1211,18 +4636,32 @@ def main() -> int:
     logger.info(f"Issue 超时: {args.issue_max_wait}秒 ({args.issue_max_wait/3600:.1f}小时)")
     logger.info(f"批次大小: {args.issue_batch_size}")
     logger.info(f"任务最大重试: {args.task_max_retries} 次 (初始等待 {args.task_retry_wait}秒)")
+    if args.auto_concurrency:
+        logger.info(f"并发数: 自适应 {args.min_concurrency}~{args.max_concurrency}")
+    else:
+        logger.info(f"并发数: {args.max_concurrency}")
     if args.dry_run:
         logger.info("模式: DRY RUN (预览)")
+    elif args.offline:
+        logger.info("模式: 离线（本地执行后端）")
+    if args.replay_cassette:
+        logger.info(f"模式: 回放录像 {args.replay_cassette} ({args.replay_speed:g}x)")
+    elif args.record_cassette:
+        logger.info(f"录制: {args.record_cassette}")
     logger.info("="*80)
 
     try:
         github: Optional[GitHubClient] = None
         if args.dry_run:
             logger.info("Dry-run 模式：跳过 GitHub 客户端初始化")
+        elif args.offline:
+            logger.info("离线模式：跳过 GitHub 客户端初始化")
         else:
-            github = GitHubClient(owner, repo)
-        ensure_core_documents()
-        pipeline = Pipeline(github, args)
+            if args.record_cassette:
+                transport = RecordingTransport(GhTransport(), args.record_cassette, f"{owner}/{repo}", clock)
+            github = GitHubClient(owner, repo, transport=transport, clock=clock)
+        ensure_core_documents(root)
+        pipeline = Pipeline(github, args, root=root, todo_root=todo_root)
 
         iteration = 0
         while True:
@@ -1233,15 +4672,24 @@ def main() -> int:
                 if not args.from_beginning:
                     completed_ids = pipeline.get_recent_completed_todos()
 
-                work_items = iter_work_items(TODO_ROOT, args.issue_batch_size, completed_ids)
+                work_items = pipeline.scan(completed_ids)
 
                 if not work_items:
                     if iteration == 1:
                         logger.info("✓ 所有 TODO 已完成，无需进一步操作。")
+                    if isinstance(transport, ReplayTransport):
+                        if replay_diverged(transport):
+                            return 1
+                        if transport.exhausted:
+                            logger.info("📼 录像已回放完毕")
+                            break
+                        # 回放不会有新任务出现：空闲时录像仍有剩余，说明调用序列与录制时不一致
+                        logger.error("✗ 回放已无待办任务，但录像尚未回放完毕：本次调用与录制时不一致")
+                        return 1
                     # 如果是持续运行模式，且没有新任务，等待一段时间再扫描
-                    if not args.dry_run:
+                    if not args.dry_run and not args.offline:
                         logger.info(f"暂无待办任务，{args.poll_interval} 秒后重新扫描...")
-                        time.sleep(args.poll_interval)
+                        pipeline.clock.sleep(args.poll_interval)
                         continue
                     break
 
@@ -1250,21 +4698,35 @@ def main() -> int:
                     logger.info(f"自动续传：检测到新的任务批次 (第 {iteration} 轮)")
                     logger.info("="*80)
 
-                pipeline.run(work_items)
+                failed = pipeline.run(work_items, completed_ids)
+
+                if args.offline and failed:
+                    logger.error("离线模式：本轮有任务失败，停止运行")
+                    return 1
 
                 if args.dry_run:
                     logger.info("Dry-run 模式：首轮任务预览完成，自动退出。")
                     break
+                if isinstance(transport, ReplayTransport):
+                    if replay_diverged(transport):
+                        return 1
+                    if transport.exhausted:
+                        logger.info("📼 录像已回放完毕")
+                        break
 
             except Exception as e:
                 logger.error(f"\n✗ 流水线执行出错 (第 {iteration} 轮): {e}", exc_info=True)
                 if args.dry_run:
                     raise  # Dry run 模式下直接报错退出
+                if isinstance(transport, ReplayTransport) and (isinstance(e, CassetteMissError)
+                                                               or replay_diverged(transport)):
+                    # 回放与录像不一致时重试只会得到同样的结果
+                    return 1
 
                 # 无人值守模式：等待后重试
                 wait_time = MAIN_ERROR_WAIT
                 logger.info(f"将在 {wait_time} 秒后自动重试...")
-                time.sleep(wait_time)
+                pipeline.clock.sleep(wait_time)
                 continue
 
         logger.info("\n" + "="*80)
@@ -1277,6 +4739,9 @@ def main() -> int:
     except Exception as e:
         logger.error(f"\n✗ 致命错误: {e}", exc_info=True)
         return 1
+    finally:
+        if transport:
+            transport.close()
 
 def signal_handler(signum: int, frame: Any) -> None:
     """优雅退出信号处理器"""
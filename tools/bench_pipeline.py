@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+400万字网文AI创作系统 · 本地热路径基准测试
+=========================================
+
+测量 Pipeline 启动与派发前的本地热路径：
+1. parse_stage_structure：逐个解析 TODO 文件
+2. iter_work_items：按 Stage 锁定筛选待处理工作项
+3. _build_body / _build_full_issue_body：为每个工作项渲染 Issue 正文
+4. completed_ids_from_issues：从已关闭 Issue 标题中提取已完成 ID
+
+数据集为仓库真实的 todo/ 文件，以及按真实 TODO 块复制生成的合成计划（默认 1 万 / 10 万个 TODO）。
+合成计划分 4 个 Stage 文件，每个文件一半已勾选；前 3 个文件的未勾选项在 GitHub 上已关闭，
+iter_work_items 必须读完前 3 个文件才能锁定第 4 个 Stage，对应计划后期启动的最坏情况。
+
+每个用例记录最快 / 中位耗时与峰值内存（tracemalloc），与 .pipeline/bench-baseline.json 中的基线比较，
+超出容差即以退出码 1 失败；同一用例在最大与最小合成规模间的单项耗时之比超过 SCALING_LIMIT
+（非线性增长）同样判定失败。基线不存在时本次结果即作为基线保存。
+
+用法：
+    python tools/bench_pipeline.py                     # 运行并与基线比较
+    python tools/bench_pipeline.py --update-baseline   # 重新记录基线
+    python tools/bench_pipeline.py --sizes 10000 --only parse
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import logging
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import auto_copilot_pipeline as pipeline
+
+ROOT = pipeline.ROOT
+
+# ==================== 配置 ====================
+
+BASELINE_NAME = "bench-baseline.json"
+DEFAULT_SIZES = (10_000, 100_000)
+DEFAULT_REPEAT = 3
+# 退化判定：耗时 / 峰值内存超过基线的比例，另加绝对余量吸收小用例的计时与分配噪声
+TIME_TOLERANCE = 0.5
+MEMORY_TOLERANCE = 0.25
+TIME_SLACK = 0.005  # 秒
+MEMORY_SLACK = 256 * 1024  # 字节
+# 最大与最小合成规模的单项耗时之比上限（线性算法应接近 1）
+SCALING_LIMIT = 3.0
+SYNTHETIC_FILES = 4
+
+
+# ==================== 数据模型 ====================
+
+@dataclass
+class BenchResult:
+    name: str
+    items: int  # 本用例处理的条目数
+    best: float  # 秒
+    median: float  # 秒
+    peak: int  # tracemalloc 峰值，字节
+
+    @property
+    def per_item(self) -> float:
+        return self.best / max(1, self.items)
+
+
+@dataclass
+class Regression:
+    name: str
+    reason: str
+
+
+def measure(name: str, items: int, func: Callable[[], Any], repeat: int, warmup: bool = True) -> BenchResult:
+    """预热一次后计时 repeat 次；峰值内存在单独一次运行中测量，避免 tracemalloc 拖慢计时"""
+    if warmup:
+        func()
+    times = []
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return BenchResult(name, items, min(times), statistics.median(times), peak)
+
+
+# ==================== 合成计划 ====================
+
+def load_templates(todo_root: Path) -> List[List[str]]:
+    """从真实 TODO 文件中切出 TODO 块（TODO 行及其后直到下一个 TODO 行的全部内容）"""
+    templates: List[List[str]] = []
+    for path in sorted(todo_root.glob("Stage-*.todos.md"), key=pipeline.stage_file_sort_key):
+        block: Optional[List[str]] = None
+        for line in path.read_text(encoding="utf-8").splitlines():
+            if pipeline.TODO_LINE_PATTERN.match(line):
+                if block:
+                    templates.append(block)
+                block = [line]
+            elif block is not None:
+                block.append(line)
+        if block:
+            templates.append(block)
+    return templates
+
+
+@dataclass
+class SyntheticPlan:
+    todo_root: Path
+    todos: int
+    completed_ids: set[str]  # 未勾选但 GitHub 上已关闭的 TODO
+
+
+def write_synthetic_plan(todo_root: Path, templates: List[List[str]], count: int) -> SyntheticPlan:
+    """按模板循环生成 count 个 TODO，分布到 SYNTHETIC_FILES 个 Stage 文件"""
+    todo_root.mkdir(parents=True, exist_ok=True)
+    per_file = -(-count // SYNTHETIC_FILES)
+    completed: set[str] = set()
+    written = 0
+    for file_index in range(SYNTHETIC_FILES):
+        stage = file_index + 1
+        path = todo_root / f"Stage-{stage:02d}_Synthetic-Bench.todos.md"
+        lines = [f"# Stage {stage:02d} · 合成基准 TODO 清单", "", "---", ""]
+        last_file = file_index == SYNTHETIC_FILES - 1
+        for _ in range(min(per_file, count - written)):
+            header, *body = templates[written % len(templates)]
+            match = pipeline.TODO_LINE_PATTERN.match(header)
+            todo_id = f"{match.group('todo_id').strip()}-N{written:06d}"
+            title = match.group("title").strip()
+            checked = written % 2 == 0
+            lines.append(f"### - [{'x' if checked else ' '}] [{todo_id}] {title}")
+            lines.extend(body)
+            if not checked and not last_file:
+                completed.add(todo_id)
+            written += 1
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return SyntheticPlan(todo_root, written, completed)
+
+
+def closed_issue_titles(count: int, templates: List[List[str]]) -> List[dict]:
+    """count 个已关闭 Issue，含少量无 ID 的标题与非字典条目（gh 输出中的噪声）"""
+    issues: List[Any] = []
+    for n in range(count):
+        match = pipeline.TODO_LINE_PATTERN.match(templates[n % len(templates)][0])
+        if n % 50 == 0:
+            issues.append({"number": n + 1, "title": "手动创建的讨论 Issue"})
+        elif n % 97 == 0:
+            issues.append(None)
+        else:
+            issues.append({"number": n + 1, "title": f"[{match.group('todo_id')}-N{n:06d}] {match.group('title')}"})
+    return issues
+
+
+# ==================== 用例 ====================
+
+def parse_all(todo_root: Path) -> int:
+    return sum(len(pipeline.parse_stage_structure(path)[1]) for path in todo_root.glob("Stage-*.todos.md"))
+
+
+def all_pending_items(todo_root: Path) -> List[pipeline.WorkItem]:
+    """每个 Stage 文件中全部未勾选的 TODO，各自作为一个工作项（不做 Stage 锁定）"""
+    items = []
+    for path in sorted(todo_root.glob("Stage-*.todos.md"), key=pipeline.stage_file_sort_key):
+        stage_num, todos = pipeline.parse_stage_structure(path)
+        items.extend(pipeline.WorkItem(todo.id_full, stage_num, todo.title, path, [todo]) for todo in todos)
+    return items
+
+
+def render_all(runner: pipeline.Pipeline, items: Sequence[pipeline.WorkItem]) -> int:
+    size = 0
+    for item in items:
+        size += len(runner._build_full_issue_body(item, runner._build_body(item)))
+    return size
+
+
+def make_runner() -> pipeline.Pipeline:
+    args = pipeline.build_arg_parser().parse_args(
+        ["--dry-run", "--no-history", "--no-dup-check", "--no-lint", "--repo", "bench/bench"]
+    )
+    return pipeline.Pipeline(None, args, root=ROOT)
+
+
+def run_benchmarks(sizes: Sequence[int], repeat: int, only: Optional[str], workdir: Path) -> List[BenchResult]:
+    todo_root = ROOT / "todo"
+    templates = load_templates(todo_root)
+    if not templates:
+        raise SystemExit(f"未在 {todo_root} 中找到 TODO 块，无法生成合成计划")
+    runner = make_runner()
+    results: List[BenchResult] = []
+
+    def bench(name: str, items: int, func: Callable[[], Any], runs: int = repeat, warmup: bool = True) -> None:
+        if only and only not in name:
+            return
+        results.append(measure(name, items, func, runs, warmup))
+        print(f"  {name}: {results[-1].best * 1000:.1f}ms", file=sys.stderr)
+
+    real_todos = parse_all(todo_root)
+    real_items = all_pending_items(todo_root)
+    bench("parse_stage_structure[real]", real_todos, lambda: parse_all(todo_root))
+    bench("iter_work_items[real]", real_todos, lambda: pipeline.iter_work_items(todo_root, 1, set()))
+    bench("render_issue_body[real]", len(real_items), lambda: render_all(runner, real_items))
+
+    for size in sorted(sizes):
+        label = f"{size // 1000}k" if size % 1000 == 0 else str(size)
+        print(f"生成合成计划: {size} 个 TODO", file=sys.stderr)
+        plan = write_synthetic_plan(workdir / f"todo-{size}", templates, size)
+        # 大规模用例单次即达秒级，跳过预热并减少重复次数
+        small = size <= 10_000
+        runs = repeat if small else max(1, repeat - 1)
+        bench(f"parse_stage_structure[{label}]", plan.todos, lambda: parse_all(plan.todo_root), runs, small)
+        bench(f"iter_work_items[{label}]", plan.todos,
+              lambda: pipeline.iter_work_items(plan.todo_root, 1, plan.completed_ids), runs, small)
+        items = pipeline.iter_work_items(plan.todo_root, 1, plan.completed_ids)
+        bench(f"render_issue_body[{label}]", len(items), lambda: render_all(runner, items), runs, small)
+        issues = closed_issue_titles(size, templates)
+        bench(f"completed_ids_from_issues[{label}]", size,
+              lambda: pipeline.completed_ids_from_issues(issues), runs, small)
+    return results
+
+
+# ==================== 基线比较 ====================
+
+def load_baseline(path: Path) -> Optional[Dict[str, dict]]:
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("results", {})
+    except (OSError, ValueError) as e:
+        print(f"读取基线失败，忽略: {e}", file=sys.stderr)
+        return None
+
+
+def save_baseline(path: Path, results: Sequence[BenchResult]) -> None:
+    """把结果合并进基线文件：只覆盖本次运行的用例，--only 运行不会丢弃其他用例的基线"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    recorded = load_baseline(path) or {}
+    recorded.update({result.name: asdict(result) for result in results})
+    data = {
+        "recorded": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "results": recorded,
+    }
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+
+
+def compare(results: Sequence[BenchResult], baseline: Dict[str, dict],
+            time_tolerance: float, memory_tolerance: float) -> List[Regression]:
+    regressions = []
+    for result in results:
+        base = baseline.get(result.name)
+        if not base:
+            continue
+        time_limit = base["best"] * (1 + time_tolerance) + TIME_SLACK
+        if result.best > time_limit:
+            regressions.append(Regression(
+                result.name, f"耗时 {result.best * 1000:.1f}ms > 基线 {base['best'] * 1000:.1f}ms × {1 + time_tolerance:g}"
+            ))
+        memory_limit = base["peak"] * (1 + memory_tolerance) + MEMORY_SLACK
+        if result.peak > memory_limit:
+            regressions.append(Regression(
+                result.name, f"峰值内存 {result.peak / 2**20:.1f}MiB > 基线 {base['peak'] / 2**20:.1f}MiB × {1 + memory_tolerance:g}"
+            ))
+    return regressions
+
+
+def check_scaling(results: Sequence[BenchResult]) -> List[Regression]:
+    """同一用例在最大与最小合成规模间的单项耗时之比，超过 SCALING_LIMIT 视为非线性增长"""
+    families: Dict[str, List[BenchResult]] = {}
+    for result in results:
+        family, _, label = result.name.partition("[")
+        if label != "real]" and result.items:
+            families.setdefault(family, []).append(result)
+    regressions = []
+    for family, series in families.items():
+        if len(series) < 2:
+            continue
+        series.sort(key=lambda result: result.items)
+        smallest, largest = series[0], series[-1]
+        ratio = largest.per_item / max(smallest.per_item, 1e-12)
+        if ratio > SCALING_LIMIT:
+            regressions.append(Regression(
+                family, f"单项耗时从 {smallest.items} 到 {largest.items} 条增长 {ratio:.1f} 倍 (上限 {SCALING_LIMIT:g})"
+            ))
+    return regressions
+
+
+# ==================== 命令行 ====================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="解析 / 渲染热路径基准测试（耗时与峰值内存，超出基线容差即失败）")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(DEFAULT_SIZES),
+                        help=f"合成计划的 TODO 数 (默认: {' '.join(map(str, DEFAULT_SIZES))})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"计时重复次数 (默认: {DEFAULT_REPEAT})")
+    parser.add_argument("--only", default=None, help="只运行名称包含该字符串的用例")
+    parser.add_argument("--baseline", type=Path, default=ROOT / ".pipeline" / BASELINE_NAME,
+                        help="基线文件 (默认: .pipeline/bench-baseline.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="以本次结果覆盖基线")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE,
+                        help=f"允许的耗时增幅 (默认: {TIME_TOLERANCE:g}，即 +{TIME_TOLERANCE:.0%})")
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE,
+                        help=f"允许的峰值内存增幅 (默认: {MEMORY_TOLERANCE:g})")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    args = parser.parse_args()
+
+    # 解析器按文件输出 INFO 日志，基准中只保留警告
+    logging.getLogger("copilot-pipeline").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory(prefix="bench-pipeline-") as workdir:
+        results = run_benchmarks(args.sizes, args.repeat, args.only, Path(workdir))
+
+    baseline = None if args.update_baseline else load_baseline(args.baseline)
+    regressions = check_scaling(results)
+    if baseline is not None:
+        regressions += compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+
+    if args.json:
+        print(json.dumps({
+            "results": [dict(asdict(result), per_item=result.per_item) for result in results],
+            "regressions": [asdict(regression) for regression in regressions],
+        }, ensure_ascii=False, indent=2))
+    else:
+        print(f"{'用例':<36}{'条目':>9}{'最快':>11}{'中位':>11}{'单项':>10}{'峰值内存':>11}{'对比基线':>10}")
+        for result in results:
+            base = (baseline or {}).get(result.name)
+            delta = f"{result.best / base['best'] - 1:+.0%}" if base and base["best"] else "-"
+            print(f"{result.name:<36}{result.items:>9}{result.best * 1000:>9.1f}ms{result.median * 1000:>9.1f}ms"
+                  f"{result.per_item * 1e6:>8.1f}µs{result.peak / 2**20:>8.1f}MiB{delta:>10}")
+        for regression in regressions:
+            print(f"❌ {regression.name}: {regression.reason}")
+
+    # 首次运行或新增用例时，把尚无基线的结果记为基线
+    unrecorded = [result for result in results if baseline is None or result.name not in baseline]
+    if unrecorded:
+        save_baseline(args.baseline, unrecorded)
+        print(f"已记录 {len(unrecorded)} 个用例的基线: {args.baseline}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
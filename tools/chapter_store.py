@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+400万字网文AI创作系统 · 章节索引
+=================================
+
+为 archives/ 下的正文建立“章号 → 文件 + 字节区间”索引，按需通过 mmap 取出任意一章、
+一个章节范围或某章的最后 N 个字符，不必读取整卷文件。
+
+Stage-04 每 3 章一组需要“当前章节的大纲和上一章结尾”，Stage-06 按 10 章一组重写章末；
+Pipeline 用本索引把上一章结尾直接嵌入 Issue 描述。
+
+实现要点：
+1. 索引键为 (阶段, 卷, 章)；同一章节组 / 卷只取最新版本（与 corpus_stats 的正文口径一致）
+2. 章节边界由字节正则在 mmap 上扫描章节标题得到，逐文件按大小 + mtime 增量更新，
+   结果缓存于 .pipeline/chapter-index.json
+3. 取章末时只映射末尾一个小窗口（不足时倍增），耗时与章节长度无关
+
+用法：
+    python tools/chapter_store.py                        # 输出索引概况
+    python tools/chapter_store.py --volume 1 --chapter 12          # 输出第 12 章全文
+    python tools/chapter_store.py --volume 1 --chapter 12 --tail 200  # 输出第 12 章最后 200 字
+    python tools/chapter_store.py --stage 5 --volume 1 --chapter 1 --to 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from corpus_stats import (
+    ARCHIVE_DIR, CHAPTER_HEADING_PATTERN, HEADING_NUMBER_PATTERN, ROOT,
+    classify, parse_chinese_number, version_rank,
+)
+
+# ==================== 配置 ====================
+
+INDEX_NAME = "chapter-index.json"
+INDEX_VERSION = 1
+DEFAULT_STAGE = 4  # Stage-04 批量生产的正文
+TAIL_CHARS = 200  # 默认取章末 200 字（Stage-06 的章末检查范围）
+UTF8_MAX_BYTES = 4  # 单个字符的最大 UTF-8 字节数，用于估算章末窗口
+
+logger = logging.getLogger("chapter-store")
+
+
+# ==================== 数据模型 ====================
+
+@dataclass
+class IndexedFile:
+    path: str  # 相对仓库根目录的 POSIX 路径
+    size: int
+    mtime_ns: int
+    stage: int
+    volume: int
+    kind: str
+    start: Optional[int] = None  # Ch-001-003 的起止章号
+    end: Optional[int] = None
+    # [[章号, 起始字节, 结束字节], ...]，区间包含章节标题
+    chapters: List[List[int]] = field(default_factory=list)
+
+    @property
+    def unit(self) -> tuple:
+        return (self.stage, self.volume, self.start, self.end)
+
+
+def scan_chapters(data, start: Optional[int] = None) -> List[List[int]]:
+    """在文件字节上定位各章区间；章号取自标题，标题无法解析时按文件名的起始章号顺延"""
+    headings = list(CHAPTER_HEADING_PATTERN.finditer(data))
+    if not headings:
+        # 无章节标题的单章文件
+        if start is not None and len(data):
+            return [[start, 0, len(data)]]
+        return []
+    spans = []
+    for index, heading in enumerate(headings):
+        begin = heading.start()
+        finish = headings[index + 1].start() if index + 1 < len(headings) else len(data)
+        match = HEADING_NUMBER_PATTERN.search(heading.group().decode("utf-8", "replace"))
+        number = parse_chinese_number(match.group(1)) if match else None
+        if number is None:
+            if start is None:
+                continue
+            number = start + index
+        spans.append([number, begin, finish])
+    return spans
+
+
+# ==================== 章节索引 ====================
+
+class ChapterStore:
+    """正文章节索引；线程安全，可在 Pipeline 的多个工作线程间共享"""
+
+    def __init__(self, root: Path = ROOT, index_path: Optional[Path] = None) -> None:
+        self.root = root
+        self.index_path = index_path or root / ".pipeline" / INDEX_NAME
+        self.files: Dict[str, IndexedFile] = {}
+        # (阶段, 卷, 章) -> (文件, 起始字节, 结束字节)
+        self._chapters: Dict[Tuple[int, int, int], Tuple[str, int, int]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    # ---------- 缓存 ----------
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取章节索引失败，将重新建立: {e}")
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        try:
+            self.files = {entry["path"]: IndexedFile(**entry) for entry in data.get("files", [])}
+        except TypeError as e:
+            logger.warning(f"章节索引格式不兼容，将重新建立: {e}")
+            self.files = {}
+        self._rebuild_lookup()
+
+    def save(self) -> None:
+        data = {"version": INDEX_VERSION, "files": [asdict(entry) for entry in self.files.values()]}
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def _rebuild_lookup(self) -> None:
+        latest: Dict[tuple, IndexedFile] = {}
+        for entry in self.files.values():
+            best = latest.get(entry.unit)
+            if best is None or version_rank(entry.kind) > version_rank(best.kind):
+                latest[entry.unit] = entry
+        lookup = {}
+        for entry in latest.values():
+            for number, begin, finish in entry.chapters:
+                lookup[(entry.stage, entry.volume, number)] = (entry.path, begin, finish)
+        self._chapters = lookup
+
+    # ---------- 刷新 ----------
+
+    def refresh(self) -> int:
+        """扫描 archives/ 下的正文文件，只重新索引变化的文件，返回重新索引的文件数"""
+        reindexed = 0
+        seen = set()
+        with self._lock:
+            archive = self.root / ARCHIVE_DIR
+            stack = [archive]
+            while stack:
+                try:
+                    entries = os.scandir(stack.pop())
+                except FileNotFoundError:
+                    continue
+                with entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(Path(entry.path))
+                            continue
+                        if not entry.name.endswith(".md") or not entry.is_file():
+                            continue
+                        rel = Path(entry.path).relative_to(self.root).as_posix()
+                        info = classify(rel)
+                        if not info.get("kind") or info.get("stage") is None or info.get("volume") is None:
+                            continue
+                        seen.add(rel)
+                        st = entry.stat()
+                        cached = self.files.get(rel)
+                        if cached and cached.size == st.st_size and cached.mtime_ns == st.st_mtime_ns:
+                            continue
+                        self.files[rel] = self._index_file(rel, st, info)
+                        reindexed += 1
+            removed = [rel for rel in self.files if rel not in seen]
+            for rel in removed:
+                del self.files[rel]
+            if reindexed or removed:
+                self._rebuild_lookup()
+                self.save()
+        return reindexed
+
+    def _index_file(self, rel: str, st: os.stat_result, info: dict) -> IndexedFile:
+        chapters: List[List[int]] = []
+        if st.st_size:
+            with open(self.root / rel, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                chapters = scan_chapters(mm, info.get("start"))
+        return IndexedFile(
+            rel, st.st_size, st.st_mtime_ns, info["stage"], info["volume"], info["kind"],
+            info.get("start"), info.get("end"), chapters,
+        )
+
+    # ---------- 查询 ----------
+
+    def _locate(self, volume: int, number: int, stage: Optional[int]) -> Optional[Tuple[str, int, int]]:
+        """stage 为空时取拥有该章的最高阶段"""
+        with self._lock:
+            if stage is not None:
+                return self._chapters.get((stage, volume, number))
+            stages = sorted({key[0] for key in self._chapters if key[1] == volume and key[2] == number})
+            return self._chapters.get((stages[-1], volume, number)) if stages else None
+
+    def _read(self, rel: str, begin: int, finish: int) -> bytes:
+        with open(self.root / rel, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[begin:min(finish, len(mm))]
+
+    def chapter(self, volume: int, number: int, stage: Optional[int] = DEFAULT_STAGE) -> Optional[str]:
+        """返回一章全文（含标题），不存在时返回 None"""
+        span = self._locate(volume, number, stage)
+        if span is None:
+            return None
+        return self._read(*span).decode("utf-8", "replace").strip()
+
+    def chapters(self, volume: int, first: int, last: int,
+                 stage: Optional[int] = DEFAULT_STAGE) -> List[Tuple[int, str]]:
+        """返回 [first, last] 范围内已有的各章 (章号, 全文)"""
+        result = []
+        for number in range(first, last + 1):
+            text = self.chapter(volume, number, stage)
+            if text is not None:
+                result.append((number, text))
+        return result
+
+    def tail(self, volume: int, number: int, chars: int = TAIL_CHARS,
+             stage: Optional[int] = DEFAULT_STAGE) -> Optional[str]:
+        """返回一章去掉末尾空白后的最后 chars 个字符；只读取章末窗口，窗口不足时倍增"""
+        span = self._locate(volume, number, stage)
+        if span is None:
+            return None
+        rel, begin, finish = span
+        window = chars * UTF8_MAX_BYTES + 64
+        with open(self.root / rel, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            finish = min(finish, len(mm))
+            while True:
+                offset = max(begin, finish - window)
+                # 窗口起点可能落在多字节字符中间，丢弃不完整的首字符
+                text = mm[offset:finish].decode("utf-8", "ignore").rstrip()
+                if len(text) >= chars or offset == begin:
+                    return text[-chars:].lstrip()
+                window *= 2
+
+    def previous(self, volume: int, number: int,
+                 stage: Optional[int] = DEFAULT_STAGE) -> Optional[Tuple[int, int]]:
+        """上一章的 (卷, 章号)：同卷的前一章，卷首则取上一卷的最后一章"""
+        if number > 1 and self._locate(volume, number - 1, stage) is not None:
+            return volume, number - 1
+        with self._lock:
+            keys = [key for key in self._chapters if stage is None or key[0] == stage]
+        earlier = [(key[1], key[2]) for key in keys if (key[1], key[2]) < (volume, number)]
+        return max(earlier) if earlier else None
+
+    def summary(self) -> Dict[int, Dict[int, int]]:
+        """各阶段各卷已索引的章节数"""
+        with self._lock:
+            result: Dict[int, Dict[int, int]] = {}
+            for stage, volume, _ in self._chapters:
+                volumes = result.setdefault(stage, {})
+                volumes[volume] = volumes.get(volume, 0) + 1
+            return result
+
+
+# ==================== 命令行 ====================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="正文章节索引：按章号读取章节或章末")
+    parser.add_argument("--root", type=Path, default=ROOT, help="仓库根目录")
+    parser.add_argument("--stage", type=int, default=None, help="阶段号（默认取拥有该章的最高阶段）")
+    parser.add_argument("--volume", type=int, help="卷号")
+    parser.add_argument("--chapter", type=int, help="章号")
+    parser.add_argument("--to", type=int, help="输出从 --chapter 到该章的范围")
+    parser.add_argument("--tail", type=int, help="只输出每章最后 N 个字符")
+    parser.add_argument("--rebuild", action="store_true", help="忽略缓存，重新建立索引")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    store = ChapterStore(args.root.resolve())
+    if args.rebuild:
+        store.files.clear()
+    started = time.perf_counter()
+    reindexed = store.refresh()
+    elapsed = time.perf_counter() - started
+
+    if args.volume is None or args.chapter is None:
+        for stage, volumes in sorted(store.summary().items()):
+            counts = "，".join(f"卷{volume} {count}章" for volume, count in sorted(volumes.items()))
+            print(f"Stage {stage:02d}: {counts}")
+        print(f"重新索引 {reindexed} 个文件，耗时 {elapsed * 1000:.0f}ms")
+        return 0
+
+    found = False
+    for number in range(args.chapter, (args.to or args.chapter) + 1):
+        if args.tail:
+            text = store.tail(args.volume, number, args.tail, stage=args.stage)
+        else:
+            text = store.chapter(args.volume, number, stage=args.stage)
+        if text is None:
+            continue
+        found = True
+        if args.tail:
+            print(f"===== 卷{args.volume} 第{number:03d}章 · 最后 {args.tail} 字 =====")
+        print(text)
+        print()
+    if not found:
+        print(f"未找到卷{args.volume} 第{args.chapter}章", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+400万字网文AI创作系统 · 字符级差异
+===================================
+
+Stage-05 润色与 Stage-06 锁链式优化的 PR 会改写整卷正文中的局部。中文没有词边界，行级 diff
+往往整段标红，看不出到底改了哪几个字。本工具按章对齐新旧版本，在句子与字符粒度上求最短编辑脚本，
+统计每章的改动率与改动段落，并可检查改动是否都落在章末窗口内（“章末截断”任务只允许改章末）。
+章末被整段删除时，窗口锚定在截断点上：删掉多长的结尾都可以，截断点前后只允许改窗口内的文字。
+
+实现要点：
+1. 两个版本先按章节标题切分、按章号对齐；内容相同的章直接跳过，只有改动过的章参与 diff
+2. 每次比较前先剥离公共前缀与后缀（锚定快速路径），章末改写通常只剩末尾几十个字需要求解
+3. 核心为 Myers O(ND) 算法的线性空间版本：双向搜索中间蛇（middle snake）后递归求解两侧，
+   内存只需 O(N + M)
+4. 先以句子为单位求 diff（句子映射为整数），再对每个改动块逐字细化；超过 REFINE_MAX_CHARS
+   的改动块或编辑步数超过 REFINE_MAX_EDITS 的子区间视为整块替换，耗时与章节长度基本无关
+
+用法：
+    python tools/char_diff.py OLD NEW                         # 比较两个文件，输出每章改动概况
+    python tools/char_diff.py OLD NEW --show                  # 同时列出每处改动
+    python tools/char_diff.py --git main archives/Stage-05_Final-Polish/Volume-01_Release.md
+    python tools/char_diff.py OLD NEW --ending-only --window 200   # 改动超出章末窗口时退出码为 1
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from corpus_stats import HEADING_NUMBER_PATTERN, ROOT, parse_chinese_number
+from prose_lint import CHAPTER_HEADING_PATTERN, ENDING_WINDOW
+
+# ==================== 配置 ====================
+
+REFINE_MAX_CHARS = 4000  # 句子级改动块任一侧超过该字符数时不再逐字细化
+REFINE_MAX_EDITS = 64  # 逐字细化时单次搜索的编辑步数上限，超过即视为整句改写
+EXCERPT_CHARS = 30
+# 句子：非终止符 + 终止符（含其后的引号、括号与换行）；单独的换行也成句，保证切分后可原样拼回
+SENTENCE_PATTERN = re.compile(
+    r"[^。！？!?…；;\n]*(?:[。！？!?…；;]+[”’\"」』）)]*\n*|\n+)|[^。！？!?…；;\n]+"
+)
+
+Span = Tuple[int, int, int, int]  # (旧起点, 旧终点, 新起点, 新终点)，终点不含
+
+
+# ==================== Myers 线性空间 diff ====================
+
+def _middle_split(a: Sequence, a0: int, a1: int, b: Sequence, b0: int, b1: int,
+                  max_edits: Optional[int] = None) -> Optional[Tuple[int, int]]:
+    """双向搜索 D 路径，返回正反两条路径相遇处的切分点（绝对坐标）
+
+    调用方保证两侧非空且首尾元素各不相同，因此 D ≥ 2，切分点严格位于两端之间。
+    单向搜索超过 max_edits 步仍未相遇时返回 None。
+    """
+    n, m = a1 - a0, b1 - b0
+    delta = n - m
+    odd = delta & 1
+    max_d = (n + m + 1) // 2
+    limit = max_d if max_edits is None else min(max_d, max_edits)
+    offset = max_d + 1
+    size = 2 * offset + 1
+    forward = [-1] * size
+    backward = [-1] * size
+    forward[offset + 1] = 0
+    backward[offset + 1] = 0
+    # 越界的对角线不再扩展：k 的上下界随搜索收缩
+    f_low = f_high = b_low = b_high = 0
+    for d in range(limit + 1):
+        for k in range(-d + f_low, d + 1 - f_high, 2):
+            index = offset + k
+            if k == -d or (k != d and forward[index - 1] < forward[index + 1]):
+                x = forward[index + 1]
+            else:
+                x = forward[index - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            forward[index] = x
+            if x > n:
+                f_high += 2
+            elif y > m:
+                f_low += 2
+            elif odd:
+                mirror = offset + delta - k
+                if 0 <= mirror < size and backward[mirror] != -1 and x >= n - backward[mirror]:
+                    return a0 + x, b0 + y
+        for k in range(-d + b_low, d + 1 - b_high, 2):
+            index = offset + k
+            if k == -d or (k != d and backward[index - 1] < backward[index + 1]):
+                x = backward[index + 1]
+            else:
+                x = backward[index - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a1 - 1 - x] == b[b1 - 1 - y]:
+                x += 1
+                y += 1
+            backward[index] = x
+            if x > n:
+                b_high += 2
+            elif y > m:
+                b_low += 2
+            elif not odd:
+                mirror = offset + delta - k
+                if 0 <= mirror < size and forward[mirror] != -1:
+                    fx = forward[mirror]
+                    if fx >= n - x:
+                        return a0 + fx, b0 + fx - (delta - k)
+    return None  # 超出 max_edits（不限制时不可达：D 不会超过 n + m）
+
+
+def common_prefix(a: Sequence, b: Sequence, a0: int, a1: int, b0: int, b1: int) -> int:
+    """a[a0:a1] 与 b[b0:b1] 的公共前缀长度；按切片二分比较，比逐个元素比较快得多"""
+    low, high = 0, min(a1 - a0, b1 - b0)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[a0 + low:a0 + mid] == b[b0 + low:b0 + mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def common_suffix(a: Sequence, b: Sequence, a0: int, a1: int, b0: int, b1: int) -> int:
+    low, high = 0, min(a1 - a0, b1 - b0)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[a1 - mid:a1 - low] == b[b1 - mid:b1 - low]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def myers_diff(a: Sequence, b: Sequence, max_edits: Optional[int] = None) -> List[Span]:
+    """最短编辑脚本中的改动块（相邻改动已合并），只返回不相同的区间
+
+    指定 max_edits 时，编辑距离过大的子区间不再细分，直接作为一个整体替换的改动块。
+    """
+    spans: List[Span] = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+        # 锚定快速路径：剥离公共前缀与后缀
+        head = common_prefix(a, b, a0, a1, b0, b1)
+        a0 += head
+        b0 += head
+        tail = common_suffix(a, b, a0, a1, b0, b1)
+        a1 -= tail
+        b1 -= tail
+        if a0 == a1 or b0 == b1:
+            if a0 < a1 or b0 < b1:
+                spans.append((a0, a1, b0, b1))
+            continue
+        split = _middle_split(a, a0, a1, b, b0, b1, max_edits)
+        if split is None:
+            spans.append((a0, a1, b0, b1))
+            continue
+        x, y = split
+        # 后压入左半边，先处理左半边，输出按位置有序
+        stack.append((x, a1, y, b1))
+        stack.append((a0, x, b0, y))
+    return _merge_adjacent(spans)
+
+
+def _merge_adjacent(spans: List[Span]) -> List[Span]:
+    merged: List[Span] = []
+    for span in spans:
+        if merged and merged[-1][1] == span[0] and merged[-1][3] == span[2]:
+            last = merged[-1]
+            merged[-1] = (last[0], span[1], last[2], span[3])
+        else:
+            merged.append(span)
+    return merged
+
+
+def split_sentences(text: str) -> List[str]:
+    return SENTENCE_PATTERN.findall(text)
+
+
+def diff_text(old: str, new: str, refine: bool = True) -> List[Span]:
+    """先按句子求 diff，再对改动块逐字细化；返回字符坐标的改动块"""
+    if old == new:
+        return []
+    # 整段文本先剥离公共前后缀，句子切分只作用于中间部分
+    head = common_prefix(old, new, 0, len(old), 0, len(new))
+    tail = common_suffix(old, new, head, len(old), head, len(new))
+    old_mid, new_mid = old[head:len(old) - tail], new[head:len(new) - tail]
+    if not old_mid or not new_mid:
+        return [(head, len(old) - tail, head, len(new) - tail)]
+
+    old_sentences, new_sentences = split_sentences(old_mid), split_sentences(new_mid)
+    ids: Dict[str, int] = {}
+    old_ids = [ids.setdefault(s, len(ids)) for s in old_sentences]
+    new_ids = [ids.setdefault(s, len(ids)) for s in new_sentences]
+    old_offsets = _offsets(old_sentences, head)
+    new_offsets = _offsets(new_sentences, head)
+
+    spans: List[Span] = []
+    for s0, s1, t0, t1 in myers_diff(old_ids, new_ids):
+        a0, a1 = old_offsets[s0], old_offsets[s1]
+        b0, b1 = new_offsets[t0], new_offsets[t1]
+        if refine and a1 > a0 and b1 > b0 and max(a1 - a0, b1 - b0) <= REFINE_MAX_CHARS:
+            spans.extend((a0 + x0, a0 + x1, b0 + y0, b0 + y1)
+                         for x0, x1, y0, y1 in myers_diff(old[a0:a1], new[b0:b1], REFINE_MAX_EDITS))
+        else:
+            spans.append((a0, a1, b0, b1))
+    return spans
+
+
+def _offsets(pieces: List[str], start: int) -> List[int]:
+    offsets = [start]
+    for piece in pieces:
+        offsets.append(offsets[-1] + len(piece))
+    return offsets
+
+
+# ==================== 按章统计 ====================
+
+@dataclass
+class Chapter:
+    number: Optional[int]  # 无章节标题的文件为 None
+    start: int  # 区间包含章节标题
+    end: int
+    body_end: int  # 去掉尾部空白后的正文终点，章末窗口由此向前计算
+
+
+@dataclass
+class ChapterDiff:
+    number: Optional[int]
+    status: str  # modified / added / removed
+    old_chars: int
+    new_chars: int
+    deleted: int
+    inserted: int
+    hunks: int
+    paragraphs: int  # 改动涉及的段落数（按新版本计，纯删除按删除位置所在段落计）
+    outside_ending: int  # 起点早于章末窗口的改动块数
+    first_offset: Optional[int] = None  # 最早一处改动距章末的字符数（章末被截断时距截断点）
+    truncated: int = 0  # 旧版截断点之后被删去的正文字符数
+    spans: List[Span] = field(default_factory=list)
+
+    @property
+    def ratio(self) -> float:
+        total = self.old_chars + self.new_chars
+        return (self.deleted + self.inserted) / total if total else 0.0
+
+    @property
+    def label(self) -> str:
+        return f"第{self.number}章" if self.number is not None else "全文"
+
+
+@dataclass
+class FileDiff:
+    chapters: List[ChapterDiff]
+    window: int
+    unchanged: int  # 未改动的章数
+    elapsed: float
+
+    @property
+    def ending_only(self) -> bool:
+        """所有改动都在各章章末窗口内（新增 / 删除整章不算）"""
+        return all(c.status == "modified" and not c.outside_ending for c in self.chapters)
+
+    @property
+    def deleted(self) -> int:
+        return sum(c.deleted for c in self.chapters)
+
+    @property
+    def inserted(self) -> int:
+        return sum(c.inserted for c in self.chapters)
+
+    @property
+    def paragraphs(self) -> int:
+        return sum(c.paragraphs for c in self.chapters)
+
+    def summary(self) -> str:
+        if not self.chapters:
+            return "无改动"
+        total = sum(c.old_chars + c.new_chars for c in self.chapters)
+        ratio = (self.deleted + self.inserted) / total if total else 0.0
+        return (f"改动 {len(self.chapters)} 章、{self.paragraphs} 段，删 {self.deleted} 字、增 {self.inserted} 字，"
+                f"改动章的改动率 {ratio:.1%}")
+
+
+def split_chapters(text: str) -> List[Chapter]:
+    """按章节标题切分；章号无法解析时按上一章顺延，无标题时整个文件为一章"""
+    headings = list(CHAPTER_HEADING_PATTERN.finditer(text))
+    if not headings:
+        return [Chapter(None, 0, len(text), len(text.rstrip()))]
+    chapters: List[Chapter] = []
+    previous = 0
+    for index, heading in enumerate(headings):
+        end = headings[index + 1].start() if index + 1 < len(headings) else len(text)
+        match = HEADING_NUMBER_PATTERN.search(heading.group(0))
+        number = parse_chinese_number(match.group(1)) if match else None
+        number = number if number is not None else previous + 1
+        previous = number
+        body_end = heading.start() + len(text[heading.start():end].rstrip())
+        chapters.append(Chapter(number, heading.start(), end, body_end))
+    return chapters
+
+
+def _line_starts(text: str) -> List[int]:
+    starts = [0]
+    position = text.find("\n")
+    while position >= 0:
+        starts.append(position + 1)
+        position = text.find("\n", position + 1)
+    return starts
+
+
+def tail_cut(spans: List[Span], body_end: int, new_body_end: int, window: int) -> Optional[int]:
+    """章末被截断时返回截断点（相对旧版），否则返回 None
+
+    截断指最后一个改动块删掉的字多于写入的字，且新版从该块起到正文终点不超过 window 字：
+    旧结尾删去多少都可以，截断后补写的新结尾仍受窗口限制。
+    """
+    if not spans:
+        return None
+    a0, a1, b0, b1 = spans[-1]
+    if a0 >= body_end or a1 - a0 <= b1 - b0 or new_body_end - b0 > window:
+        return None
+    return a0
+
+
+def diff_chapter(number: Optional[int], old: str, new: str, window: int = ENDING_WINDOW,
+                 old_body_end: Optional[int] = None) -> ChapterDiff:
+    """比较同一章的两个版本；old_body_end 为旧版正文终点（相对 old），默认去掉尾部空白
+
+    章末被整段删除时，章末窗口从截断点向前计算。
+    """
+    spans = diff_text(old, new)
+    body_end = len(old.rstrip()) if old_body_end is None else old_body_end
+    cut = tail_cut(spans, body_end, len(new.rstrip()), window)
+    anchor = body_end if cut is None else cut
+    ending_start = max(0, anchor - window)
+    lines = _line_starts(new)
+    touched = set()
+    for _, _, b0, b1 in spans:
+        first = bisect_right(lines, b0) - 1
+        last = bisect_left(lines, b1) - 1 if b1 > b0 else first
+        touched.update(range(first, max(first, last) + 1))
+    # 只统计非空段落：空行上的改动归入其后的段落
+    paragraphs = sum(1 for line in touched if new[lines[line]:lines[line + 1] if line + 1 < len(lines) else len(new)].strip())
+    return ChapterDiff(
+        number=number,
+        status="modified",
+        old_chars=len(old),
+        new_chars=len(new),
+        deleted=sum(a1 - a0 for a0, a1, _, _ in spans),
+        inserted=sum(b1 - b0 for _, _, b0, b1 in spans),
+        hunks=len(spans),
+        paragraphs=paragraphs or (1 if spans else 0),
+        outside_ending=sum(1 for a0, _, _, _ in spans if a0 < ending_start),
+        first_offset=max(0, anchor - spans[0][0]) if spans else None,
+        truncated=0 if cut is None else body_end - cut,
+        spans=spans,
+    )
+
+
+def diff_file(old: str, new: str, window: int = ENDING_WINDOW) -> FileDiff:
+    """按章对齐比较两个版本；章号重复时按出现顺序配对"""
+    started = time.perf_counter()
+    if old == new:
+        return FileDiff([], window, len(split_chapters(old)), time.perf_counter() - started)
+    old_chapters, new_chapters = split_chapters(old), split_chapters(new)
+    pending: Dict[Optional[int], List[Chapter]] = {}
+    for chapter in old_chapters:
+        pending.setdefault(chapter.number, []).append(chapter)
+
+    results: List[ChapterDiff] = []
+    unchanged = 0
+    for chapter in new_chapters:
+        new_text = new[chapter.start:chapter.end]
+        candidates = pending.get(chapter.number)
+        if not candidates:
+            results.append(ChapterDiff(chapter.number, "added", 0, len(new_text), 0, len(new_text), 1,
+                                       new_text.count("\n") + 1, 1))
+            continue
+        previous = candidates.pop(0)
+        old_text = old[previous.start:previous.end]
+        if old_text == new_text:
+            unchanged += 1
+            continue
+        results.append(diff_chapter(chapter.number, old_text, new_text, window, previous.body_end - previous.start))
+    for leftovers in pending.values():
+        for chapter in leftovers:
+            size = chapter.end - chapter.start
+            results.append(ChapterDiff(chapter.number, "removed", size, 0, size, 0, 1, 0, 1))
+    results.sort(key=lambda c: (c.number is None, c.number or 0))
+    return FileDiff(results, window, unchanged, time.perf_counter() - started)
+
+
+def excerpt(text: str, start: int, end: int) -> str:
+    snippet = text[start:end].replace("\n", "⏎")
+    if len(snippet) > EXCERPT_CHARS:
+        snippet = snippet[:EXCERPT_CHARS // 2] + "…" + snippet[-EXCERPT_CHARS // 2:]
+    return snippet
+
+
+# ==================== 命令行 ====================
+
+def _git_show(ref: str, path: str, root: Path) -> str:
+    result = subprocess.run(["git", "show", f"{ref}:{path}"], cwd=root, capture_output=True)
+    if result.returncode != 0:
+        return ""  # 该版本中不存在（新增文件）
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def _print_file(path: str, old: str, new: str, report: FileDiff, show: bool) -> None:
+    print(f"{path}: {report.summary()}（未改动 {report.unchanged} 章，耗时 {report.elapsed * 1000:.1f}ms）")
+    old_starts = {c.number: c.start for c in split_chapters(old)} if show else {}
+    new_starts = {c.number: c.start for c in split_chapters(new)} if show else {}
+    for chapter in report.chapters:
+        if chapter.status != "modified":
+            print(f"  {chapter.label}：{'新增' if chapter.status == 'added' else '删除'}整章")
+            continue
+        where = "仅章末" if not chapter.outside_ending else f"{chapter.outside_ending} 处超出章末 {report.window} 字"
+        cut = f"截去章末 {chapter.truncated} 字，" if chapter.truncated else ""
+        anchor = "截断点" if chapter.truncated else "章末"
+        print(f"  {chapter.label}：{chapter.hunks} 处 / {chapter.paragraphs} 段，改动率 {chapter.ratio:.1%}，"
+              f"{cut}最早距{anchor} {chapter.first_offset} 字（{where}）")
+        if show:
+            base_old, base_new = old_starts.get(chapter.number, 0), new_starts.get(chapter.number, 0)
+            for a0, a1, b0, b1 in chapter.spans:
+                before = excerpt(old, base_old + a0, base_old + a1)
+                after = excerpt(new, base_new + b0, base_new + b1)
+                print(f"    - 「{before}」 → 「{after}」")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="按章比较正文的两个版本（句子 + 字符粒度）")
+    parser.add_argument("paths", nargs="*", help="OLD NEW 两个文件；使用 --git 时为要比较的文件")
+    parser.add_argument("--git", metavar="REF", help="以 git 版本 REF 为旧版，与工作区中的文件比较")
+    parser.add_argument("--root", type=Path, default=ROOT, help="仓库根目录（--git 时使用）")
+    parser.add_argument("--window", type=int, default=ENDING_WINDOW, help=f"章末窗口字符数 (默认: {ENDING_WINDOW})")
+    parser.add_argument("--ending-only", action="store_true", help="改动超出章末窗口或增删整章时退出码为 1")
+    parser.add_argument("--show", action="store_true", help="列出每处改动")
+    parser.add_argument("--json", action="store_true", help="输出 JSON 报告")
+    args = parser.parse_args()
+
+    if args.git:
+        if not args.paths:
+            parser.error("--git 需要指定文件")
+        root = args.root.resolve()
+        pairs = [(path, _git_show(args.git, path, root), (root / path).read_text(encoding="utf-8"))
+                 for path in args.paths]
+    else:
+        if len(args.paths) != 2:
+            parser.error("需要 OLD NEW 两个文件")
+        old_path, new_path = (Path(p) for p in args.paths)
+        pairs = [(new_path.as_posix(), old_path.read_text(encoding="utf-8"), new_path.read_text(encoding="utf-8"))]
+
+    violations = 0
+    payload = []
+    for path, old, new in pairs:
+        report = diff_file(old, new, args.window)
+        if not report.ending_only:
+            violations += 1
+        if args.json:
+            chapters = []
+            for chapter in report.chapters:
+                entry = asdict(chapter)
+                entry["ratio"] = round(chapter.ratio, 4)
+                if not args.show:
+                    entry.pop("spans")
+                chapters.append(entry)
+            payload.append({"path": path, "unchanged": report.unchanged, "ending_only": report.ending_only,
+                            "elapsed_ms": round(report.elapsed * 1000, 2), "chapters": chapters})
+        else:
+            _print_file(path, old, new, report, args.show)
+    if args.json:
+        print(json.dumps(payload, ensure_ascii=False, indent=2))
+    return 1 if args.ending_only and violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+400万字网文AI创作系统 · 语料统计引擎
+=====================================
+
+统计 archives/ 下全部产出的汉字数、章节数、卷数与初稿 / 润色稿进度，并估算各正文阶段的完成时间。
+
+实现要点：
+1. 以文件大小 + mtime 判断是否变化；变化的文件通过 mmap 读取，直接在字节上计算哈希与汉字数
+2. 内容哈希未变时只更新 stat 信息，逐文件结果缓存于 .pipeline/corpus-stats.json
+3. 预热后全量刷新只需 stat 一遍目录；Pipeline 合并 PR 后只对 PR 改动的文件调用 update()
+4. 正文字数每次变化记录一个采样点，用近期速度推算各正文阶段达到 400 万字的 ETA
+
+用法：
+    python tools/corpus_stats.py              # 输出统计报告
+    python tools/corpus_stats.py --json       # 输出 JSON 摘要
+    python tools/corpus_stats.py --rebuild    # 忽略缓存重新统计
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+# ==================== 配置 ====================
+
+ROOT = Path(__file__).resolve().parents[1]
+ARCHIVE_DIR = "archives"
+CACHE_NAME = "corpus-stats.json"
+CACHE_VERSION = 1
+TARGET_CHARS = 4_000_000  # 北极星指标：400万字
+ETA_WINDOW = 7 * 86400  # ETA 取最近 7 天的写作速度
+MAX_SAMPLES = 2000  # 每个阶段保留的采样点上限
+
+# 汉字口径（网文“字数”）：CJK 统一表意文字、扩展 A 与兼容表意文字，不含标点、英文与空白
+CJK_CHAR_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+# 同一口径的 UTF-8 字节形式，可直接在 mmap 上匹配而无需解码
+CJK_BYTES_PATTERN = re.compile(
+    rb"\xe3[\x90-\xbf][\x80-\xbf]"  # U+3400-U+3FFF
+    rb"|\xe4[\x80-\xb6\xb8-\xbf][\x80-\xbf]"  # U+4000-U+4DBF、U+4E00-U+4FFF
+    rb"|[\xe5-\xe9][\x80-\xbf][\x80-\xbf]"  # U+5000-U+9FFF
+    rb"|\xef[\xa4-\xab][\x80-\xbf]"  # U+F900-U+FAFF
+)
+# 章节标题：# 第12章 / ## 第一百零三章（多字节字符不能放进字节类的 []，用分支表示）
+_NUMERALS = "|".join("零〇一二三四五六七八九十百千两")
+CHAPTER_HEADING_PATTERN = re.compile(
+    f"^#{{1,4}}[ \\t]*第[ \\t]*(?:[0-9]|{_NUMERALS})+[ \\t]*章".encode("utf-8"), re.MULTILINE
+)
+CHINESE_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+CHINESE_UNITS = {"十": 10, "百": 100, "千": 1000}
+# 章节标题中的章号（阿拉伯数字或中文数字）
+HEADING_NUMBER_PATTERN = re.compile(r"第[ \t]*([0-9零〇一二三四五六七八九十百千两]+)[ \t]*章")
+STAGE_DIR_PATTERN = re.compile(r"^Stage-(\d+)_")
+VOLUME_DIR_PATTERN = re.compile(r"^Volume-(\d+)$")
+# 正文文件：Stage-04 的 Ch-001-003_Draft.md / _Polished.md，Stage-05/06 的 Volume-01_Release.md / _Round1.md 等
+MANUSCRIPT_FILE_PATTERN = re.compile(
+    r"^(?:Ch-(?P<start>\d+)-(?P<end>\d+)|Volume-(?P<volume>\d+))"
+    r"_(?P<kind>Draft|Polished|Round\d+|Optimized|Release)\.md$"
+)
+
+logger = logging.getLogger("corpus-stats")
+
+
+def count_chinese_chars(text: str) -> int:
+    """统计汉字数（网文“字数”口径：不含标点、英文与空白）"""
+    return len(CJK_CHAR_PATTERN.findall(text))
+
+
+def parse_chinese_number(text: str) -> Optional[int]:
+    """解析章节号：阿拉伯数字或“一百零三”式中文数字"""
+    if text.isdigit():
+        return int(text)
+    total = current = 0
+    for ch in text:
+        if ch in CHINESE_DIGITS:
+            current = CHINESE_DIGITS[ch]
+        elif ch in CHINESE_UNITS:
+            total += (current or 1) * CHINESE_UNITS[ch]
+            current = 0
+        else:
+            return None
+    return total + current
+
+
+def version_rank(kind: str) -> int:
+    """同一章节组 / 卷的多个版本中，取版本序号最大的一个计入正文"""
+    if kind.startswith("Round"):
+        return int(kind[5:] or 0)
+    return {"Draft": 0, "Polished": 1, "Release": 1, "Optimized": 100}.get(kind, 0)
+
+
+# ==================== 数据模型 ====================
+
+@dataclass
+class FileStats:
+    path: str  # 相对仓库根目录的 POSIX 路径
+    size: Optional[int]  # 本地文件大小；来自远端内容时为 None
+    mtime_ns: Optional[int]
+    digest: str
+    chars: int
+    chapters: int  # 文件内的章节标题数
+    stage: Optional[int] = None
+    volume: Optional[int] = None
+    start: Optional[int] = None  # Ch-001-003 的起止章号
+    end: Optional[int] = None
+    kind: Optional[str] = None  # Draft / Polished / RoundN / Optimized / Release；非正文文件为 None
+    remote_at: Optional[float] = None  # 来自合并后远端内容的时间；本地副本比它旧时不覆盖
+
+    @property
+    def chapter_count(self) -> int:
+        if self.chapters:
+            return self.chapters
+        if self.start is not None and self.end is not None:
+            return max(0, self.end - self.start + 1)
+        return 0
+
+
+def classify(rel: str) -> Dict[str, Any]:
+    """从路径推断阶段、卷号、章节范围与版本类型"""
+    parts = rel.split("/")
+    info: Dict[str, Any] = {}
+    if len(parts) >= 2:
+        match = STAGE_DIR_PATTERN.match(parts[1])
+        if match:
+            info["stage"] = int(match.group(1))
+    for part in parts[2:-1]:
+        match = VOLUME_DIR_PATTERN.match(part)
+        if match:
+            info["volume"] = int(match.group(1))
+    match = MANUSCRIPT_FILE_PATTERN.match(parts[-1])
+    if match:
+        info["kind"] = match.group("kind")
+        if match.group("volume"):
+            info["volume"] = int(match.group("volume"))
+        if match.group("start"):
+            info["start"] = int(match.group("start"))
+            info["end"] = int(match.group("end"))
+    return info
+
+
+def measure(rel: str, data: Union[bytes, mmap.mmap], size: Optional[int] = None,
+            mtime_ns: Optional[int] = None) -> FileStats:
+    """对一个文件的字节内容计算哈希、汉字数与章节数"""
+    return FileStats(
+        path=rel,
+        size=size,
+        mtime_ns=mtime_ns,
+        digest=hashlib.blake2b(data, digest_size=16).hexdigest(),
+        chars=len(CJK_BYTES_PATTERN.findall(data)),
+        chapters=len(CHAPTER_HEADING_PATTERN.findall(data)),
+        **classify(rel),
+    )
+
+
+def format_duration(seconds: float) -> str:
+    if seconds >= 86400:
+        return f"{seconds / 86400:.1f}天"
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}小时"
+    return f"{seconds / 60:.0f}分钟"
+
+
+# ==================== 统计引擎 ====================
+
+class CorpusStats:
+    """archives/ 的增量统计；线程安全，可在 Pipeline 的多个工作线程间共享"""
+
+    def __init__(self, root: Path = ROOT, cache_path: Optional[Path] = None,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.root = root
+        self.cache_path = cache_path or root / ".pipeline" / CACHE_NAME
+        self.clock = clock
+        self.files: Dict[str, FileStats] = {}
+        # 阶段号 -> [[时间戳, 正文字数], ...]
+        self.samples: Dict[str, List[List[float]]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    # ---------- 缓存 ----------
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取统计缓存失败，将重新统计: {e}")
+            return
+        if data.get("version") != CACHE_VERSION:
+            return
+        try:
+            self.files = {entry["path"]: FileStats(**entry) for entry in data.get("files", [])}
+        except TypeError as e:
+            logger.warning(f"统计缓存格式不兼容，将重新统计: {e}")
+            self.files = {}
+            return
+        self.samples = data.get("samples", {})
+
+    def save(self) -> None:
+        data = {
+            "version": CACHE_VERSION,
+            "files": [asdict(entry) for entry in self.files.values()],
+            "samples": self.samples,
+        }
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.cache_path)
+
+    # ---------- 刷新 ----------
+
+    def _iter_archive_files(self) -> Iterable[tuple[str, os.stat_result]]:
+        stack = [self.root / ARCHIVE_DIR]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.name.endswith(".md") and entry.is_file():
+                        rel = Path(entry.path).relative_to(self.root).as_posix()
+                        yield rel, entry.stat()
+
+    def _scan(self, rel: str, st: os.stat_result) -> bool:
+        """按需重算单个本地文件，返回是否重新计数"""
+        cached = self.files.get(rel)
+        if cached:
+            if cached.remote_at is not None:
+                # 本地副本早于合并时间（尚未 git pull），保留远端统计
+                if st.st_mtime < cached.remote_at:
+                    return False
+            elif cached.size == st.st_size and cached.mtime_ns == st.st_mtime_ns:
+                return False
+
+        path = self.root / rel
+        if st.st_size == 0:
+            fresh = measure(rel, b"", st.st_size, st.st_mtime_ns)
+        else:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest = hashlib.blake2b(mm, digest_size=16).hexdigest()
+                if cached and cached.digest == digest:
+                    cached.size, cached.mtime_ns, cached.remote_at = st.st_size, st.st_mtime_ns, None
+                    return False
+                fresh = measure(rel, mm, st.st_size, st.st_mtime_ns)
+        self.files[rel] = fresh
+        return True
+
+    def refresh(self, paths: Optional[Iterable[str]] = None) -> int:
+        """刷新本地统计；paths 为空时扫描整个 archives/，返回重新计数的文件数"""
+        recounted = 0
+        with self._lock:
+            if paths is None:
+                seen = set()
+                for rel, st in self._iter_archive_files():
+                    seen.add(rel)
+                    recounted += self._scan(rel, st)
+                for rel in [rel for rel, entry in self.files.items() if rel not in seen and entry.remote_at is None]:
+                    del self.files[rel]
+            else:
+                for rel in paths:
+                    if not rel.startswith(f"{ARCHIVE_DIR}/") or not rel.endswith(".md"):
+                        continue
+                    try:
+                        st = (self.root / rel).stat()
+                    except FileNotFoundError:
+                        entry = self.files.get(rel)
+                        if entry and entry.remote_at is None:
+                            del self.files[rel]
+                        continue
+                    recounted += self._scan(rel, st)
+            self._record_samples()
+            self.save()
+        return recounted
+
+    def update(self, contents: Dict[str, Optional[str]]) -> int:
+        """用合并后的远端内容更新统计（内容为 None 表示文件已删除），返回重新计数的文件数"""
+        recounted = 0
+        now = self.clock()
+        with self._lock:
+            for rel, text in contents.items():
+                if text is None:
+                    recounted += self.files.pop(rel, None) is not None
+                    continue
+                data = text.encode("utf-8")
+                cached = self.files.get(rel)
+                if cached and cached.digest == hashlib.blake2b(data, digest_size=16).hexdigest():
+                    continue
+                fresh = measure(rel, data)
+                fresh.remote_at = now
+                self.files[rel] = fresh
+                recounted += 1
+            self._record_samples()
+            self.save()
+        return recounted
+
+    # ---------- 汇总 ----------
+
+    def _manuscript(self) -> Dict[int, Dict[str, Any]]:
+        """各阶段的正文进度：同一章节组 / 卷只计最新版本"""
+        units: Dict[int, Dict[tuple, FileStats]] = {}
+        for entry in self.files.values():
+            if entry.kind is None or entry.stage is None:
+                continue
+            key = (entry.volume, entry.start, entry.end)
+            stage_units = units.setdefault(entry.stage, {})
+            best = stage_units.get(key)
+            if best is None or version_rank(entry.kind) > version_rank(best.kind or ""):
+                stage_units[key] = entry
+        result = {}
+        for stage, stage_units in units.items():
+            result[stage] = {
+                "chars": sum(entry.chars for entry in stage_units.values()),
+                "chapters": sum(entry.chapter_count for entry in stage_units.values()),
+                "volumes": len({key[0] for key in stage_units if key[0] is not None}),
+            }
+        return result
+
+    def _record_samples(self) -> None:
+        now = self.clock()
+        for stage, info in self._manuscript().items():
+            series = self.samples.setdefault(str(stage), [])
+            if not series or series[-1][1] != info["chars"]:
+                series.append([now, info["chars"]])
+                del series[:-MAX_SAMPLES]
+
+    def eta(self, stage: int, target: int = TARGET_CHARS) -> Optional[float]:
+        """按最近 ETA_WINDOW 内的写作速度估算该阶段正文达到目标字数所需秒数；无法估算时返回 None"""
+        series = self.samples.get(str(stage)) or []
+        if not series:
+            return None
+        last_time, last_chars = series[-1]
+        if last_chars >= target:
+            return 0.0
+        window = [sample for sample in series if sample[0] >= last_time - ETA_WINDOW]
+        first_time, first_chars = window[0]
+        if last_time <= first_time or last_chars <= first_chars:
+            return None
+        rate = (last_chars - first_chars) / (last_time - first_time)
+        return (target - last_chars) / rate
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stages: Dict[int, Dict[str, Any]] = {}
+            for entry in self.files.values():
+                if entry.stage is None:
+                    continue
+                stage = stages.setdefault(entry.stage, {"files": 0, "chars": 0, "kinds": {}})
+                stage["files"] += 1
+                stage["chars"] += entry.chars
+                if entry.kind:
+                    kind = stage["kinds"].setdefault(entry.kind, {"files": 0, "chars": 0, "chapters": 0})
+                    kind["files"] += 1
+                    kind["chars"] += entry.chars
+                    kind["chapters"] += entry.chapter_count
+            for stage, info in self._manuscript().items():
+                eta = self.eta(stage)
+                stages.setdefault(stage, {"files": 0, "chars": 0, "kinds": {}})["manuscript"] = dict(
+                    info, target=TARGET_CHARS, eta_seconds=eta
+                )
+            return {
+                "files": len(self.files),
+                "chars": sum(entry.chars for entry in self.files.values()),
+                "stages": {f"{stage:02d}": stages[stage] for stage in sorted(stages)},
+            }
+
+    def report_lines(self) -> List[str]:
+        summary = self.summary()
+        lines = [f"archives/ 共 {summary['files']} 个文件，{summary['chars']:,} 字"]
+        for stage, info in summary["stages"].items():
+            lines.append(f"  Stage {stage}: {info['files']} 个文件，{info['chars']:,} 字")
+            for kind, counts in sorted(info["kinds"].items()):
+                lines.append(f"    {kind}: {counts['files']} 个文件，{counts['chapters']} 章，{counts['chars']:,} 字")
+            if info.get("manuscript"):
+                lines.append(f"    {_manuscript_line(info['manuscript'])}")
+        return lines
+
+    def progress_lines(self) -> List[str]:
+        """只包含各阶段正文进度与 ETA 的简报，供 Pipeline 在合并后输出"""
+        return [
+            f"Stage {stage} {_manuscript_line(info['manuscript'])}"
+            for stage, info in self.summary()["stages"].items() if info.get("manuscript")
+        ]
+
+
+def _manuscript_line(manuscript: Dict[str, Any]) -> str:
+    eta = manuscript["eta_seconds"]
+    eta_text = "数据不足" if eta is None else format_duration(eta)
+    return (
+        f"正文进度: {manuscript['chars']:,}/{manuscript['target']:,} 字 "
+        f"({manuscript['chars'] / manuscript['target']:.1%})，"
+        f"{manuscript['volumes']} 卷 {manuscript['chapters']} 章，预计剩余 {eta_text}"
+    )
+
+
+# ==================== 命令行 ====================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="统计 archives/ 的字数与正文进度")
+    parser.add_argument("--root", type=Path, default=ROOT, help="仓库根目录")
+    parser.add_argument("--json", action="store_true", help="输出 JSON 摘要")
+    parser.add_argument("--rebuild", action="store_true", help="忽略缓存，重新统计全部文件")
+    parser.add_argument("paths", nargs="*", help="只刷新这些文件（相对仓库根目录）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    stats = CorpusStats(args.root.resolve())
+    if args.rebuild:
+        stats.files.clear()
+    started = time.perf_counter()
+    recounted = stats.refresh(args.paths or None)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(stats.summary(), ensure_ascii=False, indent=2))
+    else:
+        for line in stats.report_lines():
+            print(line)
+        print(f"重新计数 {recounted} 个文件，耗时 {elapsed * 1000:.0f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+400万字网文AI创作系统 · 近似重复段落索引
+=========================================
+
+长篇连载由 Agent 分批写作，容易在不同章节、不同卷之间重复场景和段落。本工具为 archives/
+下全部 .md 的段落建立 MinHash + LSH 索引，Pipeline 合并 PR 前用它检查新增段落是否与已有
+归档近似重复，合并后再把新内容增量写入索引。
+
+实现要点：
+1. 段落按行切分，只保留汉字后取 SHINGLE_CHARS 字的滑动片段（shingle），短于
+   MIN_PARAGRAPH_CHARS 字的段落（对白、标题等）不参与比较
+2. 签名采用 one-permutation MinHash：每个 shingle 只哈希一次，按哈希值分到 NUM_BINS 个桶中
+   各取最小值，空桶用右侧最近的非空桶补齐（rotation densification），每段耗时与段长成线性
+3. 签名切成 BANDS 段做 LSH：任一段完全相同即为候选，再用签名一致的比例估计 Jaccard 相似度，
+   达到阈值才报告；查询只需查 BANDS 次哈希表，与语料规模无关
+4. 同卷同章的段落（同一章的 Draft / Polished / Release 等版本）互不比较
+5. 逐文件按大小 + mtime 增量更新，结果缓存于 .pipeline/dup-index.json
+
+用法：
+    python tools/dup_index.py                    # 刷新索引并列出语料中的近似重复段落
+    python tools/dup_index.py FILE [FILE ...]    # 检查指定文件与其余归档的重复
+    python tools/dup_index.py --threshold 0.8 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from corpus_stats import (
+    ARCHIVE_DIR, CJK_CHAR_PATTERN, HEADING_NUMBER_PATTERN, ROOT, classify, parse_chinese_number,
+)
+
+# ==================== 配置 ====================
+
+INDEX_NAME = "dup-index.json"
+INDEX_VERSION = 1
+SHINGLE_CHARS = 4  # 每个 shingle 的汉字数
+MIN_PARAGRAPH_CHARS = 40  # 段落汉字数低于该值时不参与比较
+NUM_BINS = 32  # MinHash 签名长度
+BANDS = 8  # LSH 分段数；每段 NUM_BINS // BANDS 个值，相似度约 0.6 起大概率成为候选
+DUPLICATE_THRESHOLD = 0.6  # 估计的 Jaccard 相似度达到该值记为近似重复
+EXCERPT_CHARS = 24
+VALUE_MASK = 0xFFFFFFFF
+ROTATION_OFFSET = 0x9E3779B1  # 空桶按距离偏移，避免与借用的桶取值相同
+_HEX_WIDTH = 8  # 每个签名值的十六进制位数
+_BAND_WIDTH = NUM_BINS // BANDS * _HEX_WIDTH
+
+logger = logging.getLogger("dup-index")
+
+
+# ==================== 签名 ====================
+
+def signature(text: str) -> Optional[str]:
+    """段落的 MinHash 签名（十六进制），汉字数不足时返回 None"""
+    chars = "".join(CJK_CHAR_PATTERN.findall(text))
+    if len(chars) < MIN_PARAGRAPH_CHARS:
+        return None
+    bins = [-1] * NUM_BINS
+    for shingle in {chars[i:i + SHINGLE_CHARS] for i in range(len(chars) - SHINGLE_CHARS + 1)}:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        slot = h % NUM_BINS
+        value = (h // NUM_BINS) & VALUE_MASK
+        if bins[slot] < 0 or value < bins[slot]:
+            bins[slot] = value
+    for slot in range(NUM_BINS):
+        if bins[slot] >= 0:
+            continue
+        for distance in range(1, NUM_BINS):
+            donor = bins[(slot + distance) % NUM_BINS]
+            if donor >= 0:
+                # donor 可能是本轮补齐的值，但按固定顺序补齐，相同的 shingle 集合总得到相同签名
+                bins[slot] = (donor + distance * ROTATION_OFFSET) & VALUE_MASK
+                break
+    return "".join(f"{value:08x}" for value in bins)
+
+
+def similarity(a: str, b: str) -> float:
+    """由签名估计两个段落的 Jaccard 相似度"""
+    same = sum(1 for i in range(0, len(a), _HEX_WIDTH) if a[i:i + _HEX_WIDTH] == b[i:i + _HEX_WIDTH])
+    return same / NUM_BINS
+
+
+def band_keys(sig: str) -> Iterator[str]:
+    for band in range(BANDS):
+        yield f"{band}:{sig[band * _BAND_WIDTH:(band + 1) * _BAND_WIDTH]}"
+
+
+def split_paragraphs(text: str, start: Optional[int] = None) -> Iterator[Tuple[int, Optional[int], str]]:
+    """逐行切分段落，返回 (行号, 章号, 段落)；跳过标题与代码块，章号取自最近的章节标题"""
+    chapter = start
+    in_fence = False
+    for number, line in enumerate(text.splitlines(), 1):
+        stripped = line.strip()
+        if stripped.startswith("```") or stripped.startswith("~~~"):
+            in_fence = not in_fence
+            continue
+        if in_fence or not stripped:
+            continue
+        if stripped.startswith("#"):
+            match = HEADING_NUMBER_PATTERN.search(stripped)
+            if match:
+                chapter = parse_chinese_number(match.group(1)) or chapter
+            continue
+        yield number, chapter, stripped
+
+
+# ==================== 数据模型 ====================
+
+@dataclass
+class IndexedText:
+    path: str  # 相对仓库根目录的 POSIX 路径
+    size: Optional[int]  # 本地文件大小；来自远端内容时为 None
+    mtime_ns: Optional[int]
+    digest: str
+    volume: Optional[int] = None
+    # [[行号, 章号, 签名, 摘录], ...]；章号未知时为 None
+    paragraphs: List[list] = field(default_factory=list)
+    remote_at: Optional[float] = None  # 来自合并后远端内容的时间；本地副本比它旧时不覆盖
+
+
+@dataclass
+class DuplicateHit:
+    path: str
+    line: int
+    other_path: str
+    other_line: int
+    similarity: float
+    excerpt: str
+    other_excerpt: str
+
+    def describe(self) -> str:
+        return (f"`{self.path}` 第 {self.line} 行「{self.excerpt}」≈ `{self.other_path}` "
+                f"第 {self.other_line} 行「{self.other_excerpt}」({self.similarity:.0%})")
+
+
+def index_text(rel: str, text: str, size: Optional[int] = None, mtime_ns: Optional[int] = None) -> IndexedText:
+    info = classify(rel)
+    paragraphs = []
+    for line, chapter, paragraph in split_paragraphs(text, info.get("start")):
+        sig = signature(paragraph)
+        if sig is not None:
+            paragraphs.append([line, chapter, sig, paragraph[:EXCERPT_CHARS]])
+    return IndexedText(
+        path=rel,
+        size=size,
+        mtime_ns=mtime_ns,
+        digest=hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest(),
+        volume=info.get("volume"),
+        paragraphs=paragraphs,
+    )
+
+
+def _same_chapter(volume: Optional[int], chapter: Optional[int],
+                  other_volume: Optional[int], other_chapter: Optional[int]) -> bool:
+    return chapter is not None and volume is not None and (volume, chapter) == (other_volume, other_chapter)
+
+
+# ==================== 索引 ====================
+
+class DuplicateIndex:
+    """archives/ 段落的近似重复索引；线程安全，可在 Pipeline 的多个工作线程间共享"""
+
+    def __init__(self, root: Path = ROOT, index_path: Optional[Path] = None,
+                 threshold: float = DUPLICATE_THRESHOLD, clock=time.time) -> None:
+        self.root = root
+        self.index_path = index_path or root / ".pipeline" / INDEX_NAME
+        self.threshold = threshold
+        self.clock = clock
+        self.files: Dict[str, IndexedText] = {}
+        # "分段号:分段签名" -> [(文件, 段落序号), ...]
+        self._bands: Dict[str, List[Tuple[str, int]]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    # ---------- 缓存 ----------
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取重复段落索引失败，将重新建立: {e}")
+            return
+        if data.get("version") != INDEX_VERSION or data.get("params") != self._params():
+            return
+        try:
+            self.files = {entry["path"]: IndexedText(**entry) for entry in data.get("files", [])}
+        except TypeError as e:
+            logger.warning(f"重复段落索引格式不兼容，将重新建立: {e}")
+            self.files = {}
+        for entry in self.files.values():
+            self._add_bands(entry)
+
+    @staticmethod
+    def _params() -> list:
+        return [SHINGLE_CHARS, MIN_PARAGRAPH_CHARS, NUM_BINS, BANDS]
+
+    def save(self) -> None:
+        data = {
+            "version": INDEX_VERSION,
+            "params": self._params(),
+            "files": [asdict(entry) for entry in self.files.values()],
+        }
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.index_path)
+
+    def _add_bands(self, entry: IndexedText) -> None:
+        for position, paragraph in enumerate(entry.paragraphs):
+            for key in band_keys(paragraph[2]):
+                self._bands.setdefault(key, []).append((entry.path, position))
+
+    def _remove(self, rel: str) -> bool:
+        entry = self.files.pop(rel, None)
+        if entry is None:
+            return False
+        for paragraph in entry.paragraphs:
+            for key in band_keys(paragraph[2]):
+                bucket = self._bands.get(key)
+                if bucket is None:
+                    continue
+                bucket[:] = [ref for ref in bucket if ref[0] != rel]
+                if not bucket:
+                    del self._bands[key]
+        return True
+
+    def _put(self, entry: IndexedText) -> None:
+        self._remove(entry.path)
+        self.files[entry.path] = entry
+        self._add_bands(entry)
+
+    # ---------- 刷新 ----------
+
+    def _iter_archive_files(self) -> Iterator[Tuple[str, os.stat_result]]:
+        stack = [self.root / ARCHIVE_DIR]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.name.endswith(".md") and entry.is_file():
+                        yield Path(entry.path).relative_to(self.root).as_posix(), entry.stat()
+
+    def _scan(self, rel: str, st: os.stat_result) -> bool:
+        cached = self.files.get(rel)
+        if cached:
+            if cached.remote_at is not None:
+                # 本地副本早于合并时间（尚未 git pull），保留远端内容的索引
+                if st.st_mtime < cached.remote_at:
+                    return False
+            elif cached.size == st.st_size and cached.mtime_ns == st.st_mtime_ns:
+                return False
+        try:
+            text = (self.root / rel).read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"读取 {rel} 失败，跳过: {e}")
+            return False
+        fresh = index_text(rel, text, st.st_size, st.st_mtime_ns)
+        if cached and cached.digest == fresh.digest:
+            cached.size, cached.mtime_ns, cached.remote_at = st.st_size, st.st_mtime_ns, None
+            return False
+        self._put(fresh)
+        return True
+
+    def refresh(self) -> int:
+        """扫描整个 archives/，只重新索引变化的文件，返回重新索引的文件数"""
+        reindexed = 0
+        with self._lock:
+            seen = set()
+            for rel, st in self._iter_archive_files():
+                seen.add(rel)
+                reindexed += self._scan(rel, st)
+            removed = [rel for rel, entry in self.files.items() if rel not in seen and entry.remote_at is None]
+            for rel in removed:
+                self._remove(rel)
+            if reindexed or removed:
+                self.save()
+        return reindexed
+
+    def update(self, contents: Dict[str, Optional[str]]) -> int:
+        """用合并后的远端内容更新索引（内容为 None 表示文件已删除），返回重新索引的文件数"""
+        reindexed = 0
+        now = self.clock()
+        with self._lock:
+            for rel, text in contents.items():
+                if text is None:
+                    reindexed += self._remove(rel)
+                    continue
+                fresh = index_text(rel, text)
+                cached = self.files.get(rel)
+                if cached and cached.digest == fresh.digest:
+                    continue
+                fresh.remote_at = now
+                self._put(fresh)
+                reindexed += 1
+            if reindexed:
+                self.save()
+        return reindexed
+
+    # ---------- 查询 ----------
+
+    def check(self, rel: str, text: str, base_text: str = "") -> List[DuplicateHit]:
+        """检查 text（rel 的新版本）中新增的段落，返回与其余归档或本文件其他段落近似重复的段落
+
+        base_text 中已有的段落视为历史内容，不作为检查对象；索引中 rel 的旧版本不参与比较。
+        每个段落只报告相似度最高的一处。
+        """
+        fresh = index_text(rel, text)
+        existing = {paragraph for _, _, paragraph in split_paragraphs(base_text)}
+        lines = text.splitlines()
+        # 本文件的新版本单独建表，同一次提交内的重复段落也能发现
+        local: Dict[str, List[int]] = {}
+        for position, paragraph in enumerate(fresh.paragraphs):
+            for key in band_keys(paragraph[2]):
+                local.setdefault(key, []).append(position)
+
+        hits = []
+        with self._lock:
+            for position, (line, chapter, sig, excerpt) in enumerate(fresh.paragraphs):
+                if lines[line - 1].strip() in existing:
+                    continue
+                best: Optional[DuplicateHit] = None
+                seen = set()
+                for key in band_keys(sig):
+                    for other_path, other in self._bands.get(key, ()):
+                        if other_path == rel or (other_path, other) in seen:
+                            continue
+                        seen.add((other_path, other))
+                        entry = self.files[other_path]
+                        other_line, other_chapter, other_sig, other_excerpt = entry.paragraphs[other]
+                        if _same_chapter(fresh.volume, chapter, entry.volume, other_chapter):
+                            continue
+                        score = similarity(sig, other_sig)
+                        if score >= self.threshold and (best is None or score > best.similarity):
+                            best = DuplicateHit(rel, line, other_path, other_line, score, excerpt, other_excerpt)
+                    for other in local.get(key, ()):
+                        if other == position or (rel, other) in seen:
+                            continue
+                        seen.add((rel, other))
+                        other_line, other_chapter, other_sig, other_excerpt = fresh.paragraphs[other]
+                        if _same_chapter(fresh.volume, chapter, fresh.volume, other_chapter):
+                            continue
+                        score = similarity(sig, other_sig)
+                        if score >= self.threshold and (best is None or score > best.similarity):
+                            best = DuplicateHit(rel, line, rel, other_line, score, excerpt, other_excerpt)
+                if best is not None:
+                    hits.append(best)
+        return hits
+
+    def duplicates(self, paths: Optional[Iterable[str]] = None) -> List[DuplicateHit]:
+        """列出索引内的近似重复段落对；paths 为空时遍历全部文件，每对只报告一次"""
+        wanted = set(paths) if paths is not None else None
+        hits = []
+        reported = set()
+        with self._lock:
+            for rel, entry in self.files.items():
+                if wanted is not None and rel not in wanted:
+                    continue
+                for position, (line, chapter, sig, excerpt) in enumerate(entry.paragraphs):
+                    seen = set()
+                    for key in band_keys(sig):
+                        for other_path, other in self._bands.get(key, ()):
+                            ref = (other_path, other)
+                            if ref == (rel, position) or ref in seen:
+                                continue
+                            seen.add(ref)
+                            pair = frozenset(((rel, position), ref))
+                            if pair in reported:
+                                continue
+                            other_entry = self.files[other_path]
+                            other_line, other_chapter, other_sig, other_excerpt = other_entry.paragraphs[other]
+                            if _same_chapter(entry.volume, chapter, other_entry.volume, other_chapter):
+                                continue
+                            score = similarity(sig, other_sig)
+                            if score >= self.threshold:
+                                reported.add(pair)
+                                hits.append(DuplicateHit(rel, line, other_path, other_line, score, excerpt, other_excerpt))
+        hits.sort(key=lambda hit: (-hit.similarity, hit.path, hit.line))
+        return hits
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self.files),
+                "paragraphs": sum(len(entry.paragraphs) for entry in self.files.values()),
+                "buckets": len(self._bands),
+            }
+
+
+# ==================== 命令行 ====================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="archives/ 近似重复段落检查（MinHash + LSH）")
+    parser.add_argument("paths", nargs="*", help="要检查的文件（相对仓库根目录）；默认列出全部归档中的重复段落")
+    parser.add_argument("--root", type=Path, default=ROOT, help="仓库根目录")
+    parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD,
+                        help=f"估计相似度达到该值记为重复 (默认: {DUPLICATE_THRESHOLD})")
+    parser.add_argument("--rebuild", action="store_true", help="忽略缓存，重新建立索引")
+    parser.add_argument("--json", action="store_true", help="输出 JSON 报告")
+    parser.add_argument("--max-duplicates", type=int, default=None, help="重复段落超过该数量时返回非零退出码")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    root = args.root.resolve()
+    index = DuplicateIndex(root, threshold=args.threshold)
+    if args.rebuild:
+        index.files.clear()
+        index._bands.clear()
+    started = time.perf_counter()
+    reindexed = index.refresh()
+    indexed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if args.paths:
+        hits = []
+        for rel in args.paths:
+            text = (root / rel).read_text(encoding="utf-8")
+            hits.extend(index.check(Path(rel).as_posix(), text))
+    else:
+        hits = index.duplicates()
+    elapsed = time.perf_counter() - started
+
+    summary = index.summary()
+    if args.json:
+        print(json.dumps(dict(summary, reindexed=reindexed, index_seconds=round(indexed, 3),
+                              query_seconds=round(elapsed, 3), duplicates=[asdict(hit) for hit in hits]),
+                         ensure_ascii=False, indent=2))
+    else:
+        for hit in hits:
+            print(f"{hit.path}:{hit.line} ≈ {hit.other_path}:{hit.other_line} ({hit.similarity:.0%})  "
+                  f"「{hit.excerpt}」")
+        print(f"索引 {summary['files']} 个文件 {summary['paragraphs']} 段（重新索引 {reindexed} 个，"
+              f"耗时 {indexed * 1000:.0f}ms），查询耗时 {elapsed * 1000:.1f}ms，近似重复 {len(hits)} 处")
+
+    if args.max_duplicates is not None and len(hits) > args.max_duplicates:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+400万字网文AI创作系统 · 书稿导出
+=================================
+
+把 Stage-04 的润色稿（archives/Stage-04_Mass-Production/Volume-XX/Ch-XXX-YYY_Polished.md）
+按章节顺序导出为发布格式，供 Stage-05 终审与起点上传：
+
+- txt：每卷一个 TXT，另拼接一份全书 TXT（段首两个全角空格）
+- epub：每卷一本 EPUB3
+- upload：按 N 章一包的上传批次（zip，每章一个 TXT，文件名即章节标题）
+
+实现要点：
+1. 流式处理：逐行读取正文，边解析边写入所有请求的格式；EPUB / 上传包通过 ZipFile.open("w")
+   逐章写入压缩流，内存占用与书稿总量无关（只保留章节标题列表用于目录）
+2. 增量导出：各卷的内容哈希（源文件按大小 + mtime 缓存的 blake2b 摘要，加上导出选项）
+   记录在输出目录的 .manifest.json 中，未变化且产物齐全的卷直接跳过
+3. 各卷在独立进程中并行导出；全书 TXT 在各卷完成后按块拼接
+
+用法：
+    python tools/export_manuscript.py                          # 导出全部格式到 exports/
+    python tools/export_manuscript.py --formats txt epub       # 只导出 TXT 与 EPUB
+    python tools/export_manuscript.py --volumes 1 2 --force    # 强制重新导出第 1、2 卷
+    python tools/export_manuscript.py --bundle-size 20         # 上传包每包 20 章
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+import zipfile
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from html import escape
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Union
+
+from corpus_stats import (
+    ARCHIVE_DIR, CHAPTER_HEADING_PATTERN, HEADING_NUMBER_PATTERN, ROOT,
+    classify, parse_chinese_number,
+)
+
+# ==================== 配置 ====================
+
+EXPORT_VERSION = 1  # 导出格式变化时递增，使已有产物全部失效
+MANIFEST_NAME = ".manifest.json"
+SOURCE_STAGE = 4  # 润色稿所在阶段
+SOURCE_KIND = "Polished"
+FORMATS = ("txt", "epub", "upload")
+DEFAULT_OUTPUT = ROOT / "exports"
+DEFAULT_BUNDLE_SIZE = 10  # 上传包每包章节数
+PARAGRAPH_INDENT = "　　"  # 段首两个全角空格（起点排版习惯）
+COPY_CHUNK = 1 << 20  # 拼接全书 TXT 时的块大小
+BOOK_TITLE_PATTERN = re.compile(r"\*\*书名\*\*\s*\|\s*《?([^》|\n]+?)》?\s*\|")
+UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+# 正文中不属于内容的 Markdown 行：分隔线、单行 HTML 注释
+SKIP_LINE_PATTERN = re.compile(r"^(?:[-*_]{3,}|<!--.*-->)$")
+INLINE_MARKUP_PATTERN = re.compile(r"\*\*|__|(?<!\S)[*_]|[*_](?!\S)")
+
+
+# ==================== 数据模型 ====================
+
+@dataclass
+class SourceFile:
+    path: str  # 相对仓库根目录的 POSIX 路径
+    volume: int
+    start: int
+    size: int
+    mtime_ns: int
+    digest: str = ""
+
+
+@dataclass
+class Chapter:
+    volume: int
+    number: int
+    title: str  # 如“第12章 风起青萍”
+
+
+@dataclass
+class VolumeJob:
+    root: str
+    output: str
+    volume: int
+    files: List[str]  # 按起始章号排序的源文件
+    starts: List[int]
+    formats: List[str]
+    title: str
+    author: str
+    bundle_size: int
+
+
+@dataclass
+class VolumeResult:
+    volume: int
+    chapters: int = 0
+    chars: int = 0
+    outputs: List[str] = field(default_factory=list)  # 相对输出目录
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+# ==================== 源文件 ====================
+
+def read_book_title(root: Path) -> str:
+    """从 Project-Bible.md 的基本信息表读取书名，读不到时用仓库目录名"""
+    try:
+        match = BOOK_TITLE_PATTERN.search((root / "Project-Bible.md").read_text(encoding="utf-8"))
+    except OSError:
+        match = None
+    return match.group(1).strip() if match else root.name
+
+
+def find_sources(root: Path) -> Dict[int, List[SourceFile]]:
+    """按卷收集润色稿，卷内按起始章号排序"""
+    volumes: Dict[int, List[SourceFile]] = {}
+    archive = root / ARCHIVE_DIR
+    if not archive.is_dir():
+        return volumes
+    for path in archive.rglob(f"*_{SOURCE_KIND}.md"):
+        rel = path.relative_to(root).as_posix()
+        info = classify(rel)
+        if info.get("stage") != SOURCE_STAGE or info.get("kind") != SOURCE_KIND or info.get("start") is None:
+            continue
+        st = path.stat()
+        volumes.setdefault(info["volume"], []).append(
+            SourceFile(rel, info["volume"], info["start"], st.st_size, st.st_mtime_ns)
+        )
+    for files in volumes.values():
+        files.sort(key=lambda source: (source.start, source.path))
+    return dict(sorted(volumes.items()))
+
+
+def file_digest(path: Path) -> str:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.blake2b(b"", digest_size=16).hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.blake2b(mm, digest_size=16).hexdigest()
+
+
+def volume_digest(root: Path, files: Sequence[SourceFile], cache: Dict[str, dict], options: dict) -> str:
+    """卷的内容哈希：各源文件摘要（大小与 mtime 未变时复用缓存）加上导出选项"""
+    digest = hashlib.blake2b(json.dumps(options, sort_keys=True, ensure_ascii=False).encode("utf-8"),
+                             digest_size=16)
+    for source in files:
+        cached = cache.get(source.path)
+        if cached and cached.get("size") == source.size and cached.get("mtime_ns") == source.mtime_ns:
+            source.digest = cached["digest"]
+        else:
+            source.digest = file_digest(root / source.path)
+        cache[source.path] = {"size": source.size, "mtime_ns": source.mtime_ns, "digest": source.digest}
+        digest.update(f"{source.path}\0{source.digest}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+# ==================== 流式解析 ====================
+
+def clean_line(line: str) -> Optional[str]:
+    """把一行 Markdown 正文整理为纯文本段落；空行与非内容行返回 None"""
+    text = line.strip()
+    if not text or SKIP_LINE_PATTERN.match(text):
+        return None
+    text = text.lstrip("#>").strip()
+    text = INLINE_MARKUP_PATTERN.sub("", text).strip()
+    return text or None
+
+
+def iter_events(root: Path, volume: int, files: Sequence[str],
+                starts: Sequence[int]) -> Iterator[Union[Chapter, str]]:
+    """逐行产出事件：Chapter 表示新章节开始，str 为其后的一个段落
+
+    文件中第一个章节标题之前的内容（文件说明等）不导出；没有章节标题的文件整体视为
+    以文件名起始章号命名的一章。
+    """
+    for rel, start in zip(files, starts):
+        with open(root / rel, "rb") as f:
+            has_heading = False
+            if os.fstat(f.fileno()).st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    has_heading = CHAPTER_HEADING_PATTERN.search(mm) is not None
+            in_chapter = not has_heading
+            if in_chapter:
+                yield Chapter(volume, start, f"第{start}章")
+            index = 0
+            for raw in f:
+                if has_heading and CHAPTER_HEADING_PATTERN.match(raw):
+                    title = raw.decode("utf-8", "replace").strip().lstrip("#").strip()
+                    match = HEADING_NUMBER_PATTERN.search(title)
+                    number = parse_chinese_number(match.group(1)) if match else None
+                    yield Chapter(volume, number if number is not None else start + index, title)
+                    in_chapter = True
+                    index += 1
+                    continue
+                if not in_chapter:
+                    continue
+                text = clean_line(raw.decode("utf-8", "replace"))
+                if text is not None:
+                    yield text
+
+
+# ==================== 写入器 ====================
+
+class ExportWriter(ABC):
+    """格式写入器：依次收到 begin_chapter / paragraph / end_chapter，最后 close 返回产物路径"""
+
+    @abstractmethod
+    def begin_chapter(self, chapter: Chapter) -> None:
+        ...
+
+    @abstractmethod
+    def paragraph(self, text: str) -> None:
+        ...
+
+    def end_chapter(self) -> None:
+        pass
+
+    @abstractmethod
+    def close(self) -> List[Path]:
+        ...
+
+
+def _atomic_target(path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path.with_name(path.name + ".tmp")
+
+
+class TxtWriter(ExportWriter):
+    def __init__(self, path: Path, volume: int) -> None:
+        self.path = path
+        self._tmp = _atomic_target(path)
+        self._file = open(self._tmp, "w", encoding="utf-8", newline="\n")
+        self._file.write(f"第{volume}卷\n\n")
+
+    def begin_chapter(self, chapter: Chapter) -> None:
+        self._file.write(f"\n{chapter.title}\n\n")
+
+    def paragraph(self, text: str) -> None:
+        self._file.write(f"{PARAGRAPH_INDENT}{text}\n")
+
+    def close(self) -> List[Path]:
+        self._file.close()
+        self._tmp.replace(self.path)
+        return [self.path]
+
+
+EPUB_CONTAINER = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>
+"""
+EPUB_CSS = "body { line-height: 1.8; } h2 { text-align: center; } p { text-indent: 2em; margin: 0.3em 0; }\n"
+XHTML_HEAD = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" xml:lang="zh-CN" lang="zh-CN">
+<head><meta charset="UTF-8"/><title>{title}</title><link rel="stylesheet" type="text/css" href="style.css"/></head>
+<body>
+"""
+
+
+class EpubWriter(ExportWriter):
+    """EPUB3：mimetype 不压缩且位于首位，每章一个 XHTML，目录与 OPF 在最后写入"""
+
+    def __init__(self, path: Path, title: str, author: str, volume: int) -> None:
+        self.path = path
+        self.title = f"{title} 第{volume}卷"
+        self.author = author
+        self.volume = volume
+        self._tmp = _atomic_target(path)
+        self._zip = zipfile.ZipFile(self._tmp, "w", zipfile.ZIP_DEFLATED)
+        self._zip.writestr(zipfile.ZipInfo("mimetype"), "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+        self._zip.writestr("META-INF/container.xml", EPUB_CONTAINER)
+        self._zip.writestr("OEBPS/style.css", EPUB_CSS)
+        self._chapters: List[tuple[str, str]] = []  # (文件名, 标题)
+        self._entry: Optional[BinaryIO] = None
+
+    def begin_chapter(self, chapter: Chapter) -> None:
+        self.end_chapter()
+        name = f"chapter-{len(self._chapters) + 1:04d}.xhtml"
+        self._chapters.append((name, chapter.title))
+        self._entry = self._zip.open(f"OEBPS/{name}", "w")
+        title = escape(chapter.title)
+        self._entry.write((XHTML_HEAD.format(title=title) + f"<h2>{title}</h2>\n").encode("utf-8"))
+
+    def paragraph(self, text: str) -> None:
+        if self._entry is not None:
+            self._entry.write(f"<p>{escape(text)}</p>\n".encode("utf-8"))
+
+    def end_chapter(self) -> None:
+        if self._entry is not None:
+            self._entry.write(b"</body>\n</html>\n")
+            self._entry.close()
+            self._entry = None
+
+    def close(self) -> List[Path]:
+        self.end_chapter()
+        nav = "".join(f'<li><a href="{name}">{escape(title)}</a></li>\n' for name, title in self._chapters)
+        self._zip.writestr("OEBPS/nav.xhtml", XHTML_HEAD.format(title="目录")
+                           + f'<nav epub:type="toc"><h2>目录</h2><ol>\n{nav}</ol></nav>\n</body>\n</html>\n')
+        manifest = "".join(
+            f'    <item id="c{index}" href="{name}" media-type="application/xhtml+xml"/>\n'
+            for index, (name, _) in enumerate(self._chapters, 1)
+        )
+        spine = "".join(f'    <itemref idref="c{index}"/>\n' for index in range(1, len(self._chapters) + 1))
+        modified = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        identifier = uuid.uuid5(uuid.NAMESPACE_URL, f"{self.title}/{self.author}")
+        self._zip.writestr("OEBPS/content.opf", f"""<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id" xml:lang="zh-CN">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:identifier id="book-id">urn:uuid:{identifier}</dc:identifier>
+    <dc:title>{escape(self.title)}</dc:title>
+    <dc:creator>{escape(self.author)}</dc:creator>
+    <dc:language>zh-CN</dc:language>
+    <meta property="dcterms:modified">{modified}</meta>
+  </metadata>
+  <manifest>
+    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+    <item id="css" href="style.css" media-type="text/css"/>
+{manifest}  </manifest>
+  <spine>
+{spine}  </spine>
+</package>
+""")
+        self._zip.close()
+        self._tmp.replace(self.path)
+        return [self.path]
+
+
+class BundleWriter(ExportWriter):
+    """上传包：每 size 章一个 zip，包名为首末章号（如 Volume-01_0001-0010.zip），每章一个 TXT"""
+
+    def __init__(self, directory: Path, volume: int, size: int) -> None:
+        self.directory = directory
+        self.volume = volume
+        self.size = max(1, size)
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._tmp: Optional[Path] = None
+        self._first = self._last = 0
+        self._count = 0
+        self._entry: Optional[BinaryIO] = None
+        self._outputs: List[Path] = []
+
+    def _finish_bundle(self) -> None:
+        if self._zip is None:
+            return
+        self._zip.close()
+        target = self.directory / f"Volume-{self.volume:02d}_{self._first:04d}-{self._last:04d}.zip"
+        assert self._tmp is not None
+        self._tmp.replace(target)
+        self._outputs.append(target)
+        self._zip = None
+
+    def begin_chapter(self, chapter: Chapter) -> None:
+        self.end_chapter()
+        if self._zip is not None and self._count >= self.size:
+            self._finish_bundle()
+        if self._zip is None:
+            self._tmp = _atomic_target(self.directory / f"Volume-{self.volume:02d}_bundle.zip")
+            self._zip = zipfile.ZipFile(self._tmp, "w", zipfile.ZIP_DEFLATED)
+            self._first = chapter.number
+            self._count = 0
+        self._last = chapter.number
+        self._count += 1
+        name = f"{chapter.number:04d}_{UNSAFE_FILENAME_CHARS.sub('_', chapter.title)}.txt"
+        self._entry = self._zip.open(name, "w")
+        self._entry.write(f"{chapter.title}\n\n".encode("utf-8"))
+
+    def paragraph(self, text: str) -> None:
+        if self._entry is not None:
+            self._entry.write(f"{PARAGRAPH_INDENT}{text}\n".encode("utf-8"))
+
+    def end_chapter(self) -> None:
+        if self._entry is not None:
+            self._entry.close()
+            self._entry = None
+
+    def close(self) -> List[Path]:
+        self.end_chapter()
+        self._finish_bundle()
+        return self._outputs
+
+
+# ==================== 导出 ====================
+
+def volume_outputs(output: Path, volume: int, fmt: str) -> List[Path]:
+    """某卷某格式当前已有的产物"""
+    if fmt == "txt":
+        return [output / "txt" / f"Volume-{volume:02d}.txt"]
+    if fmt == "epub":
+        return [output / "epub" / f"Volume-{volume:02d}.epub"]
+    return sorted((output / "upload").glob(f"Volume-{volume:02d}_*.zip"))
+
+
+def export_volume(job: VolumeJob) -> VolumeResult:
+    """单遍读取一卷的润色稿，同时写入所有请求的格式"""
+    started = time.perf_counter()
+    root, output = Path(job.root), Path(job.output)
+    result = VolumeResult(job.volume)
+    writers: List[ExportWriter] = []
+    try:
+        for fmt in job.formats:
+            for stale in volume_outputs(output, job.volume, fmt):
+                stale.unlink(missing_ok=True)
+            if fmt == "txt":
+                writers.append(TxtWriter(volume_outputs(output, job.volume, fmt)[0], job.volume))
+            elif fmt == "epub":
+                writers.append(EpubWriter(volume_outputs(output, job.volume, fmt)[0], job.title, job.author, job.volume))
+            else:
+                writers.append(BundleWriter(output / "upload", job.volume, job.bundle_size))
+        for event in iter_events(root, job.volume, job.files, job.starts):
+            if isinstance(event, Chapter):
+                result.chapters += 1
+                for writer in writers:
+                    writer.begin_chapter(event)
+            else:
+                result.chars += len(event)
+                for writer in writers:
+                    writer.paragraph(event)
+        for writer in writers:
+            result.outputs.extend(path.relative_to(output).as_posix() for path in writer.close())
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def book_path(output: Path, title: str) -> Path:
+    return output / "txt" / f"{UNSAFE_FILENAME_CHARS.sub('_', title)}.txt"
+
+
+def concat_book(output: Path, title: str) -> Optional[Path]:
+    """按卷序拼接全书 TXT（按块复制，不整体读入）"""
+    parts = sorted((output / "txt").glob("Volume-*.txt"))
+    if not parts:
+        return None
+    target = book_path(output, title)
+    tmp = _atomic_target(target)
+    with open(tmp, "wb") as out:
+        out.write(f"{title}\n\n".encode("utf-8"))
+        for part in parts:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out, COPY_CHUNK)
+            out.write(b"\n")
+    tmp.replace(target)
+    return target
+
+
+def load_manifest(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"version": EXPORT_VERSION, "files": {}, "volumes": {}}
+    if data.get("version") != EXPORT_VERSION:
+        return {"version": EXPORT_VERSION, "files": {}, "volumes": {}}
+    return data
+
+
+def save_manifest(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+    tmp.replace(path)
+
+
+def plan_exports(root: Path, output: Path, sources: Dict[int, List[SourceFile]], formats: Sequence[str],
+                 manifest: dict, options: dict, force: bool = False) -> Dict[int, tuple[str, List[str]]]:
+    """返回需要导出的卷 -> (内容哈希, 需要导出的格式)；哈希未变且产物齐全的格式跳过"""
+    plan: Dict[int, tuple[str, List[str]]] = {}
+    for volume, files in sources.items():
+        digest = volume_digest(root, files, manifest["files"], options)
+        done = manifest["volumes"].get(str(volume), {})
+        needed = []
+        for fmt in formats:
+            entry = done.get(fmt)
+            fresh = (not force and entry is not None and entry.get("digest") == digest
+                     and all((output / rel).exists() for rel in entry.get("outputs", [])))
+            if not fresh:
+                needed.append(fmt)
+        if needed:
+            plan[volume] = (digest, needed)
+    return plan
+
+
+def run_jobs(jobs: Sequence[VolumeJob], workers: int) -> List[VolumeResult]:
+    """各卷并行导出；只有一卷或 workers=1 时在当前进程执行"""
+    if workers <= 1 or len(jobs) <= 1:
+        return [export_volume(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return list(pool.map(export_volume, jobs))
+
+
+# ==================== 命令行 ====================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="把 Stage-04 润色稿按章节顺序流式导出为 TXT / EPUB / 上传包")
+    parser.add_argument("--root", type=Path, default=ROOT, help="仓库根目录")
+    parser.add_argument("--output", type=Path, default=None, help="输出目录 (默认: exports/)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS), help="导出格式 (默认: 全部)")
+    parser.add_argument("--volumes", nargs="+", type=int, default=None, help="只导出指定卷")
+    parser.add_argument("--title", default=None, help="书名 (默认读取 Project-Bible.md)")
+    parser.add_argument("--author", default="", help="作者署名（写入 EPUB 元数据）")
+    parser.add_argument("--bundle-size", type=int, default=DEFAULT_BUNDLE_SIZE,
+                        help=f"上传包每包章节数 (默认: {DEFAULT_BUNDLE_SIZE})")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认 CPU 核数")
+    parser.add_argument("--force", action="store_true", help="忽略内容哈希，重新导出")
+    parser.add_argument("--json", action="store_true", help="输出 JSON 报告")
+    args = parser.parse_args()
+
+    root = args.root.resolve()
+    output = (args.output or root / DEFAULT_OUTPUT.relative_to(ROOT)).resolve()
+    title = args.title or read_book_title(root)
+    started = time.perf_counter()
+
+    all_sources = find_sources(root)
+    sources = all_sources
+    if args.volumes:
+        sources = {volume: files for volume, files in all_sources.items() if volume in args.volumes}
+    if not sources:
+        print(f"未找到润色稿: {root / ARCHIVE_DIR}/Stage-{SOURCE_STAGE:02d}_*/Volume-XX/Ch-XXX-YYY_{SOURCE_KIND}.md",
+              file=sys.stderr)
+        return 1
+
+    manifest_path = output / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+    options = {"title": title, "author": args.author, "bundle_size": args.bundle_size}
+    plan = plan_exports(root, output, sources, args.formats, manifest, options, args.force)
+    jobs = [
+        VolumeJob(str(root), str(output), volume, [source.path for source in sources[volume]],
+                  [source.start for source in sources[volume]], formats, title, args.author, args.bundle_size)
+        for volume, (_, formats) in plan.items()
+    ]
+    results = run_jobs(jobs, args.workers or os.cpu_count() or 1)
+
+    for result in results:
+        if result.error is not None:
+            continue
+        digest, formats = plan[result.volume]
+        entry = manifest["volumes"].setdefault(str(result.volume), {})
+        for fmt in formats:
+            # 各格式的产物位于同名子目录下
+            entry[fmt] = {"digest": digest, "outputs": [rel for rel in result.outputs if rel.startswith(f"{fmt}/")]}
+    known = {str(volume) for volume in all_sources}
+    manifest["files"] = {rel: info for rel, info in manifest["files"].items() if (root / rel).exists()}
+    manifest["volumes"] = {key: value for key, value in manifest["volumes"].items() if key in known}
+    save_manifest(manifest_path, manifest)
+
+    book = None
+    if "txt" in args.formats and (any("txt" in formats for _, formats in plan.values())
+                                  or not book_path(output, title).exists()):
+        book = concat_book(output, title)
+    elapsed = time.perf_counter() - started
+
+    failed = [result for result in results if result.error is not None]
+    if args.json:
+        print(json.dumps({
+            "output": str(output),
+            "volumes": len(sources),
+            "skipped": sorted(set(sources) - set(plan)),
+            "exported": [asdict(result) for result in results],
+            "book": str(book) if book else None,
+            "elapsed": round(elapsed, 3),
+        }, ensure_ascii=False, indent=2))
+        return 1 if failed else 0
+
+    for result in sorted(results, key=lambda result: result.volume):
+        if result.error is not None:
+            print(f"卷{result.volume}: 导出失败 {result.error}")
+        else:
+            print(f"卷{result.volume}: {result.chapters} 章，{result.chars:,} 字符，"
+                  f"{len(result.outputs)} 个文件，{result.seconds:.2f}s")
+    skipped = len(sources) - len(plan)
+    if skipped:
+        print(f"跳过 {skipped} 个内容未变化的卷")
+    if book:
+        print(f"全书 TXT: {book.relative_to(output).as_posix()}")
+    print(f"输出目录 {output}，耗时 {elapsed:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
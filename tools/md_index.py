@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+400万字网文AI创作系统 · Markdown 结构索引
+=========================================
+
+为 Stages/*.md、Project-Bible.md、Risk-Ledger.md 与 archives/**.md 建立标题树、表格与各小节
+字节区间的索引。解析一次后按内容哈希缓存到磁盘，之后取任意小节或表格都只需按字节区间读取，
+不必重新解析全文。
+
+Pipeline 用它把 Stage 指南中的验收标准嵌入 Issue；交付物检查、参考清单读取等也可以复用。
+
+实现要点：
+1. 逐行扫描字节内容：ATX 标题（# ~ ######）构成标题树，代码块内的 # 不算标题；
+   每个小节的区间延伸到下一个同级或更高级标题之前
+2. 表格为“表头行 + 分隔行”开头的连续 | 行，记录所属小节、字节区间、表头与行数
+3. 解析结果以内容哈希为键缓存于 .pipeline/md-index.json，文件先按大小 + mtime 判断是否变化，
+   变化后哈希仍相同（如 touch、git checkout）时直接复用
+4. 取小节 / 表格时通过 mmap 只读取对应字节区间
+
+用法：
+    python tools/md_index.py                                   # 索引全部文件并输出概况
+    python tools/md_index.py Stages/Stage-04_Mass-Production.md           # 输出标题树
+    python tools/md_index.py Stages/Stage-04_Mass-Production.md --section 质量标准 去AI味
+    python tools/md_index.py Risk-Ledger.md --tables
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from corpus_stats import ARCHIVE_DIR, ROOT
+
+# ==================== 配置 ====================
+
+INDEX_NAME = "md-index.json"
+INDEX_VERSION = 1
+# 默认索引范围：阶段指南、项目总账与全部归档
+DEFAULT_GLOBS = ("Stages/*.md", "Project-Bible.md", "Risk-Ledger.md", f"{ARCHIVE_DIR}/**/*.md")
+HEADING_PATTERN = re.compile(rb"^(#{1,6})[ \t]+(.+?)[ \t#]*$")
+FENCE_PATTERN = re.compile(rb"^[ \t]*(```|~~~)")
+TABLE_SEPARATOR_PATTERN = re.compile(rb"^[ \t]*\|?[ \t]*:?-{3,}:?[ \t]*(\|[ \t]*:?-{3,}:?[ \t]*)*\|?[ \t]*$")
+
+logger = logging.getLogger("md-index")
+
+
+# ==================== 数据模型 ====================
+
+@dataclass
+class Section:
+    level: int  # 标题级别 1-6
+    title: str
+    line: int  # 标题所在行号（从 1 开始）
+    start: int  # 标题行起始字节
+    body: int  # 正文起始字节（标题行之后）
+    end: int  # 下一个同级或更高级标题之前
+    parent: Optional[int] = None  # 父小节在 sections 中的序号
+
+
+@dataclass
+class Table:
+    section: Optional[int]  # 所属小节序号；位于第一个标题之前时为 None
+    start: int
+    end: int
+    header: List[str]
+    rows: int  # 不含表头与分隔行
+
+
+@dataclass
+class DocumentTree:
+    sections: List[Section] = field(default_factory=list)
+    tables: List[Table] = field(default_factory=list)
+
+
+def _split_cells(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|"):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split("|")]
+
+
+def _lines(data) -> Iterator[Tuple[int, int, bytes]]:
+    """逐行返回 (起始字节, 结束字节（含换行）, 去掉换行的行内容)"""
+    pos = 0
+    size = len(data)
+    while pos < size:
+        newline = data.find(b"\n", pos)
+        end = size if newline < 0 else newline + 1
+        yield pos, end, bytes(data[pos:end]).rstrip(b"\r\n")
+        pos = end
+
+
+def parse_markdown(data) -> DocumentTree:
+    """解析 Markdown 字节内容的标题树与表格"""
+    tree = DocumentTree()
+    stack: List[int] = []  # 当前打开的小节序号，级别递增
+    in_fence = False
+    table: Optional[Table] = None
+    previous: Optional[Tuple[int, bytes]] = None  # 上一行 (起始字节, 内容)，用于识别表头
+
+    def close_table() -> None:
+        nonlocal table
+        if table is not None:
+            tree.tables.append(table)
+            table = None
+
+    for number, (start, end, line) in enumerate(_lines(data), 1):
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+            close_table()
+            previous = None
+            continue
+        if in_fence:
+            continue
+
+        heading = HEADING_PATTERN.match(line)
+        if heading:
+            close_table()
+            level = len(heading.group(1))
+            while stack and tree.sections[stack[-1]].level >= level:
+                tree.sections[stack.pop()].end = start
+            tree.sections.append(Section(
+                level=level,
+                title=heading.group(2).decode("utf-8", "replace").strip(),
+                line=number,
+                start=start,
+                body=end,
+                end=len(data),
+                parent=stack[-1] if stack else None,
+            ))
+            stack.append(len(tree.sections) - 1)
+            previous = None
+            continue
+
+        stripped = line.strip()
+        if table is not None:
+            if stripped.startswith(b"|"):
+                table.end = end
+                table.rows += 1
+                continue
+            close_table()
+        if previous is not None and previous[1].strip().startswith(b"|") and TABLE_SEPARATOR_PATTERN.match(line):
+            table = Table(
+                section=stack[-1] if stack else None,
+                start=previous[0],
+                end=end,
+                header=_split_cells(previous[1].decode("utf-8", "replace")),
+                rows=0,
+            )
+            previous = None
+            continue
+        previous = (start, line)
+
+    close_table()
+    for index in stack:
+        tree.sections[index].end = len(data)
+    return tree
+
+
+# ==================== 索引 ====================
+
+class MarkdownIndex:
+    """Markdown 结构索引；线程安全，可在 Pipeline 的多个工作线程间共享"""
+
+    def __init__(self, root: Path = ROOT, index_path: Optional[Path] = None) -> None:
+        self.root = root
+        self.index_path = index_path or root / ".pipeline" / INDEX_NAME
+        # 文件 -> [大小, mtime_ns, 内容哈希]
+        self.files: Dict[str, list] = {}
+        # 内容哈希 -> 解析结果
+        self.trees: Dict[str, DocumentTree] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    # ---------- 缓存 ----------
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取 Markdown 索引失败，将重新建立: {e}")
+            return
+        if data.get("version") != INDEX_VERSION:
+            return
+        try:
+            self.files = data.get("files", {})
+            self.trees = {
+                digest: DocumentTree(
+                    [Section(**section) for section in tree["sections"]],
+                    [Table(**table) for table in tree["tables"]],
+                )
+                for digest, tree in data.get("trees", {}).items()
+            }
+        except (TypeError, KeyError) as e:
+            logger.warning(f"Markdown 索引格式不兼容，将重新建立: {e}")
+            self.files, self.trees = {}, {}
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            used = {entry[2] for entry in self.files.values()}
+            data = {
+                "version": INDEX_VERSION,
+                "files": self.files,
+                "trees": {digest: asdict(tree) for digest, tree in self.trees.items() if digest in used},
+            }
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.index_path)
+            self._dirty = False
+
+    # ---------- 解析 ----------
+
+    def _digest(self, rel: str) -> Optional[str]:
+        """返回文件当前内容的哈希，必要时重新解析；文件不存在时返回 None。调用方需持有 self._lock"""
+        try:
+            st = (self.root / rel).stat()
+        except FileNotFoundError:
+            if self.files.pop(rel, None) is not None:
+                self._dirty = True
+            return None
+        cached = self.files.get(rel)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns and cached[2] in self.trees:
+            return cached[2]
+
+        with open(self.root / rel, "rb") as f:
+            if st.st_size == 0:
+                data = b""
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                if digest not in self.trees:
+                    self.trees[digest] = parse_markdown(data)
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    digest = hashlib.blake2b(mm, digest_size=16).hexdigest()
+                    if digest not in self.trees:
+                        self.trees[digest] = parse_markdown(mm)
+        self.files[rel] = [st.st_size, st.st_mtime_ns, digest]
+        self._dirty = True
+        return digest
+
+    def tree(self, rel: str) -> Optional[DocumentTree]:
+        """文件的标题树与表格，文件不存在时返回 None"""
+        with self._lock:
+            digest = self._digest(rel)
+            return self.trees.get(digest) if digest else None
+
+    def refresh(self, globs: Tuple[str, ...] = DEFAULT_GLOBS) -> int:
+        """索引匹配 globs 的全部文件，返回重新解析的文件数"""
+        reparsed = 0
+        seen = set()
+        with self._lock:
+            for pattern in globs:
+                for path in self.root.glob(pattern):
+                    if not path.is_file():
+                        continue
+                    rel = path.relative_to(self.root).as_posix()
+                    seen.add(rel)
+                    before = self.files.get(rel)
+                    after = self._digest(rel)
+                    reparsed += before is None or before[2] != after
+            for rel in [rel for rel in self.files if rel not in seen]:
+                del self.files[rel]
+                self._dirty = True
+        self.save()
+        return reparsed
+
+    # ---------- 查询 ----------
+
+    def _read(self, rel: str, start: int, end: int) -> str:
+        if end <= start:
+            return ""
+        with open(self.root / rel, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[start:min(end, len(mm))].decode("utf-8", "replace")
+
+    def find(self, rel: str, *titles: str) -> Optional[Tuple[DocumentTree, int]]:
+        """按标题路径查找小节：各级依次匹配标题中包含该文字的小节（可跳级），返回 (标题树, 序号)"""
+        tree = self.tree(rel)
+        if tree is None or not titles:
+            return None
+        candidates: List[Optional[int]] = [None]
+        for title in titles:
+            matched = []
+            for index, section in enumerate(tree.sections):
+                if title not in section.title:
+                    continue
+                # 要求位于上一级匹配结果之下
+                ancestor = section.parent
+                parents = set()
+                while ancestor is not None:
+                    parents.add(ancestor)
+                    ancestor = tree.sections[ancestor].parent
+                if any(candidate is None or candidate in parents for candidate in candidates):
+                    matched.append(index)
+            if not matched:
+                return None
+            candidates = matched
+        return tree, candidates[0]
+
+    def section(self, rel: str, *titles: str, include_heading: bool = False) -> Optional[str]:
+        """按标题路径取小节全文（含子小节），找不到时返回 None"""
+        found = self.find(rel, *titles)
+        if found is None:
+            return None
+        tree, index = found
+        section = tree.sections[index]
+        return self._read(rel, section.start if include_heading else section.body, section.end).strip()
+
+    def tables(self, rel: str, *titles: str) -> List[List[List[str]]]:
+        """取表格（每个表格为 [表头, 行, ...]）；给出标题路径时只取该小节（含子小节）内的表格"""
+        tree = self.tree(rel)
+        if tree is None:
+            return []
+        scope = None
+        if titles:
+            found = self.find(rel, *titles)
+            if found is None:
+                return []
+            scope = tree.sections[found[1]]
+        result = []
+        for table in tree.tables:
+            if scope is not None and not (scope.start <= table.start < scope.end):
+                continue
+            lines = self._read(rel, table.start, table.end).splitlines()
+            result.append([_split_cells(line) for i, line in enumerate(lines) if i != 1 and line.strip()])
+        return result
+
+
+# ==================== 命令行 ====================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Markdown 标题树 / 表格索引")
+    parser.add_argument("path", nargs="?", help="要查看的文件（相对仓库根目录）；默认索引全部文件并输出概况")
+    parser.add_argument("--root", type=Path, default=ROOT, help="仓库根目录")
+    parser.add_argument("--section", nargs="+", metavar="TITLE", help="输出标题路径对应的小节")
+    parser.add_argument("--tables", action="store_true", help="输出表格（配合 --section 只输出该小节内的表格）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出")
+    parser.add_argument("--rebuild", action="store_true", help="忽略缓存重新解析")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    index = MarkdownIndex(args.root.resolve())
+    if args.rebuild:
+        index.files.clear()
+        index.trees.clear()
+
+    if not args.path:
+        started = time.perf_counter()
+        reparsed = index.refresh()
+        elapsed = time.perf_counter() - started
+        sections = sum(len(index.trees[entry[2]].sections) for entry in index.files.values())
+        tables = sum(len(index.trees[entry[2]].tables) for entry in index.files.values())
+        print(f"索引 {len(index.files)} 个文件，{sections} 个小节，{tables} 个表格"
+              f"（重新解析 {reparsed} 个，耗时 {elapsed * 1000:.0f}ms）")
+        return 0
+
+    rel = Path(args.path).as_posix()
+    tree = index.tree(rel)
+    index.save()
+    if tree is None:
+        print(f"文件不存在: {rel}", file=sys.stderr)
+        return 1
+    if args.tables:
+        tables = index.tables(rel, *(args.section or ()))
+        if args.json:
+            print(json.dumps(tables, ensure_ascii=False, indent=2))
+        else:
+            for table in tables:
+                print("\n".join(" | ".join(row) for row in table) + "\n")
+        return 0
+    if args.section:
+        text = index.section(rel, *args.section, include_heading=True)
+        if text is None:
+            print(f"找不到小节: {' / '.join(args.section)}", file=sys.stderr)
+            return 1
+        print(text)
+        return 0
+    if args.json:
+        print(json.dumps(asdict(tree), ensure_ascii=False, indent=2))
+    else:
+        for i, section in enumerate(tree.sections):
+            tables = sum(1 for table in tree.tables if table.section == i)
+            suffix = f"  [{tables} 个表格]" if tables else ""
+            print(f"{'  ' * (section.level - 1)}{section.title}  (第 {section.line} 行, {section.end - section.start} 字节){suffix}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
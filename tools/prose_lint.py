@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+400万字网文AI创作系统 · 去AI味文风检查
+=======================================
+
+按 Stage-04 / Stage-06 的去AI味标准扫描正文：禁用词、章首归零开局、章末安稳结尾与超长句。
+
+实现要点：
+1. 所有禁用短语编译为一个 Aho-Corasick 自动机（预先展开为 DFA），每个文件只需线性扫描一遍
+2. 含 “…” 的规则（如 “那是…的开始”）拆成片段匹配，要求各片段按顺序出现在同一句内
+3. 规则可限定作用范围：全文 / 章首 OPENING_WINDOW 字 / 章末 ENDING_WINDOW 字
+4. 全量扫描按文件分发到多进程；合并前预检只比较 PR 前后的新增命中
+
+用法：
+    python tools/prose_lint.py                      # 扫描 archives/ 全部正文文件
+    python tools/prose_lint.py FILE [FILE ...]      # 扫描指定文件
+    python tools/prose_lint.py --rules rules.json   # 使用自定义规则
+    python tools/prose_lint.py --json --max-errors 0
+
+规则文件格式（JSON）：
+    {"extend": true, "max_sentence_chars": 60,
+     "rules": ["不由得", {"phrase": "沉沉睡去", "scope": "ending", "category": "安稳结尾"}]}
+    extend 为 false 或顶层直接是列表时替换内置规则。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from bisect import bisect_right
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from corpus_stats import ARCHIVE_DIR, CJK_CHAR_PATTERN, ROOT, classify, count_chinese_chars
+
+# ==================== 配置 ====================
+
+OPENING_WINDOW = 100  # 章首检查范围（字符）
+ENDING_WINDOW = 200  # 章末检查范围（字符）
+LONG_SENTENCE_CHARS = 60  # 单句汉字数超过该值记为长句
+GAP_MARKERS = re.compile(r"…+|\.{3,}")
+SENTENCE_END_PATTERN = re.compile(r"[。！？!?；;\n]")
+SENTENCE_PATTERN = re.compile(r"[^。！？!?；;\n]+")
+CHAPTER_HEADING_PATTERN = re.compile(r"^#{1,4}[ \t]*第[ \t]*[0-9零〇一二三四五六七八九十百千两]+[ \t]*章.*$", re.MULTILINE)
+FENCE_PATTERN = re.compile(r"^(```|~~~)")
+
+
+@dataclass(frozen=True)
+class LintRule:
+    phrase: str  # 禁用短语；“…” 表示同一句内的任意间隔
+    category: str = "禁用词"
+    scope: str = "any"  # any / opening / ending
+    severity: str = "error"  # error 计入预检，warning 只出现在报告中
+    suggestion: str = ""
+
+
+# 来自 Stages/Stage-04 §6.2 去AI味标准与 Stages/Stage-06 禁用词检测表、禁用开头 / 结尾清单
+DEFAULT_RULES: Tuple[LintRule, ...] = (
+    *(LintRule(p, suggestion="删除，直接写动作") for p in
+      ("然而", "显然", "不得不说", "随着时间的推移", "眼中闪过一丝", "就在这时")),
+    *(LintRule(p, "总结性", "ending", suggestion="删除，直接写动作") for p in ("这一切", "不管怎样", "在这个瞬间")),
+    *(LintRule(p, "预示性", "ending", suggestion="删除，用事实代替猜测") for p in ("仿佛预示着", "或许", "也许")),
+    *(LintRule(p, "定义性", "ending", suggestion="删除，把定义移到下章开头") for p in ("那是…的开始", "这就是…的真相")),
+    *(LintRule(p, "情绪总结", suggestion="删除，用生理反应代替") for p in ("感到前所未有的", "一种莫名的…涌上心头")),
+    *(LintRule(p, "安稳结尾", "ending", suggestion="替换为危机/悬念") for p in
+      ("沉沉睡去", "心满意足", "陷入沉思", "陷入了沉思", "聊了很久")),
+    *(LintRule(p, "归零开局", "opening", suggestion="无缝接戏，承接上一章末的动作") for p in
+      ("第二天", "回到基地后", "时间来到")),
+)
+
+
+def load_rules(path: Optional[Path]) -> Tuple[List[LintRule], dict]:
+    """读取规则文件，返回 (规则列表, 其它设置)；未指定文件时使用内置规则"""
+    if not path:
+        return list(DEFAULT_RULES), {}
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if isinstance(data, list):
+        data = {"extend": False, "rules": data}
+    rules = list(DEFAULT_RULES) if data.get("extend", True) else []
+    for entry in data.get("rules", []):
+        rule = LintRule(entry) if isinstance(entry, str) else LintRule(**entry)
+        if rule.scope not in ("any", "opening", "ending"):
+            raise ValueError(f"规则 {rule.phrase} 的 scope 无效: {rule.scope}")
+        rules.append(rule)
+    settings = {key: value for key, value in data.items() if key not in ("extend", "rules")}
+    return rules, settings
+
+
+# ==================== 多模式自动机 ====================
+
+class PhraseAutomaton:
+    """Aho-Corasick 自动机；构建时补全失配转移，扫描时每个字符只查一次字典"""
+
+    def __init__(self, patterns: Sequence[str]) -> None:
+        self.patterns = list(patterns)
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[List[int]] = [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(index)
+
+        # 按 BFS 顺序计算失配指针，并把失配状态的转移合并进来，得到完整的 DFA
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in range(len(goto) - 1)]
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                queue.append(nxt)
+        self._delta = delta
+        self._outputs = outputs
+        self._first_chars = re.compile("[" + "".join(re.escape(ch) for ch in goto[0]) + "]")
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int]]:
+        """产出 (起始位置, 模式序号)；回到根状态时用正则跳到下一个可能的首字"""
+        if not self.patterns:
+            return
+        delta, outputs, lengths = self._delta, self._outputs, [len(p) for p in self.patterns]
+        seek = self._first_chars.search
+        state = pos = 0
+        size = len(text)
+        while pos < size:
+            if not state:
+                match = seek(text, pos)
+                if match is None:
+                    return
+                pos = match.start()
+            state = delta[state].get(text[pos], 0)
+            if outputs[state]:
+                for index in outputs[state]:
+                    yield pos - lengths[index] + 1, index
+            pos += 1
+
+
+# ==================== 检查 ====================
+
+@dataclass
+class LintHit:
+    line: int
+    column: int
+    phrase: str
+    category: str
+    severity: str
+    excerpt: str
+    suggestion: str = ""
+
+
+@dataclass
+class FileReport:
+    path: str
+    chars: int = 0
+    sentences: int = 0
+    long_sentences: int = 0
+    hits: List[LintHit] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def errors(self) -> int:
+        return sum(1 for hit in self.hits if hit.severity == "error")
+
+    @property
+    def avg_sentence_chars(self) -> float:
+        return self.chars / self.sentences if self.sentences else 0.0
+
+
+def _chapter_windows(text: str) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
+    """返回每章正文的章首窗口与章末窗口；无章节标题时整个文件视为一章"""
+    starts = [m.end() for m in CHAPTER_HEADING_PATTERN.finditer(text)] or [0]
+    ends = [m.start() for m in CHAPTER_HEADING_PATTERN.finditer(text)][1:] + [len(text)]
+    openings, endings = [], []
+    for start, end in zip(starts, ends):
+        body = text[start:end]
+        lead = len(body) - len(body.lstrip())
+        tail = len(body.rstrip())
+        if tail <= lead:
+            continue
+        openings.append((start + lead, min(start + tail, start + lead + OPENING_WINDOW)))
+        endings.append((max(start + lead, start + tail - ENDING_WINDOW), start + tail))
+    return openings, endings
+
+
+def _excerpt(text: str, line_start: int, start: int, end: int, context: int = 10) -> str:
+    line_end = text.find("\n", start)
+    line_end = len(text) if line_end < 0 else line_end
+    return text[max(line_start, start - context):min(line_end, end + context)].strip()
+
+
+def _in_windows(pos: int, windows: List[Tuple[int, int]]) -> bool:
+    return any(start <= pos < end for start, end in windows)
+
+
+class ProseLinter:
+    def __init__(self, rules: Optional[Iterable[LintRule]] = None,
+                 max_sentence_chars: int = LONG_SENTENCE_CHARS) -> None:
+        self.rules = list(rules if rules is not None else DEFAULT_RULES)
+        self.max_sentence_chars = max_sentence_chars
+        # 每条规则拆成按顺序出现的片段；相同片段只进自动机一次
+        self._fragments: List[List[str]] = [
+            [part for part in GAP_MARKERS.split(rule.phrase) if part] for rule in self.rules
+        ]
+        patterns: Dict[str, int] = {}
+        for parts in self._fragments:
+            for part in parts:
+                patterns.setdefault(part, len(patterns))
+        self._pattern_index = patterns
+        self.automaton = PhraseAutomaton(list(patterns))
+        self._long_candidate = re.compile(rf"[^。！？!?；;\n]{{{max_sentence_chars + 1},}}")
+
+    @classmethod
+    def from_file(cls, path: Optional[Path]) -> "ProseLinter":
+        rules, settings = load_rules(path)
+        return cls(rules, max_sentence_chars=int(settings.get("max_sentence_chars", LONG_SENTENCE_CHARS)))
+
+    def lint_text(self, text: str, path: str = "") -> FileReport:
+        # 标题行与代码块不属于正文：替换为等长空白，保持偏移量不变
+        lines = text.split("\n")
+        line_starts: List[int] = []
+        offset = 0
+        in_fence = False
+        for number, line in enumerate(lines):
+            line_starts.append(offset)
+            offset += len(line) + 1
+            stripped = line.lstrip()
+            if FENCE_PATTERN.match(stripped):
+                in_fence = not in_fence
+                lines[number] = " " * len(line)
+            elif in_fence or stripped.startswith("#"):
+                lines[number] = " " * len(line)
+        prose = "\n".join(lines)
+        report = FileReport(path=path, chars=count_chinese_chars(prose))
+
+        positions: Dict[int, List[int]] = {}
+        for start, index in self.automaton.finditer(prose):
+            positions.setdefault(index, []).append(start)
+
+        openings, endings = _chapter_windows(text)
+        for rule, parts in zip(self.rules, self._fragments):
+            if not parts:
+                continue
+            for start in positions.get(self._pattern_index[parts[0]], []):
+                if rule.scope == "opening" and not _in_windows(start, openings):
+                    continue
+                if rule.scope == "ending" and not _in_windows(start, endings):
+                    continue
+                end = self._match_rest(prose, positions, parts, start)
+                if end is None:
+                    continue
+                line = bisect_right(line_starts, start) - 1
+                report.hits.append(LintHit(
+                    line=line + 1,
+                    column=start - line_starts[line] + 1,
+                    phrase=rule.phrase,
+                    category=rule.category,
+                    severity=rule.severity,
+                    excerpt=_excerpt(text, line_starts[line], start, end),
+                    suggestion=rule.suggestion,
+                ))
+
+        # 句数只计含汉字的句子；长句先按字符长度粗筛，再精确计汉字数
+        report.sentences = sum(1 for sentence in SENTENCE_PATTERN.findall(prose) if CJK_CHAR_PATTERN.search(sentence))
+        for match in self._long_candidate.finditer(prose):
+            length = count_chinese_chars(match.group())
+            if length <= self.max_sentence_chars:
+                continue
+            report.long_sentences += 1
+            line = bisect_right(line_starts, match.start()) - 1
+            report.hits.append(LintHit(
+                line=line + 1,
+                column=match.start() - line_starts[line] + 1,
+                phrase=f"长句（{length}字）",
+                category="短句化",
+                severity="warning",
+                excerpt=match.group().strip()[:20] + "…",
+                suggestion=f"拆分为不超过 {self.max_sentence_chars} 字的短句",
+            ))
+        report.hits.sort(key=lambda hit: (hit.line, hit.column))
+        return report
+
+    def _match_rest(self, text: str, positions: Dict[int, List[int]], parts: List[str], start: int) -> Optional[int]:
+        """从首片段位置起，在同一句内依次匹配其余片段；返回整条规则的结束位置"""
+        end = start + len(parts[0])
+        if len(parts) == 1:
+            return end
+        boundary = SENTENCE_END_PATTERN.search(text, end)
+        limit = boundary.start() if boundary else len(text)
+        for part in parts[1:]:
+            candidates = positions.get(self._pattern_index[part], [])
+            index = bisect_right(candidates, end - 1)
+            if index == len(candidates) or candidates[index] + len(part) > limit:
+                return None
+            end = candidates[index] + len(part)
+        return end
+
+    def added_errors(self, new_text: str, old_text: str = "") -> Counter:
+        """预检用：按短语统计新版本比旧版本多出的 error 级命中"""
+        def count(text: str) -> Counter:
+            return Counter(hit.phrase for hit in self.lint_text(text).hits if hit.severity == "error")
+        return count(new_text) - count(old_text)
+
+
+# ==================== 批量扫描 ====================
+
+_worker_linter: Optional[ProseLinter] = None
+
+
+def _init_worker(rules: List[LintRule], max_sentence_chars: int) -> None:
+    global _worker_linter
+    _worker_linter = ProseLinter(rules, max_sentence_chars)
+
+
+def _lint_file(args: Tuple[str, str]) -> FileReport:
+    path, rel = args
+    try:
+        text = Path(path).read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as e:
+        return FileReport(path=rel, error=str(e))
+    assert _worker_linter is not None
+    return _worker_linter.lint_text(text, rel)
+
+
+def iter_manuscript_files(root: Path, include_all: bool = False) -> List[str]:
+    """archives/ 下的正文文件（Draft / Polished / RoundN / Release 等），include_all 时包含全部 .md"""
+    archive = root / ARCHIVE_DIR
+    if not archive.exists():
+        return []
+    files = []
+    for path in sorted(archive.rglob("*.md")):
+        rel = path.relative_to(root).as_posix()
+        if include_all or classify(rel).get("kind"):
+            files.append(rel)
+    return files
+
+
+def lint_paths(linter: ProseLinter, root: Path, paths: Sequence[str], workers: Optional[int] = None) -> List[FileReport]:
+    """多进程扫描文件列表；文件很少时直接在当前进程执行"""
+    jobs = [(str(root / rel), rel) for rel in paths]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        _init_worker(linter.rules, linter.max_sentence_chars)
+        return [_lint_file(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(linter.rules, linter.max_sentence_chars)) as pool:
+        return list(pool.map(_lint_file, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+
+def summarize(reports: Sequence[FileReport]) -> dict:
+    by_phrase: Counter = Counter()
+    by_volume: Counter = Counter()
+    for report in reports:
+        info = classify(report.path)
+        volume = f"Stage-{info.get('stage', 0):02d}/Volume-{info['volume']:02d}" if info.get("volume") else report.path
+        for hit in report.hits:
+            if hit.severity == "error":
+                by_phrase[hit.phrase] += 1
+                by_volume[volume] += 1
+    chars = sum(report.chars for report in reports)
+    sentences = sum(report.sentences for report in reports)
+    return {
+        "files": len(reports),
+        "chars": chars,
+        "errors": sum(report.errors for report in reports),
+        "long_sentences": sum(report.long_sentences for report in reports),
+        "avg_sentence_chars": round(chars / sentences, 1) if sentences else 0.0,
+        "by_phrase": dict(by_phrase.most_common()),
+        "by_volume": dict(sorted(by_volume.items())),
+        "unreadable": [report.path for report in reports if report.error],
+    }
+
+
+# ==================== 命令行 ====================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="去AI味文风检查（禁用词 / 章首章末 / 长句）")
+    parser.add_argument("paths", nargs="*", help="要检查的文件（相对仓库根目录）；默认扫描 archives/ 全部正文")
+    parser.add_argument("--root", type=Path, default=ROOT, help="仓库根目录")
+    parser.add_argument("--rules", type=Path, help="自定义规则文件（JSON）")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认 CPU 核数")
+    parser.add_argument("--all", action="store_true", help="检查 archives/ 下全部 .md，而不只是正文文件")
+    parser.add_argument("--warnings", action="store_true", help="逐条列出 warning 级问题（长句等）")
+    parser.add_argument("--json", action="store_true", help="输出 JSON 报告")
+    parser.add_argument("--max-errors", type=int, default=None, help="error 级问题超过该数量时返回非零退出码")
+    args = parser.parse_args()
+
+    root = args.root.resolve()
+    linter = ProseLinter.from_file(args.rules)
+    paths = args.paths or iter_manuscript_files(root, args.all)
+    started = time.perf_counter()
+    reports = lint_paths(linter, root, paths, args.workers)
+    elapsed = time.perf_counter() - started
+    summary = summarize(reports)
+
+    if args.json:
+        payload = dict(summary, elapsed=round(elapsed, 3), files_detail=[
+            {"path": r.path, "errors": r.errors, "long_sentences": r.long_sentences,
+             "hits": [hit.__dict__ for hit in r.hits if args.warnings or hit.severity == "error"]}
+            for r in reports if r.hits
+        ])
+        print(json.dumps(payload, ensure_ascii=False, indent=2))
+    else:
+        for report in reports:
+            for hit in report.hits:
+                if hit.severity == "error" or args.warnings:
+                    print(f"{report.path}:{hit.line}:{hit.column}: [{hit.category}] {hit.phrase}  「{hit.excerpt}」")
+        print(f"检查 {summary['files']} 个文件，{summary['chars']:,} 字，耗时 {elapsed:.2f}s")
+        print(f"禁用词/句式: {summary['errors']} 处，长句: {summary['long_sentences']} 处，"
+              f"平均句长 {summary['avg_sentence_chars']} 字")
+        for phrase, count in summary["by_phrase"].items():
+            print(f"  {phrase}: {count}")
+        if summary["by_volume"]:
+            print("按卷统计:")
+            for volume, count in summary["by_volume"].items():
+                print(f"  {volume}: {count}")
+        for path in summary["unreadable"]:
+            print(f"无法读取: {path}")
+
+    if args.max_errors is not None and summary["errors"] > args.max_errors:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+400万字网文AI创作系统 · 章节文风指标
+=====================================
+
+把全部正文拆成章节，用 NumPy 一次性计算所有章节的文风指标，输出列式文件并标记异常章节，
+供 Stage-05（卷级终审 / 去AI味）与 Stage-06（章末截断 / 章首接戏）任务定向处理。
+
+指标（每章一行）：
+- 句长：均值、中位数、P90、最大值、长句占比（强制短句）
+- 段长：段落数、平均段长
+- 对话占比：引号（“”「」『』）内汉字占全章汉字的比例
+- 钩子密度：每 2000 字窗口的钩子标记数、无钩子的完整窗口数、章末 200 字是否有钩子标记
+
+实现要点：
+1. 所有章节拼接为一个 UTF-32 码点数组，句 / 段 / 窗口编号都由 cumsum 得到，按章聚合用 bincount
+2. 分位数通过 (章节, 句长) 排序后按组下标直接取值，不逐章循环
+3. 钩子标记用 prose_lint 的多模式自动机在拼接文本上一次扫描
+4. 异常判定使用中位数 / MAD 的稳健 z 分数，另有“窗口无钩子”“章末无钩子”两条硬规则
+
+依赖：numpy（仅本工具需要；Pipeline 只读取其 JSON 输出，不依赖 numpy）
+
+用法：
+    python tools/style_metrics.py                   # 计算并输出异常章节
+    python tools/style_metrics.py --z 3.0 --top 50  # 调整异常阈值与输出条数
+
+输出：
+    .pipeline/style-metrics.npz   每章指标（np.load 读取，各列等长）
+    .pipeline/style-flags.json    异常章节及原因；Pipeline 据此在 Stage-05/06 Issue 中附上预警
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from corpus_stats import ARCHIVE_DIR, HEADING_NUMBER_PATTERN, ROOT, classify, parse_chinese_number, version_rank
+from prose_lint import CHAPTER_HEADING_PATTERN, PhraseAutomaton
+
+# ==================== 配置 ====================
+
+WINDOW_CHARS = 2000  # 钩子检查窗口：每 2000 字
+ENDING_CHARS = 200  # 章末钩子检查范围（汉字）
+LONG_SENTENCE_CHARS = 30  # 超过该汉字数的句子计为长句
+OUTLIER_Z = 3.5  # 稳健 z 分数阈值
+METRICS_NAME = "style-metrics.npz"
+FLAGS_NAME = "style-flags.json"
+
+SENTENCE_END_CHARS = "。！？!?；;…\n"
+DIALOGUE_OPEN_CHARS = "“「『"
+DIALOGUE_CLOSE_CHARS = "”」』"
+# 钩子标记：转折 / 危机 / 悬念类词语与破折号；只做密度统计，不代表钩子质量
+HOOK_MARKERS = (
+    "突然", "忽然", "竟然", "居然", "没想到", "下一刻", "猛地", "不对", "危险", "就在",
+    "原来", "真相", "来不及", "糟了", "到底", "究竟", "谁", "——",
+)
+# (列名, 异常方向)：high 偏大异常，low 偏小异常，both 双向
+OUTLIER_COLUMNS = (
+    ("sentence_mean", "high"),
+    ("sentence_p90", "high"),
+    ("long_sentence_share", "high"),
+    ("paragraph_mean", "high"),
+    ("dialogue_share", "both"),
+    ("hooks_per_window", "low"),
+)
+COLUMN_LABELS = {
+    "sentence_mean": "平均句长",
+    "sentence_p90": "P90 句长",
+    "long_sentence_share": "长句占比",
+    "paragraph_mean": "平均段长",
+    "dialogue_share": "对话占比",
+    "hooks_per_window": "钩子密度（每2000字）",
+}
+
+
+@dataclass
+class Chapter:
+    path: str
+    stage: int
+    volume: int
+    chapter: int
+    text: str
+
+
+def iter_chapters(root: Path) -> List[Chapter]:
+    """按章节拆分正文；同一章节组 / 卷只取最新版本（与 corpus_stats 的正文口径一致）"""
+    latest: Dict[tuple, tuple] = {}
+    archive = root / ARCHIVE_DIR
+    for path in sorted(archive.rglob("*.md")) if archive.exists() else []:
+        rel = path.relative_to(root).as_posix()
+        info = classify(rel)
+        if not info.get("kind") or info.get("stage") is None or info.get("volume") is None:
+            continue
+        key = (info["stage"], info["volume"], info.get("start"), info.get("end"))
+        rank = version_rank(info["kind"])
+        if key not in latest or rank > latest[key][0]:
+            latest[key] = (rank, path, rel, info)
+
+    chapters: List[Chapter] = []
+    for _, path, rel, info in latest.values():
+        text = path.read_text(encoding="utf-8")
+        headings = list(CHAPTER_HEADING_PATTERN.finditer(text))
+        bodies = [(None, text)] if not headings else [
+            (heading, text[heading.end():headings[i + 1].start() if i + 1 < len(headings) else len(text)])
+            for i, heading in enumerate(headings)
+        ]
+        for index, (heading, body) in enumerate(bodies):
+            number = None
+            if info.get("start") is not None:
+                number = info["start"] + index
+            elif heading is not None:
+                match = HEADING_NUMBER_PATTERN.search(heading.group())
+                number = parse_chinese_number(match.group(1)) if match else None
+            body = body.strip()
+            if body:
+                chapters.append(Chapter(rel, info["stage"], info["volume"], number or index + 1, body))
+    chapters.sort(key=lambda c: (c.stage, c.volume, c.chapter))
+    return chapters
+
+
+# ==================== 指标计算 ====================
+
+def _group_percentile(values: np.ndarray, groups: np.ndarray, count: int, q: float) -> np.ndarray:
+    """按组取分位数（最近秩）；空组为 NaN"""
+    order = np.lexsort((values, groups))
+    sorted_values, sorted_groups = values[order], groups[order]
+    starts = np.searchsorted(sorted_groups, np.arange(count))
+    sizes = np.bincount(groups, minlength=count)
+    result = np.full(count, np.nan)
+    present = sizes > 0
+    index = starts[present] + np.floor(q * (sizes[present] - 1)).astype(np.int64)
+    result[present] = sorted_values[index]
+    return result
+
+
+def _segments(boundary: np.ndarray, chapter_start: np.ndarray, weights: np.ndarray,
+              chapter_of: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """以 boundary 字符结尾切分片段（章节开头强制切分），返回非空片段的 (汉字数, 所属章节)"""
+    new_segment = np.zeros(len(boundary), dtype=bool)
+    new_segment[1:] = boundary[:-1]
+    new_segment[chapter_start] = True
+    segment_id = np.cumsum(new_segment) - 1
+    lengths = np.bincount(segment_id, weights=weights)
+    owners = chapter_of[np.flatnonzero(new_segment)]
+    keep = lengths > 0
+    return lengths[keep], owners[keep]
+
+
+def compute_metrics(chapters: Sequence[Chapter], markers: Sequence[str] = HOOK_MARKERS) -> Dict[str, np.ndarray]:
+    """对全部章节一次性计算指标，返回列名 -> 等长数组"""
+    count = len(chapters)
+    texts = [chapter.text for chapter in chapters]
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=count)
+    joined = "".join(texts)
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+    chapter_of = np.repeat(np.arange(count), lengths)
+    chapter_start = np.concatenate(([0], np.cumsum(lengths)[:-1])) if count else np.zeros(0, dtype=np.int64)
+
+    def char_set(chars: str) -> np.ndarray:
+        return np.isin(codes, np.array([ord(ch) for ch in chars], dtype=np.uint32))
+
+    cjk = (
+        ((codes >= 0x3400) & (codes <= 0x4DBF))
+        | ((codes >= 0x4E00) & (codes <= 0x9FFF))
+        | ((codes >= 0xF900) & (codes <= 0xFAFF))
+    )
+    weights = cjk.astype(np.float64)
+    chars = np.bincount(chapter_of, weights=weights, minlength=count)
+
+    # 句子 / 段落
+    sentence_lengths, sentence_owner = _segments(char_set(SENTENCE_END_CHARS), chapter_start, weights, chapter_of)
+    sentences = np.bincount(sentence_owner, minlength=count)
+    paragraph_lengths, paragraph_owner = _segments(codes == ord("\n"), chapter_start, weights, chapter_of)
+    paragraphs = np.bincount(paragraph_owner, minlength=count)
+    long_sentences = np.bincount(sentence_owner, weights=sentence_lengths > LONG_SENTENCE_CHARS, minlength=count)
+    sentence_max = np.zeros(count)
+    np.maximum.at(sentence_max, sentence_owner, sentence_lengths)
+
+    # 对话：引号深度按章节归零，引号内的汉字计入对话
+    depth_step = char_set(DIALOGUE_OPEN_CHARS).astype(np.int64) - char_set(DIALOGUE_CLOSE_CHARS).astype(np.int64)
+    depth = np.cumsum(depth_step)
+    base = (depth - depth_step)[chapter_start] if count else np.zeros(0, dtype=np.int64)
+    inside = (depth - np.repeat(base, lengths)) > 0
+    dialogue = np.bincount(chapter_of, weights=weights * inside, minlength=count)
+
+    # 钩子标记：在拼接文本上一次扫描，按章内汉字偏移归入 2000 字窗口
+    local_chars = np.cumsum(weights) - np.repeat(np.concatenate(([0.0], np.cumsum(chars)[:-1])) if count else chars, lengths)
+    positions = np.fromiter((start for start, _ in PhraseAutomaton(list(markers)).finditer(joined)), dtype=np.int64)
+    marker_owner = chapter_of[positions]
+    markers_total = np.bincount(marker_owner, minlength=count)
+    window_count = np.maximum(1, np.ceil(chars / WINDOW_CHARS)).astype(np.int64)
+    window_offset = np.concatenate(([0], np.cumsum(window_count)[:-1])) if count else window_count
+    marker_window = np.minimum((local_chars[positions] // WINDOW_CHARS).astype(np.int64), window_count[marker_owner] - 1)
+    per_window = np.bincount(window_offset[marker_owner] + marker_window, minlength=int(window_count.sum()))
+    window_owner = np.repeat(np.arange(count), window_count)
+    window_index = np.arange(len(window_owner)) - window_offset[window_owner]
+    full_window = window_index < (chars[window_owner] // WINDOW_CHARS)
+    dead_windows = np.bincount(window_owner, weights=full_window & (per_window == 0), minlength=count)
+    in_ending = local_chars[positions] > chars[marker_owner] - ENDING_CHARS
+    ending_hooks = np.bincount(marker_owner[in_ending], minlength=count)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "chars": chars.astype(np.int32),
+            "sentences": sentences.astype(np.int32),
+            "sentence_mean": np.bincount(sentence_owner, weights=sentence_lengths, minlength=count) / sentences,
+            "sentence_p50": _group_percentile(sentence_lengths, sentence_owner, count, 0.5),
+            "sentence_p90": _group_percentile(sentence_lengths, sentence_owner, count, 0.9),
+            "sentence_max": sentence_max.astype(np.int32),
+            "long_sentence_share": long_sentences / sentences,
+            "paragraphs": paragraphs.astype(np.int32),
+            "paragraph_mean": np.bincount(paragraph_owner, weights=paragraph_lengths, minlength=count) / paragraphs,
+            "dialogue_share": dialogue / chars,
+            "hooks": markers_total.astype(np.int32),
+            "hooks_per_window": markers_total / np.maximum(chars / WINDOW_CHARS, 1e-9),
+            "dead_windows": dead_windows.astype(np.int32),
+            "ending_hooks": ending_hooks.astype(np.int32),
+        }
+
+
+def robust_z(values: np.ndarray) -> np.ndarray:
+    """(x - 中位数) / (1.4826 × MAD)；MAD 为 0 时返回全 0"""
+    median = np.nanmedian(values)
+    mad = np.nanmedian(np.abs(values - median)) * 1.4826
+    if not np.isfinite(mad) or mad == 0:
+        return np.zeros_like(values, dtype=np.float64)
+    return (values - median) / mad
+
+
+def flag_outliers(metrics: Dict[str, np.ndarray], threshold: float = OUTLIER_Z) -> List[List[str]]:
+    """返回每章的异常原因列表"""
+    count = len(metrics["chars"])
+    reasons: List[List[str]] = [[] for _ in range(count)]
+    for column, direction in OUTLIER_COLUMNS:
+        values = metrics[column].astype(np.float64)
+        z = robust_z(values)
+        median = np.nanmedian(values) if count else 0.0
+        high = z > threshold if direction in ("high", "both") else np.zeros(count, dtype=bool)
+        low = z < -threshold if direction in ("low", "both") else np.zeros(count, dtype=bool)
+        for index in np.flatnonzero(high | low):
+            word = "偏高" if high[index] else "偏低"
+            reasons[index].append(f"{COLUMN_LABELS[column]}{word}（{values[index]:.2f}，全书中位数 {median:.2f}）")
+    for index in np.flatnonzero(metrics["dead_windows"] > 0):
+        reasons[index].append(f"{metrics['dead_windows'][index]} 个 2000 字窗口没有钩子标记")
+    for index in np.flatnonzero(metrics["ending_hooks"] == 0):
+        reasons[index].append(f"章末 {ENDING_CHARS} 字没有钩子标记")
+    return reasons
+
+
+# ==================== 输出 ====================
+
+def save_metrics(path: Path, chapters: Sequence[Chapter], metrics: Dict[str, np.ndarray]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        path,
+        path=np.array([chapter.path for chapter in chapters]),
+        stage=np.array([chapter.stage for chapter in chapters], dtype=np.int16),
+        volume=np.array([chapter.volume for chapter in chapters], dtype=np.int16),
+        chapter=np.array([chapter.chapter for chapter in chapters], dtype=np.int32),
+        **metrics,
+    )
+
+
+def save_flags(path: Path, chapters: Sequence[Chapter], reasons: List[List[str]]) -> List[dict]:
+    flagged = [
+        {"stage": c.stage, "volume": c.volume, "chapter": c.chapter, "path": c.path, "reasons": r}
+        for c, r in zip(chapters, reasons) if r
+    ]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "generated": datetime.now(timezone.utc).isoformat(),
+        "chapters_total": len(chapters),
+        "chapters": flagged,
+    }, ensure_ascii=False, indent=1), encoding="utf-8")
+    return flagged
+
+
+# ==================== 命令行 ====================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="计算章节文风指标并标记异常章节")
+    parser.add_argument("--root", type=Path, default=ROOT, help="仓库根目录")
+    parser.add_argument("--out", type=Path, default=None, help=f"指标输出路径（默认 .pipeline/{METRICS_NAME}）")
+    parser.add_argument("--flags", type=Path, default=None, help=f"异常章节输出路径（默认 .pipeline/{FLAGS_NAME}）")
+    parser.add_argument("--z", type=float, default=OUTLIER_Z, help="稳健 z 分数阈值")
+    parser.add_argument("--top", type=int, default=30, help="最多列出的异常章节数")
+    args = parser.parse_args()
+
+    root = args.root.resolve()
+    started = time.perf_counter()
+    chapters = iter_chapters(root)
+    if not chapters:
+        print("archives/ 中没有可统计的正文章节")
+        return 0
+    loaded = time.perf_counter()
+    metrics = compute_metrics(chapters)
+    reasons = flag_outliers(metrics, args.z)
+    computed = time.perf_counter()
+
+    save_metrics(args.out or root / ".pipeline" / METRICS_NAME, chapters, metrics)
+    flagged = save_flags(args.flags or root / ".pipeline" / FLAGS_NAME, chapters, reasons)
+
+    print(f"{len(chapters)} 章，{int(metrics['chars'].sum()):,} 字；读取 {loaded - started:.2f}s，计算 {computed - loaded:.2f}s")
+    for column in ("sentence_mean", "sentence_p90", "paragraph_mean", "dialogue_share", "hooks_per_window"):
+        p10, p50, p90 = np.nanpercentile(metrics[column], [10, 50, 90])
+        print(f"  {COLUMN_LABELS[column]}: P10 {p10:.2f} / P50 {p50:.2f} / P90 {p90:.2f}")
+    print(f"异常章节: {len(flagged)}")
+    for entry in flagged[:args.top]:
+        print(f"  Stage {entry['stage']:02d} 卷{entry['volume']} 第{entry['chapter']:03d}章: {'；'.join(entry['reasons'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
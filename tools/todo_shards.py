@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+400万字网文AI创作系统 · TODO 分片
+=================================
+
+Stage-06 的 TODO 主文件约 500KB、近 400 个任务，执行单个任务的智能体却要整份读入才能定位到自己的条目。
+本工具把每个 TODO 块切成独立的分片文件 todo/shards/<主文件名>/<TODO ID>.md，Issue 直接指向分片。
+
+同步规则（sync_shards）：
+1. 主文件是唯一的内容来源：分片缺失、内容与主文件不一致时按主文件重写
+2. 勾选只增不减：分片中比主文件多出的 [x]（TODO 行本身或其操作步骤）回写到主文件；
+   主文件中的勾选随后覆盖到分片
+3. 主文件重新生成导致行数变化时，只回写 TODO 行本身的勾选
+4. 主文件中已不存在的 TODO 对应的分片被删除
+
+分片需与主文件一同提交，Copilot 才能在默认分支上读到。
+
+用法：
+    python tools/todo_shards.py            # 同步分片并回写勾选
+    python tools/todo_shards.py --check    # 只检查，存在差异时退出码为 1（适合 CI）
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# ==================== 配置 ====================
+
+SHARD_DIR_NAME = "shards"
+SHARD_HEADER = "<!-- 由 tools/todo_shards.py 从 `{master}` 生成：勾选会同步回主文件，其余修改会被覆盖 -->"
+# 与 auto_copilot_pipeline.TODO_LINE_PATTERN 一致：TODO 行是三级标题 + 列表项
+TODO_LINE_PATTERN = re.compile(
+    r"^###\s+-\s*\[(?P<status>[ xX])\]\s+\[(?P<todo_id>[^\]]+?)\]\s+(?P<title>.+)$"
+)
+CHECKED_PATTERN = re.compile(r"\[[xX]\]")
+UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.-]")
+
+
+# ==================== 数据模型 ====================
+
+@dataclass
+class TodoBlock:
+    todo_id: str
+    start: int  # TODO 行在主文件中的行号（从 0 开始）
+    end: int  # 块结束行（不含），已去掉尾部空行与分隔线
+
+
+@dataclass
+class ShardSyncReport:
+    masters: int = 0
+    shards: int = 0
+    written: List[Path] = field(default_factory=list)
+    removed: List[Path] = field(default_factory=list)
+    # 主文件名 -> 从分片回写了勾选的 TODO ID
+    reconciled: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.written or self.removed or self.reconciled)
+
+
+def shard_dir(todo_root: Path, master: Path) -> Path:
+    return todo_root / SHARD_DIR_NAME / master.name.removesuffix(".todos.md")
+
+
+def shard_path(todo_root: Path, master: Path, todo_id: str) -> Path:
+    return shard_dir(todo_root, master) / f"{UNSAFE_FILENAME_CHARS.sub('_', todo_id)}.md"
+
+
+def _is_boundary(line: str) -> bool:
+    """块的结束：下一个 TODO 或分组标题（与 parse_stage_structure 的切分一致）"""
+    return bool(TODO_LINE_PATTERN.match(line)) or (line.strip().startswith("##") and "Group" in line)
+
+
+def todo_blocks(lines: List[str]) -> List[TodoBlock]:
+    blocks = []
+    index = 0
+    while index < len(lines):
+        match = TODO_LINE_PATTERN.match(lines[index])
+        if not match:
+            index += 1
+            continue
+        end = index + 1
+        while end < len(lines) and not _is_boundary(lines[end]):
+            end += 1
+        next_index = end
+        while end > index + 1 and (not lines[end - 1].strip() or lines[end - 1].strip() == "---"):
+            end -= 1
+        blocks.append(TodoBlock(match.group("todo_id").strip(), index, end))
+        index = next_index
+    return blocks
+
+
+def merge_ticks(master: List[str], shard: List[str]) -> List[str]:
+    """把分片中多出的勾选合并进主文件的块；行数不同时只合并 TODO 行"""
+    merged = list(master)
+    indexes = range(len(master)) if len(master) == len(shard) else range(min(1, len(master), len(shard)))
+    for index in indexes:
+        ours, theirs = master[index], shard[index]
+        if ours == theirs:
+            continue
+        if (CHECKED_PATTERN.sub("[ ]", ours) == CHECKED_PATTERN.sub("[ ]", theirs)
+                and len(CHECKED_PATTERN.findall(theirs)) > len(CHECKED_PATTERN.findall(ours))):
+            merged[index] = theirs
+    return merged
+
+
+def _read_shard(path: Path) -> Optional[List[str]]:
+    """分片中的 TODO 块（去掉生成说明）；文件不存在时返回 None"""
+    try:
+        lines = path.read_bytes().decode("utf-8").split("\n")
+    except FileNotFoundError:
+        return None
+    if lines and lines[0].startswith("<!--"):
+        lines = lines[1:]
+    while lines and not lines[0].strip():
+        lines = lines[1:]
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return lines
+
+
+def _write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(text.encode("utf-8"))
+    tmp.replace(path)
+
+
+# ==================== 同步 ====================
+
+def sync_master(todo_root: Path, master: Path, report: ShardSyncReport, dry_run: bool = False) -> None:
+    # 按字节读写，保留主文件原有的换行符（部分 TODO 文件为 CRLF）
+    lines = master.read_bytes().decode("utf-8").split("\n")
+    try:
+        master_rel = master.relative_to(todo_root.parent).as_posix()
+    except ValueError:
+        master_rel = master.name
+    eol = "\r" if lines[0].endswith("\r") else ""  # 分片沿用主文件的换行符
+    header = SHARD_HEADER.format(master=master_rel) + eol + "\n" + eol + "\n"
+    blocks = todo_blocks(lines)
+    reconciled: List[str] = []
+    master_changed = False
+    expected: set[Path] = set()
+
+    for block in blocks:
+        path = shard_path(todo_root, master, block.todo_id)
+        expected.add(path)
+        current = lines[block.start:block.end]
+        shard = _read_shard(path)
+        if shard is not None and shard != current:
+            merged = merge_ticks(current, shard)
+            if merged != current:
+                lines[block.start:block.end] = merged
+                master_changed = True
+                if CHECKED_PATTERN.search(merged[0]) and not CHECKED_PATTERN.search(current[0]):
+                    reconciled.append(block.todo_id)
+                current = merged
+        if shard != current:
+            report.written.append(path)
+            if not dry_run:
+                _write(path, header + "\n".join(current) + "\n")
+
+    directory = shard_dir(todo_root, master)
+    if directory.is_dir():
+        for stale in sorted(directory.glob("*.md")):
+            if stale not in expected:
+                report.removed.append(stale)
+                if not dry_run:
+                    stale.unlink()
+
+    if master_changed:
+        report.reconciled[master.name] = reconciled
+        if not dry_run:
+            _write(master, "\n".join(lines))
+    report.masters += 1
+    report.shards += len(blocks)
+
+
+def sync_shards(todo_root: Path, masters: Optional[Iterable[Path]] = None, dry_run: bool = False) -> ShardSyncReport:
+    """同步 todo_root 下全部（或指定的）Stage 主文件的分片，返回变更报告"""
+    report = ShardSyncReport()
+    files = sorted(masters) if masters is not None else sorted(todo_root.glob("Stage-*.todos.md"))
+    for master in files:
+        sync_master(todo_root, master, report, dry_run)
+    if masters is None:
+        # 主文件已删除的分片目录
+        names = {shard_dir(todo_root, master).name for master in files}
+        for directory in sorted((todo_root / SHARD_DIR_NAME).glob("*/")):
+            if directory.name not in names:
+                for stale in sorted(directory.glob("*.md")):
+                    report.removed.append(stale)
+                    if not dry_run:
+                        stale.unlink()
+    return report
+
+
+# ==================== 命令行 ====================
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="同步 TODO 分片文件，并把分片中的勾选回写到主文件")
+    parser.add_argument("--todo-root", type=Path, default=ROOT / "todo", help="TODO 目录 (默认: todo/)")
+    parser.add_argument("--check", action="store_true", help="只检查不写入，存在差异时退出码为 1")
+    args = parser.parse_args()
+
+    todo_root = args.todo_root.resolve()
+    report = sync_shards(todo_root, dry_run=args.check)
+    verb = "需要" if args.check else "已"
+    for name, ids in report.reconciled.items():
+        detail = f"（TODO: {', '.join(ids)}）" if ids else "（操作步骤）"
+        print(f"{name}: {verb}回写分片中的勾选{detail}")
+    if report.written:
+        print(f"{verb}写入 {len(report.written)} 个分片")
+    if report.removed:
+        print(f"{verb}删除 {len(report.removed)} 个过期分片")
+    print(f"共 {report.masters} 个主文件、{report.shards} 个分片" + ("" if report.changed else "，均已同步"))
+    return 1 if args.check and report.changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())